@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: задержка и память на одну карточку слова.
+
+Сравниваются:
+* прежний путь — отрисовка и сохранение в NamedTemporaryFile(delete=False)
+  (файл удаляется после замера, в боте он оставался на диске);
+* word_card_png — PNG в памяти (BytesIO) с разными compress_level / optimize.
+
+Для каждого варианта — p50/p99 задержки, пик выделенной памяти на карточку
+(tracemalloc, только Python-аллокации) и средний размер PNG.
+
+Запуск из корня проекта:
+    python benchmarks/bench_card_render.py [карточек]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Отдельная временная БД — до импорта config/database
+_tmp_dir = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+from services import image_generation  # noqa: E402
+
+WORDS = ("apple", "window", "journey", "remarkable", "to negotiate", "breakfast", "umbrella", "whisper")
+
+
+def _card(i: int):
+    word = WORDS[i % len(WORDS)]
+    return f"{word} {i}", f"translation {i}", f"trans{i}", f"An example with the word {word}.", "B1"
+
+
+def _old_path(*card) -> int:
+    """Прежняя реализация create_word_card: временный файл на каждую карточку."""
+    img = image_generation.render_word_card(*card)
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
+        file_path = temp_file.name
+        img.save(file_path, "PNG")
+    size = os.path.getsize(file_path)
+    os.remove(file_path)
+    return size
+
+
+def _in_memory(**options):
+    def render(*card) -> int:
+        return len(image_generation.word_card_png(*card, **options))
+    return render
+
+
+def _run(name: str, func, cards: int):
+    # Прогрев: шрифты и первые аллокации PIL не должны попасть в замер
+    func(*_card(0))
+    latencies, peaks, sizes = [], [], []
+    for i in range(cards):
+        card = _card(i)
+        tracemalloc.start()
+        start = time.perf_counter()
+        sizes.append(func(*card))
+        latencies.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000
+    print(f"{name:<28} p50: {p50:7.2f} мс  p99: {p99:7.2f} мс  "
+          f"пик памяти: {statistics.mean(peaks) / 1024:7.1f} КБ  PNG: {statistics.mean(sizes) / 1024:6.1f} КБ")
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"Карточек: {cards}")
+    _run("temp-файл (прежний путь)", _old_path, cards)
+    _run("память, compress_level=1", _in_memory(compress_level=1), cards)
+    _run("память, compress_level=6", _in_memory(compress_level=6), cards)
+    _run("память, compress_level=9", _in_memory(compress_level=9), cards)
+    _run("память, optimize=True", _in_memory(optimize=True), cards)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти: планы «слов дня» для всей базы (tracemalloc).
+
+Сравниваются:
+* прежний кортеж из 11 элементов — «🔹 слово» × repetitions отдельными
+  строками, список строк 'HH:MM' и список уникальных слов на пользователя;
+* DailyPlan — кортеж ссылок на строки каталога, один int повторений и
+  общий для одинаковых настроек array('H') минут.
+
+Слова берутся из каталога (как в get_daily_words_for_user), настройки
+пользователей — случайные из допустимых значений.
+
+Запуск из корня проекта:
+    python benchmarks/bench_daily_plan_memory.py [пользователей]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+from utils.daily_plan import DailyPlan  # noqa: E402
+from utils.helpers import compute_notification_times  # noqa: E402
+from utils.word_catalog import word_catalog  # noqa: E402
+
+FIRST_TIME = "10:00"
+DURATION_HOURS = 10
+TIMEZONES = ("Europe/Moscow", "Europe/Kiev", "Asia/Yekaterinburg", "Asia/Novosibirsk", "UTC")
+
+
+def _old_entry(words, repetitions, words_count, tz):
+    messages = ["🔹 " + word for word in words]
+    repeated = []
+    for _ in range(repetitions):
+        repeated.extend(messages)
+    times = compute_notification_times(len(repeated), FIRST_TIME, DURATION_HOURS)
+    return ("2025-01-15", repeated, times, FIRST_TIME, DURATION_HOURS, words_count, repetitions,
+            tz, list(words), False, "")
+
+
+def _new_entry(words, repetitions, words_count, tz):
+    return DailyPlan("2025-01-15", words, repetitions, FIRST_TIME, DURATION_HOURS, words_count, tz)
+
+
+def _measure(builder, users):
+    gc.collect()
+    tracemalloc.start()
+    cache = {chat_id: builder(*args) for chat_id, args in users}
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, cache
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    word_catalog.load_all()
+    sets = [word_catalog.get_set(level, name)
+            for level in ("A1", "A2", "B1", "B2", "C1", "C2") for name in word_catalog.list_sets(level)]
+    sets = [word_set for word_set in sets if word_set is not None and len(word_set.lines) >= 20]
+
+    rng = random.Random(0)
+    users = []
+    for chat_id in range(count):
+        lines = rng.choice(sets).lines
+        words_count = rng.choice((5, 10, 15, 20))
+        repetitions = rng.choice((1, 2, 3, 5))
+        users.append((chat_id, (rng.sample(lines, words_count), repetitions, words_count, rng.choice(TIMEZONES))))
+
+    old_bytes, old_cache = _measure(_old_entry, users)
+    del old_cache
+    new_bytes, new_cache = _measure(_new_entry, users)
+
+    sample = new_cache[0]
+    assert _old_entry(*users[0][1]) == sample.as_tuple()
+    print(f"{count} пользователей, слов в день 5–20, повторений 1–5")
+    print(f"  кортеж из 11 элементов: {old_bytes / 2**20:8.1f} МБ ({old_bytes / count:6.0f} байт на план)")
+    print(f"  DailyPlan:              {new_bytes / 2**20:8.1f} МБ ({new_bytes / count:6.0f} байт на план)")
+    print(f"  экономия: {old_bytes / new_bytes:.1f}×")
+
+
+if __name__ == "__main__":
+    main()
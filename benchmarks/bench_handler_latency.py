@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: p50/p99 задержки обработчиков при одновременных ответах на
+вопросы теста многих пользователей.
+
+Сравниваются синхронные вызовы database.crud прямо в цикле событий (как
+было в handle_poll_answer) и database.async_crud (поток БД). Параллельно
+«медленный писатель» периодически держит блокировку записи SQLite —
+так ведет себя крупная транзакция или VACUUM. Вперемешку с ответами
+приходят обновления, не трогающие БД (навигация по меню): при
+синхронном доступе они ждут вместе со всем циклом событий.
+
+Запуск из корня проекта:
+    python benchmarks/bench_handler_latency.py [пользователей] [ответов_на_пользователя]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Отдельная временная БД — до импорта config/database
+_tmp_dir = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+from database import async_crud, crud  # noqa: E402
+from database.db import db_manager  # noqa: E402
+
+SEND_DELAY = 0.01        # имитация bot.send_message
+ARRIVAL_WINDOW = 2.0     # ответы приходят равномерно в течение окна (сек)
+SLOW_WRITE_HOLD = 0.05   # сколько «медленный писатель» держит блокировку
+SLOW_WRITE_PERIOD = 0.25
+
+
+def _slow_writer(stop: threading.Event):
+    con = sqlite3.connect(os.environ["DB_PATH"], timeout=30)
+    con.isolation_level = None
+    while not stop.is_set():
+        con.execute("BEGIN IMMEDIATE")
+        con.execute("UPDATE users SET words_per_day = words_per_day WHERE chat_id = -1")
+        time.sleep(SLOW_WRITE_HOLD)
+        con.execute("COMMIT")
+        stop.wait(SLOW_WRITE_PERIOD)
+    con.close()
+
+
+async def _answer_sync(chat_id: int, word: str):
+    crud.get_user(chat_id)
+    learned = {w[0].lower() for w in crud.get_learned_words(chat_id)}
+    if word.lower() not in learned:
+        crud.add_learned_word(chat_id, word, "перевод", datetime.now().strftime("%Y-%m-%d"))
+    await asyncio.sleep(SEND_DELAY)
+
+
+async def _answer_async(chat_id: int, word: str):
+    await async_crud.get_user(chat_id)
+    learned = {w[0].lower() for w in await async_crud.get_learned_words(chat_id)}
+    if word.lower() not in learned:
+        await async_crud.add_learned_word(chat_id, word, "перевод", datetime.now().strftime("%Y-%m-%d"))
+    await asyncio.sleep(SEND_DELAY)
+
+
+async def _navigate(chat_id: int, word: str):
+    await asyncio.sleep(SEND_DELAY)
+
+
+async def _run(handler, users: int, answers: int, tag: str):
+    events = [
+        (random.uniform(0, ARRIVAL_WINDOW), kind, chat_id, f"{tag}_word_{i}")
+        for chat_id in range(1, users + 1) for i in range(answers)
+        for kind in ("answer", "menu")
+    ]
+    events.sort()
+    latencies = {"answer": [], "menu": []}
+    start = time.perf_counter()
+
+    async def one(arrival, kind, chat_id, word):
+        delay = arrival - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await (handler if kind == "answer" else _navigate)(chat_id, word)
+        latencies[kind].append(time.perf_counter() - start - arrival)
+
+    await asyncio.gather(*(one(*event) for event in events))
+    return latencies
+
+
+def _report(name: str, latencies):
+    for kind, values in latencies.items():
+        values = sorted(values)
+        p50 = statistics.median(values) * 1000
+        p99 = values[int(len(values) * 0.99) - 1] * 1000
+        print(f"{name:<12} {kind:<7} n={len(values):>5}  p50: {p50:8.1f} мс  p99: {p99:8.1f} мс  "
+              f"max: {values[-1] * 1000:8.1f} мс")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    answers = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for chat_id in range(1, users + 1):
+        crud.add_user(chat_id)
+
+    stop = threading.Event()
+    writer = threading.Thread(target=_slow_writer, args=(stop,), daemon=True)
+    writer.start()
+    try:
+        print(f"Пользователей: {users}, ответов на пользователя: {answers}, "
+              f"медленная запись {SLOW_WRITE_HOLD * 1000:.0f} мс каждые {SLOW_WRITE_PERIOD * 1000:.0f} мс")
+        _report("sync crud", asyncio.run(_run(_answer_sync, users, answers, "sync")))
+        _report("async_crud", asyncio.run(_run(_answer_async, users, answers, "async")))
+    finally:
+        stop.set()
+        writer.join()
+        async_crud.shutdown()
+        db_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: «кому положено уведомление в эту минуту» для всей базы.
+
+Сравниваются:
+* прежний путь на пользователя — времена 'HH:MM' через strptime/timedelta,
+  на каждом тике astimezone + strftime и поиск строки в списке;
+* NotificationIndex — минуты суток в массивах по поясам, тик — двоичный
+  поиск по срезу массива на каждый пояс.
+
+Замеряются построение расписания и средняя длительность тика (по
+нескольким минутам суток, включая «час пик»).
+
+Запуск из корня проекта:
+    python benchmarks/bench_notification_times.py [пользователей ...]
+"""
+import gc
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+from services.notification_index import NotificationIndex  # noqa: E402
+from utils.helpers import compute_notification_times  # noqa: E402
+
+TIMEZONES = [
+    "Europe/Moscow", "Europe/Kaliningrad", "Europe/Samara", "Asia/Yekaterinburg",
+    "Asia/Omsk", "Asia/Novosibirsk", "Asia/Krasnoyarsk", "Asia/Irkutsk",
+    "Asia/Yakutsk", "Asia/Vladivostok", "Europe/Berlin", "Europe/London",
+]
+FIRST_TIME = "09:00"
+DURATION_HOURS = 11
+TICKS = [datetime(2025, 1, 15, hour, minute, tzinfo=ZoneInfo("UTC"))
+         for hour, minute in ((6, 0), (9, 17), (12, 30), (17, 0), (21, 0))]
+
+
+def legacy_times(total_count, first_time, duration_hours):
+    """Прежняя реализация compute_notification_times (strptime + timedelta)."""
+    base_time = datetime.strptime(f"{first_time}:00", "%H:%M:%S")
+    if total_count <= 1:
+        return [base_time.strftime("%H:%M")]
+    interval_seconds = (duration_hours * 3600) / (total_count - 1)
+    return [(base_time + timedelta(seconds=i * interval_seconds)).strftime("%H:%M")
+            for i in range(total_count)]
+
+
+def make_users(count):
+    rng = random.Random(42)
+    return [
+        (chat_id, "A1", rng.choice((3, 5, 10)), rng.choice((1, 2, 3)), FIRST_TIME, rng.choice(TIMEZONES))
+        for chat_id in range(1, count + 1)
+    ]
+
+
+def legacy_tick(users, plans, now_utc):
+    due = []
+    for user in users:
+        now_local = now_utc.astimezone(ZoneInfo(user[5]))
+        if now_local.strftime("%H:%M") in plans[user[0]]:
+            due.append(user[0])
+    return due
+
+
+def run(count):
+    users = make_users(count)
+
+    gc.collect()
+    start = time.perf_counter()
+    plans = {user[0]: legacy_times(user[2] * user[3], FIRST_TIME, DURATION_HOURS) for user in users}
+    legacy_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy_due = [len(legacy_tick(users, plans, tick)) for tick in TICKS]
+    legacy_tick_time = (time.perf_counter() - start) / len(TICKS)
+
+    # План в боте уже лежит в кэше; индекс переводит его в минуты
+    plans = {user[0]: compute_notification_times(user[2] * user[3], FIRST_TIME, DURATION_HOURS)
+             for user in users}
+    index = NotificationIndex(plan_provider=lambda user: plans[user[0]],
+                              first_time=FIRST_TIME, duration_hours=DURATION_HOURS)
+    gc.collect()
+    start = time.perf_counter()
+    index.rebuild(users)
+    index_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index_due = [len(index.due(tick)) for tick in TICKS]
+    index_tick_time = (time.perf_counter() - start) / len(TICKS)
+
+    # Индекс — надмножество (сброс, окно напоминания); уведомления не теряются
+    assert all(i >= l for i, l in zip(index_due, legacy_due)), (index_due, legacy_due)
+
+    print(f"{count:>9,} | {legacy_build:8.2f} s | {legacy_tick_time * 1000:10.1f} ms | "
+          f"{index_build:8.2f} s | {index_tick_time * 1000:10.2f} ms | "
+          f"x{legacy_tick_time / max(index_tick_time, 1e-9):,.0f}")
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print("пользов.  | план (строки) | тик (строки) | индекс | тик (индекс) | ускорение тика")
+    for count in counts:
+        run(count)
+
+
+if __name__ == "__main__":
+    main()
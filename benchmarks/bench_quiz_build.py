@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: построение теста из 20 вопросов.
+
+Сравниваются:
+* прежний путь — load_quiz_data (копия списка), словарь mapping и список
+  all_trans на каждый старт теста, generate_quiz_options с полной копией
+  пула дистракторов на каждый вопрос;
+* DistractorIndex — индекс набора строится один раз на версию набора,
+  mapping берется из него, k дистракторов выбираются за O(k).
+
+Замер на самых больших наборах каталога и на синтетических наборах
+большего размера (чтобы была видна зависимость от размера набора).
+
+Запуск из корня проекта:
+    python benchmarks/bench_quiz_build.py [повторов]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+from utils.quiz_helpers import get_distractor_index, load_quiz_data  # noqa: E402
+from utils.quiz_utils import DistractorIndex, generate_quiz_options  # noqa: E402
+from utils.visual_helpers import extract_english  # noqa: E402
+from utils.word_catalog import WordSet, word_catalog  # noqa: E402
+
+QUESTIONS = 20
+
+
+def _old_build(level, name, daily):
+    quiz_data = load_quiz_data(level, name)
+    mapping = {item["word"].lower(): item["translation"] for item in quiz_data}
+    all_trans = [item["translation"] for item in quiz_data]
+    questions = []
+    for src in daily:
+        correct = mapping.get(extract_english(src).lower()) or mapping.get(src.lower())
+        if correct:
+            opts, idx = generate_quiz_options(correct, all_trans, 4)
+            questions.append((src, correct, opts, idx))
+    return questions
+
+
+def _new_build(level, name, daily):
+    index = get_distractor_index(level, name)
+    mapping = index.mapping
+    questions = []
+    for src in daily:
+        correct = mapping.get(extract_english(src).lower()) or mapping.get(src.lower())
+        if correct:
+            opts, idx = index.options(correct, 4)
+            questions.append((src, correct, opts, idx))
+    return questions
+
+
+def _timeit(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def _synthetic_set(size):
+    """Набор из size слов в каталоге (без файла на диске)."""
+    from utils.word_catalog import WordRecord
+    records = tuple(WordRecord(f"word{i} [wɜːd] - перевод номер {i}{'а' * (i % 9)}") for i in range(size))
+    word_set = WordSet("BENCH", f"synthetic {size}", Path("/dev/null"), records, 0, 0)
+    word_set.checked_at = float("inf")  # не проверять файл
+    word_catalog.sets[("BENCH", word_set.name)] = word_set
+    return "BENCH", word_set.name
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    word_catalog.load_all()
+    sets = []
+    for level in ("A1", "A2", "B1", "B2", "C1", "C2"):
+        for name in word_catalog.list_sets(level):
+            word_set = word_catalog.get_set(level, name)
+            if word_set is not None:
+                sets.append((len(word_set.quiz_items), level, name))
+    sets.sort(reverse=True)
+    targets = [(level, name) for _, level, name in sets[:3]]
+    targets += [_synthetic_set(size) for size in (1000, 10000)]
+
+    rng = random.Random(0)
+    print(f"Тест из {QUESTIONS} вопросов, {repeats} повторов, мкс на построение")
+    print(f"{'набор':<32} {'слов':>6} {'было':>10} {'стало':>10} {'ускорение':>10}")
+    for level, name in targets:
+        word_set = word_catalog.get_set(level, name)
+        lines = list(word_set.lines)
+        daily = rng.sample(lines, min(QUESTIONS, len(lines)))
+        get_distractor_index(level, name)  # индекс строится один раз на версию набора
+        reps = repeats if len(lines) < 5000 else max(1, repeats // 20)
+        old = _timeit(lambda: _old_build(level, name, daily), reps)
+        new = _timeit(lambda: _new_build(level, name, daily), reps)
+        print(f"{level + '/' + name:<32} {len(lines):>6} {old:>10.1f} {new:>10.1f} {old / new:>9.1f}×")
+
+    build = _timeit(lambda: DistractorIndex(word_set.quiz_items), 5)
+    print(f"\nПостроение индекса для {len(word_set.quiz_items)} слов (один раз на версию набора): {build / 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: задержка обновления streak при одновременном завершении тестов.
+
+Сравниваются:
+* прежний read-modify-write — get_user (пояс), get_user_streak,
+  update_user_streak в транзакции и проверочный get_user_streak;
+* increment_user_streak — один UPDATE ... RETURNING с local_day(timezone, ...);
+* increment_user_streaks — пакетный вариант для фоновых задач.
+
+Завершения приходят одновременно из нескольких потоков (каждый со своим
+соединением, как потоки БД воркеров). Половина пользователей проходила
+тест вчера, половина — давно.
+
+Запуск из корня проекта:
+    python benchmarks/bench_streak_update.py [завершений] [потоков]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+# Отдельная временная БД — до импорта config/database
+_tmp_dir = tempfile.mkdtemp(prefix="bench_db_")
+os.environ["DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+from database import crud  # noqa: E402
+from database.db import db_manager  # noqa: E402
+
+TIMEZONES = ("Europe/Moscow", "Asia/Tokyo", "America/New_York", "Asia/Yekaterinburg")
+
+
+def _get_user(chat_id: int):
+    # crud.get_user читает через общий курсор модуля — из нескольких потоков нельзя
+    with db_manager.get_cursor() as cur:
+        cur.execute("SELECT * FROM users WHERE chat_id = ?", (chat_id,))
+        return cur.fetchone()
+
+
+def _old_increment(chat_id: int) -> int:
+    """Прежняя реализация: пять обращений к БД."""
+    user = _get_user(chat_id)
+    user_tz = ZoneInfo(user[5] if user and user[5] else "Europe/Moscow")
+    today = datetime.now(tz=user_tz).strftime("%Y-%m-%d")
+    current_streak, last_test_date = crud.get_user_streak(chat_id)
+    if last_test_date == today:
+        return current_streak
+    yesterday = (datetime.now(tz=user_tz) - timedelta(days=1)).strftime("%Y-%m-%d")
+    new_streak = current_streak + 1 if last_test_date == yesterday else 1
+    crud.update_user_streak(chat_id, new_streak, today)
+    crud.get_user_streak(chat_id)
+    return new_streak
+
+
+def _prepare(users: int) -> None:
+    with db_manager.transaction() as tx:
+        tx.execute("DELETE FROM users")
+        tx.executemany(
+            "INSERT INTO users (chat_id, timezone, days_streak, last_test_date) VALUES (?, ?, 5, ?)",
+            [(chat_id, TIMEZONES[chat_id % len(TIMEZONES)],
+              (datetime.now(tz=ZoneInfo(TIMEZONES[chat_id % len(TIMEZONES)])) - timedelta(days=1 + chat_id % 2))
+              .strftime("%Y-%m-%d"))
+             for chat_id in range(1, users + 1)],
+        )
+
+
+def _run(func, users: int, threads: int):
+    _prepare(users)
+
+    def timed(chat_id):
+        start = time.perf_counter()
+        result = func(chat_id)
+        return time.perf_counter() - start, result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(timed, range(1, users + 1)))
+    total = time.perf_counter() - start
+    streaks = {chat_id: result for chat_id, (_, result) in zip(range(1, users + 1), samples)}
+    return sorted(latency for latency, _ in samples), total, streaks
+
+
+def _report(name: str, latencies, total: float):
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{name:<24} p50: {p50:7.2f} мс  p99: {p99:7.2f} мс  "
+          f"всего: {total:6.2f} с ({len(latencies) / total:8.0f} /с)")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"Завершений теста: {users}, одновременно потоков: {threads}")
+
+    old_latencies, old_total, old_streaks = _run(_old_increment, users, threads)
+    _report("read-modify-write", old_latencies, old_total)
+    new_latencies, new_total, new_streaks = _run(crud.increment_user_streak, users, threads)
+    _report("UPDATE ... RETURNING", new_latencies, new_total)
+    assert old_streaks == new_streaks
+
+    _prepare(users)
+    start = time.perf_counter()
+    bulk = crud.increment_user_streaks(range(1, users + 1))
+    bulk_total = time.perf_counter() - start
+    assert bulk == new_streaks
+    print(f"{'increment_user_streaks':<24} всего: {bulk_total:6.2f} с ({users / bulk_total:8.0f} /с)")
+    db_manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
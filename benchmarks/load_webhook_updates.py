@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный генератор для режима webhook (services/update_router.py).
+
+Поднимает фронтенд и N процессов-воркеров с фиктивным обработчиком
+(немного CPU на разбор/ответ и ожидание, имитирующее БД и Telegram),
+затем шлет POST-обновления от множества чатов: каждый чат — свои
+обновления по очереди, чаты — параллельно, как это делает Telegram.
+
+Проверяется, что в каждом чате обновления обработаны строго по порядку и
+каждое — одним воркером; выводится пропускная способность.
+
+Запуск из корня проекта:
+    python benchmarks/load_webhook_updates.py [воркеров ...]
+"""
+import asyncio
+import functools
+import json
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import logging  # noqa: E402
+
+logging.disable(logging.CRITICAL)
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from services.update_router import UpdateFrontend, WorkerApp, run_worker  # noqa: E402
+
+CHATS = 400
+UPDATES_PER_CHAT = 25
+HANDLER_IO = 0.005       # ожидание БД/Telegram на обновление, с
+HANDLER_CPU = 0.0015     # работа обработчика в процессе, с
+PATH = "/telegram-webhook"
+
+
+async def _fake_factory(results, io_delay, cpu_time) -> WorkerApp:
+    from services.update_router import partition
+    index = partition()[0]
+    handled = []
+
+    async def handle(update):
+        deadline = time.perf_counter() + cpu_time
+        while time.perf_counter() < deadline:
+            pass
+        await asyncio.sleep(io_delay)
+        handled.append((update["message"]["chat"]["id"], update["update_id"]))
+
+    async def close():
+        results.put((index, handled))
+
+    return WorkerApp(handle, close)
+
+
+async def _drive(port: int) -> float:
+    url = f"http://127.0.0.1:{port}{PATH}"
+    connector = aiohttp.TCPConnector(limit=100)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def chat_sender(chat_id):
+            for n in range(UPDATES_PER_CHAT):
+                update = {"update_id": chat_id * UPDATES_PER_CHAT + n,
+                          "message": {"message_id": n, "chat": {"id": chat_id, "type": "private"}, "text": "/words"}}
+                async with session.post(url, data=json.dumps(update)) as response:
+                    assert response.status == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(chat_sender(1000 + chat) for chat in range(CHATS)))
+        return time.perf_counter() - start
+
+
+async def _serve_and_drive(queues) -> tuple:
+    frontend = UpdateFrontend(queues, path=PATH, secret="")
+    runner = web.AppRunner(frontend.make_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        accepted = await _drive(port)
+    finally:
+        await runner.cleanup()
+    return accepted
+
+
+def run(workers: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    queues = [context.Queue() for _ in range(workers)]
+    factory = functools.partial(_fake_factory, results, HANDLER_IO, HANDLER_CPU)
+    processes = [context.Process(target=run_worker, args=(i, workers, queues[i], factory)) for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    start = time.perf_counter()
+    accepted = asyncio.run(_serve_and_drive(queues))
+    for queue in queues:
+        queue.put(None)
+    handled = dict(results.get() for _ in range(workers))
+    total_time = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    per_chat = {}
+    owners = {}
+    for index, items in handled.items():
+        for chat_id, update_id in items:
+            per_chat.setdefault(chat_id, []).append(update_id)
+            owners.setdefault(chat_id, set()).add(index)
+    total = sum(len(items) for items in handled.values())
+    ordered = all(ids == sorted(ids) and len(ids) == UPDATES_PER_CHAT for ids in per_chat.values())
+    single_owner = all(len(owner) == 1 for owner in owners.values())
+    print(f"{workers:>3} воркеров: {total} обновлений, прием {total / accepted:8.0f}/с, "
+          f"обработка {total / total_time:8.0f}/с, порядок {'ok' if ordered else 'НАРУШЕН'}, "
+          f"один владелец {'ok' if single_owner else 'НЕТ'}, "
+          f"по воркерам {[len(handled[i]) for i in sorted(handled)]}")
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 4]
+    print(f"{CHATS} чатов × {UPDATES_PER_CHAT} обновлений, обработчик: "
+          f"{HANDLER_CPU * 1000:.1f} мс CPU + {HANDLER_IO * 1000:.0f} мс ожидания")
+    for workers in counts:
+        run(workers)
@@ -18,12 +18,27 @@ from config import (
     DURATION_HOURS,
     LEVELS_DIR,
     LOG_LEVEL,
-    PRODUCTION_MODE
+    PRODUCTION_MODE,
+    PAYMENT_WEBHOOK_ENABLED,
+    TELEGRAM_GLOBAL_RATE,
+    BOT_MODE,
+    TELEGRAM_WEBHOOK_URL,
+    TELEGRAM_WEBHOOK_PATH,
+    TELEGRAM_WEBHOOK_SECRET,
+    TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+    UPDATE_WORKERS
 )
 from handlers import register_handlers
+from services.message_dispatcher import message_dispatcher, InteractiveReserveMiddleware, PRIORITY_SCHEDULED
+from services.payment_gateway import payment_gateway
+from services.payment_webhook import payment_webhook
 from services.scheduler import start_scheduler
-from utils.helpers import get_daily_words_for_user, daily_words_cache
-from database import crud
+from services.update_router import WorkerApp, serve_webhook, owns_chat, is_primary_worker, partition
+from utils.helpers import get_daily_words_for_user, daily_words_cache, warm_daily_words_cache
+from utils.word_catalog import word_catalog
+from database import crud, async_crud
+from database.write_buffer import write_buffer
+from database.session_store import session_writer
 
 # ───────────────────────── Настройка логирования для продакшена ─────────────
 LOG_DIR = Path("logs")
@@ -96,8 +111,9 @@ async def _recover_missed_notifications() -> None:
 
     recovered = 0
     try:
-        users = crud.get_all_users()
-        for user in users[:50]:  # Ограничиваем количество для быстрого старта
+        async for user in async_crud.iter_users():  # Планы сохранены в БД, пересчет нужен только при смене дня
+            if not owns_chat(user[0]):
+                continue
             chat_id, level, words_count, reps_count = user[0], user[1], user[2], user[3]
             tz_name = user[5] if len(user) > 5 and user[5] else SERVER_TIMEZONE
             
@@ -107,12 +123,13 @@ async def _recover_missed_notifications() -> None:
                 last_loc = last_run.astimezone(tz)
                 today = now_loc.strftime("%Y-%m-%d")
 
-                result = get_daily_words_for_user(
+                result = await async_crud.run_db(
+                    get_daily_words_for_user,
                     chat_id, level, words_count, reps_count,
                     first_time=REMINDER_START, duration_hours=DURATION_HOURS
                 )
                 
-                if result:
+                if result and result[0] != "LEVEL_MISMATCH":
                     msgs, times = result
                     missed = []
                     for t_str, msg in zip(times, msgs):
@@ -125,7 +142,7 @@ async def _recover_missed_notifications() -> None:
                         text = "⚠️ Пропущенные уведомления:\n\n" + "\n".join(
                             f"📌 {t}: {m}" for t, m in missed[-2:]
                         )
-                        await bot.send_message(chat_id, text)
+                        await message_dispatcher.send_message(chat_id, text, priority=PRIORITY_SCHEDULED)
                         recovered += len(missed)
 
             except Exception as e:
@@ -138,7 +155,8 @@ async def _recover_missed_notifications() -> None:
     if recovered > 0:
         logger.info("Восстановлено %d уведомлений", recovered)
     
-    _save_last_run(now_srv)
+    if is_primary_worker():
+        _save_last_run(now_srv)
 
 # ───────────────────────── Fallback для необработанных callback ─────────────
 async def _log_unhandled_callback(cb: types.CallbackQuery):
@@ -153,19 +171,81 @@ async def on_startup(dispatcher: Dispatcher):
     # Создаем директорию для уровней
     Path(LEVELS_DIR).mkdir(exist_ok=True)
     
+    # Разбираем наборы слов один раз — дальше они читаются из памяти
+    word_catalog.load_all()
+    
+    # Планы слов дня сохранены в БД — после перезапуска не пересчитываем их
+    warm_daily_words_cache()
+    
+    # Окончание премиума всех пользователей — проверки доступа без чтения users
+    try:
+        loaded = await async_crud.run_db(crud.warm_entitlements)
+        logger.info("Кэш прав доступа: %d пользователей", loaded)
+    except Exception as e:
+        logger.error("Ошибка прогрева кэша прав доступа: %s", e)
+    
+    # Очередь исходящих сообщений (лимиты Telegram) — до планировщика, который в нее пишет
+    message_dispatcher.start(bot)
+    
+    # Уведомления ЮKassa принимаются в этом же цикле событий (в основном процессе)
+    if PAYMENT_WEBHOOK_ENABLED and is_primary_worker():
+        await payment_webhook.start(bot)
+    
     # Запускаем планировщик
     start_scheduler(bot, asyncio.get_running_loop())
     
     # Устанавливаем команды бота
-    from handlers.commands import set_commands
-    await set_commands(bot)
+    if is_primary_worker():
+        from handlers.commands import set_commands
+        await set_commands(bot)
     
     # Восстанавливаем пропущенные уведомления
     await _recover_missed_notifications()
     
     logger.info("Бот успешно запущен в режиме: %s", "PRODUCTION" if PRODUCTION_MODE else "DEVELOPMENT")
 
+async def on_shutdown(dispatcher: Dispatcher):
+    """Корректная остановка: досылаем очередь, закрываем сессию ЮKassa, сбрасываем буфер записи и сессии и дожидаемся потока БД."""
+    await payment_webhook.stop()
+    await message_dispatcher.stop()
+    await payment_gateway.close()
+    await async_crud.run_db(write_buffer.stop)
+    await async_crud.run_db(session_writer.stop)
+    async_crud.shutdown(wait=True)
+
+# ───────────────────────── Режим webhook ─────────────────────────────────────
+async def create_worker_app() -> WorkerApp:
+    """Фабрика процесса-воркера: свой Dispatcher, планировщик для своих чатов и доля общего лимита."""
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+    message_dispatcher.set_global_rate(TELEGRAM_GLOBAL_RATE / partition()[1])
+    await on_startup(dp)
+
+    async def handle(update: dict):
+        await dp.process_update(types.Update(**update))
+
+    async def close():
+        await on_shutdown(dp)
+        await bot.close()
+
+    return WorkerApp(handle, close)
+
+async def _set_telegram_webhook(app):
+    await bot.set_webhook(
+        TELEGRAM_WEBHOOK_URL + TELEGRAM_WEBHOOK_PATH,
+        secret_token=TELEGRAM_WEBHOOK_SECRET or None,
+        max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=types.AllowedUpdates.all(),
+        drop_pending_updates=PRODUCTION_MODE,
+    )
+    logger.info("Webhook Telegram установлен: %s%s", TELEGRAM_WEBHOOK_URL, TELEGRAM_WEBHOOK_PATH)
+
+async def _close_frontend_bot(app):
+    await bot.close()
+
 # ───────────────────────── Регистрация хендлеров ─────────────────────────────
+# Ответы хендлеров резервируют лимит Telegram раньше фоновых рассылок
+dp.middleware.setup(InteractiveReserveMiddleware(message_dispatcher))
 register_handlers(dp, bot)
 
 # Fallback хендлер для неопознанных callback (только в режиме разработки)
@@ -174,15 +254,25 @@ if not PRODUCTION_MODE:
 
 # ───────────────────────── Запуск бота ─────────────────────────────────────
 if __name__ == "__main__":
-    # Настройки для продакшена
-    skip_updates = PRODUCTION_MODE  # В продакшене пропускаем старые обновления
-    
-    executor.start_polling(
-        dp, 
-        on_startup=on_startup, 
-        skip_updates=skip_updates,
-        allowed_updates=types.AllowedUpdates.all()
-    )
+    if BOT_MODE == "webhook":
+        # Фронтенд принимает обновления, UPDATE_WORKERS процессов их обрабатывают
+        serve_webhook(
+            create_worker_app,
+            workers=UPDATE_WORKERS,
+            on_startup=_set_telegram_webhook,
+            on_shutdown=_close_frontend_bot,
+        )
+    else:
+        # Настройки для продакшена
+        skip_updates = PRODUCTION_MODE  # В продакшене пропускаем старые обновления
+        
+        executor.start_polling(
+            dp, 
+            on_startup=on_startup, 
+            on_shutdown=on_shutdown,
+            skip_updates=skip_updates,
+            allowed_updates=types.AllowedUpdates.all()
+        )
 
 # Экспорт функции для планировщика
 save_last_run_time = _save_last_run
\ No newline at end of file
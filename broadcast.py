@@ -9,14 +9,13 @@ from datetime import datetime
 from pathlib import Path
 
 from aiogram import Bot
-from aiogram.utils.exceptions import BotBlocked, ChatNotFound, TelegramAPIError, UserDeactivated
 
 # Добавляем путь к проекту для импорта модулей
 sys.path.insert(0, str(Path(__file__).parent))
 
 from config import BOT_TOKEN
-from database import crud
-from database.db import db_manager
+from services.broadcast_engine import BroadcastEngine
+from services.message_dispatcher import message_dispatcher
 
 # Настройка логирования
 logging.basicConfig(
@@ -30,114 +29,48 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class BroadcastManager:
-    """Менеджер для массовой рассылки сообщений."""
+    """
+    Менеджер для массовой рассылки сообщений.
+
+    Скрипт работает в отдельном процессе, поэтому message_dispatcher здесь свой,
+    с отдельным глобальным бакетом TELEGRAM_GLOBAL_RATE: лимит с запущенным ботом
+    не общий. Скорость рассылки ограничивает BROADCAST_MAX_RATE; если вместе с
+    трафиком бота Telegram ответит RetryAfter, движок снизит скорость вдвое.
+    """
     
     def __init__(self, bot_token: str):
         self.bot = Bot(token=bot_token, parse_mode="Markdown")
-        self.stats = {
-            'total': 0,
-            'sent': 0,
-            'failed': 0,
-            'blocked': 0,
-            'not_found': 0,
-            'deactivated': 0,
-            'other_errors': 0
-        }
-        
-    async def get_all_users(self):
-        """Получает список всех пользователей из базы данных."""
-        try:
-            users = crud.get_all_users()
-            user_ids = [user[0] for user in users]  # Извлекаем chat_id
-            logger.info(f"Найдено {len(user_ids)} пользователей в базе данных")
-            return user_ids
-        except Exception as e:
-            logger.error(f"Ошибка получения списка пользователей: {e}")
-            return []
+        self.engine = BroadcastEngine(self.bot)
+        self.stats = self.engine.stats
     
-    async def send_message_to_user(self, chat_id: int, message: str, delay: float = 0.05):
-        """
-        Отправляет сообщение одному пользователю с обработкой ошибок.
-        
-        Args:
-            chat_id: ID чата пользователя
-            message: Текст сообщения
-            delay: Задержка между отправками (в секундах)
-        """
-        try:
-            await self.bot.send_message(chat_id, message)
-            self.stats['sent'] += 1
-            logger.debug(f"Сообщение отправлено пользователю {chat_id}")
-            
-        except BotBlocked:
-            self.stats['blocked'] += 1
-            logger.debug(f"Пользователь {chat_id} заблокировал бота")
-            
-        except ChatNotFound:
-            self.stats['not_found'] += 1
-            logger.debug(f"Чат {chat_id} не найден")
-            
-        except UserDeactivated:
-            self.stats['deactivated'] += 1
-            logger.debug(f"Пользователь {chat_id} деактивирован")
-            
-        except TelegramAPIError as e:
-            self.stats['other_errors'] += 1
-            logger.warning(f"Telegram API ошибка для пользователя {chat_id}: {e}")
-            
-        except Exception as e:
-            self.stats['failed'] += 1
-            logger.error(f"Неожиданная ошибка для пользователя {chat_id}: {e}")
-        
-        finally:
-            # Небольшая задержка для избежания rate limiting
-            if delay > 0:
-                await asyncio.sleep(delay)
+    async def find_unfinished(self):
+        """Рассылки, прерванные до завершения: (id, message, created_at, last_chat_id)."""
+        return await self.engine.find_unfinished()
     
-    async def broadcast_message(self, message: str, batch_size: int = 30, delay: float = 1.0):
+    async def broadcast_message(self, message: str = None, broadcast_id: int = None):
         """
-        Отправляет сообщение всем пользователям с контролем скорости.
+        Отправляет сообщение всем доступным пользователям. Прогресс сохраняется
+        в БД после каждой страницы получателей, поэтому прерванную рассылку
+        можно продолжить без повторной отправки.
         
         Args:
-            message: Текст сообщения для рассылки
-            batch_size: Количество сообщений в батче
-            delay: Задержка между батчами (в секундах)
+            message: Текст сообщения для новой рассылки
+            broadcast_id: ID прерванной рассылки, которую нужно продолжить
         """
-        users = await self.get_all_users()
-        if not users:
-            logger.error("Список пользователей пуст")
-            return
-        
-        self.stats['total'] = len(users)
-        logger.info(f"Начинаем рассылку {self.stats['total']} пользователям")
+        if broadcast_id is None:
+            broadcast_id = await self.engine.create(message)
+        logger.info(f"Начинаем рассылку #{broadcast_id}")
         
         start_time = time.time()
         
-        # Разбиваем пользователей на батчи
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i + batch_size]
-            batch_number = i // batch_size + 1
-            total_batches = (len(users) + batch_size - 1) // batch_size
-            
-            logger.info(f"Обрабатываем батч {batch_number}/{total_batches} ({len(batch)} пользователей)")
-            
-            # Отправляем сообщения в текущем батче
-            tasks = []
-            for chat_id in batch:
-                task = self.send_message_to_user(chat_id, message, 0.03)  # 30ms между сообщениями
-                tasks.append(task)
-            
-            await asyncio.gather(*tasks)
-            
-            # Показываем прогресс
-            processed = min(i + batch_size, len(users))
-            progress = (processed / len(users)) * 100
-            logger.info(f"Прогресс: {processed}/{len(users)} ({progress:.1f}%)")
-            
-            # Задержка между батчами (кроме последнего)
-            if i + batch_size < len(users):
-                logger.info(f"Пауза {delay} секунд перед следующим батчем...")
-                await asyncio.sleep(delay)
+        def report(stats):
+            logger.info(f"Прогресс: обработано {stats['total']}, отправлено {stats['sent']}, "
+                        f"скорость {self.engine.rate:.1f} сообщ./с")
+        
+        try:
+            await self.engine.run(broadcast_id, on_progress=report)
+        finally:
+            await message_dispatcher.stop()
         
         # Выводим финальную статистику
         elapsed_time = time.time() - start_time
@@ -148,7 +81,7 @@ class BroadcastManager:
         logger.info("=" * 50)
         logger.info("СТАТИСТИКА РАССЫЛКИ")
         logger.info("=" * 50)
-        logger.info(f"Всего пользователей: {self.stats['total']}")
+        logger.info(f"Обработано пользователей: {self.stats['total']}")
         logger.info(f"Успешно отправлено: {self.stats['sent']}")
         logger.info(f"Заблокировали бота: {self.stats['blocked']}")
         logger.info(f"Чат не найден: {self.stats['not_found']}")
@@ -273,35 +206,37 @@ async def main():
             logger.error("❌ Токен бота не настроен в config.py")
             return
         
-        # Получаем сообщение для рассылки
-        message = get_message_from_user()
-        if not message:
-            return
-        
-        # Последнее подтверждение
-        print(f"\n⚠️  ВНИМАНИЕ: Сейчас будет отправлено сообщение ВСЕМ пользователям бота!")
-        final_confirm = input("Вы абсолютно уверены? Введите 'SEND' для подтверждения: ").strip()
-        
-        if final_confirm != "SEND":
-            print("❌ Рассылка отменена")
-            return
-        
         # Создаем менеджер рассылки
         broadcast_manager = BroadcastManager(BOT_TOKEN)
         
         try:
-            # Настройки рассылки
-            batch_size = 30  # Количество сообщений в батче
-            delay = 1.0      # Задержка между батчами в секундах
+            # Прерванная рассылка продолжается с места остановки
+            for broadcast_id, text, created_at, last_chat_id in await broadcast_manager.find_unfinished():
+                print(f"\n⚠️  Найдена незавершенная рассылка #{broadcast_id} от {created_at} "
+                      f"(остановилась после chat_id {last_chat_id}):")
+                print(text[:200])
+                if input("Продолжить ее? (y/N): ").strip().lower() in ['y', 'yes', 'да', 'д']:
+                    await broadcast_manager.broadcast_message(broadcast_id=broadcast_id)
+                    logger.info("✅ Рассылка завершена!")
+                    return
+            
+            # Получаем сообщение для рассылки
+            message = get_message_from_user()
+            if not message:
+                return
+        
+            # Последнее подтверждение
+            print(f"\n⚠️  ВНИМАНИЕ: Сейчас будет отправлено сообщение ВСЕМ пользователям бота!")
+            final_confirm = input("Вы абсолютно уверены? Введите 'SEND' для подтверждения: ").strip()
+            
+            if final_confirm != "SEND":
+                print("❌ Рассылка отменена")
+                return
             
             logger.info("🚀 Начинаем массовую рассылку...")
             
-            # Выполняем рассылку
-            await broadcast_manager.broadcast_message(
-                message=message,
-                batch_size=batch_size,
-                delay=delay
-            )
+            # Выполняем рассылку (темп задает очередь исходящих сообщений)
+            await broadcast_manager.broadcast_message(message=message)
             
             logger.info("✅ Рассылка завершена!")
             
@@ -6,6 +6,13 @@ load_dotenv()
 # Основные настройки
 BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_DEFAULT_TOKEN")
 DB_PATH = os.getenv("DB_PATH", "bot.db")
+# Потоки для асинхронного доступа к БД из хендлеров (database/async_crud.py)
+DB_EXECUTOR_THREADS = int(os.getenv("DB_EXECUTOR_THREADS", 1))
+# Буфер отложенной записи выученных слов и streak (database/write_buffer.py)
+WRITE_BUFFER_FLUSH_MS = int(os.getenv("WRITE_BUFFER_FLUSH_MS", 500))
+WRITE_BUFFER_MAX_ROWS = int(os.getenv("WRITE_BUFFER_MAX_ROWS", 200))
+# Сколько пользователей держать в кэше выученных слов (database/learned_cache.py)
+LEARNED_WORDS_CACHE_SIZE = int(os.getenv("LEARNED_WORDS_CACHE_SIZE", 10000))
 LEVELS_DIR = os.getenv("LEVELS_DIR", "levels")
 SERVER_TIMEZONE = os.getenv("SERVER_TIMEZONE", "UTC")
 
@@ -22,6 +29,23 @@ DEFAULT_REPETITIONS = int(os.getenv("DEFAULT_REPETITIONS", 3))
 # ЮKassa настройки
 YOOKASSA_SHOP_ID = os.getenv("YOOKASSA_SHOP_ID")
 YOOKASSA_SECRET_KEY = os.getenv("YOOKASSA_SECRET_KEY")
+YOOKASSA_API_URL = os.getenv("YOOKASSA_API_URL", "https://api.yookassa.ru/v3")
+# Сколько запросов статуса платежа выполнять одновременно
+PAYMENT_POLL_CONCURRENCY = int(os.getenv("PAYMENT_POLL_CONCURRENCY", 8))
+# Таймаут запроса статуса платежа, секунд
+PAYMENT_STATUS_TIMEOUT = float(os.getenv("PAYMENT_STATUS_TIMEOUT", 10))
+# HTTP-уведомления ЮKassa принимаются в процессе бота (services/payment_webhook.py)
+PAYMENT_WEBHOOK_ENABLED = os.getenv("PAYMENT_WEBHOOK_ENABLED", "False").lower() == "true"
+PAYMENT_WEBHOOK_HOST = os.getenv("PAYMENT_WEBHOOK_HOST", "0.0.0.0")
+PAYMENT_WEBHOOK_PORT = int(os.getenv("PAYMENT_WEBHOOK_PORT", 8080))
+PAYMENT_WEBHOOK_PATH = os.getenv("PAYMENT_WEBHOOK_PATH", "/yookassa-webhook")
+# Адреса, с которых ЮKassa отправляет уведомления (через запятую; пустая строка — не проверять)
+PAYMENT_WEBHOOK_TRUSTED_IPS = os.getenv(
+    "PAYMENT_WEBHOOK_TRUSTED_IPS",
+    "185.71.76.0/27,185.71.77.0/27,77.75.153.0/25,77.75.156.11,77.75.156.35,77.75.154.128/25,2a02:5180::/32",
+)
+# Бот за reverse proxy: брать адрес отправителя из X-Forwarded-For
+PAYMENT_WEBHOOK_TRUST_PROXY = os.getenv("PAYMENT_WEBHOOK_TRUST_PROXY", "False").lower() == "true"
 
 # Цены подписки (в рублях)
 SUBSCRIPTION_PRICES = {
@@ -54,6 +78,70 @@ FREE_SETS = {
     "C2": ["C2 Basic 1"]
 }
 
+# Лимиты Telegram для исходящих сообщений (services/message_dispatcher.py)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))
+
 # Настройки для продакшена
 PRODUCTION_MODE = os.getenv("PRODUCTION_MODE", "False").lower() == "true"
-LOG_LEVEL = "WARNING" if PRODUCTION_MODE else "INFO"
\ No newline at end of file
+LOG_LEVEL = "WARNING" if PRODUCTION_MODE else "INFO"
+
+# Как часто (сек) проверять изменение файлов наборов слов (0 — при каждом обращении)
+WORDS_RELOAD_CHECK_INTERVAL = float(os.getenv("WORDS_RELOAD_CHECK_INTERVAL", 60 if PRODUCTION_MODE else 0))
+# Скомпилированный пакет наборов слов (levels/build_bundle.py); пустая строка — не использовать
+WORDS_BUNDLE_PATH = os.getenv("WORDS_BUNDLE_PATH", os.path.join(LEVELS_DIR, "words.bundle"))
+
+# Рассылки (services/broadcast_engine.py): получателей за одну контрольную точку
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", 200))
+# Верхняя граница адаптивной скорости рассылки, сообщений в секунду
+BROADCAST_MAX_RATE = float(os.getenv("BROADCAST_MAX_RATE", 25))
+
+# Получение обновлений: polling (один процесс) или webhook (фронтенд + процессы-воркеры, services/update_router.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Публичный адрес бота, например https://bot.example.com (Telegram шлет обновления на него + TELEGRAM_WEBHOOK_PATH)
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+TELEGRAM_WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram-webhook")
+TELEGRAM_WEBHOOK_HOST = os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0")
+TELEGRAM_WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", 8443))
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", 40))
+# Число процессов-обработчиков обновлений и одновременно обрабатываемых чатов в каждом
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 4))
+UPDATE_WORKER_CONCURRENCY = int(os.getenv("UPDATE_WORKER_CONCURRENCY", 64))
+
+# Хранилище сессий тестов и обучения: memory или sqlite (переживает перезапуск, запись в фоне)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+# Время жизни брошенной сессии, с, и максимум сессий в памяти на хранилище
+SESSION_TTL = int(os.getenv("SESSION_TTL", 6 * 3600))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", 10000))
+
+# Дистракторы в тестах — переводы близкой длины (чтобы правильный ответ не выделялся)
+QUIZ_SIMILAR_LENGTH_DISTRACTORS = os.getenv("QUIZ_SIMILAR_LENGTH_DISTRACTORS", "false").lower() in ("1", "true", "yes")
+
+# Размер страницы при потоковом обходе пользователей (кэш планировщика, восстановление уведомлений)
+USER_ITER_BATCH_SIZE = int(os.getenv("USER_ITER_BATCH_SIZE", 1000))
+
+# Сколько часов хранится журнал изменений пользователей (user_changes) для инкрементального обновления кэша планировщика
+USER_CHANGES_RETENTION_HOURS = float(os.getenv("USER_CHANGES_RETENTION_HOURS", 24))
+
+# Сколько пользователей держать в кэше прав доступа (database/entitlement_cache.py): одно целое на пользователя
+ENTITLEMENT_CACHE_SIZE = int(os.getenv("ENTITLEMENT_CACHE_SIZE", 200000))
+
+# Фоновая проверка подписок (services/subscription_sweeper.py): период и за сколько дней предупреждать
+SUBSCRIPTION_SWEEP_INTERVAL_MINUTES = int(os.getenv("SUBSCRIPTION_SWEEP_INTERVAL_MINUTES", 5))
+SUBSCRIPTION_EXPIRY_NOTICE_DAYS = int(os.getenv("SUBSCRIPTION_EXPIRY_NOTICE_DAYS", 3))
+
+# Кэш озвучки слов (services/text_to_speech.py): каталог и предельный размер на диске
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", 200))
+TTS_PREWARM_WORKERS = int(os.getenv("TTS_PREWARM_WORKERS", 4))
+
+# Кэш карточек слов и значков уровня (services/image_generation.py): каталог, размер, процессы пакетной отрисовки
+CARD_CACHE_DIR = os.getenv("CARD_CACHE_DIR", os.path.join("cache", "cards"))
+CARD_CACHE_MAX_MB = float(os.getenv("CARD_CACHE_MAX_MB", 200))
+CARD_PRERENDER_WORKERS = int(os.getenv("CARD_PRERENDER_WORKERS", os.cpu_count() or 2))
+
+# Сжатие PNG карточек (services/image_generation.py): zlib 0–9 и дополнительный проход optimize (медленнее, файл меньше)
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", 6))
+PNG_OPTIMIZE = os.getenv("PNG_OPTIMIZE", "false").lower() in ("1", "true", "yes")
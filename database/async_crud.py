@@ -0,0 +1,96 @@
+# database/async_crud.py
+"""
+Асинхронная обертка над database.crud для хендлеров.
+
+Все обращения к SQLite выполняются в выделенном потоке БД (очередь
+ThreadPoolExecutor), поэтому медленная запись или backoff в
+DatabaseManager.execute больше не останавливает цикл событий — остальные
+чаты продолжают обслуживаться. Синхронный API database.crud остается для
+скриптов и планировщика.
+
+    user = await async_crud.get_user(chat_id)
+    result = await async_crud.run_db(build_memorize, chat_id, user)
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Sequence, Tuple
+
+from config import DB_EXECUTOR_THREADS, USER_ITER_BATCH_SIZE
+from database import crud
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_THREADS, thread_name_prefix="db")
+
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет синхронную функцию, работающую с БД, в потоке БД."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _async(name: str) -> Callable:
+    """Асинхронный вариант crud.<name> (функция берется в момент вызова)."""
+    @functools.wraps(getattr(crud, name))
+    async def wrapper(*args, **kwargs):
+        return await run_db(getattr(crud, name), *args, **kwargs)
+    return wrapper
+
+
+# Пользователи
+get_user = _async("get_user")
+add_user = _async("add_user")
+update_user_field = _async("update_user_field")
+update_user_level = _async("update_user_level")
+update_user_chosen_set = _async("update_user_chosen_set")
+update_user_words_per_day = _async("update_user_words_per_day")
+update_user_notifications = _async("update_user_notifications")
+update_user_timezone = _async("update_user_timezone")
+mark_user_reachable = _async("mark_user_reachable")
+set_test_words = _async("set_test_words")
+set_memorize_words = _async("set_memorize_words")
+
+
+async def iter_users(columns: Sequence[str] = crud.USER_SUMMARY_COLUMNS, batch_size: int = USER_ITER_BATCH_SIZE,
+                     reachable_only: bool = False) -> AsyncIterator[Tuple]:
+    """Асинхронный crud.iter_users: каждая страница читается в потоке БД отдельно."""
+    after = 0
+    while True:
+        page = await run_db(crud.get_users_page, after, columns, batch_size, reachable_only)
+        for user in page:
+            yield user
+        if len(page) < batch_size:
+            return
+        after = page[-1][0]
+
+
+# Выученные слова
+get_learned_words = _async("get_learned_words")
+get_learned_word_set = _async("get_learned_word_set")
+add_learned_word = _async("add_learned_word")
+clear_learned_words_for_user = _async("clear_learned_words_for_user")
+
+# Streak
+get_user_streak = _async("get_user_streak")
+increment_user_streak = _async("increment_user_streak")
+
+# Подписка
+is_user_premium = _async("is_user_premium")
+get_user_subscription_status = _async("get_user_subscription_status")
+
+# Рефералы
+get_user_by_referral_code = _async("get_user_by_referral_code")
+set_user_referral_code = _async("set_user_referral_code")
+add_referral = _async("add_referral")
+count_user_referrals = _async("count_user_referrals")
+get_user_referrals = _async("get_user_referrals")
+process_referral_rewards = _async("process_referral_rewards")
+
+
+def shutdown(wait: bool = True) -> None:
+    """Дожидается выполнения поставленных в очередь запросов и останавливает поток БД."""
+    _executor.shutdown(wait=wait)
+    logger.info("Поток БД остановлен")
@@ -8,17 +8,22 @@ from __future__ import annotations
 
 import logging
 import sqlite3
+import time
 from pathlib import Path
-from typing import Any, Iterable, List, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta  # ДОБАВЬТЕ ЭТУ СТРОКУ
 
 from database.db import conn, cursor, db_manager     # существующая инфраструктура
+from database.entitlement_cache import entitlement_cache, expires_at_epoch, premium_until_epoch
+from database.learned_cache import learned_words_cache, normalize_word
+from database.write_buffer import write_buffer
 from config import (
     DEFAULT_WORDS_PER_DAY,
     DEFAULT_REPETITIONS,
     REMINDER_DEFAULT,
     DEFAULT_SETS,
     DB_PATH,
+    USER_ITER_BATCH_SIZE,
 )
 
 logger = logging.getLogger(__name__)
@@ -33,26 +38,35 @@ def _exec(query: str, params: Iterable[Any] | None = None) -> List[Tuple]:
 
 # В файле database/crud.py добавить эти функции перед функциями update_user_test_words_count и update_user_memorize_words_count:
 
+def write_user_subscription(tx, chat_id: int, status: str, expires_at: str = None, payment_id: str = None) -> None:
+    """
+    Обновляет подписку в транзакции вызывающего. После COMMIT вызывающий
+    сбрасывает entitlement_cache.invalidate(chat_id).
+    """
+    if expires_at and payment_id:
+        tx.execute(
+            """UPDATE users SET subscription_status = ?, subscription_expires_at = ?, 
+               subscription_expires_epoch = ?, subscription_payment_id = ? WHERE chat_id = ?""",
+            (status, expires_at, expires_at_epoch(expires_at), payment_id, chat_id)
+        )
+    elif expires_at:
+        tx.execute(
+            """UPDATE users SET subscription_status = ?, subscription_expires_at = ?,
+               subscription_expires_epoch = ? WHERE chat_id = ?""",
+            (status, expires_at, expires_at_epoch(expires_at), chat_id)
+        )
+    else:
+        tx.execute(
+            "UPDATE users SET subscription_status = ? WHERE chat_id = ?",
+            (status, chat_id)
+        )
+
 def update_user_subscription(chat_id: int, status: str, expires_at: str = None, payment_id: str = None):
     """Обновляет статус подписки пользователя."""
     try:
         with db_manager.transaction() as tx:
-            if expires_at and payment_id:
-                tx.execute(
-                    """UPDATE users SET subscription_status = ?, subscription_expires_at = ?, 
-                       subscription_payment_id = ? WHERE chat_id = ?""",
-                    (status, expires_at, payment_id, chat_id)
-                )
-            elif expires_at:
-                tx.execute(
-                    "UPDATE users SET subscription_status = ?, subscription_expires_at = ? WHERE chat_id = ?",
-                    (status, expires_at, chat_id)
-                )
-            else:
-                tx.execute(
-                    "UPDATE users SET subscription_status = ? WHERE chat_id = ?",
-                    (status, chat_id)
-                )
+            write_user_subscription(tx, chat_id, status, expires_at, payment_id)
+        entitlement_cache.invalidate(chat_id)
         logger.info(f"Updated subscription status={status} for user {chat_id}")
     except Exception as e:
         logger.error(f"Error updating subscription for user {chat_id}: {e}")
@@ -75,38 +89,127 @@ def get_user_subscription_status(chat_id: int) -> tuple:
         logger.error(f"Error getting subscription status for user {chat_id}: {e}")
         return 'free', None, None
 
-def is_user_premium(chat_id: int) -> bool:
-    """Проверяет, является ли пользователь премиум (активная подписка)."""
+def get_premium_until(chat_id: int) -> int:
+    """Окончание премиума (секунды эпохи, 0 — нет подписки); из кэша прав доступа."""
+    until = entitlement_cache.get(chat_id)
+    if until is not None:
+        return until
+    entitlement_cache.begin_load(chat_id)
     try:
-        status, expires_at, _ = get_user_subscription_status(chat_id)
-        
-        if status != 'premium':
-            return False
-            
-        if not expires_at:
-            return False
-            
-        # Проверяем, не истекла ли подписка
-        from datetime import datetime, timedelta 
-        expiry_date = datetime.fromisoformat(expires_at)
-        return datetime.now() < expiry_date
-        
+        with db_manager.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT subscription_status, subscription_expires_epoch FROM users WHERE chat_id = ?",
+                (chat_id,),
+            )
+            row = cursor.fetchone()
     except Exception as e:
+        # Ошибку не кэшируем
+        entitlement_cache.finish_load(chat_id, None)
         logger.error(f"Error checking premium status for user {chat_id}: {e}")
-        return False
+        return 0
+    until = premium_until_epoch(*row) if row else 0
+    entitlement_cache.finish_load(chat_id, until)
+    return until
+
+
+def is_user_premium(chat_id: int) -> bool:
+    """Проверяет, является ли пользователь премиум (активная подписка)."""
+    return time.time() < get_premium_until(chat_id)
+
+
+def warm_entitlements() -> int:
+    """Заполняет кэш прав доступа постраничным чтением users (при старте бота)."""
+    loaded = 0
+    values = {}
+    for chat_id, status, expires_epoch in iter_users(("subscription_status", "subscription_expires_epoch")):
+        values[chat_id] = premium_until_epoch(status, expires_epoch)
+        if len(values) >= USER_ITER_BATCH_SIZE:
+            entitlement_cache.put_many(values)
+            loaded += len(values)
+            values = {}
+    entitlement_cache.put_many(values)
+    return loaded + len(values)
 
 def get_all_premium_users() -> list:
-    """Возвращает список всех премиум пользователей с их данными подписки."""
+    """Возвращает премиум пользователей с действующей подпиской (по возрастанию окончания)."""
     try:
         with db_manager.get_cursor() as cursor:
             cursor.execute(
                 """SELECT chat_id, subscription_status, subscription_expires_at, subscription_payment_id 
-                   FROM users WHERE subscription_status = 'premium'"""
+                   FROM users WHERE subscription_status = 'premium' AND subscription_expires_epoch > ?
+                   ORDER BY subscription_expires_epoch""",
+                (int(time.time()),)
             )
             return cursor.fetchall()
     except Exception as e:
         logger.error(f"Error getting premium users: {e}")
         return []
+
+
+# ───────────────────────── фоновая проверка подписок ─────────────────────────
+def get_job_watermark(name: str, default: float = 0) -> float:
+    """Водяной знак фоновой задачи из job_state (default — задача еще не запускалась)."""
+    with db_manager.get_cursor() as cursor:
+        cursor.execute("SELECT watermark FROM job_state WHERE name = ?", (name,))
+        row = cursor.fetchone()
+    return row[0] if row else default
+
+
+def _set_job_watermark(tx, name: str, watermark: float) -> None:
+    tx.execute(
+        """INSERT INTO job_state (name, watermark, updated_at) VALUES (?, ?, ?)
+           ON CONFLICT(name) DO UPDATE SET watermark = excluded.watermark, updated_at = excluded.updated_at""",
+        (name, watermark, datetime.now().isoformat()),
+    )
+
+
+def expire_subscriptions(now: int) -> List[int]:
+    """
+    Переводит в 'expired' подписки, истекшие после прошлого запуска:
+    subscription_expires_epoch в (водяной знак, now] — диапазон по индексу
+    idx_users_subscription_expiry. Водяной знак сдвигается в той же транзакции
+    (без записи в job_state — отсчет от now, см. DatabaseManager._seed_job_watermarks).
+    Возвращает chat_id пониженных пользователей.
+    """
+    with db_manager.transaction() as tx:
+        row = tx.execute("SELECT watermark FROM job_state WHERE name = 'subscription_expiry'").fetchone()
+        watermark = int(row[0]) if row else now
+        expired = [chat_id for (chat_id,) in tx.execute(
+            """UPDATE users SET subscription_status = 'expired'
+               WHERE subscription_status = 'premium'
+                 AND subscription_expires_epoch > ? AND subscription_expires_epoch <= ?
+               RETURNING chat_id""",
+            (watermark, now),
+        ).fetchall()]
+        _set_job_watermark(tx, "subscription_expiry", max(watermark, now))
+    for chat_id in expired:
+        entitlement_cache.invalidate(chat_id)
+    if expired:
+        logger.info(f"Expired subscriptions: {len(expired)}")
+    return expired
+
+
+def claim_expiring_subscriptions(now: int, until: int) -> List[Tuple[int, int]]:
+    """
+    Подписки, которые закончатся до until и о которых еще не предупреждали:
+    subscription_expires_epoch в (водяной знак, until]. Водяной знак сдвигается
+    до until, так что каждая подписка попадает в выборку один раз
+    (продленная — снова, уже с новой датой). Возвращает (chat_id, окончание).
+    """
+    with db_manager.transaction() as tx:
+        row = tx.execute("SELECT watermark FROM job_state WHERE name = 'subscription_expiry_notice'").fetchone()
+        watermark = max(int(row[0]) if row else now, now)
+        if until <= watermark:
+            return []
+        expiring = [tuple(row) for row in tx.execute(
+            """SELECT chat_id, subscription_expires_epoch FROM users
+               WHERE subscription_status = 'premium'
+                 AND subscription_expires_epoch > ? AND subscription_expires_epoch <= ?
+               ORDER BY subscription_expires_epoch""",
+            (watermark, until),
+        ).fetchall()]
+        _set_job_watermark(tx, "subscription_expiry_notice", until)
+    return expiring
         
 # ───────────────────────── базовые (существовавшие) функции ─────────────────
 def update_user_words_and_repetitions(chat_id, words_per_day, repetitions_per_word):
@@ -164,13 +267,126 @@ def get_user(chat_id: int):
         return None
 
 
+# Столбцы, которые нужны планировщику и восстановлению уведомлений
+USER_SUMMARY_COLUMNS = ("chat_id", "level", "words_per_day", "notifications", "reminder_time", "timezone")
+
+# Имена столбцов подставляются в SQL, поэтому принимаются только известные
+_USER_COLUMNS = frozenset(USER_SUMMARY_COLUMNS) | {
+    "chosen_set", "test_words_count", "memorize_words_count",
+    "subscription_status", "subscription_expires_at", "subscription_expires_epoch", "subscription_payment_id",
+    "referral_code", "unreachable_since", "unreachable_reason",
+}
+
+
+def _user_columns(columns: Sequence[str]) -> Tuple[str, ...]:
+    """Проверяет имена столбцов и ставит chat_id первым."""
+    unknown = [column for column in columns if column not in _USER_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown users columns: {unknown}")
+    return ("chat_id",) + tuple(column for column in columns if column != "chat_id")
+
+
+def get_users_page(after_chat_id: int = 0, columns: Sequence[str] = USER_SUMMARY_COLUMNS,
+                   limit: int = USER_ITER_BATCH_SIZE, reachable_only: bool = False) -> List[Tuple]:
+    """
+    Страница пользователей с chat_id > after_chat_id (keyset-пагинация по
+    первичному ключу). Первым столбцом всегда идет chat_id — по нему
+    запрашивается следующая страница.
+    """
+    columns = _user_columns(columns)
+    where = "chat_id > ?" + (" AND unreachable_since IS NULL" if reachable_only else "")
+    with db_manager.get_cursor() as cur:
+        cur.execute(
+            f"SELECT {', '.join(columns)} FROM users WHERE {where} ORDER BY chat_id LIMIT ?",
+            (after_chat_id, limit),
+        )
+        return [tuple(row) for row in cur.fetchall()]
+
+
+def iter_users(columns: Sequence[str] = USER_SUMMARY_COLUMNS, batch_size: int = USER_ITER_BATCH_SIZE,
+               reachable_only: bool = False) -> Iterator[Tuple]:
+    """
+    Потоково перебирает пользователей страницами по batch_size.
+
+    Каждая страница — отдельный короткий запрос, так что в памяти не больше
+    одной страницы и чтение не держит БД на время обхода всей таблицы.
+    """
+    after = 0
+    while True:
+        page = get_users_page(after, columns, batch_size, reachable_only)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after = page[-1][0]
+
+
+def get_users_by_ids(chat_ids: Iterable[int], columns: Sequence[str] = USER_SUMMARY_COLUMNS) -> List[Tuple]:
+    """Строки указанных пользователей (chat_id первым столбцом); удаленных в ответе нет."""
+    chat_ids = list(chat_ids)
+    columns = _user_columns(columns)
+    rows: List[Tuple] = []
+    with db_manager.get_cursor() as cur:
+        # Не больше 500 параметров на запрос (лимит SQLITE_MAX_VARIABLE_NUMBER)
+        for start in range(0, len(chat_ids), 500):
+            chunk = chat_ids[start:start + 500]
+            cur.execute(
+                f"SELECT {', '.join(columns)} FROM users WHERE chat_id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            rows.extend(tuple(row) for row in cur.fetchall())
+    return rows
+
+
+# ───────────────────────── журнал изменений пользователей ─────────────────────────
+def get_user_changes_watermark() -> int:
+    """Последний seq журнала user_changes (0, если журнал пуст)."""
+    with db_manager.get_cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM user_changes")
+        return cur.fetchone()[0]
+
+
+def get_user_changes(after_seq: int, limit: int = USER_ITER_BATCH_SIZE) -> Optional[Tuple[int, List[int]]]:
+    """
+    Пользователи, измененные после водяного знака after_seq: (новый знак, chat_id).
+
+    None — журнал уже очищен дальше after_seq (процесс долго не читал его),
+    нужна полная перезагрузка.
+    """
+    with db_manager.get_cursor() as cur:
+        cur.execute("SELECT MIN(seq) FROM user_changes")
+        oldest = cur.fetchone()[0]
+        if oldest is None:
+            # Журнал пуст: все записи после after_seq могли быть уже удалены
+            cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'user_changes'")
+            row = cur.fetchone()
+            return None if row and row[0] > after_seq else (after_seq, [])
+        if oldest > after_seq + 1:
+            return None
+        changed: dict = {}
+        while True:
+            cur.execute(
+                "SELECT seq, chat_id FROM user_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (after_seq, limit),
+            )
+            rows = cur.fetchall()
+            for seq, chat_id in rows:
+                changed[chat_id] = None
+            if rows:
+                after_seq = rows[-1][0]
+            if len(rows) < limit:
+                return after_seq, list(changed)
+
+
+def prune_user_changes(max_age_seconds: float) -> int:
+    """Удаляет записи журнала старше max_age_seconds; возвращает число удаленных."""
+    cutoff = datetime.now().timestamp() - max_age_seconds
+    with db_manager.transaction() as tx:
+        return tx.execute("DELETE FROM user_changes WHERE changed_at < ?", (cutoff,)).rowcount
+
+
 def get_all_users():
     try:
-        cursor.execute(
-            "SELECT chat_id, level, words_per_day, notifications, reminder_time, timezone "
-            "FROM users"
-        )
-        return cursor.fetchall()
+        return list(iter_users())
     except Exception as e:
         logger.error(f"Error getting all users: {e}")
         return []
@@ -318,23 +534,28 @@ def get_user_dictionary(chat_id: int, limit: int = 10, offset: int = 0):
         return []
 
 
-def add_learned_word(chat_id: int, word: str, translation: str, learned_date: str):
+def add_learned_word(chat_id: int, word: str, translation: str, learned_date: str,
+                     buffered: bool = False):
+    """
+    Добавляет выученное слово (повтор игнорируется уникальным индексом).
+    buffered=True — через буфер отложенной записи (горячий путь теста).
+    """
+    if buffered:
+        write_buffer.add_learned_word(chat_id, word, translation, learned_date)
+        learned_words_cache.add(chat_id, word)
+        return
     try:
         with db_manager.transaction() as tx:
-            tx_cur = tx.cursor()
-            tx_cur.execute(
-                "SELECT COUNT(*) FROM learned_words WHERE chat_id = ? AND word = ?",
-                (chat_id, word),
-            )
-            if tx_cur.fetchone()[0] == 0:
-                tx_cur.execute(
-                    """
-                    INSERT INTO learned_words (chat_id, word, translation, learned_date)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (chat_id, word, translation, learned_date),
-                )
+            inserted = tx.execute(
+                """
+                INSERT OR IGNORE INTO learned_words (chat_id, word, translation, learned_date)
+                VALUES (?, ?, ?, ?)
+                """,
+                (chat_id, word, translation, learned_date),
+            ).rowcount
+            if inserted:
                 logger.debug("Added learned word '%s' for user %s", word, chat_id)
+        learned_words_cache.add(chat_id, word)
     except Exception as e:
         logger.error(f"Error adding learned word for user {chat_id}: {e}")
         raise
@@ -347,8 +568,13 @@ def get_learned_words(chat_id: int):
                 "SELECT word, translation FROM learned_words WHERE chat_id = ?", (chat_id,)
             )
             res = cur.fetchall()
-            logger.debug("Retrieved %d learned words for user %s", len(res), chat_id)
-            return res
+        # Слова из буфера отложенной записи, еще не попавшие в БД
+        pending = write_buffer.pending_learned_words(chat_id)
+        if pending:
+            stored = {row[0] for row in res}
+            res = list(res) + [row for row in pending if row[0] not in stored]
+        logger.debug("Retrieved %d learned words for user %s", len(res), chat_id)
+        return res
     except sqlite3.Error as sql_error:
         logger.error(f"SQLite error getting learned words for user {chat_id}: {sql_error}")
         return []
@@ -357,10 +583,75 @@ def get_learned_words(chat_id: int):
         return []
 
 
+def get_learned_word_set(chat_id: int) -> frozenset:
+    """
+    Нормализованные ключи выученных слов (extract_english(word).lower()).
+    Берутся из LRU-кэша; при промахе строятся из get_learned_words.
+    """
+    words = learned_words_cache.get(chat_id)
+    if words is not None:
+        return words
+
+    learned_words_cache.begin_load(chat_id)
+    try:
+        with db_manager.get_cursor() as cur:
+            cur.execute("SELECT word FROM learned_words WHERE chat_id = ?", (chat_id,))
+            rows = cur.fetchall()
+    except Exception as e:
+        # Ошибку не кэшируем: пустое множество вернется только на этот вызов
+        learned_words_cache.finish_load(chat_id, None)
+        logger.error(f"Error loading learned word set for user {chat_id}: {e}")
+        return frozenset()
+    pending = write_buffer.pending_learned_words(chat_id)
+    words = frozenset(normalize_word(word) for word, *_ in list(rows) + pending)
+    learned_words_cache.finish_load(chat_id, words)
+    return words
+
+
+def get_learned_word_sets(chat_ids: Iterable[int]) -> Dict[int, frozenset]:
+    """
+    get_learned_word_set для многих пользователей: промахи кэша читаются
+    запросами WHERE chat_id IN (...) по 500 пользователей. Прочитанное не
+    кладется в LRU-кэш, чтобы пакетные задачи не вытесняли активных.
+    """
+    result: Dict[int, frozenset] = {}
+    missing = []
+    for chat_id in chat_ids:
+        words = learned_words_cache.get(chat_id)
+        if words is None:
+            missing.append(chat_id)
+        else:
+            result[chat_id] = words
+    loaded: Dict[int, list] = {chat_id: [] for chat_id in missing}
+    try:
+        with db_manager.get_cursor() as cur:
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                cur.execute(
+                    f"SELECT chat_id, word FROM learned_words WHERE chat_id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for chat_id, word in cur.fetchall():
+                    loaded[chat_id].append(word)
+    except Exception as e:
+        logger.error(f"Error loading learned word sets for {len(missing)} users: {e}")
+    for chat_id, words in loaded.items():
+        pending = [word for word, *_ in write_buffer.pending_learned_words(chat_id)]
+        result[chat_id] = frozenset(normalize_word(word) for word in words + pending)
+    return result
+
+
+def is_word_learned(chat_id: int, word: str) -> bool:
+    return normalize_word(word) in get_learned_word_set(chat_id)
+
+
 def clear_learned_words_for_user(chat_id: int):
     try:
+        write_buffer.discard(chat_id)
         cursor.execute("DELETE FROM learned_words WHERE chat_id = ?", (chat_id,))
         conn.commit()
+        learned_words_cache.invalidate(chat_id)
+        learned_words_cache.put(chat_id, frozenset())
         logger.info("Cleared learned words for user %s", chat_id)
     except Exception as e:
         logger.error(f"Error clearing learned words for user {chat_id}: {e}")
@@ -426,58 +717,52 @@ def get_user_streak(chat_id: int) -> tuple:
         logger.error(f"Error getting streak for user {chat_id}: {e}")
         return 0, None
 
+# Новый streak считается в самом UPDATE по местным датам пользователя
+# (SQL-функция local_day, database/db.py): тест сегодня — без изменений,
+# вчера — +1, иначе (пропуск или первый тест) — 1
+_STREAK_UPDATE = """
+    UPDATE users SET
+        days_streak = CASE
+            WHEN last_test_date = local_day(timezone, 0) THEN MAX(COALESCE(days_streak, 0), 0)
+            WHEN last_test_date = local_day(timezone, -1) THEN MAX(COALESCE(days_streak, 0), 0) + 1
+            ELSE 1
+        END,
+        last_test_date = local_day(timezone, 0)
+    WHERE {where}
+    RETURNING chat_id, days_streak
+"""
+
+
 def increment_user_streak(chat_id: int) -> int:
-    """Увеличивает количество дней подряд на 1 и обновляет дату последнего теста. ИСПРАВЛЕННАЯ версия с учетом часового пояса пользователя."""
-    try:
-        # ИСПРАВЛЕНИЕ: получаем часовой пояс пользователя
-        try:
-            user = get_user(chat_id)
-            user_timezone = user[5] if user and len(user) > 5 and user[5] else "Europe/Moscow"
-            from zoneinfo import ZoneInfo
-            user_tz = ZoneInfo(user_timezone)
-            today = datetime.now(tz=user_tz).strftime("%Y-%m-%d")
-        except Exception as e:
-            logger.error(f"Ошибка получения часового пояса для пользователя {chat_id}: {e}")
-            today = datetime.now().strftime("%Y-%m-%d")
-        
-        current_streak, last_test_date = get_user_streak(chat_id)
-        logger.debug(f"Current state for user {chat_id}: streak={current_streak}, last_date={last_test_date}, today={today}")
-        
-        # Проверяем, не проходил ли уже тест сегодня
-        if last_test_date == today:
-            logger.debug(f"User {chat_id} already took test today, keeping streak at {current_streak}")
-            return current_streak  # Уже проходил тест сегодня
-        
-        # Проверяем, был ли пропуск дней
-        try:
-            yesterday = (datetime.now(tz=user_tz) - timedelta(days=1)).strftime("%Y-%m-%d")
-        except Exception:
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        if last_test_date is None:
-            # Первый тест вообще
-            new_streak = 1
-        elif last_test_date == yesterday:
-            # Тест был вчера - увеличиваем streak
-            new_streak = current_streak + 1
-        else:
-            # Был пропуск - начинаем заново
-            new_streak = 1
-        
-        logger.debug(f"Incrementing streak for user {chat_id}: {current_streak} -> {new_streak}")
-        
-        update_user_streak(chat_id, new_streak, today)
-        
-        # Проверяем что обновление прошло успешно
-        verify_streak, verify_date = get_user_streak(chat_id)
-        logger.debug(f"After update verification: streak={verify_streak}, date={verify_date}")
-        
-        return new_streak
-        
+    """
+    Увеличивает количество дней подряд на 1 и обновляет дату последнего теста
+    (с учетом часового пояса пользователя) — одним атомарным UPDATE.
+    """
+    try:
+        with db_manager.transaction() as tx:
+            row = tx.execute(_STREAK_UPDATE.format(where="chat_id = ?"), (chat_id,)).fetchone()
+        if row is None:
+            logger.warning(f"User {chat_id} not found when incrementing streak")
+            return 0
+        logger.debug(f"Streak for user {chat_id}: {row[1]}")
+        return row[1]
     except Exception as e:
         logger.error(f"Error incrementing streak for user {chat_id}: {e}")
         return 0
 
+
+def increment_user_streaks(chat_ids: Iterable[int]) -> Dict[int, int]:
+    """increment_user_streak для многих пользователей: один UPDATE на 500 chat_id."""
+    chat_ids = list(chat_ids)
+    result: Dict[int, int] = {}
+    with db_manager.transaction() as tx:
+        for start in range(0, len(chat_ids), 500):
+            chunk = chat_ids[start:start + 500]
+            where = f"chat_id IN ({', '.join('?' * len(chunk))})"
+            result.update(tx.execute(_STREAK_UPDATE.format(where=where), chunk).fetchall())
+    return result
+
+
 def reset_user_streak(chat_id: int):
     """Сбрасывает количество дней подряд до 0."""
     try:
@@ -487,6 +772,59 @@ def reset_user_streak(chat_id: int):
     except Exception as e:
         logger.error(f"Error resetting streak for user {chat_id}: {e}")
 
+def reset_stale_streaks(timezones: Sequence[str], today: str, yesterday: str,
+                        include_unset: bool = False, partition: Tuple[int, int] = (0, 1)) -> int:
+    """
+    Сбрасывает streak всем пользователям с часовым поясом из timezones, у
+    которых последний тест был раньше вчера (или дата пустая/в будущем), —
+    одним UPDATE. include_unset — также пользователи без пояса (по умолчанию
+    Москва). partition=(index, total) — только чаты этого процесса-воркера.
+    Возвращает число сброшенных.
+    """
+    if not timezones and not include_unset:
+        return 0
+    zone_filter = f"timezone IN ({', '.join('?' * len(timezones))})" if timezones else "0"
+    if include_unset:
+        zone_filter += " OR timezone IS NULL OR timezone = ''"
+    sql = (
+        "UPDATE users SET days_streak = 0, last_test_date = NULL "
+        "WHERE days_streak > 0 "
+        "AND (last_test_date IS NULL OR last_test_date < ? OR last_test_date > ?) "
+        f"AND ({zone_filter})"
+    )
+    params: List[Any] = [yesterday, today, *timezones]
+    index, total = partition
+    if total > 1:
+        # Остаток как в update_router.worker_for (Python: неотрицательный)
+        sql += " AND ((chat_id % ?) + ?) % ? = ?"
+        params += [total, total, total, index]
+    with db_manager.transaction() as tx:
+        return tx.execute(sql, params).rowcount
+
+
+def is_daily_reset_done(bucket: str, local_date: str, worker: str) -> bool:
+    """Выполнен ли ежедневный сброс группы поясов bucket за local_date этим воркером."""
+    with db_manager.get_cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM daily_resets WHERE bucket = ? AND local_date = ? AND worker = ?",
+            (bucket, local_date, worker),
+        )
+        return cur.fetchone() is not None
+
+
+def mark_daily_reset_done(bucket: str, local_date: str, worker: str) -> None:
+    """Запоминает выполненный сброс и удаляет отметки старше двух дней."""
+    with db_manager.transaction() as tx:
+        tx.execute(
+            "INSERT OR IGNORE INTO daily_resets (bucket, local_date, worker, done_at) VALUES (?, ?, ?, ?)",
+            (bucket, local_date, worker, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        tx.execute(
+            "DELETE FROM daily_resets WHERE local_date < ?",
+            ((datetime.strptime(local_date, "%Y-%m-%d") - timedelta(days=2)).strftime("%Y-%m-%d"),),
+        )
+
+
 def calculate_streak_discount(chat_id: int) -> int:
     """Вычисляет скидку на подписку на основе количества дней подряд."""
     try:
@@ -683,4 +1021,67 @@ def process_referral_rewards(user_id: int) -> bool:
         
     except Exception as e:
         logger.error(f"Error processing referral rewards for user {user_id}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+# ───────────────────────── доступность пользователей ─────────────────────────
+def get_reachable_user_ids_page(after_chat_id: int = 0, limit: int = 500) -> List[int]:
+    """
+    Страница chat_id > after_chat_id (keyset-пагинация по первичному ключу),
+    без пользователей, заблокировавших бота.
+    """
+    return [row[0] for row in get_users_page(after_chat_id, ("chat_id",), limit, reachable_only=True)]
+
+
+def mark_users_unreachable(chat_ids_with_reason: Iterable[Tuple[int, str]]) -> None:
+    """Помечает пользователей недоступными (reason: blocked / deactivated / not_found)."""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(now, reason, chat_id) for chat_id, reason in chat_ids_with_reason]
+    if not rows:
+        return
+    with db_manager.transaction() as tx:
+        tx.executemany(
+            "UPDATE users SET unreachable_since = ?, unreachable_reason = ? WHERE chat_id = ?", rows
+        )
+    logger.info("Marked %d users as unreachable", len(rows))
+
+
+def mark_user_reachable(chat_id: int) -> None:
+    """Снимает отметку недоступности (пользователь снова написал боту)."""
+    db_manager.execute(
+        "UPDATE users SET unreachable_since = NULL, unreachable_reason = NULL "
+        "WHERE chat_id = ? AND unreachable_since IS NOT NULL",
+        (chat_id,),
+        commit=True,
+    )
+
+
+# ───────────────────────── file_id загруженных медиа ─────────────────────────
+def get_media_file_ids(cache_keys: Iterable[str]) -> Dict[str, str]:
+    """file_id Telegram для ключей кэша медиа (отсутствующие не возвращаются)."""
+    keys = list(dict.fromkeys(cache_keys))
+    result: Dict[str, str] = {}
+    with db_manager.get_cursor() as cursor:
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            cursor.execute(
+                f"SELECT cache_key, file_id FROM media_file_ids WHERE cache_key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            result.update(cursor.fetchall())
+    return result
+
+
+def save_media_file_id(cache_key: str, kind: str, file_id: str) -> None:
+    """Запоминает file_id после первой загрузки файла в Telegram."""
+    db_manager.execute(
+        """INSERT INTO media_file_ids (cache_key, kind, file_id, created_at) VALUES (?, ?, ?, ?)
+           ON CONFLICT(cache_key) DO UPDATE SET file_id = excluded.file_id, created_at = excluded.created_at""",
+        (cache_key, kind, file_id, datetime.now().isoformat()),
+        commit=True,
+    )
+
+
+def delete_media_file_id(cache_key: str) -> None:
+    """Забывает file_id (Telegram больше не принимает его)."""
+    db_manager.execute("DELETE FROM media_file_ids WHERE cache_key = ?", (cache_key,), commit=True)
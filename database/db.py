@@ -4,10 +4,48 @@ import threading
 import time
 import logging
 from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from config import DB_PATH, PRODUCTION_MODE
 
 logger = logging.getLogger(__name__)
 
+# Пояс пользователя без настройки или с некорректным значением
+DEFAULT_USER_TIMEZONE = "Europe/Moscow"
+
+# Локальные даты по поясам на текущую UTC-минуту: (пояс, сдвиг в днях) → 'YYYY-MM-DD'
+_local_days = {}
+_local_days_minute = None
+
+
+def local_day(tz_name, days=0):
+    """
+    Местная дата пользователя со сдвигом days — SQL-функция local_day(timezone, days).
+
+    Позволяет считать «сегодня/вчера» пользователя внутри одного UPDATE.
+    Значения кэшируются на текущую минуту (даты меняются только на границе минут).
+    """
+    global _local_days, _local_days_minute
+    now = datetime.now(tz=timezone.utc)
+    minute = int(now.timestamp()) // 60
+    if minute != _local_days_minute:
+        _local_days, _local_days_minute = {}, minute
+    key = (tz_name, days)
+    value = _local_days.get(key)
+    if value is None:
+        try:
+            zone = ZoneInfo(tz_name or DEFAULT_USER_TIMEZONE)
+        except Exception:
+            zone = ZoneInfo(DEFAULT_USER_TIMEZONE)
+        value = _local_days[key] = (now.astimezone(zone) + timedelta(days=days)).strftime("%Y-%m-%d")
+    return value
+
+
+def register_sql_functions(connection):
+    """Регистрирует функции приложения в соединении SQLite."""
+    connection.create_function("local_day", 2, local_day)
+
+
 class DatabaseManager:
     """
     Оптимизированный менеджер базы данных для продакшена.
@@ -55,6 +93,7 @@ class DatabaseManager:
         
         connection.isolation_level = None
         connection.row_factory = sqlite3.Row
+        register_sql_functions(connection)
         return connection
         
     def get_connection(self):
@@ -115,9 +154,15 @@ class DatabaseManager:
     
     @contextmanager
     def transaction(self):
-        """Контекстный менеджер для транзакций."""
+        """
+        Контекстный менеджер для транзакций.
+
+        BEGIN IMMEDIATE берет блокировку записи сразу (с ожиданием по timeout):
+        отложенная транзакция, начавшая с чтения, при конкурентной записи
+        получала «database is locked» без повторных попыток.
+        """
         conn = self.get_connection()
-        conn.execute("BEGIN")
+        conn.execute("BEGIN IMMEDIATE")
         try:
             yield conn
             conn.commit()
@@ -218,6 +263,116 @@ class DatabaseManager:
                 )
             ''', commit=True)
                 
+            # Планы «слов дня» и остатки прошлого дня (переживают перезапуск)
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS daily_plans (
+                    chat_id INTEGER PRIMARY KEY,
+                    plan_date TEXT,
+                    payload TEXT NOT NULL
+                )
+            ''', commit=True)
+
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS previous_daily_words (
+                    chat_id INTEGER PRIMARY KEY,
+                    plan_date TEXT,
+                    payload TEXT NOT NULL
+                )
+            ''', commit=True)
+
+            # Рассылки с контрольными точками и статусом по каждому получателю
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    message TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'running',
+                    last_chat_id INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    finished_at TEXT DEFAULT NULL
+                )
+            ''', commit=True)
+
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                    broadcast_id INTEGER NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT DEFAULT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (broadcast_id, chat_id),
+                    FOREIGN KEY (broadcast_id) REFERENCES broadcasts (id)
+                ) WITHOUT ROWID
+            ''', commit=True)
+
+            # Сессии тестов и обучения (database/session_store.py)
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                ) WITHOUT ROWID
+            ''', commit=True)
+
+            # Выполненные ежедневные сбросы: (группа поясов, локальная дата, воркер)
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS daily_resets (
+                    bucket TEXT NOT NULL,
+                    local_date TEXT NOT NULL,
+                    worker TEXT NOT NULL,
+                    done_at TEXT NOT NULL,
+                    PRIMARY KEY (bucket, local_date, worker)
+                ) WITHOUT ROWID
+            ''', commit=True)
+
+            # Журнал изменений пользователей: планировщик дочитывает его по
+            # водяному знаку seq вместо полной перезагрузки user_cache
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS user_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    changed_at REAL NOT NULL
+                )
+            ''', commit=True)
+            self._create_user_change_triggers()
+
+            # file_id медиа, уже загруженных в Telegram (ключ — хэш содержимого/параметров)
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS media_file_ids (
+                    cache_key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                ) WITHOUT ROWID
+            ''', commit=True)
+
+            # Водяные знаки фоновых задач: до какого момента задача уже отработала
+            self.execute('''
+                CREATE TABLE IF NOT EXISTS job_state (
+                    name TEXT PRIMARY KEY,
+                    watermark REAL NOT NULL,
+                    updated_at TEXT NOT NULL
+                ) WITHOUT ROWID
+            ''', commit=True)
+
+            # Дни подряд (раньше добавлялись скриптами alter_db_streak.py / fix_streak_db.py)
+            self._ensure_column("users", "days_streak", "INTEGER DEFAULT 0")
+            self._ensure_column("users", "last_test_date", "TEXT DEFAULT NULL")
+
+            # Окончание подписки в секундах эпохи: сортируемое значение для индекса
+            # и фоновой проверки истечения (services/subscription_sweeper.py)
+            if self._ensure_column("users", "subscription_expires_epoch", "INTEGER DEFAULT 0"):
+                self._backfill_subscription_epochs()
+            self._seed_job_watermarks()
+
+            # Пользователи, заблокировавшие бота или удалившие аккаунт
+            self._ensure_column("users", "unreachable_since", "TEXT DEFAULT NULL")
+            self._ensure_column("users", "unreachable_reason", "TEXT DEFAULT NULL")
+
+            # Уникальность (chat_id, word) для INSERT OR IGNORE
+            self._ensure_learned_words_unique()
+
             # Создаем индексы для оптимизации запросов
             self._create_indexes()
             
@@ -225,6 +380,99 @@ class DatabaseManager:
             logger.error("Ошибка инициализации БД: %s", e)
             raise
 
+    def _create_user_change_triggers(self):
+        """Триггеры users → user_changes (вставка, удаление, смена настроек и подписки)."""
+        log = ("INSERT INTO user_changes (chat_id, changed_at) "
+               "VALUES ({}.chat_id, (julianday('now') - 2440587.5) * 86400.0)")
+        triggers = {
+            "trg_users_insert": ("AFTER INSERT ON users", "NEW"),
+            "trg_users_delete": ("AFTER DELETE ON users", "OLD"),
+            "trg_users_update": (
+                "AFTER UPDATE OF level, words_per_day, notifications, reminder_time, timezone, chosen_set, "
+                "subscription_status, subscription_expires_at ON users", "NEW",
+            ),
+        }
+        for name, (event, row) in triggers.items():
+            sql = f"CREATE TRIGGER {name} {event} FOR EACH ROW BEGIN {log.format(row)}; END"
+            existing = self.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+            ).fetchone()
+            if existing is not None and existing[0] == sql:
+                continue
+            # Определение изменилось (новые столбцы) — пересоздаем
+            self.execute(f"DROP TRIGGER IF EXISTS {name}", commit=True)
+            self.execute(sql, commit=True)
+
+    def _ensure_column(self, table: str, column: str, definition: str) -> bool:
+        """Добавляет колонку, если ее еще нет (миграция существующей БД). True — добавлена."""
+        columns = {row[1] for row in self.execute(f"PRAGMA table_info({table})").fetchall()}
+        if column not in columns:
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}", commit=True)
+            logger.info("Добавлена колонка %s.%s", table, column)
+            return True
+        return False
+
+    def _backfill_subscription_epochs(self):
+        """Заполняет subscription_expires_epoch по ISO-датам subscription_expires_at."""
+        from database.entitlement_cache import expires_at_epoch
+
+        rows = self.execute(
+            "SELECT chat_id, subscription_expires_at FROM users WHERE subscription_expires_at IS NOT NULL"
+        ).fetchall()
+        with self.transaction() as tx:
+            tx.executemany(
+                "UPDATE users SET subscription_expires_epoch = ? WHERE chat_id = ?",
+                [(expires_at_epoch(expires_at), chat_id) for chat_id, expires_at in rows],
+            )
+        logger.info("Заполнено subscription_expires_epoch: %d пользователей", len(rows))
+
+    def _seed_job_watermarks(self, now: int = None):
+        """
+        Водяные знаки проверки подписок при первом развертывании — текущий
+        момент. С нулевым водяным знаком первый проход разослал бы «Premium
+        истек» всем, чья подписка закончилась когда-либо раньше; такие
+        подписки переводятся в 'expired' молча.
+        """
+        now = int(time.time()) if now is None else now
+        updated_at = datetime.now().isoformat()
+        with self.transaction() as tx:
+            seeded = tx.execute(
+                "INSERT OR IGNORE INTO job_state (name, watermark, updated_at) VALUES ('subscription_expiry', ?, ?)",
+                (now, updated_at),
+            ).rowcount
+            tx.execute(
+                "INSERT OR IGNORE INTO job_state (name, watermark, updated_at) "
+                "VALUES ('subscription_expiry_notice', ?, ?)",
+                (now, updated_at),
+            )
+            if not seeded:
+                return
+            lapsed = tx.execute(
+                """UPDATE users SET subscription_status = 'expired'
+                   WHERE subscription_status = 'premium'
+                     AND subscription_expires_epoch > 0 AND subscription_expires_epoch <= ?""",
+                (now,),
+            ).rowcount
+        logger.info("Водяные знаки проверки подписок: %d, без уведомления истекло %d", now, lapsed)
+
+    def _ensure_learned_words_unique(self):
+        """Удаляет дубликаты выученных слов и создает уникальный индекс (chat_id, word)."""
+        cursor = self.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_learned_words_chat_word'"
+        )
+        if cursor.fetchone():
+            return
+        with self.transaction() as tx:
+            removed = tx.execute(
+                "DELETE FROM learned_words WHERE id NOT IN "
+                "(SELECT MIN(id) FROM learned_words GROUP BY chat_id, word)"
+            ).rowcount
+            tx.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_learned_words_chat_word "
+                "ON learned_words(chat_id, word)"
+            )
+        logger.info("Создан уникальный индекс выученных слов, удалено дубликатов: %d", removed)
+
     def _create_indexes(self):
         """Создает индексы для оптимизации запросов."""
         indexes = [
@@ -236,7 +484,11 @@ class DatabaseManager:
             "CREATE INDEX IF NOT EXISTS idx_referrals_referrer ON referrals(referrer_id)",
             "CREATE INDEX IF NOT EXISTS idx_referrals_referred ON referrals(referred_id)", 
             "CREATE INDEX IF NOT EXISTS idx_referral_rewards_user ON referral_rewards(user_id)",
-            "CREATE INDEX IF NOT EXISTS idx_users_referral_code ON users(referral_code)"
+            "CREATE INDEX IF NOT EXISTS idx_users_referral_code ON users(referral_code)",
+            "CREATE INDEX IF NOT EXISTS idx_broadcast_recipients_status ON broadcast_recipients(broadcast_id, status)",
+            "CREATE INDEX IF NOT EXISTS idx_user_changes_changed_at ON user_changes(changed_at)",
+            "CREATE INDEX IF NOT EXISTS idx_users_subscription_expiry ON users(subscription_expires_epoch) "
+            "WHERE subscription_status = 'premium'"
         ]
         
         for index_sql in indexes:
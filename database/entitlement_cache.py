@@ -0,0 +1,99 @@
+# database/entitlement_cache.py
+"""
+Кэш прав доступа: до какого момента у пользователя действует премиум.
+
+Для каждого chat_id хранится одно целое — время окончания подписки в
+секундах эпохи (0 — подписки нет), как в users.subscription_expires_epoch.
+Проверка «премиум ли сейчас» — сравнение с time.time(), без чтения users и
+без разбора дат; запись сама перестает давать премиум в момент окончания
+подписки.
+
+Запись сбрасывается в crud.update_user_subscription и
+PaymentService.activate_subscription; в других процессах-воркерах — по
+журналу изменений пользователей (services/scheduler.py).
+Доступность наборов считается битовыми масками уровня поверх этого значения
+(utils/subscription_helpers.py).
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import ENTITLEMENT_CACHE_SIZE
+
+
+def expires_at_epoch(expires_at: Optional[str]) -> int:
+    """ISO-дата окончания подписки (местное время) в секундах эпохи; 0 — нет даты."""
+    if not expires_at:
+        return 0
+    try:
+        return int(datetime.fromisoformat(expires_at).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def premium_until_epoch(status: Optional[str], expires_epoch: Optional[int]) -> int:
+    """Окончание премиума в секундах эпохи; 0 — не премиум или дата не задана."""
+    if status != "premium" or not expires_epoch:
+        return 0
+    return int(expires_epoch)
+
+
+class EntitlementCache:
+    """chat_id → окончание премиума (epoch); вытесняются давно не использованные."""
+
+    def __init__(self, max_users: int = ENTITLEMENT_CACHE_SIZE):
+        self.max_users = max_users
+        self._until: "OrderedDict[int, int]" = OrderedDict()
+        # chat_id, для которых идет чтение из БД → была ли инвалидация за это время
+        self._loading: Dict[int, bool] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> Optional[int]:
+        with self._lock:
+            until = self._until.get(chat_id)
+            if until is not None:
+                self._until.move_to_end(chat_id)
+            return until
+
+    def _put(self, chat_id: int, until: int) -> None:
+        self._until[chat_id] = until
+        self._until.move_to_end(chat_id)
+        while len(self._until) > self.max_users:
+            self._until.popitem(last=False)
+
+    def put_many(self, values: Dict[int, int]) -> None:
+        with self._lock:
+            for chat_id, until in values.items():
+                if chat_id not in self._loading:
+                    self._put(chat_id, until)
+
+    def begin_load(self, chat_id: int) -> None:
+        """Отмечает начало чтения из БД: инвалидация до finish_load отменит кэширование."""
+        with self._lock:
+            self._loading[chat_id] = False
+
+    def finish_load(self, chat_id: int, until: Optional[int]) -> None:
+        with self._lock:
+            changed = self._loading.pop(chat_id, True)
+            if until is not None and not changed:
+                self._put(chat_id, until)
+
+    def invalidate(self, chat_id: Optional[int] = None) -> None:
+        with self._lock:
+            if chat_id is None:
+                self._until.clear()
+                for loading in self._loading:
+                    self._loading[loading] = True
+            else:
+                if chat_id in self._loading:
+                    self._loading[chat_id] = True
+                self._until.pop(chat_id, None)
+
+    def __len__(self) -> int:
+        return len(self._until)
+
+
+# Глобальный кэш
+entitlement_cache = EntitlementCache()
@@ -0,0 +1,95 @@
+# database/learned_cache.py
+"""
+Ограниченный LRU-кэш нормализованных выученных слов по chat_id.
+
+Ключ слова — extract_english(word).lower(), как и во всех проверках
+«выучено ли слово». Множество строится один раз из БД, затем
+поддерживается на месте функциями crud.add_learned_word и
+crud.clear_learned_words_for_user — проверка принадлежности становится
+O(1) без повторного чтения таблицы и регулярного выражения на каждую строку.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional
+
+from config import LEARNED_WORDS_CACHE_SIZE
+from utils.visual_helpers import extract_english
+
+
+def normalize_word(word: str) -> str:
+    """Ключ выученного слова."""
+    return extract_english(word).lower()
+
+
+class LearnedWordsCache:
+    """chat_id → frozenset ключей; вытесняются давно не использованные пользователи."""
+
+    def __init__(self, max_users: int = LEARNED_WORDS_CACHE_SIZE):
+        self.max_users = max_users
+        self._sets: "OrderedDict[int, FrozenSet[str]]" = OrderedDict()
+        # chat_id, для которых идет чтение из БД → были ли изменения за это время
+        self._loading: Dict[int, bool] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> Optional[FrozenSet[str]]:
+        with self._lock:
+            words = self._sets.get(chat_id)
+            if words is not None:
+                self._sets.move_to_end(chat_id)
+            return words
+
+    def _put(self, chat_id: int, words: FrozenSet[str]) -> None:
+        self._sets[chat_id] = words
+        self._sets.move_to_end(chat_id)
+        while len(self._sets) > self.max_users:
+            self._sets.popitem(last=False)
+
+    def put(self, chat_id: int, words: FrozenSet[str]) -> None:
+        with self._lock:
+            self._put(chat_id, words)
+
+    def begin_load(self, chat_id: int) -> None:
+        """Отмечает начало чтения из БД: изменения до finish_load отменят кэширование."""
+        with self._lock:
+            self._loading[chat_id] = False
+
+    def finish_load(self, chat_id: int, words: Optional[FrozenSet[str]]) -> None:
+        """
+        Кэширует прочитанное, если за время чтения слова пользователя не менялись.
+        words=None — чтение не удалось, ничего не кэшируется.
+        """
+        with self._lock:
+            changed = self._loading.pop(chat_id, True)
+            if words is not None and not changed:
+                self._put(chat_id, words)
+
+    def _touch(self, chat_id: int) -> None:
+        if chat_id in self._loading:
+            self._loading[chat_id] = True
+
+    def add(self, chat_id: int, word: str) -> None:
+        """Добавляет слово, только если множество пользователя уже в кэше."""
+        key = normalize_word(word)
+        with self._lock:
+            self._touch(chat_id)
+            words = self._sets.get(chat_id)
+            if words is not None and key not in words:
+                self._sets[chat_id] = words | {key}
+
+    def invalidate(self, chat_id: Optional[int] = None) -> None:
+        with self._lock:
+            if chat_id is None:
+                self._sets.clear()
+                for loading in self._loading:
+                    self._loading[loading] = True
+            else:
+                self._touch(chat_id)
+                self._sets.pop(chat_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+
+# Глобальный кэш
+learned_words_cache = LearnedWordsCache()
@@ -0,0 +1,197 @@
+# database/plan_store.py
+"""
+Хранение планов «слов дня» в SQLite, чтобы они переживали перезапуск бота.
+
+PersistentDict — обычный dict в памяти (все существующие обращения вида
+cache[chat_id], chat_id in cache, del cache[chat_id] работают как раньше),
+каждая запись и удаление которого сразу сохраняются в таблицу. При
+обращении к ключу, которого нет в памяти, значение читается из БД
+(read-through); warm() загружает всю таблицу одним запросом при старте.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from database.db import db_manager
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class PlanStore:
+    """Таблица chat_id → JSON (схема создается в DatabaseManager.init_db)."""
+
+    def __init__(self, table: str, manager=None):
+        self.table = table
+        self._db = manager if manager is not None else db_manager
+
+    def load(self, chat_id: int) -> Optional[Any]:
+        with self._db.get_cursor() as cursor:
+            cursor.execute(f"SELECT payload FROM {self.table} WHERE chat_id = ?", (chat_id,))
+            row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_all(self) -> Dict[int, Any]:
+        with self._db.get_cursor() as cursor:
+            cursor.execute(f"SELECT chat_id, payload FROM {self.table}")
+            return {chat_id: json.loads(payload) for chat_id, payload in cursor.fetchall()}
+
+    def save(self, chat_id: int, value: Any, plan_date: Optional[str] = None) -> None:
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (chat_id, plan_date, payload) VALUES (?, ?, ?)",
+            (chat_id, plan_date, json.dumps(value, ensure_ascii=False)),
+            commit=True,
+        )
+
+    def save_many(self, rows: Iterable[tuple]) -> None:
+        """rows — (chat_id, value, plan_date); одной транзакцией."""
+        with self._db.transaction() as tx:
+            tx.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (chat_id, plan_date, payload) VALUES (?, ?, ?)",
+                [(chat_id, plan_date, json.dumps(value, ensure_ascii=False)) for chat_id, value, plan_date in rows],
+            )
+
+    def delete(self, chat_id: int) -> None:
+        self._db.execute(f"DELETE FROM {self.table} WHERE chat_id = ?", (chat_id,), commit=True)
+
+    def delete_many(self, chat_ids: Iterable[int]) -> None:
+        with self._db.transaction() as tx:
+            tx.executemany(f"DELETE FROM {self.table} WHERE chat_id = ?", [(chat_id,) for chat_id in chat_ids])
+
+    def clear(self) -> None:
+        self._db.execute(f"DELETE FROM {self.table}", commit=True)
+
+
+class PersistentDict(dict):
+    """
+    dict с записью в PlanStore.
+
+    decode — преобразование значения после чтения из JSON (например, tuple),
+    encode — обратное преобразование перед записью (по умолчанию значение как есть),
+    plan_date — функция, извлекающая дату плана из значения (для очистки SQL-запросом).
+    """
+
+    def __init__(self, store: PlanStore, decode: Callable[[Any], Any] = lambda value: value,
+                 plan_date: Optional[Callable[[Any], Optional[str]]] = None,
+                 encode: Callable[[Any], Any] = lambda value: value):
+        super().__init__()
+        self.store = store
+        self._decode = decode
+        self._encode = encode
+        self._plan_date = plan_date
+        self._absent = set()
+        self._complete = False
+
+    # ───────────────────────── загрузка ─────────────────────────
+    def warm(self) -> int:
+        """Загружает все сохраненные значения. После этого промахи не ходят в БД."""
+        try:
+            rows = self.store.load_all()
+        except Exception as e:
+            logger.error("Не удалось загрузить %s: %s", self.store.table, e)
+            return 0
+        for chat_id, value in rows.items():
+            dict.__setitem__(self, chat_id, self._decode(value))
+        self._absent.clear()
+        self._complete = True
+        return len(rows)
+
+    def _read_through(self, chat_id) -> Any:
+        if self._complete or chat_id in self._absent:
+            return _MISSING
+        try:
+            value = self.store.load(chat_id)
+        except Exception as e:
+            logger.error("Ошибка чтения %s для пользователя %s: %s", self.store.table, chat_id, e)
+            return _MISSING
+        if value is None:
+            self._absent.add(chat_id)
+            return _MISSING
+        value = self._decode(value)
+        dict.__setitem__(self, chat_id, value)
+        return value
+
+    # ───────────────────────── чтение ─────────────────────────
+    def __contains__(self, chat_id) -> bool:
+        return dict.__contains__(self, chat_id) or self._read_through(chat_id) is not _MISSING
+
+    def __missing__(self, chat_id):
+        value = self._read_through(chat_id)
+        if value is _MISSING:
+            raise KeyError(chat_id)
+        return value
+
+    def get(self, chat_id, default=None):
+        try:
+            return self[chat_id]
+        except KeyError:
+            return default
+
+    # ───────────────────────── запись ─────────────────────────
+    def __setitem__(self, chat_id, value) -> None:
+        dict.__setitem__(self, chat_id, value)
+        self._absent.discard(chat_id)
+        try:
+            plan_date = self._plan_date(value) if self._plan_date else None
+            self.store.save(chat_id, self._encode(value), plan_date)
+        except Exception as e:
+            logger.error("Не удалось сохранить %s для пользователя %s: %s", self.store.table, chat_id, e)
+
+    def __delitem__(self, chat_id) -> None:
+        # Значение может лежать только в БД
+        if not dict.__contains__(self, chat_id) and chat_id not in self:
+            raise KeyError(chat_id)
+        dict.__delitem__(self, chat_id)
+        self._absent.add(chat_id)
+        try:
+            self.store.delete(chat_id)
+        except Exception as e:
+            logger.error("Не удалось удалить %s для пользователя %s: %s", self.store.table, chat_id, e)
+
+    def pop(self, chat_id, default=_MISSING):
+        try:
+            value = self[chat_id]
+        except KeyError:
+            if default is _MISSING:
+                raise
+            return default
+        del self[chat_id]
+        return value
+
+    def update_many(self, values: Dict[int, Any]) -> None:
+        """Записывает несколько значений одной транзакцией."""
+        if not values:
+            return
+        for chat_id, value in values.items():
+            dict.__setitem__(self, chat_id, value)
+            self._absent.discard(chat_id)
+        try:
+            self.store.save_many(
+                (chat_id, self._encode(value), self._plan_date(value) if self._plan_date else None)
+                for chat_id, value in values.items()
+            )
+        except Exception as e:
+            logger.error("Не удалось сохранить записи %s: %s", self.store.table, e)
+
+    def discard_many(self, chat_ids: Iterable[int]) -> None:
+        """Удаляет несколько значений одной транзакцией."""
+        chat_ids = [chat_id for chat_id in chat_ids if dict.__contains__(self, chat_id)]
+        for chat_id in chat_ids:
+            dict.__delitem__(self, chat_id)
+            self._absent.add(chat_id)
+        if chat_ids:
+            try:
+                self.store.delete_many(chat_ids)
+            except Exception as e:
+                logger.error("Не удалось удалить записи %s: %s", self.store.table, e)
+
+    def clear(self) -> None:
+        dict.clear(self)
+        self._absent.clear()
+        self._complete = True
+        try:
+            self.store.clear()
+        except Exception as e:
+            logger.error("Не удалось очистить %s: %s", self.store.table, e)
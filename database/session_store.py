@@ -0,0 +1,354 @@
+# database/session_store.py
+"""
+Хранилища сессий тестов и обучения с временем жизни (TTL).
+
+Состояние тестов (handlers/quiz.py) и обучения (handlers/learning.py)
+раньше лежало в обычных dict без срока жизни: брошенные тесты копились в
+памяти до перезапуска, а перезапуск обрывал все идущие тесты.
+
+Оба хранилища ведут себя как dict (store[key], key in store, get, pop,
+del, clear), поэтому обработчики работают с ними как раньше:
+
+* MemorySessionStore — LRU в памяти: не больше max_entries записей,
+  запись, не обновлявшаяся дольше ttl, удаляется;
+* SqliteSessionStore — тот же LRU поверх таблицы sessions: записи
+  копятся в памяти и сбрасываются фоновым потоком (session_writer) одной
+  транзакцией раз в WRITE_BUFFER_FLUSH_MS, промах читается из БД, поэтому
+  сессии переживают перезапуск. Обработчики в цикле событий в БД не пишут.
+
+По умолчанию (SESSION_BACKEND=memory) используется MemorySessionStore.
+
+В БД значения хранятся в JSON: кроме типов JSON поддерживаются set и
+dataclass-классы, отмеченные register_session_type. Ключи вложенных dict
+становятся строками, кортежи — списками.
+
+Значения, измененные на месте (state["current"] += 1), нужно записать
+обратно (store[key] = state), иначе SQLite-хранилище их не сохранит.
+
+    quiz_states = create_session_store("quiz_states")
+"""
+
+import atexit
+import dataclasses
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import SESSION_BACKEND, SESSION_TTL, SESSION_MAX_ENTRIES, WRITE_BUFFER_FLUSH_MS
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Все созданные хранилища — для периодической очистки истекших записей
+_stores: List["MemorySessionStore"] = []
+
+# dataclass-классы, которые можно хранить в SqliteSessionStore
+_session_types: Dict[str, type] = {}
+
+
+def register_session_type(cls: type) -> type:
+    """Декоратор dataclass-класса, значения которого хранятся в сессиях."""
+    _session_types[cls.__name__] = cls
+    return cls
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": list(value)}
+    if dataclasses.is_dataclass(value) and _session_types.get(type(value).__name__) is type(value):
+        return {
+            "__dataclass__": type(value).__name__,
+            "fields": {f.name: getattr(value, f.name) for f in dataclasses.fields(value)},
+        }
+    raise TypeError(f"Значение типа {type(value).__name__} нельзя сохранить в сессии")
+
+
+def _decode(obj: dict) -> Any:
+    if "__set__" in obj:
+        return set(obj["__set__"])
+    if "__dataclass__" in obj:
+        return _session_types[obj["__dataclass__"]](**obj["fields"])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_encode, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data) -> Any:
+    return json.loads(data, object_hook=_decode)
+
+
+class MemorySessionStore:
+    """LRU-словарь в памяти с временем жизни записей."""
+
+    def __init__(self, namespace: str, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.time):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._items: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.RLock()
+
+    # ───────────────────────── хранилище (переопределяется) ─────────────────────────
+    def _load(self, key) -> Any:
+        return _MISSING
+
+    def _save(self, key, value, expires_at: float) -> None:
+        pass
+
+    def _delete(self, key) -> None:
+        pass
+
+    def _clear(self) -> None:
+        pass
+
+    def _expire(self, now: float) -> int:
+        return 0
+
+    # ───────────────────────── память ─────────────────────────
+    def _lookup(self, key) -> Any:
+        now = self._clock()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if item[0] > now:
+                    self._items.move_to_end(key)
+                    return item[1]
+                del self._items[key]
+        value = self._load(key)
+        if value is not _MISSING:
+            with self._lock:
+                self._put(key, value, now + self.ttl)
+        return value
+
+    def _put(self, key, value, expires_at: float) -> None:
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        # Из памяти вытесняется самая давняя сессия; в SQLite она остается до истечения TTL
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    # ───────────────────────── интерфейс dict ─────────────────────────
+    def __contains__(self, key) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __setitem__(self, key, value) -> None:
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._put(key, value, expires_at)
+        try:
+            self._save(key, value, expires_at)
+        except Exception as e:
+            logger.error("Не удалось сохранить сессию %s/%s: %s", self.namespace, key, e)
+
+    def __delitem__(self, key) -> None:
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def pop(self, key, default=_MISSING):
+        value = self._lookup(key)
+        if value is not _MISSING:
+            with self._lock:
+                self._items.pop(key, None)
+            try:
+                self._delete(key)
+            except Exception as e:
+                logger.error("Не удалось удалить сессию %s/%s: %s", self.namespace, key, e)
+            return value
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+        try:
+            self._clear()
+        except Exception as e:
+            logger.error("Не удалось очистить сессии %s: %s", self.namespace, e)
+
+    def __len__(self) -> int:
+        """Число сессий в памяти процесса."""
+        return len(self._items)
+
+    def expire(self) -> int:
+        """Удаляет истекшие записи, возвращает их число."""
+        now = self._clock()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._items.items() if expires_at <= now]
+            for key in expired:
+                del self._items[key]
+        try:
+            return max(len(expired), self._expire(now))
+        except Exception as e:
+            logger.error("Ошибка очистки сессий %s: %s", self.namespace, e)
+            return len(expired)
+
+
+class SqliteSessionStore(MemorySessionStore):
+    """LRU в памяти с отложенной записью в таблицу sessions (схема — в DatabaseManager.init_db)."""
+
+    def __init__(self, namespace: str, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.time, manager=None):
+        super().__init__(namespace, ttl, max_entries, clock)
+        if manager is None:
+            from database.db import db_manager as manager
+        self._db = manager
+        # key -> (JSON, expires_at) или None (удалить); снимок, который записывается сейчас
+        self._pending: Dict[str, Optional[Tuple[str, float]]] = {}
+        self._inflight: Dict[str, Optional[Tuple[str, float]]] = {}
+        self._flush_lock = threading.Lock()
+
+    def _load(self, key) -> Any:
+        with self._lock:
+            for source in (self._pending, self._inflight):
+                if str(key) in source:
+                    entry = source[str(key)]
+                    if entry is None or entry[1] <= self._clock():
+                        return _MISSING
+                    return loads(entry[0])
+        try:
+            with self._db.get_cursor() as cursor:
+                cursor.execute(
+                    "SELECT value FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (self.namespace, str(key), self._clock()),
+                )
+                row = cursor.fetchone()
+            return loads(row[0]) if row else _MISSING
+        except Exception as e:
+            logger.error("Ошибка чтения сессии %s/%s: %s", self.namespace, key, e)
+            return _MISSING
+
+    def _save(self, key, value, expires_at: float) -> None:
+        data = dumps(value)
+        with self._lock:
+            self._pending[str(key)] = (data, expires_at)
+        session_writer.start()
+
+    def _delete(self, key) -> None:
+        with self._lock:
+            self._pending[str(key)] = None
+        session_writer.start()
+
+    def _clear(self) -> None:
+        # Ждем идущий сброс, чтобы он не записал сессии после очистки
+        with self._flush_lock:
+            with self._lock:
+                self._pending.clear()
+            self._db.execute("DELETE FROM sessions WHERE namespace = ?", (self.namespace,), commit=True)
+
+    def _expire(self, now: float) -> int:
+        cursor = self._db.execute(
+            "DELETE FROM sessions WHERE namespace = ? AND expires_at <= ?", (self.namespace, now), commit=True
+        )
+        return cursor.rowcount
+
+    def flush(self) -> int:
+        """Записывает накопленные изменения одной транзакцией. Возвращает число строк."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+            upserts = [(self.namespace, key, entry[0], entry[1])
+                       for key, entry in self._inflight.items() if entry is not None]
+            deletes = [(self.namespace, key) for key, entry in self._inflight.items() if entry is None]
+            try:
+                with self._db.transaction() as tx:
+                    if upserts:
+                        tx.executemany(
+                            "INSERT OR REPLACE INTO sessions (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                            upserts,
+                        )
+                    if deletes:
+                        tx.executemany("DELETE FROM sessions WHERE namespace = ? AND key = ?", deletes)
+            except Exception as e:
+                logger.error("Ошибка записи сессий %s (%d строк), повтор позже: %s",
+                             self.namespace, len(self._inflight), e)
+                with self._lock:
+                    # Изменения, пришедшие во время записи, новее
+                    for key, entry in self._inflight.items():
+                        self._pending.setdefault(key, entry)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = {}
+        return len(upserts) + len(deletes)
+
+
+class _SessionWriter:
+    """Фоновый поток, сбрасывающий отложенные записи всех SQLite-хранилищ."""
+
+    def __init__(self, flush_interval_ms: int = WRITE_BUFFER_FLUSH_MS):
+        self.flush_interval = flush_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def flush(self) -> int:
+        return sum(store.flush() for store in list(_stores) if isinstance(store, SqliteSessionStore))
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def start(self) -> None:
+        """Запускает поток (вызывается автоматически при первой записи)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Останавливает поток и записывает остаток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+            atexit.unregister(self.stop)
+        self.flush()
+
+
+# Глобальный поток записи сессий
+session_writer = _SessionWriter()
+
+
+def create_session_store(namespace: str, ttl: float = SESSION_TTL,
+                         backend: str = SESSION_BACKEND) -> MemorySessionStore:
+    """Хранилище сессий выбранного в конфигурации типа (SESSION_BACKEND)."""
+    if backend == "sqlite":
+        store = SqliteSessionStore(namespace, ttl)
+    else:
+        store = MemorySessionStore(namespace, ttl)
+    _stores.append(store)
+    return store
+
+
+def expire_sessions() -> int:
+    """Очищает истекшие сессии во всех хранилищах (вызывается планировщиком)."""
+    removed = sum(store.expire() for store in _stores)
+    if removed:
+        logger.info("Удалено истекших сессий: %d", removed)
+    return removed
@@ -0,0 +1,133 @@
+# database/write_buffer.py
+"""
+Буфер отложенной записи (write-behind) для частых мелких изменений —
+выученных слов после правильных ответов.
+
+Вместо отдельной транзакции на каждый правильный ответ изменения
+копятся в памяти (повторы схлопываются) и сбрасываются одной транзакцией
+через executemany — раз в WRITE_BUFFER_FLUSH_MS или при накоплении
+WRITE_BUFFER_MAX_ROWS строк. Чтения в crud накладывают несброшенные
+изменения поверх БД, поэтому пользователь сразу видит свои слова.
+"""
+
+import atexit
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config import WRITE_BUFFER_FLUSH_MS, WRITE_BUFFER_MAX_ROWS
+from database.db import db_manager
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Потокобезопасный буфер с фоновым потоком сброса."""
+
+    def __init__(self, flush_interval_ms: int = WRITE_BUFFER_FLUSH_MS,
+                 max_rows: int = WRITE_BUFFER_MAX_ROWS):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        # (chat_id, word) -> (chat_id, word, translation, learned_date)
+        self._learned: Dict[Tuple[int, str], Tuple[int, str, str, str]] = {}
+        # Снимок, который сейчас записывается (виден читателям до коммита)
+        self._inflight_learned: Dict[Tuple[int, str], Tuple[int, str, str, str]] = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ───────────────────────── запись ─────────────────────────
+    def add_learned_word(self, chat_id: int, word: str, translation: str, learned_date: str) -> None:
+        with self._lock:
+            self._learned.setdefault((chat_id, word), (chat_id, word, translation, learned_date))
+            self._after_write()
+
+    def _after_write(self) -> None:
+        if self._thread is None:
+            self.start()
+        if len(self._learned) >= self.max_rows:
+            self._wakeup.set()
+
+    def discard(self, chat_id: int) -> None:
+        """Отбрасывает несброшенные слова пользователя (перед прямой записью в БД)."""
+        # Ждем идущий сброс, чтобы он не записал отброшенное после прямой записи
+        with self._flush_lock, self._lock:
+            for key in [key for key in self._learned if key[0] == chat_id]:
+                del self._learned[key]
+
+    # ───────────────────────── чтение ─────────────────────────
+    def pending_learned_words(self, chat_id: int) -> List[Tuple[str, str]]:
+        """Несброшенные слова пользователя в формате get_learned_words: (word, translation)."""
+        with self._lock:
+            return [
+                (word, translation)
+                for source in (self._inflight_learned, self._learned)
+                for (pending_chat, _), (_, word, translation, _) in source.items()
+                if pending_chat == chat_id
+            ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._learned)
+
+    # ───────────────────────── сброс ─────────────────────────
+    def flush(self) -> int:
+        """Записывает накопленное одной транзакцией. Возвращает число строк."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._learned:
+                    return 0
+                self._inflight_learned, self._learned = self._learned, {}
+            learned = list(self._inflight_learned.values())
+            try:
+                with db_manager.transaction() as tx:
+                    tx.executemany(
+                        "INSERT OR IGNORE INTO learned_words (chat_id, word, translation, learned_date) "
+                        "VALUES (?, ?, ?, ?)",
+                        learned,
+                    )
+            except Exception as e:
+                logger.error("Ошибка сброса буфера записи (%d строк), повтор позже: %s", len(learned), e)
+                with self._lock:
+                    # Новые изменения, пришедшие во время сброса, важнее
+                    for key, row in self._inflight_learned.items():
+                        self._learned.setdefault(key, row)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight_learned = {}
+        logger.debug("Буфер записи сброшен: %d слов", len(learned))
+        return len(learned)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> None:
+        """Запускает фоновый поток сброса (вызывается автоматически при первой записи)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Останавливает фоновый поток и сбрасывает остаток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            self._wakeup.set()
+            thread.join()
+            atexit.unregister(self.stop)
+        self.flush()
+
+
+# Глобальный буфер
+write_buffer = WriteBehindBuffer()
@@ -8,7 +8,7 @@ from aiogram import Bot, Dispatcher, types
 from aiogram.types import BotCommand, MenuButtonCommands
 
 from config import DEFAULT_SETS
-from database import crud
+from database import async_crud
 from keyboards.main_menu import main_menu_keyboard
 from keyboards.reply_keyboards import get_main_menu_keyboard
 from utils.helpers import get_daily_words_for_user
@@ -69,7 +69,7 @@ async def cmd_start(message: types.Message, bot: Bot) -> None:
             if start_param.startswith("ref_"):
                 try:
                     referral_code = start_param[4:]  # Убираем "ref_"
-                    referrer = crud.get_user_by_referral_code(referral_code)
+                    referrer = await async_crud.get_user_by_referral_code(referral_code)
                     if referrer:
                         referrer_id = referrer[0]  # chat_id реферера
                         logger.info(f"User {chat_id} came via referral from {referrer_id}")
@@ -77,20 +77,20 @@ async def cmd_start(message: types.Message, bot: Bot) -> None:
                     logger.error(f"Error processing referral link: {e}")
         
         # ─── регистрация нового пользователя ───────────────────────────────
-        is_new_user = not crud.get_user(chat_id)
+        is_new_user = not await async_crud.get_user(chat_id)
         if is_new_user:
-            crud.add_user(chat_id)
+            await async_crud.add_user(chat_id)
             logger.info("Создан новый пользователь %s", chat_id)
 
             # Устанавливаем реферальный код для нового пользователя
-            crud.set_user_referral_code(chat_id)
+            await async_crud.set_user_referral_code(chat_id)
 
             # Обрабатываем реферальную ссылку
             if referrer_id and referrer_id != chat_id:
-                if crud.add_referral(referrer_id, chat_id):
+                if await async_crud.add_referral(referrer_id, chat_id):
                     # Уведомляем реферера о новом друге
                     try:
-                        referrals_count = crud.count_user_referrals(referrer_id)
+                        referrals_count = await async_crud.count_user_referrals(referrer_id)
                         await bot.send_message(
                             referrer_id,
                             f"🎉 По вашей ссылке присоединился новый друг!\n"
@@ -99,7 +99,7 @@ async def cmd_start(message: types.Message, bot: Bot) -> None:
                         )
                         
                         # Проверяем и обрабатываем награды
-                        if crud.process_referral_rewards(referrer_id):
+                        if await async_crud.process_referral_rewards(referrer_id):
                             await bot.send_message(
                                 referrer_id,
                                 "💎 Ваша Premium подписка активирована за приглашение 5 друзей!"
@@ -109,7 +109,7 @@ async def cmd_start(message: types.Message, bot: Bot) -> None:
 
             default_set = DEFAULT_SETS.get("A1")
             if default_set:
-                crud.update_user_chosen_set(chat_id, default_set)
+                await async_crud.update_user_chosen_set(chat_id, default_set)
                 from handlers.settings import user_set_selection
                 user_set_selection[chat_id] = default_set
                 logger.info("Базовый сет %s назначен пользователю %s", default_set, chat_id)
@@ -119,6 +119,9 @@ async def cmd_start(message: types.Message, bot: Bot) -> None:
             await start_onboarding(message, bot)
             return
 
+        # Мог ранее заблокировать бота — снова получает рассылки
+        await async_crud.mark_user_reachable(chat_id)
+
         # ─── приветственное сообщение + главное меню ───────────────────────
         await message.answer(
             "👋 *Добро пожаловать обратно!*\n\n"
@@ -149,7 +152,7 @@ async def cmd_words(message: types.Message, bot: Bot) -> None:
     # Проверяем активные платежи пользователя
     await check_user_payments(chat_id, bot)
     
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     
     if not user:
         await message.answer("⚠️ Профиль не найден. Используйте /start.", parse_mode="Markdown")
@@ -160,10 +163,11 @@ async def cmd_words(message: types.Message, bot: Bot) -> None:
     from utils.helpers import get_user_settings, daily_words_cache
     from utils.visual_helpers import format_daily_words_message, truncate_daily_words_message
     
-    words, reps = get_user_settings(chat_id)
+    words, reps = await async_crud.run_db(get_user_settings, chat_id)
     chosen_set = user[6] if len(user) > 6 else DEFAULT_SETS.get(user[1])
     
-    result = get_daily_words_for_user(
+    result = await async_crud.run_db(
+        get_daily_words_for_user,
         chat_id, user[1], words, reps,
         first_time=REMINDER_START, duration_hours=DURATION_HOURS
     )
@@ -209,10 +213,9 @@ async def cmd_words(message: types.Message, bot: Bot) -> None:
     if len(formatted_message) > 4000:
         # Получаем уникальные слова из кэша
         unique_words = []
-        if chat_id in daily_words_cache:
-            entry = daily_words_cache[chat_id]
-            if len(entry) > 8 and entry[8]:
-                unique_words = entry[8]
+        entry = await async_crud.run_db(daily_words_cache.get, chat_id)
+        if entry and entry.words:
+            unique_words = list(entry.words)
         
         # Если не можем получить уникальные слова из кэша, используемmessages
         if not unique_words:
@@ -236,18 +239,17 @@ async def cmd_quiz(message: types.Message, bot: Bot) -> None:
     # Проверяем активные платежи пользователя
     await check_user_payments(chat_id, bot)
     
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     
     if not user:
         await message.answer("⚠️ Профиль не найден. Используйте /start.", parse_mode="Markdown")
         return
     
     # Инициализируем тест напрямую
-    from config import DURATION_HOURS, REMINDER_START
+    from config import DURATION_HOURS, REMINDER_START, QUIZ_SIMILAR_LENGTH_DISTRACTORS
     from handlers.quiz import quiz_states, poll_to_user, poll_to_index, nav_messages
     from utils.helpers import daily_words_cache, get_daily_words_for_user
-    from utils.quiz_helpers import load_quiz_data
-    from utils.quiz_utils import generate_quiz_options
+    from utils.quiz_helpers import get_distractor_index
     from utils.visual_helpers import extract_english
     
     level = user[1]
@@ -258,29 +260,30 @@ async def cmd_quiz(message: types.Message, bot: Bot) -> None:
     except ImportError:
         chosen_set = None
 
-    learned = {extract_english(w[0]).lower() for w in crud.get_learned_words(chat_id)}
+    learned = await async_crud.get_learned_word_set(chat_id)
 
     # Получаем слова дня
-    get_daily_words_for_user(
+    await async_crud.run_db(
+        get_daily_words_for_user,
         chat_id, level, user[2], user[3],
         first_time=REMINDER_START, duration_hours=DURATION_HOURS,
         chosen_set=chosen_set,
     )
-    entry = daily_words_cache.get(chat_id)
+    entry = await async_crud.run_db(daily_words_cache.get, chat_id)
     if not entry:
         await message.answer("⚠️ Нет слов для теста.")
         return
 
     # Используем уникальные слова из кэша
-    if len(entry) > 8 and entry[8]:
-        unique_words = entry[8]
+    if entry.words:
+        unique_words = list(entry.words)
     else:
         raw = [m.replace("🔹 ", "").strip() for m in entry[1]]
         if raw and raw[0].startswith(("🎓", "⚠️")):
             raw.pop(0)
         unique_words = raw
 
-    revision = bool(len(entry) > 9 and entry[9])
+    revision = entry.is_revision
     source = unique_words if revision else [w for w in unique_words if extract_english(w).lower() not in learned]
     
     if not source:
@@ -288,13 +291,12 @@ async def cmd_quiz(message: types.Message, bot: Bot) -> None:
         return
 
     # Подготовка вопросов для теста
-    quiz_data = load_quiz_data(level, chosen_set)
-    if not quiz_data:
+    index = get_distractor_index(level, chosen_set)
+    if index is None:
         await message.answer("⚠️ Не удалось создать вопросы.")
         return
         
-    mapping = {item["word"].lower(): item["translation"] for item in quiz_data}
-    all_trans = [item["translation"] for item in quiz_data]
+    mapping = index.mapping
     questions = []
     
     for src in source:
@@ -302,7 +304,7 @@ async def cmd_quiz(message: types.Message, bot: Bot) -> None:
         correct = mapping.get(key) or mapping.get(src.lower())
         if not correct:
             continue
-        opts, idx = generate_quiz_options(correct, all_trans, 4)
+        opts, idx = index.options(correct, 4, QUIZ_SIMILAR_LENGTH_DISTRACTORS)
         questions.append({
             "word": src,
             "correct": correct,
@@ -338,7 +340,7 @@ async def cmd_dictionary(message: types.Message, bot: Bot) -> None:
     await check_user_payments(chat_id, bot)
     
     # Получаем выученные слова напрямую
-    learned = crud.get_learned_words(chat_id)
+    learned = await async_crud.get_learned_words(chat_id)
     
     from utils.visual_helpers import format_dictionary_message
     from keyboards.submenus import dictionary_menu_keyboard
@@ -12,7 +12,7 @@ from functools import partial
 
 from aiogram import Bot, Dispatcher, types
 
-from database import crud
+from database import async_crud
 from keyboards.submenus import dictionary_menu_keyboard, clear_dictionary_confirm_keyboard
 from keyboards.reply_keyboards import get_main_menu_keyboard
 from utils.sticker_helper import send_sticker_with_menu, get_clean_sticker
@@ -24,7 +24,7 @@ logger = logging.getLogger(__name__)
 async def show_dictionary(callback: types.CallbackQuery, bot: Bot):
     """Показывает выученные слова или сообщение о пустом словаре."""
     chat_id = callback.from_user.id
-    learned = crud.get_learned_words(chat_id)
+    learned = await async_crud.get_learned_words(chat_id)
 
     if not learned:
         text = (
@@ -57,7 +57,7 @@ async def clear_dictionary(callback: types.CallbackQuery, bot: Bot):
     """Очищает словарь пользователя и показывает главное меню."""
     chat_id = callback.from_user.id
     try:
-        crud.clear_learned_words_for_user(chat_id)
+        await async_crud.clear_learned_words_for_user(chat_id)
         # Удаляем отправку стикера
         # await send_sticker_with_menu(chat_id, bot, get_clean_sticker())
         await bot.send_message(
@@ -17,18 +17,20 @@ from typing import Any, Dict, List
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Poll, PollAnswer
 
-from config import DEFAULT_SETS, LEVELS_DIR
-from database import crud
+from config import DEFAULT_SETS, LEVELS_DIR, QUIZ_SIMILAR_LENGTH_DISTRACTORS
+from database import async_crud, crud
+from database.session_store import create_session_store, register_session_type
 from keyboards.main_menu import main_menu_keyboard
 from keyboards.submenus import (
     learning_menu_keyboard,
     learning_settings_keyboard,  # базовый: две кнопки «Настройки теста/заучивания» + «Назад»
 )
 from utils.helpers import extract_english
-from utils.quiz_helpers import load_quiz_data
-from utils.quiz_utils import generate_quiz_options
+from utils.quiz_helpers import get_distractor_index
+from utils.quiz_utils import DistractorIndex
 from utils.sticker_helper import get_congratulation_sticker, send_sticker_with_menu
 from utils.visual_helpers import format_progress_bar
+from utils.word_catalog import word_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -54,15 +56,10 @@ def _get_user_val(user: tuple, idx: int, default: Any) -> Any:
 
 
 def _read_set_words(level: str, name: str) -> List[str]:
-    file = Path(LEVELS_DIR) / level / f"{name}.txt"
-    if not file.exists():
-        raise FileNotFoundError(file)
-    for enc in ("utf-8", "cp1251", "latin-1", "iso-8859-1"):
-        try:
-            return [ln.strip() for ln in file.read_text(enc).splitlines() if ln.strip()]
-        except UnicodeDecodeError:
-            continue
-    raise UnicodeDecodeError(f"Can't decode {file}")
+    word_set = word_catalog.get_set(level, name)
+    if word_set is None:
+        raise FileNotFoundError(Path(LEVELS_DIR) / level / f"{name}.txt")
+    return list(word_set.lines)
 
 
 def _make_nav(prefix: str) -> InlineKeyboardMarkup:
@@ -75,6 +72,7 @@ def _make_nav(prefix: str) -> InlineKeyboardMarkup:
 
 
 # ────────────────────────── состояние сессий ────────────────────────────────
+@register_session_type
 @dataclass
 class LearningState:
     questions: List[Dict[str, Any]]
@@ -84,12 +82,14 @@ class LearningState:
     answered: set[int] = field(default_factory=set)
 
 
-states: Dict[int, LearningState] = {}
+# с TTL, с SESSION_BACKEND=sqlite переживают перезапуск (database/session_store.py);
+# измененное состояние записывается обратно: states[chat] = st
+states = create_session_store("learning_states")  # chat → LearningState
 
 # таблицы именно для «learning»
-lpoll2user: Dict[str, int] = {}
-lpoll2idx: Dict[str, int] = {}
-lnav_msgs: Dict[int, int] = {}
+lpoll2user = create_session_store("learning_poll_user")
+lpoll2idx = create_session_store("learning_poll_index")
+lnav_msgs = create_session_store("learning_nav")
 
 # ────────────────────────── keyboards dynamic ──────────────────────────────
 def _number_keyboard(prefix: str, current: int) -> InlineKeyboardMarkup:
@@ -106,7 +106,7 @@ def _number_keyboard(prefix: str, current: int) -> InlineKeyboardMarkup:
 def _make_question_list(
     words: List[str],
     translations_map: Dict[str, str],
-    all_trans: List[str],
+    distractors: DistractorIndex,
     revision_flags: Dict[str, bool],
 ) -> List[Dict[str, Any]]:
     res: List[Dict[str, Any]] = []
@@ -122,7 +122,7 @@ def _make_question_list(
             logger.warning("Learning: skip word '%s' (no translation)", src)
             continue
         rus = rus.strip()
-        opts, _ = generate_quiz_options(rus, all_trans, 4)
+        opts, _ = distractors.options(rus, 4, QUIZ_SIMILAR_LENGTH_DISTRACTORS)
         opts = [o.strip() for o in opts]
         if rus not in opts:
             opts[0] = rus
@@ -151,10 +151,8 @@ def build_dict_test(chat: int, user: tuple) -> List[Dict[str, Any]]:
                 set_level_mismatch = True
                 break
         
-        # Проверяем существование файла для текущего уровня
-        from pathlib import Path
-        set_file_path = Path(LEVELS_DIR) / level / f"{chosen_set}.txt"
-        if not set_file_path.exists():
+        # Проверяем существование набора для текущего уровня
+        if not word_catalog.has_set(level, chosen_set):
             set_level_mismatch = True
         
         if set_level_mismatch:
@@ -167,12 +165,12 @@ def build_dict_test(chat: int, user: tuple) -> List[Dict[str, Any]]:
     cnt = min(_get_user_val(user, 7, 5), len(learned))
     sample = random.sample(learned, cnt)
     level, chosen_set = user[1], _get_user_val(user, 6, None)
-    quiz_data = load_quiz_data(level, chosen_set)
-    all_tr = [d["translation"].strip() for d in quiz_data]
+    # Без набора варианты добиваются «???», как раньше
+    index = get_distractor_index(level, chosen_set) or DistractorIndex(())
     return _make_question_list(
         [w for w, _ in sample],
         {w.lower(): t.strip() for w, t in sample},
-        all_tr,
+        index,
         {extract_english(w).lower(): True for w, _ in sample},
     )
 
@@ -189,10 +187,8 @@ def build_memorize(chat: int, user: tuple) -> List[Dict[str, Any]]:
                 set_level_mismatch = True
                 break
         
-        # Проверяем существование файла для текущего уровня
-        from pathlib import Path
-        set_file_path = Path(LEVELS_DIR) / level / f"{chosen_set}.txt"
-        if not set_file_path.exists():
+        # Проверяем существование набора для текущего уровня
+        if not word_catalog.has_set(level, chosen_set):
             set_level_mismatch = True
         
         if set_level_mismatch:
@@ -207,12 +203,10 @@ def build_memorize(chat: int, user: tuple) -> List[Dict[str, Any]]:
     
     cnt = min(_get_user_val(user, 8, 5), len(words))
     sample = random.sample(words, cnt)
-    quiz_data = load_quiz_data(level, chosen_set)
-    translations = {d["word"].lower(): d["translation"].strip() for d in quiz_data}
-    all_tr = [d["translation"].strip() for d in quiz_data]
-    learned = {extract_english(w[0]).lower() for w in crud.get_learned_words(chat)}
+    index = get_distractor_index(level, chosen_set) or DistractorIndex(())
+    learned = crud.get_learned_word_set(chat)
     return _make_question_list(
-        sample, translations, all_tr, {w: w in learned for w in translations}
+        sample, index.mapping, index, {w: w in learned for w in index.mapping}
     )
 
 
@@ -292,6 +286,7 @@ async def poll_answer_handler(ans: PollAnswer):
     if qidx in st.answered:
         return
     st.answered.add(qidx)
+    states[chat] = st
     q = st.questions[qidx]
     chosen_idx = ans.option_ids[0] if ans.option_ids else None
     chosen_txt = q["options"][chosen_idx] if chosen_idx is not None else None
@@ -304,6 +299,7 @@ async def poll_answer_handler(ans: PollAnswer):
         st.correct += 1
         await bot.send_message(chat, "✅ Верно!")
         st.current += 1
+        states[chat] = st
         await _send_question(chat, bot)
     else:
         await bot.send_message(chat, f"❌ Неверно. Правильный ответ: {q['correct']}")
@@ -322,13 +318,13 @@ async def _update_user_setting(chat: int, field: str, value: int):
     """Обновляем поле в БД (7 – test_words, 8 – memorize_words)."""
     try:
         if field == "test":
-            crud.set_test_words(chat, value)
+            await async_crud.set_test_words(chat, value)
         else:
-            crud.set_memorize_words(chat, value)
+            await async_crud.set_memorize_words(chat, value)
         logger.info("Learning: update %s_words → %d (chat=%s)", field, value, chat)
     except AttributeError:
         idx = 7 if field == "test" else 8
-        crud.update_user_field(chat, idx, value)
+        await async_crud.update_user_field(chat, idx, value)
         logger.info("Learning: fallback update field idx=%d value=%d", idx, value)
     except Exception as e:
         logger.error("Learning: cannot update setting (%s_words=%d) – %s", field, value, e)
@@ -338,7 +334,7 @@ async def _update_user_setting(chat: int, field: str, value: int):
 async def handle_learning_settings(cb: types.CallbackQuery, bot: Bot):
     chat = cb.from_user.id
     data = cb.data
-    user = crud.get_user(chat)
+    user = await async_crud.get_user(chat)
     if not user:
         return await cb.answer("Профиль не найден", show_alert=True)
 
@@ -388,11 +384,12 @@ async def handle_learning_settings(cb: types.CallbackQuery, bot: Bot):
 async def _start(cb: types.CallbackQuery, bot: Bot, builder):
     """Запускает режим обучения с проверкой соответствия уровня и набора."""
     chat = cb.from_user.id
-    user = crud.get_user(chat)
+    user = await async_crud.get_user(chat)
     if not user:
         return await cb.answer("Профиль не найден.", show_alert=True)
     
-    qs = builder(chat, user)
+    # Сборка вопросов читает выученные слова — выполняем в потоке БД
+    qs = await async_crud.run_db(builder, chat, user)
     if not qs:
         # ИСПРАВЛЕНИЕ: Показываем специальное сообщение при блокировке
         level = user[1]
@@ -406,7 +403,7 @@ async def _start(cb: types.CallbackQuery, bot: Bot, builder):
                     set_level_mismatch = True
                     break
             
-            if set_level_mismatch or not os.path.exists(os.path.join(LEVELS_DIR, level, f"{chosen_set}.txt")):
+            if set_level_mismatch or not word_catalog.has_set(level, chosen_set):
                 default_set = DEFAULT_SETS.get(level, "")
                 from keyboards.submenus import set_change_confirm_keyboard
                 
@@ -496,6 +493,7 @@ async def nav_callback(cb: types.CallbackQuery, bot: Bot):
     if action == "skip":
         # пропустить вопрос
         st.current += 1
+        states[chat] = st
         await cb.answer("Вопрос пропущен")
         await _send_question(chat, bot)
     elif action == "back":
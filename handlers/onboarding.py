@@ -3,7 +3,7 @@ import logging
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from database import crud
+from database import async_crud
 from config import REMINDER_START, DURATION_HOURS, DEFAULT_SETS
 from utils.helpers import get_daily_words_for_user, reset_daily_words_cache
 from keyboards.main_menu import main_menu_keyboard
@@ -98,12 +98,12 @@ async def process_onboarding(callback: types.CallbackQuery, bot: Bot):
         state["step"] = "words"
         
         # Сохраняем уровень в БД
-        crud.update_user_level(chat_id, level)
+        await async_crud.update_user_level(chat_id, level)
         
         # Также устанавливаем набор слов по умолчанию для выбранного уровня
         default_set = DEFAULT_SETS.get(level)
         if default_set:
-            crud.update_user_chosen_set(chat_id, default_set)
+            await async_crud.update_user_chosen_set(chat_id, default_set)
             # Обновляем кэш выбранных сетов, если он используется
             try:
                 from handlers.settings import user_set_selection
@@ -126,7 +126,7 @@ async def process_onboarding(callback: types.CallbackQuery, bot: Bot):
         state["step"] = "reps"
         
         # Сохраняем количество слов в БД
-        crud.update_user_words_per_day(chat_id, words)
+        await async_crud.update_user_words_per_day(chat_id, words)
         
         await callback.message.edit_text(
             f"Вы будете изучать {words} новых слов в день.\n\n"
@@ -143,14 +143,14 @@ async def process_onboarding(callback: types.CallbackQuery, bot: Bot):
         state["step"] = "finished"
         
         # Сохраняем количество повторений в БД
-        crud.update_user_notifications(chat_id, reps)
+        await async_crud.update_user_notifications(chat_id, reps)
         
         # Получаем данные из состояния
         level = state["level"]
         words = state["words"]
         
         # Сбрасываем кэш слов дня
-        reset_daily_words_cache(chat_id)
+        await async_crud.run_db(reset_daily_words_cache, chat_id)
         
         # Отправляем завершающее сообщение
         await callback.message.edit_text(
@@ -180,10 +180,11 @@ async def send_first_words(chat_id, level, words_count, repetitions, bot):
     # Получаем первые слова дня
     try:
         # Получаем информацию о выбранном наборе слов
-        user = crud.get_user(chat_id)
+        user = await async_crud.get_user(chat_id)
         chosen_set = user[6] if user and len(user) > 6 else DEFAULT_SETS.get(level)
         
-        result = get_daily_words_for_user(
+        result = await async_crud.run_db(
+            get_daily_words_for_user,
             chat_id, level, words_count, repetitions,
             first_time=REMINDER_START, duration_hours=DURATION_HOURS,
             force_reset=True
@@ -11,23 +11,25 @@ from datetime import datetime
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Poll, PollAnswer
 
-from config import DURATION_HOURS, REMINDER_START, LEVELS_DIR, DEFAULT_SETS
-from database import crud
+from config import DURATION_HOURS, REMINDER_START, DEFAULT_SETS, QUIZ_SIMILAR_LENGTH_DISTRACTORS
+from database import async_crud, crud
+from database.session_store import create_session_store
 from utils.helpers import daily_words_cache, get_daily_words_for_user
-from utils.quiz_helpers import load_quiz_data
-from utils.quiz_utils import generate_quiz_options
+from utils.quiz_helpers import get_distractor_index
 from utils.sticker_helper import get_congratulation_sticker, send_sticker_with_menu
 from utils.visual_helpers import extract_english, format_progress_bar, format_result_message
+from utils.word_catalog import word_catalog
 
 logger = logging.getLogger(__name__)
 
 # ───────────────────────────────────────────────────────────────
-#   Глобальное состояние
+#   Глобальное состояние (с TTL; с SESSION_BACKEND=sqlite переживает перезапуск — database/session_store.py)
+#   Измененное на месте состояние записывается обратно: quiz_states[chat_id] = state
 # ───────────────────────────────────────────────────────────────
-quiz_states: dict[int, dict] = {}
-poll_to_user: dict[str, int] = {}
-poll_to_index: dict[str, int] = {}
-nav_messages: dict[int, int] = {}
+quiz_states = create_session_store("quiz_states")        # chat_id → состояние теста
+poll_to_user = create_session_store("quiz_poll_user")    # poll_id → chat_id
+poll_to_index = create_session_store("quiz_poll_index")  # poll_id → номер вопроса
+nav_messages = create_session_store("quiz_nav")          # chat_id → message_id навигации
 # ───────────────────────────────────────────────────────────────
 
 
@@ -42,13 +44,12 @@ def _make_nav(prefix: str) -> InlineKeyboardMarkup:
 
 
 def _generate_questions(daily: list[str], level: str, chosen_set: str | None, revision: bool) -> list[dict]:
-    quiz_data = load_quiz_data(level, chosen_set)
-    if not quiz_data:
+    index = get_distractor_index(level, chosen_set)
+    if index is None:
         logger.warning("No quiz data for level=%s set=%s", level, chosen_set)
         return []
 
-    mapping = {item["word"].lower(): item["translation"] for item in quiz_data}
-    all_trans = [item["translation"] for item in quiz_data]
+    mapping = index.mapping
     questions: list[dict] = []
 
     for src in daily:
@@ -57,7 +58,7 @@ def _generate_questions(daily: list[str], level: str, chosen_set: str | None, re
         if not correct:
             logger.warning("No translation for %s", src)
             continue
-        opts, idx = generate_quiz_options(correct, all_trans, 4)
+        opts, idx = index.options(correct, 4, QUIZ_SIMILAR_LENGTH_DISTRACTORS)
         questions.append({
             "word": src,
             "correct": correct,
@@ -146,8 +147,7 @@ async def _finish_quiz(chat_id: int, bot: Bot) -> None:
                 result += "\n🎯 Отличная последовательность!"
         else:
             # Fallback - получаем streak из БД
-            from database.crud import get_user_streak
-            streak, _ = get_user_streak(chat_id)
+            streak, _ = await async_crud.get_user_streak(chat_id)
             if streak > 0:
                 result += f"\n🔥 Дней подряд: {streak}"
                 if streak >= 7:
@@ -174,7 +174,7 @@ async def start_quiz(cb: types.CallbackQuery, bot: Bot) -> None:
         except Exception:
             pass
 
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     if not user:
         await bot.send_message(chat_id, "Профиль не найден. Используйте /start.")
         await cb.answer()
@@ -207,10 +207,8 @@ async def start_quiz(cb: types.CallbackQuery, bot: Bot) -> None:
                 set_level_mismatch = True
                 break
         
-        # Проверяем существование файла для текущего уровня
-        from pathlib import Path
-        set_file_path = Path(LEVELS_DIR) / level / f"{chosen_set}.txt"
-        if not set_file_path.exists():
+        # Проверяем существование набора для текущего уровня
+        if not word_catalog.has_set(level, chosen_set):
             set_level_mismatch = True
         
         # БЛОКИРОВКА: Если есть несоответствие, показываем сообщение о смене набора
@@ -234,7 +232,8 @@ async def start_quiz(cb: types.CallbackQuery, bot: Bot) -> None:
             return
 
     # Проверяем слова дня (уже после проверки соответствия уровня)
-    result = get_daily_words_for_user(
+    result = await async_crud.run_db(
+        get_daily_words_for_user,
         chat_id, level, user[2], user[3],
         first_time=REMINDER_START, duration_hours=DURATION_HOURS,
         chosen_set=chosen_set,
@@ -263,18 +262,18 @@ async def start_quiz(cb: types.CallbackQuery, bot: Bot) -> None:
         return
 
     messages, times = result
-    learned = {extract_english(w[0]).lower() for w in crud.get_learned_words(chat_id)}
+    learned = await async_crud.get_learned_word_set(chat_id)
 
     # Получаем слова из кэша
-    entry = daily_words_cache.get(chat_id)
+    entry = await async_crud.run_db(daily_words_cache.get, chat_id)
     if not entry:
         await bot.send_message(chat_id, "⚠️ Нет слов для теста.")
         await cb.answer()
         return
 
-    # Используем уникальные слова из кэша (позиция 8)
-    if len(entry) > 8 and entry[8]:
-        unique_words = entry[8]
+    # Используем уникальные слова из плана
+    if entry.words:
+        unique_words = list(entry.words)
     else:
         # Если уникальные слова не доступны, извлекаем их из сообщений
         raw = [m.replace("🔹 ", "").strip() for m in entry[1]]
@@ -284,7 +283,7 @@ async def start_quiz(cb: types.CallbackQuery, bot: Bot) -> None:
         unique_words = raw
 
     # ИСПРАВЛЕННАЯ ЛОГИКА ОБРАБОТКИ РЕЖИМА ПОВТОРЕНИЯ
-    revision = bool(len(entry) > 9 and entry[9])
+    revision = entry.is_revision
     
     if revision:
         # В режиме повторения тестируем случайные слова из набора
@@ -311,13 +310,11 @@ async def start_quiz(cb: types.CallbackQuery, bot: Bot) -> None:
     # ИСПРАВЛЕНИЕ: Увеличиваем streak в НАЧАЛЕ теста
     current_streak = 0
     try:
-        from database.crud import increment_user_streak, get_user_streak
-        
         # Получаем streak до инкремента
-        old_streak, _ = get_user_streak(chat_id)
+        old_streak, _ = await async_crud.get_user_streak(chat_id)
         
         # Инкрементируем streak (функция сама проверяет, не проходился ли уже тест сегодня)
-        current_streak = increment_user_streak(chat_id)
+        current_streak = await async_crud.increment_user_streak(chat_id)
         
         if current_streak > old_streak:
             # Streak увеличился - первый тест за день
@@ -362,6 +359,7 @@ async def handle_poll_answer(ans: PollAnswer) -> None:
         return
     
     state["answered"].add(idx)
+    quiz_states[chat_id] = state
     bot = Bot.get_current()
 
     q = state["questions"][idx]
@@ -385,11 +383,11 @@ async def handle_poll_answer(ans: PollAnswer) -> None:
         # ИСПРАВЛЕНИЕ: добавляем слова в словарь только в обычном режиме (не в режиме повторения)
         if not state.get("revision", False):
             eng = extract_english(q["word"]).lower()
-            learned_words = {extract_english(w[0]).lower() for w in crud.get_learned_words(chat_id)}
-            if eng not in learned_words:
+            if eng not in await async_crud.get_learned_word_set(chat_id):
+                # Запись копится в буфере и уходит в БД пачкой
                 crud.add_learned_word(
                     chat_id, extract_english(q["word"]), q["correct"],
-                    datetime.now().strftime("%Y-%m-%d")
+                    datetime.now().strftime("%Y-%m-%d"), buffered=True
                 )
                 logger.info(f"Added word '{eng}' to dictionary for user {chat_id}")
 
@@ -398,6 +396,7 @@ async def handle_poll_answer(ans: PollAnswer) -> None:
         
         # Переходим к следующему вопросу
         state["current"] += 1
+        quiz_states[chat_id] = state
         if state["current"] >= len(state["questions"]):
             await _finish_quiz(chat_id, bot)
         else:
@@ -459,6 +458,7 @@ async def process_quiz_navigation(cb: types.CallbackQuery, bot: Bot) -> None:
         
         # Переходим к следующему вопросу
         st["current"] += 1
+        quiz_states[chat_id] = st
         if st["current"] >= len(st["questions"]):
             await _finish_quiz(chat_id, bot)
         else:
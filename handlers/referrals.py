@@ -6,7 +6,7 @@ from urllib.parse import quote
 from aiogram import Bot, Dispatcher, types
 
 from config import BOT_TOKEN
-from database import crud
+from database import async_crud
 from keyboards.referrals import referral_menu_keyboard
 
 logger = logging.getLogger(__name__)
@@ -26,8 +26,8 @@ async def show_referral_menu(callback: types.CallbackQuery, bot: Bot):
     chat_id = callback.from_user.id
     
     # Получаем данные пользователя
-    referral_code = crud.set_user_referral_code(chat_id)
-    referrals_count = crud.count_user_referrals(chat_id)
+    referral_code = await async_crud.set_user_referral_code(chat_id)
+    referrals_count = await async_crud.count_user_referrals(chat_id)
     
     # Создаем реферальную ссылку
     bot_username = await get_bot_username(bot)
@@ -63,7 +63,7 @@ async def show_referral_menu(callback: types.CallbackQuery, bot: Bot):
 async def show_referral_history(callback: types.CallbackQuery, bot: Bot):
     """Показывает историю приглашенных друзей."""
     chat_id = callback.from_user.id
-    referrals = crud.get_user_referrals(chat_id)
+    referrals = await async_crud.get_user_referrals(chat_id)
     
     if not referrals:
         text = "👥 *История приглашений*\n\nВы еще никого не пригласили."
@@ -90,7 +90,7 @@ async def show_referral_history(callback: types.CallbackQuery, bot: Bot):
 async def share_referral_link(callback: types.CallbackQuery, bot: Bot):
     """Создает сообщение для удобного копирования реферальной ссылки."""
     chat_id = callback.from_user.id
-    referral_code = crud.set_user_referral_code(chat_id)
+    referral_code = await async_crud.set_user_referral_code(chat_id)
     bot_username = await get_bot_username(bot)
     referral_link = f"https://t.me/{bot_username}?start=ref_{referral_code}"
     
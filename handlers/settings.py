@@ -12,7 +12,7 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.exceptions import MessageNotModified
 
 from config import LEVELS_DIR, REMINDER_START, DURATION_HOURS, DEFAULT_SETS
-from database import crud
+from database import async_crud, crud
 from keyboards.main_menu import main_menu_keyboard
 from keyboards.submenus import (
     level_selection_keyboard,
@@ -26,6 +26,7 @@ from utils.helpers import (
 )
 from utils.sticker_helper import get_congratulation_sticker, send_sticker_with_menu
 from utils.visual_helpers import format_progress_bar
+from utils.word_catalog import word_catalog
 
 # ──────────────────────────────── ЛОГИ + КЭШ ───────────────────────────────
 logger = logging.getLogger(__name__)
@@ -62,14 +63,13 @@ def _read_file(path: Path) -> str:
             continue
     raise IOError(f"Не удалось прочитать {path}")
 
-def _first_n_words(path: Path, n: int = 30) -> str:
-    """Первые *n* строк файла, лишние пробелы удалены."""
-    try:
-        text = _read_file(path)
-    except IOError:
-        logger.warning("Не удалось показать превью сета %s", path)
+def _first_n_words(level: str, set_name: str, n: int = 30) -> str:
+    """Первые *n* строк набора (из каталога слов)."""
+    word_set = word_catalog.get_set(level, set_name)
+    if word_set is None:
+        logger.warning("Не удалось показать превью сета %s/%s", level, set_name)
         return "Ошибка чтения файла."
-    words = [ln.strip() for ln in text.splitlines() if ln.strip()][:n]
+    words = word_set.lines[:n]
     preview = "\n".join(words)
     if len(words) == n:
         preview += "\n…"
@@ -188,12 +188,13 @@ async def process_settings_input(message: types.Message, bot: Bot):
         )
         return True
 
-    words, reps = _update_and_refresh(
+    words, reps = await async_crud.run_db(
+        _update_and_refresh,
         chat_id,
         words=value if field == "words" else None,
         reps=value if field == "repetitions" else None,
     )
-    _reschedule(chat_id)
+    await async_crud.run_db(_reschedule, chat_id)
     await message.answer(
         f"✅ Настройки обновлены!\n\n📊 Слов/день: *{words}*\n🔄 Повторений: *{reps}*",
         parse_mode="Markdown",
@@ -212,7 +213,7 @@ async def show_settings_callback(cb: types.CallbackQuery, bot: Bot):
 async def process_settings_choice_callback(cb: types.CallbackQuery, bot: Bot):
     _, option = cb.data.split(":", 1)
     chat_id = cb.from_user.id
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
 
     if option == "level":
         await cb.message.edit_text(
@@ -272,8 +273,8 @@ async def process_settings_choice_callback(cb: types.CallbackQuery, bot: Bot):
 # ──────────────────────── WORDS / REP BUTTONS ──────────────────────────────
 async def handle_set_words_count(cb: types.CallbackQuery, bot: Bot):
     _, num = cb.data.split(":", 1)
-    words, reps = _update_and_refresh(cb.from_user.id, words=int(num))
-    _reschedule(cb.from_user.id)
+    words, reps = await async_crud.run_db(_update_and_refresh, cb.from_user.id, words=int(num))
+    await async_crud.run_db(_reschedule, cb.from_user.id)
     await cb.message.edit_text(
         f"✅ Сохранено!\n\n📊 Слов/день: *{words}*\n🔄 Повторений: *{reps}*",
         parse_mode="Markdown",
@@ -283,8 +284,8 @@ async def handle_set_words_count(cb: types.CallbackQuery, bot: Bot):
 
 async def handle_set_repetitions_count(cb: types.CallbackQuery, bot: Bot):
     _, num = cb.data.split(":", 1)
-    words, reps = _update_and_refresh(cb.from_user.id, reps=int(num))
-    _reschedule(cb.from_user.id)
+    words, reps = await async_crud.run_db(_update_and_refresh, cb.from_user.id, reps=int(num))
+    await async_crud.run_db(_reschedule, cb.from_user.id)
     await cb.message.edit_text(
         f"✅ Сохранено!\n\n📊 Слов/день: *{words}*\n🔄 Повторений: *{reps}*",
         parse_mode="Markdown",
@@ -300,8 +301,8 @@ async def process_set_timezone_callback(cb: types.CallbackQuery, bot: Bot):
     if not _is_valid_tz(tz):
         tz = "Europe/Moscow"
 
-    _update_and_refresh(cb.from_user.id, tz=tz)
-    _reschedule(cb.from_user.id)
+    await async_crud.run_db(_update_and_refresh, cb.from_user.id, tz=tz)
+    await async_crud.run_db(_reschedule, cb.from_user.id)
     await cb.message.edit_text("✅ Часовой пояс обновлён.", reply_markup=settings_menu_keyboard())
     await cb.answer()
 
@@ -309,7 +310,7 @@ async def process_set_timezone_callback(cb: types.CallbackQuery, bot: Bot):
 async def process_set_level_callback(cb: types.CallbackQuery, bot: Bot):
     """Устанавливает новый уровень для пользователя без сброса кэша слов дня."""
     _, level = cb.data.split(":", 1)
-    crud.update_user_level(cb.from_user.id, level)
+    await async_crud.update_user_level(cb.from_user.id, level)
     # Удаляем строку с reset_daily_words_cache, чтобы не сбрасывать кэш
     await cb.message.edit_text(f"🔤 Уровень изменён на {level}.", reply_markup=settings_menu_keyboard())
     await cb.answer()
@@ -319,7 +320,7 @@ async def process_set_level_callback(cb: types.CallbackQuery, bot: Bot):
 
 async def process_my_sets(cb: types.CallbackQuery, bot: Bot):
     chat_id = cb.from_user.id
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     if not user:
         await bot.send_message(chat_id, "Пользователь не найден.")
         return
@@ -335,8 +336,8 @@ async def process_my_sets(cb: types.CallbackQuery, bot: Bot):
     
     # Получаем все наборы для текущего уровня пользователя
     all_sets = sorted(f.stem for f in level_dir.glob("*.txt"))
-    available_sets = get_available_sets_for_user(chat_id, level)
-    is_premium = crud.is_user_premium(chat_id)
+    available_sets = await async_crud.run_db(get_available_sets_for_user, chat_id, level)
+    is_premium = await async_crud.is_user_premium(chat_id)
     
     logger.info(f"User {chat_id} (level {level}, premium: {is_premium}): {len(all_sets)} total sets, {len(available_sets)} available")
     
@@ -421,7 +422,7 @@ async def _choose_set(cb: types.CallbackQuery, idx: int, *, confirm: bool):
 
     # ИСПРАВЛЕНИЕ: Проверяем, является ли выбранный набор уже текущим
     chat_id = cb.from_user.id
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     current_set = user_set_selection.get(chat_id) or user[6]
     
     if current_set == set_name:
@@ -432,16 +433,11 @@ async def _choose_set(cb: types.CallbackQuery, idx: int, *, confirm: bool):
     if confirm:
         # показываем первые 30 слов для превью
         level = user[1]
-        preview_path = Path(LEVELS_DIR) / level / f"{set_name}.txt"
-        preview_text = _first_n_words(preview_path)
+        preview_text = _first_n_words(level, set_name)
         
         # Подсчитываем общее количество слов
-        total_words = 50  # значение по умолчанию
-        try:
-            with open(preview_path, 'r', encoding='utf-8') as f:
-                total_words = len([line for line in f if line.strip()])
-        except Exception as e:
-            logger.error(f"Ошибка при подсчете слов: {e}")
+        word_set = word_catalog.get_set(level, set_name)
+        total_words = len(word_set) if word_set is not None else 50  # 50 — значение по умолчанию
 
         kb = InlineKeyboardMarkup(row_width=2)
         kb.add(
@@ -506,12 +502,12 @@ async def handle_set_change_confirmed_by_index(
         return
 
     chat_id = cb.from_user.id
-    crud.clear_learned_words_for_user(chat_id)
-    crud.update_user_chosen_set(chat_id, set_name)
+    await async_crud.clear_learned_words_for_user(chat_id)
+    await async_crud.update_user_chosen_set(chat_id, set_name)
     user_set_selection[chat_id] = set_name
-    reset_daily_words_cache(chat_id)
+    await async_crud.run_db(reset_daily_words_cache, chat_id)
 
-    level = crud.get_user(chat_id)[1]
+    level = (await async_crud.get_user(chat_id))[1]
     set_path = Path(LEVELS_DIR) / level / f"{set_name}.txt"
     content = _read_file(set_path)
     
@@ -547,7 +543,7 @@ async def handle_set_change_cancelled(cb: types.CallbackQuery, bot: Bot):
 # ───────────────────────── МОИ НАСТРОЙКИ (ПРОФИЛЬ) ────────────────────────
 async def process_settings_mysettings(cb: types.CallbackQuery, bot: Bot):
     chat_id = cb.from_user.id
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     if not user:
         try:
             await cb.message.edit_text("Профиль не найден.", reply_markup=main_menu_keyboard())
@@ -560,8 +556,7 @@ async def process_settings_mysettings(cb: types.CallbackQuery, bot: Bot):
 
     # Получаем информацию о днях подряд
     try:
-        from database.crud import get_user_streak
-        streak, last_test_date = get_user_streak(chat_id)
+        streak, last_test_date = await async_crud.get_user_streak(chat_id)
     except Exception:
         streak = 0
         
@@ -585,7 +580,7 @@ async def process_settings_mysettings(cb: types.CallbackQuery, bot: Bot):
                     if w.strip()
                 ]
                 total_words = len(set_words)
-                learnt_en = {extract_english(w[0]).lower() for w in crud.get_learned_words(chat_id)}
+                learnt_en = await async_crud.get_learned_word_set(chat_id)
                 done = sum(1 for w in set_words if w in learnt_en)
                 
                 text += f"📚 *Набор:* {chosen} ({total_words} слов)\n"
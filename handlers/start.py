@@ -2,7 +2,7 @@
 import logging
 from aiogram import types
 from keyboards.main_menu import main_menu_keyboard
-from database import crud
+from database import async_crud
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +17,13 @@ async def cmd_start(message: types.Message, bot: Bot) -> None:
         await bot.set_chat_menu_button(chat_id=chat_id, menu_button=MenuButtonCommands())
         
         # ─── регистрация нового пользователя ───────────────────────────────
-        if not crud.get_user(chat_id):
-            crud.add_user(chat_id)
+        if not await async_crud.get_user(chat_id):
+            await async_crud.add_user(chat_id)
             logger.info("Создан новый пользователь %s", chat_id)
 
             default_set = DEFAULT_SETS.get("A1")
             if default_set:
-                crud.update_user_chosen_set(chat_id, default_set)
+                await async_crud.update_user_chosen_set(chat_id, default_set)
                 from handlers.settings import user_set_selection
 
                 user_set_selection[chat_id] = default_set
@@ -6,7 +6,7 @@ from functools import partial
 from aiogram import Bot, Dispatcher, types
 
 from config import SUBSCRIPTION_PRICES
-from database import crud
+from database import async_crud
 from keyboards.subscription import (
     subscription_menu_keyboard, 
     subscription_period_keyboard,
@@ -62,9 +62,8 @@ async def show_subscription_plans(callback: types.CallbackQuery, bot: Bot):
     
     # Получаем информацию о скидке пользователя
     try:
-        from database.crud import get_user_streak, is_user_premium
-        streak, _ = get_user_streak(chat_id)
-        is_premium = is_user_premium(chat_id)
+        streak, _ = await async_crud.get_user_streak(chat_id)
+        is_premium = await async_crud.is_user_premium(chat_id)
         
         # Рассчитываем скидку только для премиум пользователей
         if is_premium and streak > 0:
@@ -187,7 +186,7 @@ async def start_payment(callback: types.CallbackQuery, bot: Bot):
         )
         
         # Проверяем, есть ли активная подписка
-        current_status, current_expires, _ = crud.get_user_subscription_status(chat_id)
+        current_status, current_expires, _ = await async_crud.get_user_subscription_status(chat_id)
         is_extension = (current_status == 'premium' and current_expires and 
                        datetime.fromisoformat(current_expires) > datetime.now())
         
@@ -223,7 +222,7 @@ async def start_payment(callback: types.CallbackQuery, bot: Bot):
             
             # Получаем информацию о streak
             try:
-                streak, _ = crud.get_user_streak(chat_id)
+                streak, _ = await async_crud.get_user_streak(chat_id)
                 message_text += f"🎯 Ваша серия: {streak} дней подряд\n\n"
             except Exception:
                 pass
@@ -292,8 +291,8 @@ async def show_subscription_status(callback: types.CallbackQuery, bot: Bot):
         # Сначала проверяем активные платежи
         await PaymentService.check_and_process_user_payments(chat_id, bot)
         
-        status_text = format_subscription_status(chat_id)
-        is_premium = crud.is_user_premium(chat_id)
+        status_text = await async_crud.run_db(format_subscription_status, chat_id)
+        is_premium = await async_crud.is_user_premium(chat_id)
         
         # Добавляем информацию о доступных наборах
         if is_premium:
@@ -302,7 +301,7 @@ async def show_subscription_status(callback: types.CallbackQuery, bot: Bot):
             status_text += "\n\n📚 *Доступные наборы:* Только Basic 1 и Basic 2 для каждого уровня"
             
             # Показываем примеры премиум наборов
-            user = crud.get_user(chat_id)
+            user = await async_crud.get_user(chat_id)
             if user:
                 level = user[1]
                 premium_sets = get_premium_sets_for_level(level)
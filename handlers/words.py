@@ -9,7 +9,7 @@ from aiogram import Bot, Dispatcher, types
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from config import DURATION_HOURS, LEVELS_DIR, REMINDER_START, DEFAULT_SETS
-from database import crud
+from database import async_crud
 from keyboards.submenus import words_day_keyboard
 from utils.helpers import (
     get_daily_words_for_user,
@@ -44,7 +44,7 @@ async def _send_daily_words(
 ) -> None:
     """Отправка «Слов дня» (или сообщение-ошибку)."""
     # Получаем выбранный сет и проверяем соответствие уровню
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     chosen_set = user[6]  # current set from database
     
     # Проверяем несоответствие уровня и сета
@@ -76,7 +76,8 @@ async def _send_daily_words(
         return
         
     # Получаем слова дня, если нет несоответствия уровня и сета
-    result = get_daily_words_for_user(
+    result = await async_crud.run_db(
+        get_daily_words_for_user,
         chat_id,
         level,
         words_per_day,
@@ -94,7 +95,7 @@ async def _send_daily_words(
     # ——— требуется подтверждение смены сета (другой случай) ————————————————
     if len(result) == 3 and result[:2] == (None, None):
         default_set: str = result[2]
-        current_set = crud.get_user(chat_id)[6] or "не выбран"
+        current_set = (await async_crud.get_user(chat_id))[6] or "не выбран"
         text = (
             "⚠️ *Внимание! Смена набора сбросит прогресс.*\n\n"
             f"Текущий набор: *{current_set}*\n"
@@ -130,10 +131,9 @@ async def _send_daily_words(
     if len(formatted_message) > 4000:
         # Получаем уникальные слова из кэша
         unique_words = []
-        if chat_id in daily_words_cache:
-            entry = daily_words_cache[chat_id]
-            if len(entry) > 8 and entry[8]:
-                unique_words = entry[8]
+        entry = await async_crud.run_db(daily_words_cache.get, chat_id)
+        if entry and entry.words:
+            unique_words = list(entry.words)
         
         # Если не можем получить уникальные слова из кэша, извлекаем из messages
         if not unique_words:
@@ -153,13 +153,13 @@ async def _send_daily_words(
 
 async def send_words_day_schedule(cb: types.CallbackQuery, bot: Bot) -> None:
     chat_id = cb.from_user.id
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
     if not user:
         await cb.message.edit_text("⚠️ Профиль не найден. Используйте /start.", parse_mode="Markdown")
         await cb.answer()
         return
 
-    words, reps = get_user_settings(chat_id)
+    words, reps = await async_crud.run_db(get_user_settings, chat_id)
     await _send_daily_words(cb, chat_id, user[1], words, reps)
 
 
@@ -169,7 +169,7 @@ async def handle_confirm_set_change(cb: types.CallbackQuery, bot: Bot) -> None:
     """Подтверждение смены сета с полной перезагрузкой слов дня."""
     chat_id = cb.from_user.id
     _, default_set = cb.data.split(":", 1)
-    user = crud.get_user(chat_id)
+    user = await async_crud.get_user(chat_id)
 
     if not user:
         await cb.answer("Профиль не найден.", show_alert=True)
@@ -179,25 +179,25 @@ async def handle_confirm_set_change(cb: types.CallbackQuery, bot: Bot) -> None:
 
     try:
         # Очищаем словарь и меняем сет
-        crud.clear_learned_words_for_user(chat_id)
-        crud.update_user_chosen_set(chat_id, default_set)
+        await async_crud.clear_learned_words_for_user(chat_id)
+        await async_crud.update_user_chosen_set(chat_id, default_set)
 
         # Синхронизируем кэш выбранных сетов
         from handlers.settings import user_set_selection
         user_set_selection[chat_id] = default_set
         
         # Гарантированно сбрасываем все кэши для данного пользователя
-        reset_daily_words_cache(chat_id)
+        await async_crud.run_db(reset_daily_words_cache, chat_id)
         
         # Дополнительно удаляем пользователя из кэша previous_daily_words
-        if chat_id in previous_daily_words:
-            del previous_daily_words[chat_id]
+        await async_crud.run_db(previous_daily_words.pop, chat_id, None)
         
         # Принудительно обновляем слова дня
-        words, reps = get_user_settings(chat_id)
+        words, reps = await async_crud.run_db(get_user_settings, chat_id)
         
         # ВАЖНО: Создаем новый запрос для слов дня с force_reset=True
-        result = get_daily_words_for_user(
+        result = await async_crud.run_db(
+            get_daily_words_for_user,
             chat_id,
             level,
             words,
@@ -232,10 +232,9 @@ async def handle_confirm_set_change(cb: types.CallbackQuery, bot: Bot) -> None:
         if len(formatted_message) > 4000:
             # Получаем уникальные слова из кэша
             unique_words = []
-            if chat_id in daily_words_cache:
-                entry = daily_words_cache[chat_id]
-                if len(entry) > 8 and entry[8]:
-                    unique_words = entry[8]
+            entry = await async_crud.run_db(daily_words_cache.get, chat_id)
+            if entry and entry.words:
+                unique_words = list(entry.words)
             
             # Если не можем получить уникальные слова из кэша, используем messages
             if not unique_words:
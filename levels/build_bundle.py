@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Компилирует все наборы слов levels/<LEVEL>/*.txt в бинарный пакет,
+который бот отображает в память при старте (см. utils/word_bundle.py).
+
+Запуск из корня проекта (после изменения наборов и при деплое):
+    python levels/build_bundle.py [путь_к_пакету]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import LEVELS_DIR, WORDS_BUNDLE_PATH  # noqa: E402
+from utils.word_catalog import build_bundle  # noqa: E402
+
+
+def main():
+    output_path = sys.argv[1] if len(sys.argv) > 1 else WORDS_BUNDLE_PATH
+    if not output_path:
+        print("WORDS_BUNDLE_PATH не задан, укажите путь к пакету аргументом")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    count = build_bundle(LEVELS_DIR, output_path)
+    elapsed = (time.perf_counter() - started) * 1000
+    size_kb = Path(output_path).stat().st_size / 1024
+    print(f"Собрано наборов: {count} → {output_path} ({size_kb:.1f} КБ, {elapsed:.0f} мс)")
+
+
+if __name__ == "__main__":
+    main()
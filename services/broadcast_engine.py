@@ -0,0 +1,261 @@
+# services/broadcast_engine.py
+"""
+Возобновляемая рассылка с контрольными точками в БД.
+
+Прогресс хранится в таблицах broadcasts (курсор last_chat_id) и
+broadcast_recipients (статус по каждому получателю):
+
+* получатели выбираются страницами по первичному ключу (chat_id > курсор),
+  без загрузки всей таблицы users в память;
+* страница «захватывается» одной транзакцией: получатели записываются со
+  статусом 'sending', курсор сдвигается. После падения рассылка продолжается
+  с курсора, а строки, оставшиеся в 'sending', повторно не отправляются —
+  лучше потерять несколько сообщений, чем прислать дубли;
+* скорость адаптивная: при RetryAfter от Telegram она уменьшается вдвое,
+  после каждой спокойной страницы растет на единицу (до BROADCAST_MAX_RATE);
+* пользователи, заблокировавшие бота или удалившие аккаунт, помечаются в
+  users.unreachable_since, и следующие рассылки их пропускают.
+
+    engine = BroadcastEngine(bot)
+    broadcast_id = await engine.create(text)
+    await engine.run(broadcast_id)
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.utils.exceptions import (
+    BotBlocked, ChatNotFound, RetryAfter, TelegramAPIError, UserDeactivated,
+)
+
+from config import BROADCAST_MAX_RATE, BROADCAST_PAGE_SIZE
+from database import crud
+from database.async_crud import run_db
+from database.db import db_manager
+from services.message_dispatcher import message_dispatcher, PRIORITY_BROADCAST, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Статусы получателей
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_BLOCKED = "blocked"
+STATUS_NOT_FOUND = "not_found"
+STATUS_DEACTIVATED = "deactivated"
+STATUS_FAILED = "failed"
+
+# Ошибки, после которых пользователь исключается из следующих рассылок
+UNREACHABLE_STATUSES = (STATUS_BLOCKED, STATUS_NOT_FOUND, STATUS_DEACTIVATED)
+
+MIN_RATE = 1.0
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class BroadcastStore:
+    """Таблицы broadcasts / broadcast_recipients (схема создается в DatabaseManager.init_db)."""
+
+    def create(self, message: str) -> int:
+        with db_manager.transaction() as tx:
+            cursor = tx.execute(
+                "INSERT INTO broadcasts (message, status, last_chat_id, created_at) VALUES (?, 'running', 0, ?)",
+                (message, _now()),
+            )
+            return cursor.lastrowid
+
+    def get(self, broadcast_id: int) -> Optional[Tuple[int, str, str, int]]:
+        """(id, message, status, last_chat_id) или None."""
+        with db_manager.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, message, status, last_chat_id FROM broadcasts WHERE id = ?", (broadcast_id,)
+            )
+            return cursor.fetchone()
+
+    def find_unfinished(self) -> List[Tuple[int, str, str, int]]:
+        with db_manager.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, message, created_at, last_chat_id FROM broadcasts "
+                "WHERE status = 'running' ORDER BY id"
+            )
+            return cursor.fetchall()
+
+    def claim_page(self, broadcast_id: int, chat_ids: List[int]) -> None:
+        """Записывает получателей страницы и сдвигает курсор одной транзакцией."""
+        now = _now()
+        with db_manager.transaction() as tx:
+            tx.executemany(
+                "INSERT OR IGNORE INTO broadcast_recipients (broadcast_id, chat_id, status, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(broadcast_id, chat_id, STATUS_SENDING, now) for chat_id in chat_ids],
+            )
+            tx.execute(
+                "UPDATE broadcasts SET last_chat_id = ? WHERE id = ? AND last_chat_id < ?",
+                (chat_ids[-1], broadcast_id, chat_ids[-1]),
+            )
+
+    def save_results(self, broadcast_id: int, results: List[Tuple[int, str, Optional[str]]]) -> None:
+        """results — (chat_id, status, error)."""
+        now = _now()
+        with db_manager.transaction() as tx:
+            tx.executemany(
+                "UPDATE broadcast_recipients SET status = ?, error = ?, updated_at = ? "
+                "WHERE broadcast_id = ? AND chat_id = ?",
+                [(status, error, now, broadcast_id, chat_id) for chat_id, status, error in results],
+            )
+
+    def finish(self, broadcast_id: int) -> None:
+        db_manager.execute(
+            "UPDATE broadcasts SET status = 'done', finished_at = ? WHERE id = ?",
+            (_now(), broadcast_id),
+            commit=True,
+        )
+
+    def status_counts(self, broadcast_id: int) -> Dict[str, int]:
+        with db_manager.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT status, COUNT(*) FROM broadcast_recipients WHERE broadcast_id = ? GROUP BY status",
+                (broadcast_id,),
+            )
+            return dict(cursor.fetchall())
+
+
+class BroadcastEngine:
+    """
+    Исполнитель рассылок. send — корутина (chat_id, text), по умолчанию
+    отправка через общую очередь исходящих сообщений с PRIORITY_BROADCAST.
+    """
+
+    def __init__(self, bot: Optional[Bot] = None,
+                 send: Optional[Callable[[int, str], Awaitable]] = None,
+                 store: Optional[BroadcastStore] = None,
+                 page_size: int = BROADCAST_PAGE_SIZE,
+                 max_rate: float = BROADCAST_MAX_RATE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.bot = bot
+        self._send = send or self._send_via_dispatcher
+        self.store = store or BroadcastStore()
+        self.page_size = page_size
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self._clock = clock
+        self._bucket = TokenBucket(max_rate, 1, clock())
+        self._retry_after_seen = message_dispatcher.stats["retry_after"]
+        self.stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, int]:
+        return {
+            'total': 0,
+            'sent': 0,
+            'failed': 0,
+            'blocked': 0,
+            'not_found': 0,
+            'deactivated': 0,
+            'other_errors': 0,
+        }
+
+    async def _send_via_dispatcher(self, chat_id: int, text: str):
+        return await message_dispatcher.send_message(chat_id, text, priority=PRIORITY_BROADCAST, bot=self.bot)
+
+    # ───────────────────────── API ─────────────────────────
+    async def create(self, message: str) -> int:
+        broadcast_id = await run_db(self.store.create, message)
+        logger.info("Создана рассылка #%s", broadcast_id)
+        return broadcast_id
+
+    async def find_unfinished(self) -> List[Tuple[int, str, str, int]]:
+        """Прерванные рассылки: (id, message, created_at, last_chat_id)."""
+        return await run_db(self.store.find_unfinished)
+
+    async def run(self, broadcast_id: int, on_progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """Отправляет (или продолжает) рассылку до конца и возвращает статистику."""
+        row = await run_db(self.store.get, broadcast_id)
+        if row is None:
+            raise ValueError(f"Рассылка #{broadcast_id} не найдена")
+        _, message, status, cursor = row
+        if status != "running":
+            logger.info("Рассылка #%s уже завершена", broadcast_id)
+            return self.stats
+        if cursor:
+            logger.info("Продолжаем рассылку #%s после chat_id %s", broadcast_id, cursor)
+
+        while True:
+            chat_ids = await run_db(crud.get_reachable_user_ids_page, cursor, self.page_size)
+            if not chat_ids:
+                break
+            await run_db(self.store.claim_page, broadcast_id, chat_ids)
+            cursor = chat_ids[-1]
+
+            results = await self._send_page(chat_ids, message)
+            await run_db(self.store.save_results, broadcast_id, results)
+            unreachable = [(chat_id, status) for chat_id, status, _ in results if status in UNREACHABLE_STATUSES]
+            if unreachable:
+                await run_db(crud.mark_users_unreachable, unreachable)
+            self._adapt_rate(results)
+            if on_progress:
+                on_progress(self.stats)
+
+        await run_db(self.store.finish, broadcast_id)
+        logger.info("Рассылка #%s завершена: %s", broadcast_id, self.stats)
+        return self.stats
+
+    # ───────────────────────── отправка ─────────────────────────
+    async def _send_page(self, chat_ids: List[int], message: str) -> List[Tuple[int, str, Optional[str]]]:
+        tasks = []
+        for chat_id in chat_ids:
+            wait = self._bucket.wait_time(self._clock())
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._bucket.take(self._clock())
+            tasks.append(asyncio.ensure_future(self._send_one(chat_id, message)))
+        return list(await asyncio.gather(*tasks))
+
+    async def _send_one(self, chat_id: int, message: str) -> Tuple[int, str, Optional[str]]:
+        self.stats['total'] += 1
+        try:
+            await self._send(chat_id, message)
+        except BotBlocked:
+            self.stats['blocked'] += 1
+            return chat_id, STATUS_BLOCKED, None
+        except ChatNotFound:
+            self.stats['not_found'] += 1
+            return chat_id, STATUS_NOT_FOUND, None
+        except UserDeactivated:
+            self.stats['deactivated'] += 1
+            return chat_id, STATUS_DEACTIVATED, None
+        except RetryAfter as e:
+            # Очередь исчерпала повторы: сообщение не отправлено, скорость снизим
+            self.stats['other_errors'] += 1
+            return chat_id, STATUS_FAILED, f"RetryAfter: {e.timeout}"
+        except TelegramAPIError as e:
+            self.stats['other_errors'] += 1
+            logger.warning("Telegram API ошибка для пользователя %s: %s", chat_id, e)
+            return chat_id, STATUS_FAILED, str(e)
+        except Exception as e:
+            self.stats['failed'] += 1
+            logger.error("Неожиданная ошибка для пользователя %s: %s", chat_id, e)
+            return chat_id, STATUS_FAILED, str(e)
+        self.stats['sent'] += 1
+        return chat_id, STATUS_SENT, None
+
+    def _adapt_rate(self, results: List[Tuple[int, str, Optional[str]]]) -> None:
+        """AIMD: вдвое медленнее после RetryAfter, на 1 сообщ./с быстрее после спокойной страницы."""
+        retry_after = message_dispatcher.stats["retry_after"]
+        throttled = retry_after > self._retry_after_seen or any(
+            error and error.startswith("RetryAfter") for _, _, error in results
+        )
+        self._retry_after_seen = retry_after
+        if throttled:
+            rate = max(MIN_RATE, self.rate / 2)
+        else:
+            rate = min(self.max_rate, self.rate + 1)
+        if rate != self.rate:
+            logger.info("Скорость рассылки: %.1f → %.1f сообщ./с", self.rate, rate)
+            self.rate = rate
+            self._bucket.rate = rate
@@ -0,0 +1,141 @@
+# services/daily_reset.py
+"""
+Ежедневный сброс в полночь по местному времени — пакетами по группам поясов.
+
+Раньше сброс выполнялся внутри поминутного цикла для каждого пользователя
+с местным временем 00:00–00:03: отдельные get_user_streak/reset_user_streak
+и чтение выученных слов на пользователя, а повтор отсекался множеством
+строк в памяти (терялось при перезапуске).
+
+Теперь пояса, у которых наступили первые RESET_WINDOW_MINUTES минут суток,
+группируются по текущему смещению от UTC (Москва и Стамбул — одна группа).
+Для группы:
+* streak сбрасывается одним UPDATE ... WHERE last_test_date < вчера;
+* выученные слова всех пользователей группы читаются пакетно, остатки
+  плана сохраняются и планы сбрасываются одной транзакцией;
+* (группа, местная дата, воркер) записывается в daily_resets — после
+  перезапуска сброс не повторяется, а пропущенный в окне выполняется.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from database import crud
+from services.notification_index import DEFAULT_TIMEZONE, resolve_timezone
+from services.update_router import partition
+from utils.helpers import daily_words_cache, previous_daily_words, reset_daily_words_cache_many
+from utils.visual_helpers import extract_english
+from config import PRODUCTION_MODE
+
+logger = logging.getLogger(__name__)
+
+# Сброс выполняется в первые минуты местных суток (окно — запас на перезапуск)
+RESET_WINDOW_MINUTES = 60
+
+# Выполненные сбросы (группа, дата, воркер), уже прочитанные из daily_resets
+_done = set()
+
+
+def _offset_label(local: datetime) -> str:
+    minutes = int(local.utcoffset().total_seconds() // 60)
+    sign = "+" if minutes >= 0 else "-"
+    return f"UTC{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def due_buckets(now_utc: datetime, users: List[tuple], window_minutes: int = RESET_WINDOW_MINUTES,
+                is_done: Callable[[Tuple[str, str]], bool] = lambda key: False,
+                ) -> Dict[Tuple[str, str], Dict[str, List[tuple]]]:
+    """
+    Пользователи, у которых идут первые window_minutes минут суток:
+    (смещение, местная дата) → {значение столбца timezone: [пользователи]}.
+    Некорректный или пустой пояс считается московским, как в планировщике;
+    группы, для которых is_done(key), пропускаются.
+    """
+    keys: Dict[str, Tuple[str, str]] = {}
+    for raw in {user[5] if len(user) > 5 and user[5] else "" for user in users}:
+        local = now_utc.astimezone(resolve_timezone((None,) * 5 + (raw,)))
+        if local.hour * 60 + local.minute < window_minutes:
+            key = (_offset_label(local), local.strftime("%Y-%m-%d"))
+            if not is_done(key):
+                keys[raw] = key
+    buckets: Dict[Tuple[str, str], Dict[str, List[tuple]]] = defaultdict(lambda: defaultdict(list))
+    if not keys:
+        # Большую часть суток ни у одного пояса не полночь — без обхода пользователей
+        return buckets
+    for user in users:
+        key = keys.get(user[5] if len(user) > 5 and user[5] else "")
+        if key is not None:
+            buckets[key][user[5] or ""].append(user)
+    return buckets
+
+
+def roll_over_plans(chat_ids: List[int]) -> int:
+    """Остатки невыученных слов переходят на следующий день, планы сбрасываются."""
+    plans = {chat_id: daily_words_cache.get(chat_id) for chat_id in chat_ids}
+    plans = {chat_id: plan for chat_id, plan in plans.items() if plan is not None}
+    learning = [chat_id for chat_id, plan in plans.items() if not plan.is_revision and plan.words]
+    learned_sets = crud.get_learned_word_sets(learning)
+
+    leftovers = {}
+    for chat_id in learning:
+        learned = learned_sets.get(chat_id, frozenset())
+        words = []
+        for word in plans[chat_id].words:
+            english = extract_english(word).lower()
+            if english and english not in learned:
+                words.append(word)
+        if words:
+            leftovers[chat_id] = words
+    # В режиме повторения и без остатков прошлые остатки удаляются
+    previous_daily_words.discard_many(
+        chat_id for chat_id in plans if chat_id not in leftovers and chat_id in previous_daily_words
+    )
+    previous_daily_words.update_many(leftovers)
+    reset_daily_words_cache_many(plans)
+    return len(leftovers)
+
+
+def reset_users(users: List[tuple], local_now: datetime, include_unset: bool = False) -> List[int]:
+    """Сброс для пользователей одной группы поясов; возвращает их chat_id."""
+    today = local_now.strftime("%Y-%m-%d")
+    yesterday = (local_now - timedelta(days=1)).strftime("%Y-%m-%d")
+    timezones = sorted({user[5] for user in users if len(user) > 5 and user[5]})
+    chat_ids = [user[0] for user in users]
+    reset = crud.reset_stale_streaks(timezones, today, yesterday, include_unset, partition())
+    leftovers = roll_over_plans(chat_ids)
+    if not PRODUCTION_MODE:
+        logger.info("Ежедневный сброс %s: пользователей %d, сброшено streak %d, остатков %d",
+                    today, len(chat_ids), reset, leftovers)
+    return chat_ids
+
+
+def run_daily_reset(now_utc: datetime, users: List[tuple]) -> List[int]:
+    """
+    Выполняет сброс для всех групп поясов, у которых началась новая дата и
+    сброс за нее еще не записан. Возвращает chat_id обработанных пользователей.
+    """
+    index, total = partition()
+    worker = f"{index}/{total}"
+
+    def is_done(key: Tuple[str, str]) -> bool:
+        if (*key, worker) not in _done and crud.is_daily_reset_done(*key, worker):
+            _done.add((*key, worker))
+        return (*key, worker) in _done
+
+    processed: List[int] = []
+    for (bucket, local_date), by_timezone in due_buckets(now_utc, users, is_done=is_done).items():
+        try:
+            group = [user for bucket_users in by_timezone.values() for user in bucket_users]
+            local_now = now_utc.astimezone(resolve_timezone(group[0]))
+            include_unset = "" in by_timezone or DEFAULT_TIMEZONE in by_timezone
+            processed.extend(reset_users(group, local_now, include_unset))
+            crud.mark_daily_reset_done(bucket, local_date, worker)
+            _done.add((bucket, local_date, worker))
+            logger.info("Ежедневный сброс %s за %s: %d пользователей", bucket, local_date, len(group))
+        except Exception as e:
+            logger.error("Ошибка ежедневного сброса %s за %s: %s", bucket, local_date, e)
+    if len(_done) > 1000:
+        _done.clear()
+    return processed
@@ -1,9 +1,33 @@
 # services/image_generation.py
+"""
+Card, progress chart and level badge images.
+
+render_* draw PIL images; png_bytes and the *_png helpers encode them in
+memory (optimize / compress_level are configurable), ready to send as an
+InputFile without any temp file. Fonts are loaded once per (type, size).
+
+The create_* functions return paths in a size-bounded content-addressed
+cache (utils/media_cache.DiskCache) keyed by everything that affects the
+picture plus RENDER_VERSION, so the same card is drawn once. Telegram
+file_ids of sent cards are kept in media_file_ids; prerender_set draws a
+whole word set in a process pool ahead of time.
+"""
 from PIL import Image, ImageDraw, ImageFont
+import functools
 import os
-import tempfile
 import logging
-from typing import Optional, Tuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from aiogram.types import InputFile
+
+from utils.media_cache import DiskCache, FileIdStore, content_key, input_file, send_cached, write_atomic
+from config import (
+    CARD_CACHE_DIR, CARD_CACHE_MAX_MB, CARD_PRERENDER_WORKERS, PNG_COMPRESS_LEVEL, PNG_OPTIMIZE,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +56,17 @@ DEFAULT_FONT_PATHS = {
     "italic": os.path.join(FONT_DIR, "OpenSans-Italic.ttf"),
 }
 
+# Bump when a layout changes: cached images are keyed by it
+RENDER_VERSION = 1
+MEDIA_KIND = "card"
+
+card_cache = DiskCache(CARD_CACHE_DIR, int(CARD_CACHE_MAX_MB * 1024 * 1024), ".png")
+card_file_ids = FileIdStore(MEDIA_KIND)
+
+
+@functools.lru_cache(maxsize=64)
 def get_font(font_type: str = "regular", size: int = 24) -> Optional[ImageFont.FreeTypeFont]:
-    """Get a font for image generation, with fallback to default."""
+    """Get a font for image generation, with fallback to default (loaded once per type and size)."""
     font_path = DEFAULT_FONT_PATHS.get(font_type)
     
     try:
@@ -46,12 +79,12 @@ def get_font(font_type: str = "regular", size: int = 24) -> Optional[ImageFont.F
         logger.error(f"Error loading font: {e}")
         return ImageFont.load_default()
 
-def create_word_card(word: str, translation: str, 
-                    transcription: Optional[str] = None,
-                    example: Optional[str] = None,
-                    level: Optional[str] = None) -> str:
+def render_word_card(word: str, translation: str,
+                     transcription: Optional[str] = None,
+                     example: Optional[str] = None,
+                     level: Optional[str] = None) -> Image.Image:
     """
-    Create a visually appealing image card for a vocabulary word.
+    Draw a visually appealing image card for a vocabulary word.
     
     Args:
         word: The English word
@@ -61,67 +94,57 @@ def create_word_card(word: str, translation: str,
         level: Optional level indicator (A1, B2, etc.)
         
     Returns:
-        Path to the generated image file
+        The card image
     """
-    try:
-        # Create image with white background
-        img = Image.new('RGB', (CARD_WIDTH, CARD_HEIGHT), COLORS["background"])
-        draw = ImageDraw.Draw(img)
-        
-        # Get fonts
-        word_font = get_font("bold", 48)
-        translation_font = get_font("bold", 36)
-        transcription_font = get_font("italic", 24)
-        example_font = get_font("regular", 24)
-        level_font = get_font("bold", 20)
-        
-        # Draw border with slight shadow effect
-        draw.rectangle([(10, 10), (CARD_WIDTH-10, CARD_HEIGHT-10)], 
-                      outline=COLORS["border"], width=2)
-        
-        # Draw word and translation
-        draw.text((CARD_WIDTH//2, 80), word, font=word_font, 
-                 fill=COLORS["text_primary"], anchor="mm")
-        
-        draw.text((CARD_WIDTH//2, 150), translation, font=translation_font, 
-                 fill=COLORS["accent"], anchor="mm")
-        
-        # Draw transcription if provided
-        if transcription:
-            draw.text((CARD_WIDTH//2, 200), f"[{transcription}]", 
-                     font=transcription_font, fill=COLORS["text_secondary"], 
-                     anchor="mm")
-            
-        # Draw example if provided
-        if example:
-            # Limit example length for display
-            if len(example) > 60:
-                example = example[:57] + "..."
-                
-            draw.text((CARD_WIDTH//2, 260), f'"{example}"', 
-                     font=example_font, fill=COLORS["text_secondary"], 
-                     anchor="mm")
-        
-        # Draw level indicator if provided
-        if level:
-            draw.text((CARD_WIDTH-30, 30), level, font=level_font, 
-                     fill=COLORS["accent"], anchor="mm")
+    # Create image with white background
+    img = Image.new('RGB', (CARD_WIDTH, CARD_HEIGHT), COLORS["background"])
+    draw = ImageDraw.Draw(img)
+    
+    # Get fonts
+    word_font = get_font("bold", 48)
+    translation_font = get_font("bold", 36)
+    transcription_font = get_font("italic", 24)
+    example_font = get_font("regular", 24)
+    level_font = get_font("bold", 20)
+    
+    # Draw border with slight shadow effect
+    draw.rectangle([(10, 10), (CARD_WIDTH-10, CARD_HEIGHT-10)], 
+                  outline=COLORS["border"], width=2)
+    
+    # Draw word and translation
+    draw.text((CARD_WIDTH//2, 80), word, font=word_font, 
+             fill=COLORS["text_primary"], anchor="mm")
+    
+    draw.text((CARD_WIDTH//2, 150), translation, font=translation_font, 
+             fill=COLORS["accent"], anchor="mm")
+    
+    # Draw transcription if provided
+    if transcription:
+        draw.text((CARD_WIDTH//2, 200), f"[{transcription}]", 
+                 font=transcription_font, fill=COLORS["text_secondary"], 
+                 anchor="mm")
         
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            file_path = temp_file.name
-            img.save(file_path, "PNG")
+    # Draw example if provided
+    if example:
+        # Limit example length for display
+        if len(example) > 60:
+            example = example[:57] + "..."
             
-        return file_path
-        
-    except Exception as e:
-        logger.error(f"Error creating word card: {e}")
-        return ""
+        draw.text((CARD_WIDTH//2, 260), f'"{example}"', 
+                 font=example_font, fill=COLORS["text_secondary"], 
+                 anchor="mm")
+    
+    # Draw level indicator if provided
+    if level:
+        draw.text((CARD_WIDTH-30, 30), level, font=level_font, 
+                 fill=COLORS["accent"], anchor="mm")
 
-def create_progress_chart(learned_count: int, target_count: int = None, 
-                         days_active: int = None) -> str:
+    return img
+
+def render_progress_chart(learned_count: int, target_count: int = None,
+                          days_active: int = None) -> Image.Image:
     """
-    Create a progress chart showing the user's learning progress.
+    Draw a progress chart showing the user's learning progress.
     
     Args:
         learned_count: Number of words learned
@@ -129,121 +152,293 @@ def create_progress_chart(learned_count: int, target_count: int = None,
         days_active: Optional number of days the user has been active
         
     Returns:
-        Path to the generated image file
+        The chart image
     """
-    try:
-        # Create image with white background
-        img = Image.new('RGB', (800, 400), COLORS["background"])
-        draw = ImageDraw.Draw(img)
-        
-        # Get fonts
-        title_font = get_font("bold", 36)
-        label_font = get_font("regular", 24)
-        number_font = get_font("bold", 48)
-        
-        # Draw title
-        draw.text((400, 50), "Learning Progress", font=title_font, 
+    # Create image with white background
+    img = Image.new('RGB', (800, 400), COLORS["background"])
+    draw = ImageDraw.Draw(img)
+    
+    # Get fonts
+    title_font = get_font("bold", 36)
+    label_font = get_font("regular", 24)
+    number_font = get_font("bold", 48)
+    
+    # Draw title
+    draw.text((400, 50), "Learning Progress", font=title_font, 
+             fill=COLORS["text_primary"], anchor="mm")
+    
+    # Draw learned words count in a circle
+    circle_center = (200, 200)
+    circle_radius = 100
+    draw.ellipse((circle_center[0]-circle_radius, circle_center[1]-circle_radius,
+                 circle_center[0]+circle_radius, circle_center[1]+circle_radius),
+                outline=COLORS["accent"], width=3)
+    
+    draw.text((circle_center[0], circle_center[1]-20), "Words Learned", 
+             font=label_font, fill=COLORS["text_secondary"], anchor="mm")
+    
+    draw.text((circle_center[0], circle_center[1]+20), str(learned_count), 
+             font=number_font, fill=COLORS["accent"], anchor="mm")
+    
+    # Draw additional stats if provided
+    if target_count:
+        draw.text((600, 150), "Target", font=label_font, 
+                 fill=COLORS["text_secondary"], anchor="mm")
+        draw.text((600, 190), str(target_count), font=number_font, 
                  fill=COLORS["text_primary"], anchor="mm")
         
-        # Draw learned words count in a circle
-        circle_center = (200, 200)
-        circle_radius = 100
-        draw.ellipse((circle_center[0]-circle_radius, circle_center[1]-circle_radius,
-                     circle_center[0]+circle_radius, circle_center[1]+circle_radius),
-                    outline=COLORS["accent"], width=3)
-        
-        draw.text((circle_center[0], circle_center[1]-20), "Words Learned", 
-                 font=label_font, fill=COLORS["text_secondary"], anchor="mm")
+        # Draw progress bar
+        progress = min(1.0, learned_count / target_count) if target_count > 0 else 0
+        bar_width = 300
+        bar_height = 30
+        bar_left = 450
+        bar_top = 250
         
-        draw.text((circle_center[0], circle_center[1]+20), str(learned_count), 
-                 font=number_font, fill=COLORS["accent"], anchor="mm")
+        # Draw bar background
+        draw.rectangle([(bar_left, bar_top), 
+                       (bar_left + bar_width, bar_top + bar_height)], 
+                      fill=COLORS["border"])
         
-        # Draw additional stats if provided
-        if target_count:
-            draw.text((600, 150), "Target", font=label_font, 
-                     fill=COLORS["text_secondary"], anchor="mm")
-            draw.text((600, 190), str(target_count), font=number_font, 
-                     fill=COLORS["text_primary"], anchor="mm")
-            
-            # Draw progress bar
-            progress = min(1.0, learned_count / target_count) if target_count > 0 else 0
-            bar_width = 300
-            bar_height = 30
-            bar_left = 450
-            bar_top = 250
-            
-            # Draw bar background
-            draw.rectangle([(bar_left, bar_top), 
-                           (bar_left + bar_width, bar_top + bar_height)], 
-                          fill=COLORS["border"])
-            
-            # Draw progress fill
-            draw.rectangle([(bar_left, bar_top), 
-                           (bar_left + int(bar_width * progress), bar_top + bar_height)], 
-                          fill=COLORS["accent"])
-            
-            # Draw percentage
-            draw.text((bar_left + bar_width//2, bar_top + bar_height//2), 
-                     f"{int(progress*100)}%", font=label_font, 
-                     fill=COLORS["text_primary"], anchor="mm")
+        # Draw progress fill
+        draw.rectangle([(bar_left, bar_top), 
+                       (bar_left + int(bar_width * progress), bar_top + bar_height)], 
+                      fill=COLORS["accent"])
         
-        if days_active:
-            draw.text((600, 300), "Days Active", font=label_font, 
-                     fill=COLORS["text_secondary"], anchor="mm")
-            draw.text((600, 340), str(days_active), font=number_font, 
-                     fill=COLORS["text_primary"], anchor="mm")
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            file_path = temp_file.name
-            img.save(file_path, "PNG")
-            
-        return file_path
+        # Draw percentage
+        draw.text((bar_left + bar_width//2, bar_top + bar_height//2), 
+                 f"{int(progress*100)}%", font=label_font, 
+                 fill=COLORS["text_primary"], anchor="mm")
+    
+    if days_active:
+        draw.text((600, 300), "Days Active", font=label_font, 
+                 fill=COLORS["text_secondary"], anchor="mm")
+        draw.text((600, 340), str(days_active), font=number_font, 
+                 fill=COLORS["text_primary"], anchor="mm")
+
+    return img
+
+def render_level_badge(level: str) -> Image.Image:
+    """
+    Draw a badge image for the user's current level.
+    
+    Args:
+        level: The user's level (A1, A2, B1, etc.)
         
+    Returns:
+        The badge image
+    """
+    # Create a circular badge
+    size = 200
+    img = Image.new('RGB', (size, size), COLORS["background"])
+    draw = ImageDraw.Draw(img)
+    
+    # Draw circular background
+    circle_color = {
+        "A1": (152, 251, 152),  # Pale Green
+        "A2": (144, 238, 144),  # Light Green
+        "B1": (135, 206, 250),  # Light Sky Blue
+        "B2": (100, 149, 237),  # Cornflower Blue
+        "C1": (221, 160, 221),  # Plum
+        "C2": (186, 85, 211),   # Medium Orchid
+    }.get(level, COLORS["accent"])
+    
+    draw.ellipse((10, 10, size-10, size-10), fill=circle_color, outline=(255,255,255), width=3)
+    
+    # Draw level text
+    level_font = get_font("bold", 80)
+    draw.text((size//2, size//2), level, font=level_font, 
+             fill=(255,255,255), anchor="mm")
+
+    return img
+
+
+# ───────────────────────── in-memory PNG ─────────────────────────
+
+def png_bytes(img: Image.Image, optimize: Optional[bool] = None, compress_level: Optional[int] = None) -> bytes:
+    """
+    Encode an image as PNG in memory, without touching the disk.
+
+    Args:
+        img: The image to encode
+        optimize: Extra compression pass (slower, smaller; implies zlib level 9), default PNG_OPTIMIZE
+        compress_level: zlib level 0-9 (0 is fastest, 9 is smallest), default PNG_COMPRESS_LEVEL
+
+    Returns:
+        PNG file contents
+    """
+    buffer = BytesIO()
+    img.save(buffer, "PNG",
+             optimize=PNG_OPTIMIZE if optimize is None else optimize,
+             compress_level=PNG_COMPRESS_LEVEL if compress_level is None else compress_level)
+    return buffer.getvalue()
+
+
+def png_buffer(img: Image.Image, filename: str = "image.png", **options) -> BytesIO:
+    """PNG in a named BytesIO, ready for InputFile or any file-like API."""
+    buffer = BytesIO(png_bytes(img, **options))
+    buffer.name = filename
+    return buffer
+
+
+def word_card_png(word: str, translation: str,
+                  transcription: Optional[str] = None,
+                  example: Optional[str] = None,
+                  level: Optional[str] = None, **options) -> bytes:
+    """Render a word card straight to PNG bytes (options as in png_bytes)."""
+    return png_bytes(render_word_card(word, translation, transcription, example, level), **options)
+
+
+def progress_chart_png(learned_count: int, target_count: int = None,
+                       days_active: int = None, **options) -> bytes:
+    """Render a progress chart straight to PNG bytes (options as in png_bytes)."""
+    return png_bytes(render_progress_chart(learned_count, target_count, days_active), **options)
+
+
+@functools.lru_cache(maxsize=16)
+def level_badge_png(level: str, optimize: Optional[bool] = None, compress_level: Optional[int] = None) -> bytes:
+    """PNG bytes of a level badge; there are only a few levels, so they stay in memory."""
+    return png_bytes(render_level_badge(level), optimize=optimize, compress_level=compress_level)
+
+
+def as_input_file(data: bytes, filename: str = "card.png") -> InputFile:
+    """Wrap PNG bytes for sending to Telegram without a temp file."""
+    return input_file(data, filename)
+
+
+# ───────────────────────── cached files ─────────────────────────
+
+def word_card_key(word: str, translation: str, transcription: Optional[str] = None,
+                  example: Optional[str] = None, level: Optional[str] = None) -> str:
+    """Content hash of a word card: same inputs and layout version give the same file."""
+    return content_key(MEDIA_KIND, "word_card", RENDER_VERSION, word, translation,
+                       transcription or None, example or None, level or None)
+
+
+def create_word_card(word: str, translation: str,
+                     transcription: Optional[str] = None,
+                     example: Optional[str] = None,
+                     level: Optional[str] = None) -> str:
+    """
+    Get a word card image, rendering it only if it is not cached yet.
+
+    Returns:
+        Path to the cached image file (owned by the cache, do not delete), or "" on error
+    """
+    try:
+        key = word_card_key(word, translation, transcription, example, level)
+        return str(card_cache.get_or_create(
+            key, lambda: png_bytes(render_word_card(word, translation, transcription, example, level))
+        ))
+    except Exception as e:
+        logger.error(f"Error creating word card: {e}")
+        return ""
+
+
+def create_progress_chart(learned_count: int, target_count: int = None,
+                          days_active: int = None) -> str:
+    """
+    Get a progress chart image (cached by its numbers).
+
+    Returns:
+        Path to the cached image file, or "" on error
+    """
+    try:
+        key = content_key(MEDIA_KIND, "progress_chart", RENDER_VERSION, learned_count, target_count, days_active)
+        return str(card_cache.get_or_create(
+            key, lambda: png_bytes(render_progress_chart(learned_count, target_count, days_active))
+        ))
     except Exception as e:
         logger.error(f"Error creating progress chart: {e}")
         return ""
 
+
 def create_level_badge(level: str) -> str:
     """
-    Create a badge image for the user's current level.
-    
-    Args:
-        level: The user's level (A1, A2, B1, etc.)
-        
+    Get the badge image for a level (rendered once per level).
+
     Returns:
-        Path to the generated image file
+        Path to the cached image file, or "" on error
     """
     try:
-        # Create a circular badge
-        size = 200
-        img = Image.new('RGB', (size, size), COLORS["background"])
-        draw = ImageDraw.Draw(img)
-        
-        # Draw circular background
-        circle_color = {
-            "A1": (152, 251, 152),  # Pale Green
-            "A2": (144, 238, 144),  # Light Green
-            "B1": (135, 206, 250),  # Light Sky Blue
-            "B2": (100, 149, 237),  # Cornflower Blue
-            "C1": (221, 160, 221),  # Plum
-            "C2": (186, 85, 211),   # Medium Orchid
-        }.get(level, COLORS["accent"])
-        
-        draw.ellipse((10, 10, size-10, size-10), fill=circle_color, outline=(255,255,255), width=3)
-        
-        # Draw level text
-        level_font = get_font("bold", 80)
-        draw.text((size//2, size//2), level, font=level_font, 
-                 fill=(255,255,255), anchor="mm")
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-            file_path = temp_file.name
-            img.save(file_path, "PNG")
-            
-        return file_path
-        
+        key = content_key(MEDIA_KIND, "level_badge", RENDER_VERSION, level)
+        return str(card_cache.get_or_create(key, lambda: level_badge_png(level)))
     except Exception as e:
         logger.error(f"Error creating level badge: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+
+async def send_word_card(bot, chat_id: int, word: str, translation: str,
+                         transcription: Optional[str] = None, example: Optional[str] = None,
+                         level: Optional[str] = None, **kwargs):
+    """
+    Send a word card by its saved file_id. The first time the PNG is uploaded
+    from the disk cache if it was pre-rendered, otherwise straight from memory.
+    """
+    key = word_card_key(word, translation, transcription, example, level)
+
+    def load():
+        if card_cache.contains(key):
+            return card_cache.get_or_create(
+                key, lambda: word_card_png(word, translation, transcription, example, level)
+            )
+        return word_card_png(word, translation, transcription, example, level)
+
+    return await send_cached(bot.send_photo, chat_id, key, card_file_ids, load, "photo",
+                             filename="card.png", **kwargs)
+
+
+# ───────────────────────── batch pre-render ─────────────────────────
+
+def _render_card_job(job: Tuple[str, str, tuple]) -> Tuple[str, int]:
+    """Process-pool worker: render one card straight into its cache path."""
+    key, path, card = job
+    data = png_bytes(render_word_card(*card))
+    write_atomic(Path(path), data)
+    return key, len(data)
+
+
+def prerender_cards(cards: Iterable[tuple], workers: int = CARD_PRERENDER_WORKERS) -> int:
+    """
+    Render missing cards in parallel processes.
+
+    Args:
+        cards: Tuples of create_word_card arguments (word, translation, transcription, example, level)
+        workers: Number of processes (1 renders in the current process)
+
+    Returns:
+        Number of rendered cards
+    """
+    jobs = []
+    for card in dict.fromkeys(tuple(card) for card in cards):
+        key = word_card_key(*card)
+        if not card_cache.contains(key):
+            jobs.append((key, str(card_cache.path(key)), card))
+    if not jobs:
+        return 0
+
+    if workers <= 1 or len(jobs) == 1:
+        results = [_render_card_job(job) for job in jobs]
+    else:
+        # spawn, as in update_router: a forked child would inherit the bot's threads' locks
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_render_card_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    # Files were written by child processes — account for them in this process's cache index
+    for key, size in results:
+        card_cache.register(key, size)
+    logger.info(f"Pre-rendered {len(results)} word cards")
+    return len(results)
+
+
+def prerender_set(level: str, set_name: str, workers: int = CARD_PRERENDER_WORKERS) -> int:
+    """Pre-render cards for every word of a set; returns the number of rendered cards."""
+    from utils.word_catalog import word_catalog
+
+    word_set = word_catalog.get_set(level, set_name)
+    if word_set is None:
+        return 0
+    return prerender_cards(
+        ((record.english, record.translation, record.transcription or None, None, level)
+         for record in word_set.records if record.english),
+        workers,
+    )
@@ -0,0 +1,313 @@
+# services/message_dispatcher.py
+"""
+Центральная очередь исходящих сообщений с учетом лимитов Telegram.
+
+Все фоновые отправки (уведомления планировщика, оповещения об оплате,
+рассылки) идут через одну очередь с приоритетами:
+
+* глобальный token bucket — не больше TELEGRAM_GLOBAL_RATE сообщений в секунду;
+* token bucket на чат — не больше TELEGRAM_CHAT_RATE сообщения в секунду в один чат;
+* RetryAfter от Telegram приостанавливает всю отправку на указанное время,
+  сообщение повторяется автоматически;
+* ответы на действия пользователя (PRIORITY_INTERACTIVE) обслуживаются раньше
+  напоминаний и рассылок. Ответы, которые хендлеры отправляют напрямую,
+  резервируют токены через InteractiveReserveMiddleware.
+
+    await message_dispatcher.send_message(chat_id, "Привет", priority=PRIORITY_SCHEDULED)
+    message_dispatcher.submit_threadsafe(chat_id, "Привет", priority=PRIORITY_SCHEDULED)  # из другого потока
+    message_dispatcher.submit_many_threadsafe([(chat_id, "Привет")], priority=PRIORITY_NOTIFICATION)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.utils.exceptions import RetryAfter
+
+from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше — важнее
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NOTIFICATION = 1   # оплата, подписка
+PRIORITY_SCHEDULED = 2      # слова дня, напоминания
+PRIORITY_BROADCAST = 3      # массовые рассылки
+
+MAX_RETRY_AFTER_ATTEMPTS = 3
+# Неактивные бакеты чатов удаляются, чтобы словарь не рос бесконечно
+CHAT_BUCKET_TTL = 60.0
+
+
+class TokenBucket:
+    """Классический token bucket; допускает «долг» для резервирования."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен (0 — прямо сейчас)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "chat_id", "call", "future", "attempts")
+
+    def __init__(self, priority: int, seq: int, chat_id: int, call: Callable, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.call = call
+        self.future = future
+        self.attempts = 0
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class MessageDispatcher:
+    """Очередь с приоритетами и token bucket'ами; один фоновый воркер в цикле событий бота."""
+
+    def __init__(self, global_rate: float = TELEGRAM_GLOBAL_RATE, chat_rate: float = TELEGRAM_CHAT_RATE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self._clock = clock
+        self._global = TokenBucket(global_rate, global_rate, clock())
+        self._chats: Dict[int, TokenBucket] = {}
+        self._heap: List[_Job] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.bot: Optional[Bot] = None
+        self.stats = {"sent": 0, "failed": 0, "retry_after": 0}
+
+    def set_global_rate(self, rate: float) -> None:
+        """Меняет общий лимит (в режиме webhook он делится между процессами-воркерами)."""
+        self.global_rate = rate
+        self._global = TokenBucket(rate, rate, self._clock())
+
+    # ───────────────────────── жизненный цикл ─────────────────────────
+    def start(self, bot: Optional[Bot] = None) -> None:
+        """Запускает воркер в текущем цикле событий."""
+        if bot is not None:
+            self.bot = bot
+        if self._worker is not None and not self._worker.done():
+            return
+        self.loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._worker = self.loop.create_task(self._run())
+        logger.info("Очередь исходящих сообщений запущена: %.0f сообщ./с, %.1f в чат",
+                    self.global_rate, self.chat_rate)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дожидается отправки очереди (не дольше timeout) и останавливает воркер."""
+        if self._worker is None:
+            return
+        deadline = self._clock() + timeout
+        while (self._heap or self._inflight) and self._clock() < deadline:
+            await asyncio.sleep(0.05)
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        for job in self._heap:
+            if not job.future.done():
+                job.future.cancel()
+        if self._heap:
+            logger.warning("Очередь остановлена, не отправлено сообщений: %d", len(self._heap))
+        self._heap.clear()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # ───────────────────────── постановка в очередь ─────────────────────────
+    def submit(self, chat_id: int, call: Callable, priority: int = PRIORITY_INTERACTIVE) -> asyncio.Future:
+        """
+        Ставит в очередь произвольный вызов API (call — функция без аргументов,
+        возвращающая корутину). Возвращает future с результатом вызова.
+        """
+        if self._worker is None or self._worker.done():
+            self.start()
+        future = self.loop.create_future()
+        heapq.heappush(self._heap, _Job(priority, next(self._seq), chat_id, call, future))
+        self._wakeup.set()
+        return future
+
+    async def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_INTERACTIVE,
+                           bot: Optional[Bot] = None, **kwargs):
+        """Отправляет сообщение через очередь и возвращает Message (или пробрасывает ошибку)."""
+        bot = bot or self.bot or Bot.get_current()
+        if self.bot is None:
+            self.bot = bot
+        return await self.submit(chat_id, lambda: bot.send_message(chat_id, text, **kwargs), priority)
+
+    def submit_threadsafe(self, chat_id: int, text: str, priority: int = PRIORITY_SCHEDULED,
+                          bot: Optional[Bot] = None, **kwargs) -> None:
+        """Постановка сообщения из другого потока (например, из задачи APScheduler)."""
+        self.submit_many_threadsafe([(chat_id, text)], priority, bot, **kwargs)
+
+    def submit_many_threadsafe(self, messages: Iterable[Tuple[int, str]], priority: int = PRIORITY_SCHEDULED,
+                               bot: Optional[Bot] = None, **kwargs) -> None:
+        """Пакет сообщений (chat_id, текст) из другого потока — один переход в цикл событий."""
+        if self.loop is None:
+            raise RuntimeError("MessageDispatcher не запущен")
+        bot = bot or self.bot
+        messages = list(messages)
+
+        def send(chat_id: int, text: str):
+            return lambda: bot.send_message(chat_id, text, **kwargs)
+
+        def enqueue():
+            for chat_id, text in messages:
+                future = self.submit(chat_id, send(chat_id, text), priority)
+                future.add_done_callback(_log_failure(chat_id))
+
+        self.loop.call_soon_threadsafe(enqueue)
+
+    def reserve(self, chat_id: int) -> None:
+        """
+        Учитывает ответ, который хендлер отправит напрямую: токены списываются
+        сразу (в долг), и фоновые сообщения подождут.
+        """
+        now = self._clock()
+        self._global.take(now)
+        self._chat_bucket(chat_id, now).take(now)
+
+    # ───────────────────────── воркер ─────────────────────────
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, 1, now)
+        return bucket
+
+    def _next_job(self, now: float):
+        """
+        Самое приоритетное задание, чат которого готов принять сообщение.
+        Возвращает (job, 0) или (None, сколько ждать).
+        """
+        wait = self._global.wait_time(now)
+        if wait > 0:
+            return None, wait
+        deferred = []
+        job, wait = None, None
+        while self._heap:
+            candidate = heapq.heappop(self._heap)
+            if candidate.future.cancelled():
+                continue
+            chat_wait = self._chat_bucket(candidate.chat_id, now).wait_time(now)
+            if chat_wait <= 0:
+                job = candidate
+                break
+            deferred.append(candidate)
+            wait = chat_wait if wait is None else min(wait, chat_wait)
+        for candidate in deferred:
+            heapq.heappush(self._heap, candidate)
+        return job, (0.0 if job else wait)
+
+    def _prune_buckets(self, now: float) -> None:
+        stale = [chat_id for chat_id, bucket in self._chats.items() if now - bucket.updated > CHAT_BUCKET_TTL]
+        for chat_id in stale:
+            del self._chats[chat_id]
+
+    async def _run(self) -> None:
+        last_prune = self._clock()
+        while True:
+            now = self._clock()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if now - last_prune > CHAT_BUCKET_TTL:
+                self._prune_buckets(now)
+                last_prune = now
+
+            job, wait = self._next_job(now)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global.take(now)
+            self._chat_bucket(job.chat_id, now).take(now)
+            # Сам запрос к API выполняется параллельно: лимит задают бакеты, а не задержка сети
+            task = self.loop.create_task(self._execute(job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, job: _Job) -> None:
+        try:
+            result = await job.call()
+        except RetryAfter as e:
+            self.stats["retry_after"] += 1
+            self._paused_until = max(self._paused_until, self._clock() + e.timeout)
+            job.attempts += 1
+            logger.warning("Flood control Telegram: пауза %s с (чат %s)", e.timeout, job.chat_id)
+            if job.attempts < MAX_RETRY_AFTER_ATTEMPTS:
+                heapq.heappush(self._heap, job)
+                self._wakeup.set()
+                return
+            self.stats["failed"] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        except Exception as e:
+            self.stats["failed"] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        self.stats["sent"] += 1
+        if not job.future.done():
+            job.future.set_result(result)
+
+
+def _log_failure(chat_id: int):
+    def callback(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Ошибка отправки сообщения пользователю %s: %s", chat_id, future.exception())
+    return callback
+
+
+class InteractiveReserveMiddleware(BaseMiddleware):
+    """Резервирует токены под ответ на каждое входящее сообщение/нажатие кнопки."""
+
+    def __init__(self, dispatcher: "MessageDispatcher"):
+        super().__init__()
+        self.dispatcher = dispatcher
+
+    async def on_pre_process_message(self, message, data: dict):
+        self.dispatcher.reserve(message.chat.id)
+
+    async def on_pre_process_callback_query(self, callback_query, data: dict):
+        self.dispatcher.reserve(callback_query.from_user.id)
+
+
+# Глобальная очередь
+message_dispatcher = MessageDispatcher()
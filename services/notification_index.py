@@ -0,0 +1,286 @@
+"""
+Индекс «кому что-то положено в эту минуту» для поминутного планировщика.
+
+Расписание хранится целыми минутами суток в компактных массивах (модуль
+array), сгруппированных по часовому поясу:
+
+* members — все пользователи пояса (для перестройки и подсчета);
+* planned — пользователи с планом (окно напоминания о тесте);
+* minutes / chat_ids — параллельные массивы локальных минут уведомлений,
+  отсортированные по минуте.
+
+Тик переводит текущую UTC-минуту в локальную один раз на пояс (смещение
+считается на каждом тике, поэтому переход на летнее время учитывается сразу)
+и берет срез массива двоичным поиском — без обхода пользователей и без
+сравнения строк 'HH:MM'. Изменения между перестройками копятся в небольшом
+оверлее и периодически вливаются в массивы.
+"""
+
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from config import REMINDER_START, DURATION_HOURS, PRODUCTION_MODE
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_TIMEZONE = "Europe/Moscow"
+
+# Окно напоминания о тесте вокруг конца периода уведомлений (± минут)
+TEST_REMINDER_WINDOW = 5
+# Оверлей вливается в массивы, когда превышает эту долю индекса (но не меньше минимума)
+OVERLAY_COMPACT_RATIO = 0.02
+OVERLAY_COMPACT_MIN = 256
+
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+    """Кэшированный ZoneInfo: объект пояса создается один раз на имя."""
+    return ZoneInfo(name)
+
+
+def resolve_timezone(user) -> ZoneInfo:
+    """Возвращает часовой пояс пользователя с fallback на Москву."""
+    name = user[5] if len(user) > 5 and user[5] else DEFAULT_TIMEZONE
+    try:
+        return _zone(name)
+    except Exception:
+        return _zone(DEFAULT_TIMEZONE)
+
+
+def hhmm_to_minute(value: str) -> int:
+    """'HH:MM' → минута суток."""
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _test_reminder_minutes(first_time: str, duration_hours: float) -> FrozenSet[int]:
+    end = hhmm_to_minute(first_time) + int(round(duration_hours * 60))
+    return frozenset(
+        (end + delta) % MINUTES_PER_DAY
+        for delta in range(-TEST_REMINDER_WINDOW, TEST_REMINDER_WINDOW + 1)
+    )
+
+
+def _default_plan_times(user) -> Optional[Sequence[int]]:
+    """Минуты уведомлений из плана слов дня (тот же план, что использует планировщик)."""
+    from utils.helpers import get_daily_plan_for_user
+    from utils.daily_plan import DailyPlan
+
+    plan = get_daily_plan_for_user(
+        user[0], user[1], user[2], user[3],
+        first_time=REMINDER_START, duration_hours=DURATION_HOURS
+    )
+    if not isinstance(plan, DailyPlan):
+        return None
+    return plan.minutes
+
+
+class _ZoneGroup:
+    """Массивы расписания пользователей одного часового пояса."""
+
+    __slots__ = ("members", "planned", "minutes", "chat_ids")
+
+    def __init__(self, members: array, planned: array, by_minute: Dict[int, array]):
+        self.members = members
+        self.planned = planned
+        self.minutes = array("H")
+        self.chat_ids = array("q")
+        for minute in sorted(by_minute):
+            chat_ids = by_minute[minute]
+            self.minutes.extend(array("H", [minute]) * len(chat_ids))
+            self.chat_ids.extend(chat_ids)
+
+    def due(self, local_minute: int, reminder_minutes: FrozenSet[int]) -> List[int]:
+        result = []
+        if local_minute in reminder_minutes:
+            result.extend(self.planned)
+        lo = bisect_left(self.minutes, local_minute)
+        hi = bisect_right(self.minutes, local_minute, lo)
+        if hi > lo:
+            result.extend(self.chat_ids[lo:hi])
+        return result
+
+
+# Запись пользователя: (пояс, минуты уведомлений или None, если плана нет)
+_Entry = Tuple[str, Optional[FrozenSet[int]]]
+
+
+class NotificationIndex:
+    """
+    Расписание всех пользователей в минутах суток, сгруппированное по поясам.
+
+    Индекс — надмножество: попадание в выборку означает лишь, что пользователя
+    стоит проверить в эту минуту. Точные условия отправки по-прежнему
+    проверяются в process_user. Полуночный сброс выполняется отдельно
+    (services/daily_reset.py).
+    """
+
+    def __init__(self, plan_provider: Callable = _default_plan_times,
+                 first_time: str = REMINDER_START,
+                 duration_hours: float = DURATION_HOURS):
+        self._plan_provider = plan_provider
+        self._reminder_minutes = _test_reminder_minutes(first_time, duration_hours)
+        self._groups: Dict[str, _ZoneGroup] = {}
+        # Отсортированные chat_id, вошедшие в массивы при последней перестройке
+        self._base_ids = array("q")
+        # Изменения после перестройки: chat_id → запись (None — удален)
+        self._overlay: Dict[int, Optional[_Entry]] = {}
+        self._dirty = set()
+        self._built_day: Optional[str] = None
+        self._lock = threading.RLock()
+
+    # ───────────────────────── построение ─────────────────────────
+    def _entry(self, user) -> _Entry:
+        try:
+            times = self._plan_provider(user)
+        except Exception as e:
+            if not PRODUCTION_MODE:
+                logger.error("Ошибка расчета плана для пользователя %s: %s", user[0], e)
+            times = None
+        # План без слов (несоответствие набора / нет слов) — только сброс
+        minutes = frozenset(t if isinstance(t, int) else hhmm_to_minute(t) for t in times) if times else None
+        return resolve_timezone(user).key, minutes
+
+    def _build(self, entries: Iterable[Tuple[int, _Entry]],
+               groups: Optional[Dict[str, Tuple[array, array, Dict[int, array]]]] = None,
+               ids: Optional[array] = None) -> None:
+        """Раскладывает записи по поясам и минутам (сортировка подсчетом, без кортежей на пару)."""
+        groups = {} if groups is None else groups
+        ids = array("q") if ids is None else ids
+        for chat_id, (zone, minutes) in entries:
+            ids.append(chat_id)
+            group = groups.get(zone)
+            if group is None:
+                group = groups[zone] = (array("q"), array("q"), {})
+            group[0].append(chat_id)
+            if minutes:
+                group[1].append(chat_id)
+                by_minute = group[2]
+                for minute in minutes:
+                    bucket = by_minute.get(minute)
+                    if bucket is None:
+                        bucket = by_minute[minute] = array("q")
+                    bucket.append(chat_id)
+        self._groups = {zone: _ZoneGroup(*group) for zone, group in groups.items()}
+        self._base_ids = array("q", sorted(ids))
+        self._overlay = {}
+
+    def _in_base(self, chat_id: int) -> bool:
+        pos = bisect_left(self._base_ids, chat_id)
+        return pos < len(self._base_ids) and self._base_ids[pos] == chat_id
+
+    def _compact(self) -> None:
+        """Вливает оверлей в массивы: старые записи фильтруются, новые добавляются."""
+        overlay = self._overlay
+        groups = {}
+        ids = array("q")
+        for zone, group in self._groups.items():
+            members = array("q", (chat_id for chat_id in group.members if chat_id not in overlay))
+            planned = array("q", (chat_id for chat_id in group.planned if chat_id not in overlay))
+            by_minute: Dict[int, array] = {}
+            for minute, chat_id in zip(group.minutes, group.chat_ids):
+                if chat_id not in overlay:
+                    bucket = by_minute.get(minute)
+                    if bucket is None:
+                        bucket = by_minute[minute] = array("q")
+                    bucket.append(chat_id)
+            groups[zone] = (members, planned, by_minute)
+            ids.extend(members)
+        self._build(((chat_id, entry) for chat_id, entry in overlay.items() if entry is not None),
+                    groups, ids)
+
+    def _set_entry(self, chat_id: int, entry: Optional[_Entry]) -> None:
+        if entry is None and not self._in_base(chat_id):
+            self._overlay.pop(chat_id, None)
+        else:
+            self._overlay[chat_id] = entry
+        if len(self._overlay) > max(OVERLAY_COMPACT_MIN, len(self._base_ids) * OVERLAY_COMPACT_RATIO):
+            self._compact()
+
+    def rebuild(self, users: Iterable, now_utc: Optional[datetime] = None) -> None:
+        """Полное перестроение индекса (новый день, перезагрузка кэша пользователей)."""
+        with self._lock:
+            self._build((user[0], self._entry(user)) for user in users)
+            # Построение планов само помечает пользователей — они уже учтены
+            self._dirty.clear()
+            self._built_day = datetime.now().strftime("%Y-%m-%d")
+        logger.info("Индекс уведомлений перестроен: %d пользователей, %d поясов",
+                    len(self._base_ids), len(self._groups))
+
+    def needs_rebuild(self) -> bool:
+        """Нужна ли полная перестройка (индекс не построен или сменился день плана)."""
+        return self._built_day != datetime.now().strftime("%Y-%m-%d")
+
+    def invalidate(self) -> None:
+        """Помечает весь индекс устаревшим: следующий тик перестроит его целиком."""
+        with self._lock:
+            self._built_day = None
+
+    # ───────────────────────── инкрементальные изменения ─────────────────────────
+    def mark_dirty(self, chat_id: int) -> None:
+        """Пользователь изменил настройки или план — пересчитать на следующем тике."""
+        with self._lock:
+            self._dirty.add(chat_id)
+
+    def remove(self, chat_id: int) -> None:
+        with self._lock:
+            self._set_entry(chat_id, None)
+            self._dirty.discard(chat_id)
+
+    def refresh_dirty(self, user_cache: Dict[int, tuple], now_utc: Optional[datetime] = None) -> int:
+        """Переиндексирует помеченных пользователей. Возвращает их количество."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for chat_id in dirty:
+                user = user_cache.get(chat_id)
+                self._set_entry(chat_id, None if user is None else self._entry(user))
+            # Построение плана само уведомляет о новом плане — он уже учтен
+            self._dirty.difference_update(dirty)
+        return len(dirty)
+
+    # ───────────────────────── выборка ─────────────────────────
+    def due(self, now_utc: datetime) -> List[int]:
+        """Пользователи, которых нужно проверить в текущую минуту."""
+        with self._lock:
+            local_minutes = {
+                zone: _local_minute(now_utc, zone)
+                for zone in set(self._groups).union(
+                    entry[0] for entry in self._overlay.values() if entry is not None
+                )
+            }
+            result = []
+            for zone, group in self._groups.items():
+                result.extend(group.due(local_minutes[zone], self._reminder_minutes))
+            if self._overlay:
+                result = [chat_id for chat_id in result if chat_id not in self._overlay]
+                for chat_id, entry in self._overlay.items():
+                    if entry is None:
+                        continue
+                    zone, minutes = entry
+                    minute = local_minutes[zone]
+                    if minutes and (minute in minutes or minute in self._reminder_minutes):
+                        result.append(chat_id)
+        # Пользователь может попасть в выборку дважды (уведомление в окне напоминания о тесте)
+        return list(dict.fromkeys(result))
+
+    def __len__(self) -> int:
+        with self._lock:
+            removed = sum(1 for chat_id in self._overlay if self._in_base(chat_id))
+            added = sum(1 for entry in self._overlay.values() if entry is not None)
+            return len(self._base_ids) - removed + added
+
+
+def _local_minute(now_utc: datetime, zone: str) -> int:
+    local = now_utc.astimezone(_zone(zone))
+    return local.hour * 60 + local.minute
+
+
+# Глобальный экземпляр для планировщика
+notification_index = NotificationIndex()
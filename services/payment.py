@@ -6,7 +6,10 @@ from typing import Optional, Dict, Any, List
 
 from yookassa import Configuration, Payment
 from config import YOOKASSA_SHOP_ID, YOOKASSA_SECRET_KEY, SUBSCRIPTION_PRICES
+from database.async_crud import run_db
 from database.db import db_manager
+from services.message_dispatcher import message_dispatcher, PRIORITY_NOTIFICATION
+from services.payment_gateway import payment_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -193,10 +196,110 @@ class PaymentService:
         except Exception as e:
             logger.error(f"Error marking payment as processed: {e}")
     
+    @staticmethod
+    def get_active_payment(payment_id: str) -> Optional[Dict[str, Any]]:
+        """Сохраненный платеж по ID (в том числе уже обработанный)."""
+        with db_manager.get_cursor() as cursor:
+            cursor.execute('''
+                SELECT chat_id, amount, months, status, processed
+                FROM active_payments WHERE payment_id = ?
+            ''', (payment_id,))
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return {
+            'chat_id': row[0],
+            'payment_id': payment_id,
+            'amount': row[1],
+            'months': row[2],
+            'status': row[3],
+            'processed': bool(row[4])
+        }
+
+    @staticmethod
+    def claim_payment(payment_id: str, status: str = 'completed') -> bool:
+        """
+        Атомарно отмечает платеж обработанным. True возвращает только первый
+        вызов, поэтому webhook, фоновая проверка и /start не активируют
+        один платеж дважды.
+        """
+        with db_manager.transaction() as conn:
+            return PaymentService._claim(conn, payment_id, status)
+
+    @staticmethod
+    def _claim(conn, payment_id: str, status: str = 'completed') -> bool:
+        cursor = conn.execute('''
+            UPDATE active_payments SET processed = TRUE, status = ?
+            WHERE payment_id = ? AND processed = FALSE
+        ''', (status, payment_id))
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def activate_subscription(chat_id: int, payment_id: str, months: int) -> Optional[bool]:
+        """
+        Продлевает подписку по успешному платежу и отмечает платеж обработанным.
+
+        Returns:
+            None, если платеж уже обработан; иначе True при продлении
+            действующей подписки и False для новой
+        """
+        from database import crud
+
+        # Отметка платежа и продление — одна транзакция: при ошибке откатываются
+        # обе записи, и платеж подхватит следующая проверка
+        with db_manager.transaction() as conn:
+            if not PaymentService._claim(conn, payment_id):
+                logger.info(f"Payment {payment_id} already processed")
+                return None
+
+            is_extension = crud.is_user_premium(chat_id)
+
+            # Вычисляем дату окончания подписки
+            expiry_date = PaymentService.calculate_subscription_expiry(months, chat_id)
+
+            # Обновляем подписку пользователя
+            crud.write_user_subscription(conn, chat_id, "premium", expiry_date, payment_id)
+        crud.entitlement_cache.invalidate(chat_id)
+        logger.info(f"Activated subscription for user {chat_id} until {expiry_date}")
+        return is_extension
+
+    @staticmethod
+    async def notify_subscription_activated(chat_id: int, months: int, is_extension: bool, bot=None):
+        """Сообщает пользователю об активации или продлении Premium."""
+        period_text = {
+            1: "1 месяц",
+            3: "3 месяца",
+            6: "6 месяцев",
+            12: "12 месяцев"
+        }.get(months, f"{months} месяцев")
+
+        if is_extension:
+            message = (
+                f"🎉 *Подписка продлена!*\n\n"
+                f"💎 Добавлен период: {period_text}\n"
+                f"Ваш Premium доступ продлен автоматически!"
+            )
+        else:
+            message = (
+                f"🎉 *Premium активирован!*\n\n"
+                f"💎 Период: {period_text}\n"
+                f"Теперь у вас есть доступ ко всем наборам слов!"
+            )
+
+        try:
+            await message_dispatcher.send_message(
+                chat_id, message, priority=PRIORITY_NOTIFICATION,
+                bot=bot, parse_mode="Markdown"
+            )
+            logger.info(f"Sent subscription notification to user {chat_id}")
+        except Exception as e:
+            logger.error(f"Error sending notification to user {chat_id}: {e}")
+
     @staticmethod
     def check_payment_status(payment_id: str) -> Optional[Dict[str, Any]]:
         """
-        Проверяет статус платежа.
+        Проверяет статус платежа (синхронно, через SDK — для скриптов;
+        в боте используйте payment_gateway.get_payment).
         
         Args:
             payment_id: ID платежа
@@ -239,68 +342,36 @@ class PaymentService:
         processed_count = 0
         
         try:
-            active_payments = PaymentService.get_active_payments(chat_id)
+            active_payments = await run_db(PaymentService.get_active_payments, chat_id)
+            if not active_payments:
+                return 0
+            
+            # Статусы в ЮKassa запрашиваются параллельно, без блокировки цикла событий
+            statuses = await payment_gateway.get_payments(p['payment_id'] for p in active_payments)
             
             for payment_data in active_payments:
                 payment_id = payment_data['payment_id']
                 months = payment_data['months']
                 
-                # Проверяем статус в ЮKassa
-                status = PaymentService.check_payment_status(payment_id)
+                status = statuses.get(payment_id)
                 
                 if status and status["status"] == "succeeded" and status["paid"]:
                     # Платеж успешен - активируем подписку
-                    from database import crud
-                    
-                    # Вычисляем дату окончания подписки
-                    expiry_date = PaymentService.calculate_subscription_expiry(months, chat_id)
-                    
-                    # Обновляем подписку пользователя
-                    crud.update_user_subscription(chat_id, "premium", expiry_date, payment_id)
-                    
-                    # Отмечаем платеж как обработанный
-                    PaymentService.mark_payment_processed(payment_id)
-                    
+                    is_extension = await run_db(PaymentService.activate_subscription, chat_id, payment_id, months)
+                    if is_extension is None:
+                        continue
+
                     processed_count += 1
-                    
+
                     # Отправляем уведомление пользователю, если передан бот
                     if bot:
-                        try:
-                            # Определяем тип операции
-                            current_status, current_expires, _ = crud.get_user_subscription_status(chat_id)
-                            is_extension = (current_status == 'premium' and current_expires)
-                            
-                            period_text = {
-                                1: "1 месяц",
-                                3: "3 месяца",
-                                6: "6 месяцев",
-                                12: "12 месяцев"
-                            }.get(months, f"{months} месяцев")
-                            
-                            if is_extension:
-                                message = (
-                                    f"🎉 *Подписка продлена!*\n\n"
-                                    f"💎 Добавлен период: {period_text}\n"
-                                    f"Ваш Premium доступ продлен автоматически!"
-                                )
-                            else:
-                                message = (
-                                    f"🎉 *Premium активирован!*\n\n"
-                                    f"💎 Период: {period_text}\n"
-                                    f"Теперь у вас есть доступ ко всем наборам слов!"
-                                )
-                            
-                            await bot.send_message(chat_id, message, parse_mode="Markdown")
-                            logger.info(f"Sent subscription notification to user {chat_id}")
-                            
-                        except Exception as e:
-                            logger.error(f"Error sending notification to user {chat_id}: {e}")
-                    
+                        await PaymentService.notify_subscription_activated(chat_id, months, is_extension, bot)
+
                     logger.info(f"Successfully processed payment {payment_id} for user {chat_id}")
                 
                 elif status and status["status"] == "canceled":
                     # Платеж отменен
-                    PaymentService.mark_payment_processed(payment_id)
+                    await run_db(PaymentService.mark_payment_processed, payment_id)
                     logger.info(f"Payment {payment_id} was canceled")
         
         except Exception as e:
@@ -323,67 +394,47 @@ class PaymentService:
         processed_count = 0
         
         try:
-            active_payments = PaymentService.get_active_payments()
+            active_payments = await run_db(PaymentService.get_active_payments)
             logger.info(f"Checking {len(active_payments)} active payments")
             
+            pending = []
             for payment_data in active_payments:
-                chat_id = payment_data['chat_id']
                 payment_id = payment_data['payment_id']
-                months = payment_data['months']
-                created_at = payment_data['created_at']
                 
                 # Проверяем возраст платежа - если старше 24 часов, помечаем как истекший
                 try:
-                    created_time = datetime.fromisoformat(created_at)
+                    created_time = datetime.fromisoformat(payment_data['created_at'])
                     if datetime.now() - created_time > timedelta(hours=24):
-                        PaymentService.mark_payment_processed(payment_id)
+                        await run_db(PaymentService.mark_payment_processed, payment_id)
                         logger.info(f"Marked expired payment {payment_id} as processed")
                         continue
                 except Exception as e:
                     logger.error(f"Error parsing payment date: {e}")
+                pending.append(payment_data)
+            
+            # Статусы в ЮKassa запрашиваются параллельно (не больше PAYMENT_POLL_CONCURRENCY)
+            statuses = await payment_gateway.get_payments(p['payment_id'] for p in pending)
+            
+            for payment_data in pending:
+                chat_id = payment_data['chat_id']
+                payment_id = payment_data['payment_id']
+                months = payment_data['months']
                 
-                # Проверяем статус в ЮKassa
-                status = PaymentService.check_payment_status(payment_id)
+                status = statuses.get(payment_id)
                 
                 if status and status["status"] == "succeeded" and status["paid"]:
                     # Платеж успешен - активируем подписку
-                    from database import crud
-                    
                     try:
-                        # Вычисляем дату окончания подписки
-                        expiry_date = PaymentService.calculate_subscription_expiry(months, chat_id)
-                        
-                        # Обновляем подписку пользователя
-                        crud.update_user_subscription(chat_id, "premium", expiry_date, payment_id)
-                        
-                        # Отмечаем платеж как обработанный
-                        PaymentService.mark_payment_processed(payment_id)
-                        
+                        is_extension = await run_db(PaymentService.activate_subscription, chat_id, payment_id, months)
+                        if is_extension is None:
+                            continue
+
                         processed_count += 1
-                        
+
                         # Отправляем уведомление пользователю
                         if bot:
-                            try:
-                                period_text = {
-                                    1: "1 месяц",
-                                    3: "3 месяца",
-                                    6: "6 месяцев",
-                                    12: "12 месяцев"
-                                }.get(months, f"{months} месяцев")
-                                
-                                message = (
-                                    f"🎉 *Premium активирован!*\n\n"
-                                    f"💎 Ваша подписка на {period_text} успешно оплачена!\n"
-                                    f"Теперь у вас есть доступ ко всем наборам слов.\n\n"
-                                    f"Перейдите в Настройки → Наборы слов для выбора новых наборов."
-                                )
-                                
-                                await bot.send_message(chat_id, message, parse_mode="Markdown")
-                                logger.info(f"Sent auto-activation notification to user {chat_id}")
-                                
-                            except Exception as e:
-                                logger.error(f"Error sending auto-notification to user {chat_id}: {e}")
-                        
+                            await PaymentService.notify_subscription_activated(chat_id, months, is_extension, bot)
+
                         logger.info(f"Auto-processed payment {payment_id} for user {chat_id}")
                         
                     except Exception as e:
@@ -391,7 +442,7 @@ class PaymentService:
                 
                 elif status and status["status"] == "canceled":
                     # Платеж отменен
-                    PaymentService.mark_payment_processed(payment_id)
+                    await run_db(PaymentService.mark_payment_processed, payment_id)
                     logger.info(f"Auto-marked canceled payment {payment_id} as processed")
         
         except Exception as e:
@@ -0,0 +1,156 @@
+# services/payment_gateway.py
+"""
+Неблокирующий клиент API ЮKassa для проверки статусов платежей.
+
+SDK yookassa синхронный (requests, новая сессия на каждый запрос): вызов
+Payment.find_one из хендлера останавливал весь цикл событий на время
+HTTP-запроса. Здесь запросы идут через aiohttp с одной постоянной сессией:
+
+* одновременно выполняется не больше PAYMENT_POLL_CONCURRENCY запросов;
+* одинаковые запросы, пришедшие одновременно, объединяются в один;
+* конечные статусы (succeeded, canceled) кэшируются — они уже не меняются.
+
+    status = await payment_gateway.get_payment(payment_id)
+    statuses = await payment_gateway.get_payments(payment_ids)
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+import aiohttp
+
+from config import (
+    YOOKASSA_SHOP_ID, YOOKASSA_SECRET_KEY, YOOKASSA_API_URL,
+    PAYMENT_POLL_CONCURRENCY, PAYMENT_STATUS_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "canceled")
+TERMINAL_CACHE_SIZE = 10000
+
+
+def payment_status_from_json(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Объект платежа API → словарь в формате PaymentService.check_payment_status."""
+    return {
+        "payment_id": data.get("id"),
+        "status": data.get("status"),
+        "paid": bool(data.get("paid")),
+        "amount": (data.get("amount") or {}).get("value"),
+        "created_at": data.get("created_at"),
+        "metadata": data.get("metadata") or {},
+    }
+
+
+class YooKassaGateway:
+    """Асинхронный клиент GET /payments/{id} с ограничением параллельности."""
+
+    def __init__(self, shop_id: Optional[str] = YOOKASSA_SHOP_ID,
+                 secret_key: Optional[str] = YOOKASSA_SECRET_KEY,
+                 api_url: str = YOOKASSA_API_URL,
+                 concurrency: int = PAYMENT_POLL_CONCURRENCY,
+                 timeout: float = PAYMENT_STATUS_TIMEOUT):
+        self.shop_id = shop_id
+        self.secret_key = secret_key
+        self.api_url = api_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._terminal: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"requests": 0, "cache_hits": 0, "errors": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.shop_id and self.secret_key)
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # Сессия и семафор привязаны к циклу событий
+            await self._close_stale_session()
+            self._loop = loop
+            self._inflight = {}
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(str(self.shop_id), str(self.secret_key)),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+            )
+        return self._session
+
+    async def _close_stale_session(self) -> None:
+        """Закрывает сессию прежнего цикла событий, чтобы ее соединения не оставались открытыми."""
+        session, self._session = self._session, None
+        if session is None or session.closed:
+            return
+        if self._loop is not None and self._loop.is_running():
+            # Прежний цикл работает в другом потоке — закрываем в нем
+            asyncio.run_coroutine_threadsafe(session.close(), self._loop)
+            return
+        try:
+            await session.close()
+        except RuntimeError as e:  # соединения закрытого цикла событий
+            logger.debug("Сессия ЮKassa прежнего цикла событий: %r", e)
+            session.detach()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ───────────────────────── запросы ─────────────────────────
+    async def get_payment(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        """Статус платежа или None при ошибке."""
+        cached = self._terminal.get(payment_id)
+        if cached is not None:
+            self._terminal.move_to_end(payment_id)
+            self.stats["cache_hits"] += 1
+            return cached
+        if not self.configured:
+            logger.error("ЮKassa not initialized")
+            return None
+
+        await self._ensure_session()
+        future = self._inflight.get(payment_id)
+        if future is None:
+            future = self._inflight[payment_id] = asyncio.ensure_future(self._fetch(payment_id))
+            future.add_done_callback(lambda _: self._inflight.pop(payment_id, None))
+        return await asyncio.shield(future)
+
+    async def get_payments(self, payment_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Статусы нескольких платежей; запросы идут параллельно (не больше concurrency)."""
+        payment_ids = list(dict.fromkeys(payment_ids))
+        results = await asyncio.gather(*(self.get_payment(payment_id) for payment_id in payment_ids))
+        return dict(zip(payment_ids, results))
+
+    async def _fetch(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        session = await self._ensure_session()
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            try:
+                async with session.get(f"{self.api_url}/payments/{payment_id}") as response:
+                    if response.status != 200:
+                        self.stats["errors"] += 1
+                        logger.error(f"Error checking payment status {payment_id}: HTTP {response.status}")
+                        return None
+                    status = payment_status_from_json(await response.json())
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError — некорректный JSON в ответе: ошибка только этого платежа
+                self.stats["errors"] += 1
+                logger.error(f"Error checking payment status {payment_id}: {e!r}")
+                return None
+
+        if status["status"] in TERMINAL_STATUSES:
+            self._terminal[payment_id] = status
+            if len(self._terminal) > TERMINAL_CACHE_SIZE:
+                self._terminal.popitem(last=False)
+        return status
+
+
+# Глобальный клиент
+payment_gateway = YooKassaGateway()
@@ -0,0 +1,158 @@
+# services/payment_webhook.py
+"""
+Прием HTTP-уведомлений ЮKassa в процессе бота (aiohttp, тот же цикл событий).
+
+Подписка активируется через секунду после оплаты, без опроса API:
+
+* уведомления принимаются только с адресов ЮKassa (PAYMENT_WEBHOOK_TRUSTED_IPS);
+* платеж должен быть сохранен в active_payments, пользователь и срок
+  берутся из этой записи, а не из metadata уведомления;
+* повторы одного уведомления отбрасываются в памяти, а активация
+  идемпотентна благодаря PaymentService.claim_payment — webhook и фоновая
+  проверка не продлят подписку дважды.
+
+Фоновая проверка платежей (check_payments_job) остается страховкой на случай
+потерянных уведомлений и при включенном webhook запускается редко.
+"""
+
+import ipaddress
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from aiohttp import web
+
+from config import (
+    PAYMENT_WEBHOOK_HOST, PAYMENT_WEBHOOK_PORT, PAYMENT_WEBHOOK_PATH,
+    PAYMENT_WEBHOOK_TRUSTED_IPS, PAYMENT_WEBHOOK_TRUST_PROXY,
+)
+from database.async_crud import run_db
+from services.payment import PaymentService
+
+logger = logging.getLogger(__name__)
+
+SEEN_EVENTS_LIMIT = 10000
+
+
+def _parse_networks(value: str):
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+class PaymentWebhook:
+    """HTTP-сервер уведомлений ЮKassa."""
+
+    def __init__(self, host: str = PAYMENT_WEBHOOK_HOST, port: int = PAYMENT_WEBHOOK_PORT,
+                 path: str = PAYMENT_WEBHOOK_PATH, trusted_ips: str = PAYMENT_WEBHOOK_TRUSTED_IPS,
+                 trust_proxy: bool = PAYMENT_WEBHOOK_TRUST_PROXY):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.trusted_networks = _parse_networks(trusted_ips)
+        self.trust_proxy = trust_proxy
+        self.bot = None
+        self._seen: "OrderedDict[tuple, None]" = OrderedDict()
+        self._runner: Optional[web.AppRunner] = None
+        self.stats = {"received": 0, "activated": 0, "duplicates": 0, "rejected": 0}
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self, bot=None) -> None:
+        """Запускает HTTP-сервер в текущем цикле событий."""
+        self.bot = bot
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Webhook ЮKassa слушает %s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ───────────────────────── обработка ─────────────────────────
+    def _is_trusted(self, request: web.Request) -> bool:
+        if not self.trusted_networks:
+            return True
+        remote = request.remote
+        if self.trust_proxy and request.headers.get("X-Forwarded-For"):
+            remote = request.headers["X-Forwarded-For"].split(",")[0].strip()
+        try:
+            address = ipaddress.ip_address(remote)
+        except (TypeError, ValueError):
+            return False
+        return any(address in network for network in self.trusted_networks)
+
+    def _remember(self, key: tuple) -> bool:
+        """False, если уведомление уже обрабатывалось."""
+        if key in self._seen:
+            return False
+        self._seen[key] = None
+        if len(self._seen) > SEEN_EVENTS_LIMIT:
+            self._seen.popitem(last=False)
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.stats["received"] += 1
+        if not self._is_trusted(request):
+            self.stats["rejected"] += 1
+            logger.warning("Webhook ЮKassa: отклонен запрос с адреса %s", request.remote)
+            return web.json_response({"status": "forbidden"}, status=403)
+
+        try:
+            data = await request.json()
+        except Exception:
+            return web.json_response({"status": "error", "message": "invalid json"}, status=400)
+
+        result = PaymentService.process_webhook(data)
+        if not result or not result.get("payment_id"):
+            return web.json_response({"status": "error", "message": "invalid notification"}, status=400)
+
+        key = (data.get("event"), result["payment_id"])
+        if not self._remember(key):
+            self.stats["duplicates"] += 1
+            return web.json_response({"status": "ok"})
+
+        try:
+            await self.process(data.get("event"), result)
+        except Exception as e:
+            # ЮKassa повторит уведомление, пока не получит 200
+            self._seen.pop(key, None)
+            logger.error(f"Error processing webhook for payment {result['payment_id']}: {e}")
+            return web.json_response({"status": "error"}, status=500)
+        return web.json_response({"status": "ok"})
+
+    async def process(self, event: str, result: dict) -> None:
+        payment_id = result["payment_id"]
+        payment = await run_db(PaymentService.get_active_payment, payment_id)
+        if payment is None:
+            logger.warning(f"Webhook for unknown payment {payment_id} ignored")
+            return
+        if payment["processed"]:
+            self.stats["duplicates"] += 1
+            return
+
+        if event == "payment.succeeded" and result.get("success"):
+            amount = result.get("amount")
+            if amount is not None and abs(float(amount) - float(payment["amount"])) > 0.01:
+                self.stats["rejected"] += 1
+                logger.warning(f"Webhook amount mismatch for payment {payment_id}: {amount} != {payment['amount']}")
+                return
+            chat_id, months = payment["chat_id"], payment["months"]
+            is_extension = await run_db(PaymentService.activate_subscription, chat_id, payment_id, months)
+            if is_extension is None:
+                self.stats["duplicates"] += 1
+                return
+            self.stats["activated"] += 1
+            logger.info(f"Webhook activated payment {payment_id} for user {chat_id}")
+            if self.bot:
+                await PaymentService.notify_subscription_activated(chat_id, months, is_extension, self.bot)
+        elif event == "payment.canceled":
+            if await run_db(PaymentService.claim_payment, payment_id, "canceled"):
+                logger.info(f"Payment {payment_id} was canceled")
+
+
+# Глобальный приемник уведомлений
+payment_webhook = PaymentWebhook()
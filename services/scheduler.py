@@ -7,9 +7,19 @@ import logging
 from aiogram import Bot
 from zoneinfo import ZoneInfo
 from database import crud
-from utils.helpers import get_daily_words_for_user, daily_words_cache, previous_daily_words, reset_daily_words_cache
-from utils.visual_helpers import extract_english
-from config import REMINDER_START, DURATION_HOURS, SERVER_TIMEZONE, PRODUCTION_MODE
+from database.entitlement_cache import entitlement_cache
+from database.session_store import expire_sessions
+from utils.helpers import get_daily_plan_for_user, add_daily_words_listener
+from utils.daily_plan import DailyPlan
+from services.message_dispatcher import message_dispatcher, PRIORITY_SCHEDULED
+from services.daily_reset import roll_over_plans, run_daily_reset
+from services.notification_index import notification_index
+from services.subscription_sweeper import subscription_sweep_job
+from services.update_router import owns_chat, is_primary_worker
+from config import (
+    REMINDER_START, DURATION_HOURS, SERVER_TIMEZONE, PRODUCTION_MODE, PAYMENT_WEBHOOK_ENABLED,
+    USER_CHANGES_RETENTION_HOURS, SUBSCRIPTION_SWEEP_INTERVAL_MINUTES,
+)
 
 logger = logging.getLogger(__name__)
 FIRST_TIME = REMINDER_START
@@ -20,15 +30,23 @@ user_cache = {}
 last_cache_update = 0
 last_payment_check = 0
 
+# Водяной знак журнала user_changes, до которого применены изменения user_cache
+user_changes_seq = 0
+
 # Оптимизированные интервалы для продакшена
-CACHE_UPDATE_INTERVAL = 1800 if PRODUCTION_MODE else 900  # 30 мин в продакшене, 15 мин в разработке
 PAYMENT_CHECK_INTERVAL = 600 if PRODUCTION_MODE else 300  # 10 мин в продакшене, 5 мин в разработке
+if PAYMENT_WEBHOOK_ENABLED:
+    # Платежи активирует webhook; опрос ЮKassa — только страховка от потерянных уведомлений
+    PAYMENT_CHECK_INTERVAL = 3600
+
+# Сброс/пересчет плана слов дня → пересчитать корзины пользователя в индексе
+add_daily_words_listener(notification_index.mark_dirty)
 
 def scheduler_job(bot: Bot, loop: asyncio.AbstractEventLoop):
     """
     Оптимизированная функция планировщика для продакшена.
     """
-    global last_cache_update, user_cache, last_payment_check
+    global last_cache_update, last_payment_check
     
     try:
         # Получаем серверное время
@@ -40,30 +58,39 @@ def scheduler_job(bot: Bot, loop: asyncio.AbstractEventLoop):
         current_time = now_server.timestamp()
         
         # Проверка платежей (реже в продакшене)
-        if current_time - last_payment_check > PAYMENT_CHECK_INTERVAL:
+        if current_time - last_payment_check > PAYMENT_CHECK_INTERVAL and is_primary_worker():
             asyncio.run_coroutine_threadsafe(check_payments_job(bot), loop)
             last_payment_check = current_time
         
-        # Обновление кэша пользователей (реже в продакшене)
-        if current_time - last_cache_update > CACHE_UPDATE_INTERVAL:
-            try:
-                user_cache = {user[0]: user for user in crud.get_all_users()}
+        # Кэш пользователей: полная загрузка при старте/сбросе, дальше — только
+        # изменения из журнала user_changes (настройки применяются за минуту)
+        try:
+            if not last_cache_update or not _apply_user_changes():
+                _reload_user_cache()
                 last_cache_update = current_time
-                logger.info("Кэш пользователей обновлен: %d пользователей", len(user_cache))
-            except Exception as e:
-                logger.error("Ошибка обновления кэша пользователей: %s", e)
-                if not user_cache:
-                    try:
-                        user_cache = {user[0]: user for user in crud.get_all_users()}
-                    except Exception:
-                        user_cache = {}
+        except Exception as e:
+            logger.error("Ошибка обновления кэша пользователей: %s", e)
         
         if not user_cache:
             return
         
-        # Обработка пользователей
+        # Индекс уведомлений: полная перестройка раз в день/после перезагрузки кэша,
+        # иначе — только пользователи с измененными настройками или планом
+        if notification_index.needs_rebuild():
+            notification_index.rebuild(user_cache.values(), now_server)
+        else:
+            notification_index.refresh_dirty(user_cache, now_server)
+        
+        # Полночь по местному времени: пакетный сброс по группам поясов
+        for chat_id in run_daily_reset(now_server, list(user_cache.values())):
+            test_reminder_sent.pop(chat_id, None)
+        
+        # Обработка только тех пользователей, у кого что-то запланировано на эту минуту
         processed_count = 0
-        for chat_id, user in user_cache.items():
+        for chat_id in notification_index.due(now_server):
+            user = user_cache.get(chat_id)
+            if user is None:
+                continue
             try:
                 timezone = user[5] if len(user) > 5 and user[5] else "Europe/Moscow"
                 
@@ -73,26 +100,16 @@ def scheduler_job(bot: Bot, loop: asyncio.AbstractEventLoop):
                     now_local = now_server.astimezone(ZoneInfo("Europe/Moscow"))
                     timezone = "Europe/Moscow"
                     
-                # Проверка на полночь для сброса данных (ИСПРАВЛЕНО: передаем часовой пояс)
-                local_hour = now_local.hour
-                local_minute = now_local.minute
-                
-                if local_hour == 0 and local_minute <= 3:
-                    process_daily_reset(chat_id, timezone)  # ИСПРАВЛЕНИЕ: передаем часовой пояс пользователя
-                    processed_count += 1
-                    continue
-                
                 # Проверка необходимости обработки
-                now_local_str = now_local.strftime("%H:%M")
                 needs_processing = False
                 
                 # Проверка времени уведомлений
                 try:
-                    result = get_daily_words_for_user(
+                    plan = get_daily_plan_for_user(
                         chat_id, user[1], user[2], user[3],
                         first_time=FIRST_TIME, duration_hours=DURATION_HOURS
                     )
-                    if result and now_local_str in result[1]:
+                    if isinstance(plan, DailyPlan) and now_local.hour * 60 + now_local.minute in plan.minutes:
                         needs_processing = True
                 except Exception as e:
                     if not PRODUCTION_MODE:
@@ -117,10 +134,6 @@ def scheduler_job(bot: Bot, loop: asyncio.AbstractEventLoop):
                     process_user(user, now_server, bot, loop)
                     processed_count += 1
                     
-                # Ограничиваем нагрузку
-                if processed_count % 20 == 0:
-                    asyncio.run_coroutine_threadsafe(asyncio.sleep(0.1), loop)
-                    
             except Exception as e:
                 if not PRODUCTION_MODE:
                     logger.error("Ошибка обработки пользователя %s: %s", chat_id, e)
@@ -147,6 +160,57 @@ async def check_payments_job(bot: Bot):
     except Exception as e:
         logger.error("Ошибка при проверке платежей: %s", e)
 
+def _reload_user_cache():
+    """Полная загрузка кэша пользователей этого воркера."""
+    global user_cache, user_changes_seq
+    # Знак берется до чтения: изменения во время загрузки применятся повторно
+    seq = crud.get_user_changes_watermark()
+    user_cache = {user[0]: user for user in crud.iter_users() if owns_chat(user[0])}
+    user_changes_seq = seq
+    notification_index.invalidate()
+    logger.info("Кэш пользователей загружен: %d пользователей", len(user_cache))
+
+
+def _apply_user_changes() -> bool:
+    """
+    Применяет к кэшу изменения после водяного знака.
+
+    False — журнал очищен дальше знака, нужна полная загрузка.
+    """
+    global user_changes_seq
+    changes = crud.get_user_changes(user_changes_seq)
+    if changes is None:
+        return False
+    seq, changed = changes
+    # Подписка могла смениться в другом процессе (вебхук оплаты, админ-команда)
+    for chat_id in changed:
+        entitlement_cache.invalidate(chat_id)
+    changed = [chat_id for chat_id in changed if owns_chat(chat_id)]
+    if changed:
+        rows = {user[0]: user for user in crud.get_users_by_ids(changed)}
+        for chat_id in changed:
+            user = rows.get(chat_id)
+            if user is None:
+                user_cache.pop(chat_id, None)
+            else:
+                user_cache[chat_id] = user
+            notification_index.mark_dirty(chat_id)
+        if not PRODUCTION_MODE:
+            logger.info("Кэш пользователей: применено изменений %d", len(changed))
+    user_changes_seq = seq
+    return True
+
+
+def prune_user_changes():
+    """Очищает журнал изменений пользователей старше USER_CHANGES_RETENTION_HOURS."""
+    try:
+        removed = crud.prune_user_changes(USER_CHANGES_RETENTION_HOURS * 3600)
+        if removed and not PRODUCTION_MODE:
+            logger.info("Журнал изменений пользователей: удалено %d записей", removed)
+    except Exception as e:
+        logger.error("Ошибка очистки журнала изменений пользователей: %s", e)
+
+
 def reset_user_cache(chat_id=None):
     """Сброс кэша пользователей."""
     global user_cache, last_cache_update
@@ -154,13 +218,15 @@ def reset_user_cache(chat_id=None):
     try:
         if chat_id is not None:
             user = crud.get_user(chat_id)
-            if user:
+            if user and owns_chat(chat_id):
                 user_cache[chat_id] = user
             elif chat_id in user_cache:
                 del user_cache[chat_id]
+            notification_index.mark_dirty(chat_id)
         else:
             user_cache = {}
             last_cache_update = 0
+            notification_index.invalidate()
             
         if not PRODUCTION_MODE:
             logger.info("Кэш пользователей сброшен" + (f" для {chat_id}" if chat_id else ""))
@@ -170,125 +236,27 @@ def reset_user_cache(chat_id=None):
 
 
 def process_daily_reset(chat_id, user_timezone="Europe/Moscow"):
-    """Ежедневный сброс данных пользователя с ИСПРАВЛЕННОЙ обработкой streak по времени пользователя."""
+    """
+    Ежедневный сброс одного пользователя (ручные проверки и скрипты).
+    Планировщик сбрасывает всех пакетно — services/daily_reset.py.
+    """
     try:
-        # Используем время пользователя, а не сервера
         try:
-            user_tz = ZoneInfo(user_timezone)
-            now_user = datetime.now(tz=user_tz)
+            now_user = datetime.now(tz=ZoneInfo(user_timezone))
         except Exception:
-            user_tz = ZoneInfo("Europe/Moscow")
-            now_user = datetime.now(tz=user_tz)
-            
+            now_user = datetime.now(tz=ZoneInfo("Europe/Moscow"))
         today = now_user.strftime("%Y-%m-%d")
         yesterday = (now_user - timedelta(days=1)).strftime("%Y-%m-%d")
         
-        reset_key = f"{chat_id}_reset_{today}"
-        
-        # Проверка на повторный сброс
-        if hasattr(process_daily_reset, 'processed_resets') and reset_key in process_daily_reset.processed_resets:
-            return
-            
-        if not hasattr(process_daily_reset, 'processed_resets'):
-            process_daily_reset.processed_resets = set()
-        
-        # ИСПРАВЛЕННАЯ логика проверки и сброса дней подряд с учетом времени пользователя
-        try:
-            from database.crud import get_user_streak, reset_user_streak
-            streak, last_test_date = get_user_streak(chat_id)
-            
-            if streak > 0:
-                logger.debug(f"Checking streak for user {chat_id} (TZ: {user_timezone}): streak={streak}, last_test_date={last_test_date}, yesterday={yesterday}, today={today}")
-                
-                should_reset = False
-                reset_reason = ""
-                
-                if not last_test_date:
-                    # Нет записи о последнем тесте - сбрасываем
-                    should_reset = True
-                    reset_reason = "no_test_date"
-                elif last_test_date < yesterday:
-                    # Последний тест был позавчера или раньше - сбрасываем
-                    should_reset = True
-                    reset_reason = f"test_too_old_{last_test_date}"
-                elif last_test_date == yesterday:
-                    # Тест был вчера - НЕ сбрасываем
-                    should_reset = False
-                    reset_reason = "test_yesterday_ok"
-                elif last_test_date == today:
-                    # Тест уже был сегодня - НЕ сбрасываем
-                    should_reset = False
-                    reset_reason = "test_today_ok"
-                else:
-                    # Дата в будущем (не должно быть) - сбрасываем
-                    should_reset = True
-                    reset_reason = f"future_date_{last_test_date}"
-                
-                if should_reset:
-                    logger.info(f"Resetting streak for user {chat_id} (TZ: {user_timezone}): reason={reset_reason}, old_streak={streak}")
-                    reset_user_streak(chat_id)
-                    
-                    # Если нужно уведомить пользователя о сбросе streak (опционально)
-                    if not PRODUCTION_MODE:
-                        logger.info(f"DEBUG: User {chat_id} streak reset from {streak} to 0. Reason: {reset_reason}")
-                else:
-                    logger.debug(f"Keeping streak for user {chat_id}: reason={reset_reason}, streak={streak}")
-                    
-        except Exception as e:
-            logger.error(f"Ошибка проверки streak для пользователя {chat_id}: {e}")
-        
-        # Обработка leftover слов (существующая логика)
-        if chat_id in daily_words_cache:
-            entry = daily_words_cache[chat_id]
-            unique_words = entry[8] if len(entry) > 8 and entry[8] else []
-            is_revision = entry[9] if len(entry) > 9 else False
-            
-            # Сохраняем leftover слова ТОЛЬКО если это НЕ режим повторения
-            if not is_revision and unique_words:
-                try:
-                    learned_raw = crud.get_learned_words(chat_id)
-                    learned_set = set(extract_english(item[0]).lower() for item in learned_raw)
-                    
-                    # Фильтруем только действительно невыученные слова
-                    leftover_words = []
-                    for word in unique_words:
-                        english_part = extract_english(word).lower()
-                        if english_part and english_part not in learned_set:
-                            leftover_words.append(word)
-                    
-                    # Сохраняем leftover слова для следующего дня
-                    if leftover_words:
-                        previous_daily_words[chat_id] = leftover_words
-                        if not PRODUCTION_MODE:
-                            logger.info(f"Saved {len(leftover_words)} leftover words for user {chat_id}")
-                    elif chat_id in previous_daily_words:
-                        del previous_daily_words[chat_id]
-                        
-                except Exception as e:
-                    logger.error("Ошибка обработки leftover слов для пользователя %s: %s", chat_id, e)
-            else:
-                # В режиме повторения не сохраняем leftover слова
-                if chat_id in previous_daily_words:
-                    del previous_daily_words[chat_id]
-                
-            # Сбрасываем кэш слов дня
-            reset_daily_words_cache(chat_id)
-        
-        # Сброс напоминания о тесте
-        if chat_id in test_reminder_sent:
-            del test_reminder_sent[chat_id]
+        # Streak сохраняется, только если тест был вчера или сегодня
+        streak, last_test_date = crud.get_user_streak(chat_id)
+        if streak > 0 and not (last_test_date and yesterday <= last_test_date <= today):
+            logger.info(f"Resetting streak for user {chat_id} (TZ: {user_timezone}): last_test_date={last_test_date}, old_streak={streak}")
+            crud.reset_user_streak(chat_id)
         
-        process_daily_reset.processed_resets.add(reset_key)
+        roll_over_plans([chat_id])
+        test_reminder_sent.pop(chat_id, None)
         
-        # Очистка старых записей
-        if len(process_daily_reset.processed_resets) > 1000:
-            yesterday_check = (now_user - timedelta(days=1)).strftime("%Y-%m-%d")
-            today_check = now_user.strftime("%Y-%m-%d")
-            process_daily_reset.processed_resets = {
-                key for key in process_daily_reset.processed_resets 
-                if today_check in key or yesterday_check in key
-            }
-            
         if not PRODUCTION_MODE:
             logger.info("Ежедневный сброс выполнен для пользователя %s (TZ: %s)", chat_id, user_timezone)
             
@@ -322,39 +290,31 @@ def process_user(user, now_server, bot, loop):
         return
     
     try:
-        result = get_daily_words_for_user(
+        result = get_daily_plan_for_user(
             chat_id, level, words_count, repetitions,
             first_time=FIRST_TIME, duration_hours=DURATION_HOURS
         )
         
         # ИСПРАВЛЕНИЕ: Проверяем результат на несоответствие уровня
-        if result == ("LEVEL_MISMATCH", "LEVEL_MISMATCH", None) or (
-            isinstance(result, tuple) and len(result) == 3 and result[:2] == ("LEVEL_MISMATCH", "LEVEL_MISMATCH")
-        ):
+        if isinstance(result, tuple) and result[:2] == ("LEVEL_MISMATCH", "LEVEL_MISMATCH"):
             logger.info(f"Skipping notifications for user {chat_id} due to level/set mismatch")
             return  # Не отправляем уведомления при несоответствии уровня и набора
         
         if result is None:
             return
         
-        messages, times = result
+        plan = result
+        is_revision_mode = plan.is_revision
 
-        # Определение режима повторения
-        is_revision_mode = False
-        if chat_id in daily_words_cache:
-            entry = daily_words_cache[chat_id]
-            if len(entry) > 9:
-                is_revision_mode = entry[9]
-
-        # Отправка уведомлений
-        if now_local_str in times:
-            notif_index = times.index(now_local_str)
-            message_text = messages[notif_index] if notif_index < len(messages) else "(нет слов)"
+        # Отправка уведомлений: текст собирается из плана только для наступившей минуты
+        local_minute = now_local.hour * 60 + now_local.minute
+        if local_minute in plan.minutes:
+            message_text = plan.message_at(local_minute) or "(нет слов)"
             
             try:
-                asyncio.run_coroutine_threadsafe(
-                    bot.send_message(chat_id, message_text),
-                    loop
+                # Через общую очередь: лимиты Telegram соблюдаются даже в «час пик» 20:00
+                message_dispatcher.submit_threadsafe(
+                    chat_id, message_text, priority=PRIORITY_SCHEDULED, bot=bot
                 )
                 if not PRODUCTION_MODE:
                     logger.info("Отправлено уведомление пользователю %s в %s", chat_id, now_local_str)
@@ -375,9 +335,8 @@ def process_user(user, now_server, bot, loop):
                     else:
                         reminder_message = "Пройдите тест, чтобы добавить слова в Ваш словарь."
                         
-                    asyncio.run_coroutine_threadsafe(
-                        bot.send_message(chat_id, reminder_message),
-                        loop
+                    message_dispatcher.submit_threadsafe(
+                        chat_id, reminder_message, priority=PRIORITY_SCHEDULED, bot=bot
                     )
                     test_reminder_sent[chat_id] = local_today_str
                     if not PRODUCTION_MODE:
@@ -399,8 +358,18 @@ def start_scheduler(bot: Bot, loop: asyncio.AbstractEventLoop):
     # Основная задача каждую минуту
     scheduler.add_job(scheduler_job, 'interval', minutes=1, args=[bot, loop])
     
-    # Оптимизация БД раз в сутки (только в продакшене)
-    if PRODUCTION_MODE:
+    # Брошенные тесты и сессии обучения удаляются по TTL
+    scheduler.add_job(expire_sessions, 'interval', minutes=10)
+    
+    # Журнал изменений пользователей общий для всех воркеров — чистит один процесс
+    if is_primary_worker():
+        scheduler.add_job(prune_user_changes, 'interval', hours=1)
+        # Истечение подписок и предупреждения — по водяным знакам в job_state
+        scheduler.add_job(subscription_sweep_job, 'interval', minutes=SUBSCRIPTION_SWEEP_INTERVAL_MINUTES,
+                          args=[bot], next_run_time=datetime.now())
+    
+    # Оптимизация БД раз в сутки (только в продакшене, один процесс на все воркеры)
+    if PRODUCTION_MODE and is_primary_worker():
         scheduler.add_job(
             lambda: asyncio.run_coroutine_threadsafe(optimize_database(), loop),
             'cron', hour=3, minute=0  # В 3:00 ночи
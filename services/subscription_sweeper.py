@@ -0,0 +1,73 @@
+# services/subscription_sweeper.py
+"""
+Фоновая проверка подписок.
+
+Раньше истекшая подписка замечалась только при проверке is_user_premium
+(разбор ISO-даты на каждый запрос), а статус в users оставался 'premium'.
+
+Теперь окончание подписки хранится в users.subscription_expires_epoch
+(секунды эпохи, частичный индекс по премиум-пользователям), и задача раз в
+SUBSCRIPTION_SWEEP_INTERVAL_MINUTES минут:
+* переводит в 'expired' ровно те подписки, что истекли после прошлого
+  запуска (диапазон по индексу от водяного знака в job_state);
+* предупреждает тех, у кого подписка закончится в ближайшие
+  SUBSCRIPTION_EXPIRY_NOTICE_DAYS дней, — один раз на дату окончания.
+
+Уведомления уходят одним пакетом через очередь message_dispatcher.
+Водяные знаки общие для всех воркеров, поэтому задача работает только в
+основном процессе.
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+
+from database import crud
+from services.message_dispatcher import message_dispatcher, PRIORITY_NOTIFICATION
+from config import SUBSCRIPTION_EXPIRY_NOTICE_DAYS
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_MESSAGE = (
+    "❌ *Premium истек*\n\n"
+    "Доступны только базовые наборы. Продлите подписку, чтобы вернуть доступ ко всем наборам слов!"
+)
+
+
+def expiring_message(expires_epoch: int) -> str:
+    expires = datetime.fromtimestamp(expires_epoch).strftime("%d.%m.%Y %H:%M")
+    return (
+        f"⚠️ *Premium скоро закончится*\n\n"
+        f"Подписка действует до {expires}. Продлите ее, чтобы сохранить доступ ко всем наборам слов."
+    )
+
+
+def sweep_subscriptions(bot: Optional[Bot] = None, now: Optional[int] = None
+                        ) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """
+    Один проход проверки. Возвращает (пониженные chat_id, [(chat_id, окончание)]
+    для предупреждений).
+    """
+    now = int(time.time()) if now is None else now
+    expired = crud.expire_subscriptions(now)
+    expiring = crud.claim_expiring_subscriptions(now, now + SUBSCRIPTION_EXPIRY_NOTICE_DAYS * 86400)
+
+    messages = [(chat_id, EXPIRED_MESSAGE) for chat_id in expired]
+    messages.extend((chat_id, expiring_message(expires_epoch)) for chat_id, expires_epoch in expiring)
+    if messages:
+        message_dispatcher.submit_many_threadsafe(
+            messages, priority=PRIORITY_NOTIFICATION, bot=bot, parse_mode="Markdown"
+        )
+        logger.info("Проверка подписок: истекло %d, предупреждений %d", len(expired), len(expiring))
+    return expired, expiring
+
+
+def subscription_sweep_job(bot: Bot) -> None:
+    """Задача планировщика: ошибки логируются, следующий запуск повторит диапазон."""
+    try:
+        sweep_subscriptions(bot)
+    except Exception as e:
+        logger.error("Ошибка проверки подписок: %s", e)
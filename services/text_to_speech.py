@@ -1,11 +1,110 @@
 # services/text_to_speech.py
-import os
-import tempfile
-from gtts import gTTS
+"""
+Озвучка слов с кэшем по содержимому.
+
+Раньше каждый вызов generate_speech ходил в gTTS и оставлял новый
+NamedTemporaryFile(delete=False), который никто не удалял.
+
+Теперь ключ озвучки — sha256 от (язык, текст):
+* mp3 хранится в TTS_CACHE_DIR (utils/media_cache.DiskCache), общий размер
+  ограничен TTS_CACHE_MAX_MB — вытесняются давно не использованные файлы;
+* после первой отправки file_id Telegram запоминается в media_file_ids —
+  повторная отправка не синтезирует и не загружает файл, даже если он уже
+  вытеснен с диска;
+* prewarm_set заранее озвучивает все слова набора в несколько потоков.
+
+Синтез выполняет backend с методом synthesize(text, lang) -> bytes
+(по умолчанию GTTSBackend; в тестах — локальная заглушка).
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable
+
+from utils.media_cache import DiskCache, FileIdStore, content_key, send_cached
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB, TTS_PREWARM_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Вид медиа в media_file_ids
+MEDIA_KIND = "tts"
+
+
+def cache_key(text: str, lang: str = "en") -> str:
+    """Ключ озвучки: одинаковый текст (с точностью до пробелов) и язык — один файл."""
+    return content_key(MEDIA_KIND, lang, " ".join(text.split()))
+
+
+class GTTSBackend:
+    """Синтез через gTTS (запрос к Google Translate)."""
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        from gtts import gTTS
+
+        buffer = BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class PronunciationCache:
+    """Файлы озвучки на диске и file_id уже отправленных."""
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, max_bytes: int = int(TTS_CACHE_MAX_MB * 1024 * 1024),
+                 backend=None):
+        self.disk = DiskCache(cache_dir, max_bytes, ".mp3")
+        self.file_ids = FileIdStore(MEDIA_KIND)
+        self.backend = backend or GTTSBackend()
+
+    def contains(self, text: str, lang: str = "en") -> bool:
+        return self.disk.contains(cache_key(text, lang))
+
+    def get_path(self, text: str, lang: str = "en") -> Path:
+        """Путь к mp3 озвучки; синтезирует при промахе."""
+        return self.disk.get_or_create(cache_key(text, lang), lambda: self.backend.synthesize(text, lang))
+
+    def prewarm(self, texts: Iterable[str], lang: str = "en", workers: int = TTS_PREWARM_WORKERS) -> int:
+        """Озвучивает отсутствующие в кэше тексты; возвращает число синтезированных."""
+        missing = [text for text in dict.fromkeys(texts) if text and not self.contains(text, lang)]
+
+        def synthesize(text: str) -> bool:
+            try:
+                self.get_path(text, lang)
+                return True
+            except Exception as e:
+                logger.error("Ошибка озвучки %r: %s", text, e)
+                return False
+
+        if not missing:
+            return 0
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tts") as pool:
+            return sum(pool.map(synthesize, missing))
+
+
+# Глобальный кэш озвучки
+pronunciation_cache = PronunciationCache()
+
 
 def generate_speech(text, lang="en"):
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tf:
-        filename = tf.name
-        tts = gTTS(text=text, lang=lang)
-        tts.save(filename)
-    return filename
+    """Путь к mp3 озвучки из кэша (файл принадлежит кэшу — удалять его не нужно)."""
+    return str(pronunciation_cache.get_path(text, lang))
+
+
+def prewarm_set(level: str, set_name: str, lang: str = "en") -> int:
+    """Озвучивает заранее все слова набора; возвращает число синтезированных."""
+    from utils.word_catalog import word_catalog
+
+    word_set = word_catalog.get_set(level, set_name)
+    if word_set is None:
+        return 0
+    return pronunciation_cache.prewarm((record.english for record in word_set.records), lang)
+
+
+async def send_pronunciation(bot, chat_id: int, text: str, lang: str = "en", **kwargs):
+    """Отправляет озвучку: по сохраненному file_id, иначе загружает mp3 из кэша."""
+    return await send_cached(
+        bot.send_audio, chat_id, cache_key(text, lang), pronunciation_cache.file_ids,
+        lambda: pronunciation_cache.get_path(text, lang), "audio",
+        filename=f"{text[:40]}.mp3", **kwargs,
+    )
@@ -0,0 +1,240 @@
+# services/update_router.py
+"""
+Режим webhook: прием обновлений Telegram и их раздача процессам-обработчикам.
+
+Фронтенд aiohttp принимает POST от Telegram, определяет чат и кладет
+обновление в очередь процесса, которому принадлежит чат
+(chat_id % UPDATE_WORKERS). Каждый процесс — отдельный цикл событий со
+своим Dispatcher aiogram:
+
+* обновления одного чата идут в одну очередь и обрабатываются строго по
+  порядку (ChatSerializer), разные чаты — параллельно;
+* состояние тестов и обучения (quiz_states, poll_to_user, states,
+  lpoll2user и т.д.) живет в памяти процесса-владельца: ответы на опросы
+  (poll_answer) маршрутизируются по пользователю, а в личном чате его id
+  совпадает с chat_id;
+* планировщик в каждом процессе обслуживает только своих пользователей
+  (owns_chat), общие задачи (проверка платежей, webhook ЮKassa) выполняет
+  основной процесс (is_primary_worker).
+
+    serve_webhook(create_worker_app)   # create_worker_app — async фабрика WorkerApp
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from config import (
+    TELEGRAM_WEBHOOK_HOST, TELEGRAM_WEBHOOK_PORT, TELEGRAM_WEBHOOK_PATH, TELEGRAM_WEBHOOK_SECRET,
+    UPDATE_WORKERS, UPDATE_WORKER_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+# (номер процесса, всего процессов); в режиме polling — единственный процесс
+_partition = (0, 1)
+
+# Поля обновления, в которых есть chat, и поля, где есть только пользователь
+_CHAT_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post",
+                "my_chat_member", "chat_member", "chat_join_request")
+_USER_FIELDS = ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query")
+
+
+# ───────────────────────── разбиение по чатам ─────────────────────────
+def set_partition(index: int, total: int) -> None:
+    global _partition
+    _partition = (index, total)
+
+
+def partition() -> tuple:
+    return _partition
+
+
+def worker_for(key: int, workers: int) -> int:
+    return key % workers
+
+
+def owns_chat(chat_id: int) -> bool:
+    """Обслуживает ли текущий процесс этот чат."""
+    index, total = _partition
+    return total == 1 or worker_for(chat_id, total) == index
+
+
+def is_primary_worker() -> bool:
+    """Основной процесс выполняет общие задачи (платежи, webhook ЮKassa)."""
+    return _partition[0] == 0
+
+
+def routing_key(update: dict) -> int:
+    """Ключ маршрутизации: id чата (или пользователя — в личном чате они совпадают)."""
+    for field in _CHAT_FIELDS:
+        obj = update.get(field)
+        if obj:
+            return obj["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback:
+        message = callback.get("message")
+        return message["chat"]["id"] if message else callback["from"]["id"]
+    answer = update.get("poll_answer")
+    if answer:
+        # Тесты отправляются в личный чат: id пользователя = chat_id владельца опроса
+        return answer["user"]["id"]
+    for field in _USER_FIELDS:
+        obj = update.get(field)
+        if obj:
+            return obj["from"]["id"]
+    return update.get("update_id", 0)
+
+
+# ───────────────────────── порядок внутри чата ─────────────────────────
+class ChatSerializer:
+    """Обновления одного ключа выполняются по очереди, разных ключей — параллельно."""
+
+    def __init__(self, handler: Callable[[dict], Awaitable], max_concurrency: int = UPDATE_WORKER_CONCURRENCY):
+        self._handler = handler
+        self._queues: Dict[int, deque] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+
+    def submit(self, key: int, update: dict) -> None:
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(update)
+            return
+        self._queues[key] = deque([update])
+        task = asyncio.ensure_future(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, key: int) -> None:
+        queue = self._queues[key]
+        try:
+            while queue:
+                update = queue.popleft()
+                async with self._semaphore:
+                    try:
+                        await self._handler(update)
+                    except Exception:
+                        logger.exception("Ошибка обработки обновления %s", update.get("update_id"))
+        finally:
+            del self._queues[key]
+
+    async def join(self) -> None:
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+
+# ───────────────────────── процесс-воркер ─────────────────────────
+class WorkerApp:
+    """То, что фабрика возвращает воркеру: обработчик обновления и завершение."""
+
+    def __init__(self, handle: Callable[[dict], Awaitable], close: Optional[Callable[[], Awaitable]] = None):
+        self.handle = handle
+        self.close = close
+
+
+def run_worker(index: int, total: int, queue, app_factory: Callable[[], Awaitable[WorkerApp]]) -> None:
+    """Точка входа процесса-воркера."""
+    set_partition(index, total)
+    asyncio.run(_worker_main(index, queue, app_factory))
+
+
+async def _worker_main(index: int, queue, app_factory) -> None:
+    app = await app_factory()
+    serializer = ChatSerializer(app.handle)
+    loop = asyncio.get_running_loop()
+    logger.info("Воркер обновлений %d запущен", index)
+    # Очередь читает один поток — порядок обновлений сохраняется
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"updates-{index}") as reader:
+        while True:
+            item = await loop.run_in_executor(reader, queue.get)
+            if item is None:
+                break
+            key, body = item
+            serializer.submit(key, json.loads(body))
+    await serializer.join()
+    if app.close is not None:
+        await app.close()
+    logger.info("Воркер обновлений %d остановлен", index)
+
+
+# ───────────────────────── фронтенд ─────────────────────────
+class UpdateFrontend:
+    """HTTP-прием обновлений и раздача по очередям воркеров."""
+
+    def __init__(self, queues: List, path: str = TELEGRAM_WEBHOOK_PATH, secret: str = TELEGRAM_WEBHOOK_SECRET):
+        self.queues = queues
+        self.path = path
+        self.secret = secret
+        self.stats = {"received": 0, "rejected": 0}
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.secret
+        ):
+            self.stats["rejected"] += 1
+            return web.Response(status=403)
+        body = await request.read()
+        try:
+            key = routing_key(json.loads(body))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.stats["rejected"] += 1
+            return web.Response(status=400)
+        # Без await между разбором и постановкой: порядок поступления сохраняется
+        self.queues[worker_for(key, len(self.queues))].put_nowait((key, body))
+        self.stats["received"] += 1
+        return web.Response()
+
+
+def serve_webhook(app_factory: Callable[[], Awaitable[WorkerApp]], workers: int = UPDATE_WORKERS,
+                  host: str = TELEGRAM_WEBHOOK_HOST, port: int = TELEGRAM_WEBHOOK_PORT,
+                  path: str = TELEGRAM_WEBHOOK_PATH, secret: str = TELEGRAM_WEBHOOK_SECRET,
+                  on_startup: Optional[Callable[[web.Application], Awaitable]] = None,
+                  on_shutdown: Optional[Callable[[web.Application], Awaitable]] = None) -> None:
+    """
+    Запускает воркеры и фронтенд (блокирует до остановки). app_factory должна
+    быть функцией уровня модуля — она передается в процессы через pickle.
+    """
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(workers)]
+    processes = [
+        context.Process(target=run_worker, args=(index, workers, queues[index], app_factory),
+                        name=f"update-worker-{index}")
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    frontend = UpdateFrontend(queues, path, secret)
+    app = frontend.make_app()
+    if on_startup:
+        app.on_startup.append(on_startup)
+    if on_shutdown:
+        app.on_shutdown.append(on_shutdown)
+    logger.info("Webhook обновлений: %s:%s%s, воркеров: %d", host, port, path, workers)
+    try:
+        web.run_app(app, host=host, port=port, print=None)
+    finally:
+        # Воркеры дорабатывают очереди и завершаются
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                logger.warning("Воркер %s не завершился, останавливаем", process.name)
+                process.terminate()
@@ -0,0 +1,57 @@
+# tests/fake_db.py
+"""
+Замена db_manager для тестов: одно соединение SQLite в памяти с тем же
+интерфейсом, что у DatabaseManager (execute, get_cursor, transaction).
+
+    db = FakeManager("CREATE TABLE users (chat_id INTEGER PRIMARY KEY)")
+    with patch("database.crud.db_manager", db):
+        ...
+
+Соединение в режиме autocommit и доступно из любого потока (поток БД
+async_crud, пулы потоков). Счетчики reads и transactions — число вызовов
+get_cursor и transaction.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+from database.db import register_sql_functions
+
+
+class FakeManager:
+    def __init__(self, schema: str = "", sql_functions: bool = False):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+        if sql_functions:
+            register_sql_functions(self.conn)
+        self.conn.executescript(schema)
+        self.reads = 0
+        self.transactions = 0
+
+    def execute(self, sql, params=None, commit=False):
+        return self.conn.execute(sql, params or ())
+
+    @contextmanager
+    def get_cursor(self):
+        self.reads += 1
+        cursor = self.conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def count(self, table: str) -> int:
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
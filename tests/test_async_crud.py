@@ -0,0 +1,34 @@
+# tests/test_async_crud.py
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from database import async_crud
+
+
+class TestAsyncCrud(unittest.TestCase):
+    def test_runs_in_db_thread(self):
+        """Запросы выполняются в потоке БД, а не в потоке цикла событий."""
+        loop_thread = threading.current_thread().name
+        result = asyncio.run(async_crud.run_db(lambda x: (x, threading.current_thread().name), 7))
+        self.assertEqual(result[0], 7)
+        self.assertTrue(result[1].startswith("db"))
+        self.assertNotEqual(result[1], loop_thread)
+
+    def test_wrapper_uses_current_crud_function(self):
+        """Обертка берет функцию crud в момент вызова (работает с patch)."""
+        with patch("database.crud.get_user", return_value=("stub",)) as mocked:
+            self.assertEqual(asyncio.run(async_crud.get_user(42)), ("stub",))
+        mocked.assert_called_once_with(42)
+
+    def test_errors_propagate(self):
+        """Исключение из потока БД пробрасывается в await."""
+        def fail():
+            raise ValueError("boom")
+        with self.assertRaises(ValueError):
+            asyncio.run(async_crud.run_db(fail))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# tests/test_broadcast_engine.py
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from aiogram.utils.exceptions import BotBlocked
+
+from fake_db import FakeManager
+from services.broadcast_engine import BroadcastEngine
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, unreachable_since TEXT, unreachable_reason TEXT);
+    CREATE TABLE broadcasts (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL,
+                             status TEXT NOT NULL DEFAULT 'running', last_chat_id INTEGER NOT NULL DEFAULT 0,
+                             created_at TEXT NOT NULL, finished_at TEXT);
+    CREATE TABLE broadcast_recipients (broadcast_id INTEGER NOT NULL, chat_id INTEGER NOT NULL,
+                                       status TEXT NOT NULL, error TEXT, updated_at TEXT NOT NULL,
+                                       PRIMARY KEY (broadcast_id, chat_id)) WITHOUT ROWID;
+"""
+
+
+class _Crash(Exception):
+    pass
+
+
+class TestBroadcastEngine(unittest.TestCase):
+    def setUp(self):
+        self.manager = FakeManager(_SCHEMA)
+        self.manager.conn.executemany("INSERT INTO users (chat_id) VALUES (?)", [(i,) for i in range(1, 11)])
+        for target in ("services.broadcast_engine.db_manager", "database.crud.db_manager"):
+            patcher = patch(target, self.manager)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.manager.close()
+
+    def _engine(self, send):
+        return BroadcastEngine(send=send, page_size=3, max_rate=10_000)
+
+    def test_resume_without_duplicates(self):
+        """После падения рассылка продолжается с курсора, никто не получает сообщение дважды."""
+        delivered = []
+
+        async def send(chat_id, text):
+            delivered.append(chat_id)
+
+        async def scenario():
+            engine = self._engine(send)
+            broadcast_id = await engine.create("hi")
+            # Процесс «падает» после отправки первой страницы, до записи ее статусов
+            with patch("services.broadcast_engine.BroadcastStore.save_results", side_effect=_Crash):
+                with self.assertRaises(_Crash):
+                    await engine.run(broadcast_id)
+            self.assertEqual(delivered, [1, 2, 3])
+            self.assertEqual([row[0] for row in await engine.find_unfinished()], [broadcast_id])
+
+            await self._engine(send).run(broadcast_id)
+            return broadcast_id
+
+        broadcast_id = asyncio.run(scenario())
+        self.assertEqual(len(delivered), len(set(delivered)))
+        self.assertEqual(sorted(delivered), list(range(1, 11)))
+        status = self.manager.conn.execute("SELECT status FROM broadcasts WHERE id = ?", (broadcast_id,)).fetchone()
+        self.assertEqual(status[0], "done")
+
+    def test_blocked_users_skipped_next_time(self):
+        """Заблокировавшие бота помечаются и не попадают в следующую рассылку."""
+        calls = []
+
+        async def send(chat_id, text):
+            calls.append(chat_id)
+            if chat_id in (2, 7):
+                raise BotBlocked("Forbidden: bot was blocked by the user")
+
+        async def scenario():
+            engine = self._engine(send)
+            stats = await engine.run(await engine.create("first"))
+            self.assertEqual(stats["blocked"], 2)
+            self.assertEqual(stats["sent"], 8)
+            calls.clear()
+            await engine.run(await engine.create("second"))
+
+        asyncio.run(scenario())
+        self.assertNotIn(2, calls)
+        self.assertNotIn(7, calls)
+        self.assertEqual(len(calls), 8)
+        reasons = self.manager.conn.execute(
+            "SELECT chat_id, unreachable_reason FROM users WHERE unreachable_since IS NOT NULL"
+        ).fetchall()
+        self.assertEqual(sorted(reasons), [(2, "blocked"), (7, "blocked")])
+
+    def test_rate_backs_off_on_retry_after(self):
+        """После RetryAfter скорость падает вдвое, после спокойной страницы растет."""
+        engine = BroadcastEngine(send=None, max_rate=20)
+        engine._adapt_rate([(1, "failed", "RetryAfter: 5")])
+        self.assertEqual(engine.rate, 10)
+        engine._adapt_rate([(1, "sent", None)])
+        self.assertEqual(engine.rate, 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
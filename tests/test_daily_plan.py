@@ -0,0 +1,65 @@
+# tests/test_daily_plan.py
+import json
+import unittest
+
+from utils.daily_plan import DailyPlan
+from utils.helpers import compute_notification_times
+
+
+def _legacy_entry(words, repetitions, prefix="", first_time="10:00", duration=10):
+    """План в прежнем формате — кортеж из 11 элементов."""
+    messages = ([prefix] if prefix else []) + ["🔹 " + word for word in words]
+    repeated = messages * repetitions
+    times = compute_notification_times(len(repeated), first_time, duration)
+    return ("2025-01-15", repeated, times, first_time, duration, len(words), repetitions,
+            "Asia/Tokyo", list(words), False, prefix)
+
+
+class TestDailyPlan(unittest.TestCase):
+    def test_matches_legacy_tuple(self):
+        """Индексы 0..10 и len() дают то же, что прежний кортеж."""
+        words = ["cat - кошка", "dog - собака", "fox - лиса"]
+        for prefix in ("", "⚠️ Осталось всего 3 невыученных слов в этом наборе!"):
+            legacy = _legacy_entry(words, 4, prefix)
+            plan = DailyPlan("2025-01-15", words, 4, "10:00", 10, 3, "Asia/Tokyo", False, prefix)
+            self.assertEqual(len(plan), 11)
+            self.assertEqual(tuple(plan[i] for i in range(11)), legacy)
+            self.assertEqual(plan.as_tuple(), legacy)
+            self.assertEqual(plan[-1], prefix)
+            with self.assertRaises(IndexError):
+                plan[11]
+            with self.assertRaises(TypeError):
+                hash(plan)
+
+    def test_message_at_renders_lazily(self):
+        """Текст уведомления для минуты — как messages[times.index(HH:MM)]."""
+        words = ["cat - кошка", "dog - собака"]
+        plan = DailyPlan("2025-01-15", words, 3, "10:00", 10, 2, "UTC", False, "🎓 Повторение:")
+        messages, times = plan.messages(), plan.times()
+        for minute in range(24 * 60):
+            hhmm = f"{minute // 60:02d}:{minute % 60:02d}"
+            expected = messages[times.index(hhmm)] if hhmm in times else None
+            self.assertEqual(plan.message_at(minute), expected)
+
+    def test_json_roundtrip_and_legacy_payload(self):
+        """План сохраняется в JSON, и читается сохраненный раньше список."""
+        plan = DailyPlan("2025-01-15", ["cat - кошка"], 2, "10:00", 10, 1, "UTC", True, "")
+        restored = DailyPlan.from_json(json.loads(json.dumps(plan.to_json())))
+        self.assertEqual(restored, plan)
+
+        legacy = json.loads(json.dumps(_legacy_entry(["cat - кошка", "dog - собака"], 2)))
+        legacy[2][0] = "09:59"  # времена старого плана сохраняются как были
+        restored = DailyPlan.from_json(legacy)
+        self.assertEqual(restored.words, ("cat - кошка", "dog - собака"))
+        self.assertEqual(restored.times(), legacy[2])
+        self.assertEqual(restored[1], legacy[1])
+
+    def test_minutes_shared_between_plans(self):
+        """Планы с одинаковыми параметрами делят один массив минут."""
+        first = DailyPlan("2025-01-15", ["a - а", "b - б"], 3, "10:00", 10, 2, "UTC")
+        second = DailyPlan("2025-01-15", ["c - в", "d - г"], 3, "10:00", 10, 2, "Europe/Moscow")
+        self.assertIs(first.minutes, second.minutes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+# tests/test_daily_reset.py
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from database import crud
+from database.plan_store import PersistentDict, PlanStore
+from fake_db import FakeManager
+from services import daily_reset
+from utils.daily_plan import DailyPlan
+
+# 00:10 16 января по Москве
+NOW = datetime(2025, 1, 15, 21, 10, tzinfo=ZoneInfo("UTC"))
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, level TEXT, words_per_day INTEGER,
+                        notifications INTEGER, reminder_time TEXT, timezone TEXT,
+                        days_streak INTEGER DEFAULT 0, last_test_date TEXT);
+    CREATE TABLE learned_words (chat_id INTEGER, word TEXT, translation TEXT, learned_date TEXT);
+    CREATE TABLE daily_resets (bucket TEXT, local_date TEXT, worker TEXT, done_at TEXT,
+                               PRIMARY KEY (bucket, local_date, worker)) WITHOUT ROWID;
+    CREATE TABLE daily_plans (chat_id INTEGER PRIMARY KEY, plan_date TEXT, payload TEXT NOT NULL);
+    CREATE TABLE previous_daily_words (chat_id INTEGER PRIMARY KEY, plan_date TEXT, payload TEXT NOT NULL);
+"""
+
+
+class TestDailyReset(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeManager(_SCHEMA)
+        self.addCleanup(self.db.close)
+        self.plans = PersistentDict(PlanStore("daily_plans", self.db), decode=DailyPlan.from_json,
+                                    encode=DailyPlan.to_json, plan_date=lambda plan: plan.date)
+        self.leftovers = PersistentDict(PlanStore("previous_daily_words", self.db))
+        for target, value in (("database.crud.db_manager", self.db),
+                              ("services.daily_reset.daily_words_cache", self.plans),
+                              ("utils.helpers.daily_words_cache", self.plans),
+                              ("services.daily_reset.previous_daily_words", self.leftovers),
+                              ("services.daily_reset._done", set())):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _add(self, chat_id, timezone, streak, last_test_date):
+        self.db.conn.execute(
+            "INSERT INTO users VALUES (?, 'A1', 5, 3, '10:00', ?, ?, ?)",
+            (chat_id, timezone, streak, last_test_date),
+        )
+
+    def _users(self):
+        return [tuple(row) for row in self.db.conn.execute(
+            "SELECT chat_id, level, words_per_day, notifications, reminder_time, timezone FROM users")]
+
+    def _streaks(self):
+        return dict(self.db.conn.execute("SELECT chat_id, days_streak FROM users"))
+
+    def test_streaks_reset_for_zones_past_midnight(self):
+        """Один UPDATE на группу: сброс при пропуске дня, пояса вне полуночи не трогаются."""
+        self._add(1, "Europe/Moscow", 5, "2025-01-14")     # пропустил 15-е
+        self._add(2, "Europe/Moscow", 5, "2025-01-15")     # тест вчера
+        self._add(3, "Europe/Moscow", 5, "2025-01-16")     # уже сегодня
+        self._add(4, "Europe/Istanbul", 5, None)           # то же смещение UTC+3
+        self._add(5, None, 5, "2025-01-10")                # пояс по умолчанию — Москва
+        self._add(6, "Mars/Base", 5, "2025-01-10")         # некорректный пояс — Москва
+        self._add(7, "Asia/Tokyo", 5, "2025-01-10")        # в Токио 06:10
+        processed = daily_reset.run_daily_reset(NOW, self._users())
+        self.assertEqual(sorted(processed), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self._streaks(), {1: 0, 2: 5, 3: 5, 4: 0, 5: 0, 6: 0, 7: 5})
+
+    def test_idempotent_across_restarts(self):
+        """Повторный тик и перезапуск (пустая память) не повторяют сброс за ту же дату."""
+        self._add(1, "Europe/Moscow", 5, "2025-01-14")
+        self.assertEqual(daily_reset.run_daily_reset(NOW, self._users()), [1])
+        self.db.conn.execute("UPDATE users SET days_streak = 3, last_test_date = '2025-01-01'")
+        self.assertEqual(daily_reset.run_daily_reset(NOW, self._users()), [])
+        daily_reset._done.clear()
+        self.assertEqual(daily_reset.run_daily_reset(NOW, self._users()), [])
+        self.assertEqual(self._streaks(), {1: 3})
+
+    def test_leftovers_are_batched(self):
+        """Невыученные слова плана переходят в остатки, план сбрасывается."""
+        self._add(1, "Europe/Moscow", 0, None)
+        self._add(2, "Europe/Moscow", 0, None)
+        self.db.conn.execute("INSERT INTO learned_words VALUES (1, 'cat', 'кошка', '2025-01-15')")
+        words = ["cat - кошка", "dog - собака"]
+        self.plans[1] = DailyPlan("2025-01-15", words, 1, "10:00", 10, 2, "Europe/Moscow")
+        self.plans[2] = DailyPlan("2025-01-15", words, 1, "10:00", 10, 2, "Europe/Moscow", is_revision=True)
+        self.leftovers[2] = ["old - старое"]
+        daily_reset.run_daily_reset(NOW, self._users())
+        self.assertEqual(self.leftovers.get(1), ["dog - собака"])
+        self.assertNotIn(2, self.leftovers)
+        self.assertEqual(self.db.count("daily_plans"), 0)
+
+    def test_partition_filter(self):
+        """Воркер сбрасывает только свои чаты (chat_id % total == index)."""
+        for chat_id in range(1, 7):
+            self._add(chat_id, "Europe/Moscow", 5, "2025-01-01")
+        reset = crud.reset_stale_streaks(["Europe/Moscow"], "2025-01-16", "2025-01-15", partition=(1, 2))
+        self.assertEqual(reset, 3)
+        self.assertEqual(self._streaks(), {1: 0, 2: 5, 3: 0, 4: 5, 5: 0, 6: 5})
+
+
+if __name__ == '__main__':
+    unittest.main()
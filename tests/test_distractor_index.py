@@ -0,0 +1,56 @@
+# tests/test_distractor_index.py
+import random
+import unittest
+
+from utils.quiz_utils import DistractorIndex
+
+
+def _items(count):
+    return [{"word": f"word{i}", "translation": "п" * (1 + i % 15) + str(i)} for i in range(count)]
+
+
+class TestDistractorIndex(unittest.TestCase):
+    def test_options_contract(self):
+        """Варианты: правильный ответ ровно один раз, дистракторы различны."""
+        index = DistractorIndex(_items(200))
+        rng = random.Random(1)
+        for i in range(200):
+            correct = index.mapping[f"word{i}"]
+            opts, idx = index.options(correct, 4, rng=rng)
+            self.assertEqual(len(opts), 4)
+            self.assertEqual(opts[idx], correct)
+            self.assertEqual(opts.count(correct), 1)
+            self.assertEqual(len(set(opts)), 4)
+
+    def test_duplicate_translations_not_offered_twice(self):
+        """Одинаковые переводы разных слов не дают повторяющихся вариантов."""
+        items = _items(10) + [{"word": "extra", "translation": "п0"}]
+        index = DistractorIndex(items)
+        self.assertEqual(len(index), 10)
+        self.assertEqual(index.mapping["extra"], "п0")
+        for _ in range(50):
+            opts, _ = index.options("п0", 4)
+            self.assertEqual(len(set(opts)), 4)
+
+    def test_small_set_falls_back(self):
+        """Если дистракторов меньше нужного — повторы, без дистракторов — «???»."""
+        index = DistractorIndex(_items(2))
+        opts, idx = index.options(index.mapping["word0"], 4)
+        self.assertEqual(opts[idx], index.mapping["word0"])
+        self.assertEqual(set(opts) - {opts[idx]}, {index.mapping["word1"]})
+        opts, _ = DistractorIndex(()).options("кошка", 4)
+        self.assertEqual(sorted(opts), ["???", "???", "???", "кошка"])
+
+    def test_similar_length(self):
+        """similar_length берет дистракторы из окна близких по длине переводов."""
+        items = [{"word": f"w{i}", "translation": "x" * (i + 1)} for i in range(100)]
+        index = DistractorIndex(items)
+        rng = random.Random(2)
+        for _ in range(100):
+            distractors = index.sample("x" * 50, 3, similar_length=True, rng=rng)
+            self.assertTrue(all(abs(len(d) - 50) <= 7 for d in distractors))
+            self.assertNotIn("x" * 50, distractors)
+
+
+if __name__ == "__main__":
+    unittest.main()
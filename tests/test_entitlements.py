@@ -0,0 +1,118 @@
+# tests/test_entitlements.py
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from database import crud
+from database.entitlement_cache import EntitlementCache, expires_at_epoch, premium_until_epoch
+from fake_db import FakeManager
+from utils import subscription_helpers
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, level TEXT, subscription_status TEXT DEFAULT 'free',
+                        subscription_expires_at TEXT, subscription_expires_epoch INTEGER DEFAULT 0,
+                        subscription_payment_id TEXT);
+"""
+
+
+class _FakeCatalog:
+    def __init__(self, sets):
+        self.sets = sets
+        self.names_version = 1
+
+    def list_sets(self, level):
+        return sorted(self.sets.get(level, []))
+
+
+class TestEntitlements(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeManager(_SCHEMA)
+        self.addCleanup(self.db.close)
+        self.cache = EntitlementCache(max_users=100)
+        self.catalog = _FakeCatalog({"A1": ["A1 Basic 1", "A1 Travel", "A1 Food"]})
+        for target, value in (("database.crud.db_manager", self.db),
+                              ("database.crud.entitlement_cache", self.cache),
+                              ("utils.subscription_helpers.word_catalog", self.catalog),
+                              ("utils.subscription_helpers.FREE_SETS", {"A1": ["A1 Basic 1", "A1 Missing"]}),
+                              ("utils.subscription_helpers._level_sets_cache", {})):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _add(self, chat_id, status="free", expires_at=None):
+        self.db.conn.execute(
+            "INSERT INTO users (chat_id, level, subscription_status, subscription_expires_at, "
+            "subscription_expires_epoch) VALUES (?, 'A1', ?, ?, ?)",
+            (chat_id, status, expires_at, expires_at_epoch(expires_at)))
+
+    def test_premium_until_epoch(self):
+        """Окончание премиума: 0 без подписки, без даты и при некорректной дате."""
+        expires = datetime(2030, 1, 1, 12, 0)
+        epoch = expires_at_epoch(expires.isoformat())
+        self.assertEqual(epoch, int(expires.timestamp()))
+        self.assertEqual(expires_at_epoch("завтра"), 0)
+        self.assertEqual(premium_until_epoch("premium", epoch), epoch)
+        self.assertEqual(premium_until_epoch("free", epoch), 0)
+        self.assertEqual(premium_until_epoch("premium", None), 0)
+
+    def test_cached_and_expires_by_itself(self):
+        """Повторная проверка без чтения БД; запись сама перестает давать премиум."""
+        self._add(1, "premium", (datetime.now() + timedelta(hours=1)).isoformat())
+        self.assertTrue(crud.is_user_premium(1))
+        self.assertTrue(crud.is_user_premium(1))
+        self.assertEqual(self.db.reads, 1)
+        with patch("database.crud.time.time", return_value=time.time() + 7200):
+            self.assertFalse(crud.is_user_premium(1))
+        self.assertEqual(self.db.reads, 1)
+        self.assertFalse(crud.is_user_premium(404))
+
+    def test_update_invalidates(self):
+        """update_user_subscription сбрасывает запись кэша."""
+        self._add(1)
+        self.assertFalse(crud.is_user_premium(1))
+        crud.update_user_subscription(1, "premium", (datetime.now() + timedelta(days=30)).isoformat())
+        self.assertTrue(crud.is_user_premium(1))
+        crud.update_user_subscription(1, "free")
+        self.assertFalse(crud.is_user_premium(1))
+
+    def test_invalidation_during_load_is_not_lost(self):
+        """Инвалидация во время чтения из БД не дает закэшировать устаревшее значение."""
+        self.cache.begin_load(1)
+        self.cache.invalidate(1)
+        self.cache.finish_load(1, 123)
+        self.assertIsNone(self.cache.get(1))
+
+    def test_set_masks(self):
+        """Премиум — все наборы каталога, бесплатный — бесплатные из каталога."""
+        self._add(1)
+        self._add(2, "premium", (datetime.now() + timedelta(days=1)).isoformat())
+        self.assertEqual(subscription_helpers.get_available_sets_for_user(1, "A1"), ["A1 Basic 1"])
+        self.assertEqual(subscription_helpers.get_available_sets_for_user(2, "A1"),
+                         ["A1 Basic 1", "A1 Food", "A1 Travel"])
+        self.assertEqual(subscription_helpers.get_premium_sets_for_level("A1"), ["A1 Food", "A1 Travel"])
+        self.assertEqual(subscription_helpers.get_available_sets_for_user(1, "B2"), [])
+
+    def test_set_check_with_level_skips_user_read(self):
+        """С переданным уровнем проверка набора не читает users (после первого обращения)."""
+        self._add(1)
+        self._add(2, "premium", (datetime.now() + timedelta(days=1)).isoformat())
+        with patch("database.crud.get_user", side_effect=AssertionError("get_user")):
+            self.assertTrue(subscription_helpers.is_set_available_for_user(1, "A1 Basic 1", "A1"))
+            self.assertFalse(subscription_helpers.is_set_available_for_user(1, "A1 Travel", "A1"))
+            self.assertTrue(subscription_helpers.is_set_available_for_user(2, "A1 Travel", "A1"))
+            self.assertFalse(subscription_helpers.is_set_available_for_user(2, "A1 Unknown", "A1"))
+        self.assertEqual(self.db.reads, 2)
+
+    def test_catalog_change_rebuilds_masks(self):
+        """Новый набор в каталоге появляется после смены names_version."""
+        self._add(2, "premium", (datetime.now() + timedelta(days=1)).isoformat())
+        self.assertFalse(subscription_helpers.is_set_available_for_user(2, "A1 New", "A1"))
+        self.catalog.sets["A1"].append("A1 New")
+        self.catalog.names_version += 1
+        self.assertTrue(subscription_helpers.is_set_available_for_user(2, "A1 New", "A1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
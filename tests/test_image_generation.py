@@ -0,0 +1,106 @@
+# tests/test_image_generation.py
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from PIL import Image
+
+from fake_db import FakeManager
+from services import image_generation
+from utils.media_cache import DiskCache, FileIdStore
+
+
+_SCHEMA = """
+    CREATE TABLE media_file_ids (cache_key TEXT PRIMARY KEY, kind TEXT NOT NULL,
+                                 file_id TEXT NOT NULL, created_at TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+class _FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        self.sent.append(photo)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id="big")])
+
+
+class TestCardCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.cache = DiskCache(self.dir.name, 10 * 1024 * 1024, ".png")
+        for target, value in (("services.image_generation.card_cache", self.cache),
+                              ("services.image_generation.card_file_ids", FileIdStore("card")),
+                              ("database.crud.db_manager", FakeManager(_SCHEMA))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_fonts_loaded_once(self):
+        """Шрифт каждого типа и размера загружается один раз на все карточки."""
+        image_generation.get_font.cache_clear()
+        for word in ("cat", "dog", "fox"):
+            image_generation.render_word_card(word, "animal", "k", "example", "A1")
+        info = image_generation.get_font.cache_info()
+        self.assertEqual(info.misses, 5)  # bold 48, bold 36, italic 24, regular 24, bold 20
+        self.assertEqual(info.hits, 10)
+
+    def test_card_rendered_once_per_content(self):
+        """Одинаковая карточка рисуется один раз, другое содержимое — другой файл."""
+        with patch.object(image_generation, "render_word_card",
+                          wraps=image_generation.render_word_card) as render:
+            first = image_generation.create_word_card("cat", "animal", level="A1")
+            self.assertEqual(image_generation.create_word_card("cat", "animal", level="A1"), first)
+            other = image_generation.create_word_card("cat", "animal", level="A2")
+        self.assertEqual(render.call_count, 2)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith(self.dir.name))
+        with open(first, "rb") as f:
+            self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+
+    def test_badges_cached(self):
+        """Значок уровня рисуется один раз."""
+        with patch.object(image_generation, "render_level_badge",
+                          wraps=image_generation.render_level_badge) as render:
+            paths = {image_generation.create_level_badge("B1") for _ in range(3)}
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(render.call_count, 1)
+
+    def test_prerender_in_process_pool(self):
+        """Пакетная отрисовка в процессах: файлы в кэше, повтор ничего не рисует."""
+        cards = [(f"word{i}", f"translation {i}", None, None, "A1") for i in range(6)]
+        self.assertEqual(image_generation.prerender_cards(cards + cards[:2], workers=2), 6)
+        self.assertTrue(all(self.cache.contains(image_generation.word_card_key(*card)) for card in cards))
+        self.assertEqual(image_generation.prerender_cards(cards, workers=2), 0)
+        with patch.object(image_generation, "render_word_card", side_effect=AssertionError("render")):
+            image_generation.create_word_card(*cards[0])
+
+    def test_file_id_reused(self):
+        """Первая отправка — из памяти без файлов на диске, повторная — по file_id большого фото."""
+        bot = _FakeBot()
+        asyncio.run(image_generation.send_word_card(bot, 1, "cat", "animal"))
+        asyncio.run(image_generation.send_word_card(bot, 2, "cat", "animal"))
+        self.assertEqual(bot.sent[0].file.read(8), b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(bot.sent[1], "big")
+        self.assertEqual(list(self.cache.cache_dir.iterdir()), [])
+
+    def test_in_memory_png_options(self):
+        """PNG в памяти: уровень сжатия влияет на размер, картинка та же."""
+        image = image_generation.render_word_card("cat", "animal", "kaet", level="A1")
+        fast = image_generation.png_bytes(image, compress_level=0)
+        small = image_generation.png_bytes(image, compress_level=9)
+        optimized = image_generation.png_bytes(image, optimize=True)
+        self.assertGreater(len(fast), len(small))
+        self.assertLessEqual(len(optimized), len(small))
+        buffer = image_generation.png_buffer(image, "cat.png", compress_level=1)
+        self.assertEqual(buffer.name, "cat.png")
+        self.assertEqual(Image.open(buffer).tobytes(), image.tobytes())
+        self.assertIs(image_generation.level_badge_png("A1"), image_generation.level_badge_png("A1"))
+        self.assertEqual(image_generation.as_input_file(small, "cat.png").filename, "cat.png")
+
+
+if __name__ == '__main__':
+    unittest.main()
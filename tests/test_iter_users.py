@@ -0,0 +1,69 @@
+# tests/test_iter_users.py
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from database import async_crud, crud
+from fake_db import FakeManager
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, level TEXT, words_per_day INTEGER,
+                        notifications INTEGER, reminder_time TEXT, timezone TEXT, chosen_set TEXT,
+                        unreachable_since TEXT, unreachable_reason TEXT);
+"""
+
+
+class TestIterUsers(unittest.TestCase):
+    def _patch(self, count):
+        manager = FakeManager(_SCHEMA)
+        self.addCleanup(manager.close)
+        # Вставка вразнобой — порядок выдачи задает ORDER BY chat_id
+        manager.conn.executemany(
+            "INSERT INTO users VALUES (?, 'A1', 5, 3, '10:00', 'UTC', 'Set', ?, NULL)",
+            [(chat_id, "2025-01-01" if chat_id % 7 == 0 else None) for chat_id in range(count * 3, 0, -3)],
+        )
+        patcher = patch("database.crud.db_manager", manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return manager
+
+    def test_pages_in_chat_id_order(self):
+        """Все пользователи по возрастанию chat_id, по одному запросу на страницу."""
+        manager = self._patch(25)
+        users = list(crud.iter_users(batch_size=10))
+        self.assertEqual([user[0] for user in users], list(range(3, 76, 3)))
+        self.assertEqual(users[0], (3, "A1", 5, 3, "10:00", "UTC"))
+        self.assertEqual(manager.reads, 3)
+
+    def test_exact_multiple_and_empty_table(self):
+        """Полная последняя страница дает еще один пустой запрос; пустая таблица — ничего."""
+        manager = self._patch(20)
+        self.assertEqual(len(list(crud.iter_users(batch_size=10))), 20)
+        self.assertEqual(manager.reads, 3)
+        self._patch(0)
+        self.assertEqual(list(crud.iter_users()), [])
+        self.assertEqual(crud.get_all_users(), [])
+
+    def test_columns_and_reachable_only(self):
+        """Выбираются только нужные столбцы (chat_id всегда первым), недоступные пропускаются."""
+        self._patch(25)
+        users = list(crud.iter_users(("chosen_set",), batch_size=4, reachable_only=True))
+        self.assertEqual(users[0], (3, "Set"))
+        self.assertEqual([user[0] for user in users], [i for i in range(3, 76, 3) if i % 7])
+        self.assertEqual(crud.get_reachable_user_ids_page(0, 3), [3, 6, 9])
+        with self.assertRaises(ValueError):
+            crud.get_users_page(0, ("chat_id", "level; DROP TABLE users"))
+
+    def test_async_iterator(self):
+        """async_crud.iter_users читает страницы в потоке БД."""
+        self._patch(25)
+
+        async def collect():
+            return [user[0] async for user in async_crud.iter_users(batch_size=7)]
+
+        self.assertEqual(asyncio.run(collect()), list(range(3, 76, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
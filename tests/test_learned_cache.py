@@ -0,0 +1,48 @@
+# tests/test_learned_cache.py
+import unittest
+
+from database.learned_cache import LearnedWordsCache
+
+
+class TestLearnedWordsCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LearnedWordsCache(max_users=2)
+
+    def test_lru_eviction(self):
+        """Вытесняется давно не использованный пользователь."""
+        self.cache.put(1, frozenset({"cat"}))
+        self.cache.put(2, frozenset({"dog"}))
+        self.cache.get(1)
+        self.cache.put(3, frozenset())
+        self.assertIsNotNone(self.cache.get(1))
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(len(self.cache), 2)
+
+    def test_add_updates_in_place_with_normalization(self):
+        """Новое слово попадает в множество в нормализованном виде."""
+        self.cache.put(1, frozenset({"cat"}))
+        self.cache.add(1, "Hello - привет")
+        self.assertEqual(self.cache.get(1), frozenset({"cat", "hello"}))
+        # Пользователя нет в кэше — ничего не создается
+        self.cache.add(5, "dog")
+        self.assertIsNone(self.cache.get(5))
+
+    def test_change_during_load_is_not_cached(self):
+        """Изменение во время чтения из БД отменяет кэширование устаревшего результата."""
+        self.cache.begin_load(1)
+        self.cache.add(1, "cat")
+        self.cache.finish_load(1, frozenset())
+        self.assertIsNone(self.cache.get(1))
+
+        self.cache.begin_load(1)
+        self.cache.finish_load(1, frozenset({"cat"}))
+        self.assertEqual(self.cache.get(1), frozenset({"cat"}))
+
+    def test_failed_load_is_not_cached(self):
+        self.cache.begin_load(1)
+        self.cache.finish_load(1, None)
+        self.assertIsNone(self.cache.get(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
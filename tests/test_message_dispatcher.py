@@ -0,0 +1,134 @@
+# tests/test_message_dispatcher.py
+import asyncio
+import time
+import unittest
+
+from aiogram.utils.exceptions import RetryAfter
+
+from services.message_dispatcher import (
+    MAX_RETRY_AFTER_ATTEMPTS, MessageDispatcher, TokenBucket, PRIORITY_BROADCAST, PRIORITY_INTERACTIVE,
+)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_and_debt(self):
+        """Токены восстанавливаются со скоростью rate; резерв уводит бакет в долг."""
+        bucket = TokenBucket(rate=2, capacity=1, now=0.0)
+        self.assertEqual(bucket.wait_time(0.0), 0.0)
+        bucket.take(0.0)
+        self.assertAlmostEqual(bucket.wait_time(0.0), 0.5)
+        self.assertEqual(bucket.wait_time(0.5), 0.0)
+        bucket.take(0.5)
+        bucket.take(0.5)
+        self.assertAlmostEqual(bucket.wait_time(0.5), 1.0)
+
+
+class TestMessageDispatcher(unittest.TestCase):
+    def _run(self, coro):
+        return asyncio.run(coro)
+
+    def test_per_chat_rate(self):
+        """Сообщения в один чат разнесены на 1/chat_rate, другие чаты не ждут."""
+        sent = []
+
+        async def scenario():
+            dispatcher = MessageDispatcher(global_rate=1000, chat_rate=20)
+
+            def call(chat_id):
+                async def send():
+                    sent.append((chat_id, time.monotonic()))
+                return send
+
+            futures = [dispatcher.submit(1, call(1)) for _ in range(3)]
+            futures.append(dispatcher.submit(2, call(2)))
+            await asyncio.gather(*futures)
+            await dispatcher.stop()
+
+        self._run(scenario())
+        chat1 = [t for chat_id, t in sent if chat_id == 1]
+        self.assertEqual(len(chat1), 3)
+        self.assertGreaterEqual(chat1[2] - chat1[0], 2 / 20 - 0.01)
+        # Сообщение во второй чат не ждет хвоста первого
+        self.assertLess(sent.index(next(s for s in sent if s[0] == 2)), 3)
+
+    def test_priority_order(self):
+        """Интерактивные ответы обслуживаются раньше рассылки."""
+        order = []
+
+        async def scenario():
+            dispatcher = MessageDispatcher(global_rate=1000, chat_rate=1000)
+            dispatcher.start()
+            dispatcher._paused_until = time.monotonic() + 0.05  # копим очередь
+
+            def call(name):
+                async def send():
+                    order.append(name)
+                return send
+
+            futures = [dispatcher.submit(i, call(f"broadcast{i}"), PRIORITY_BROADCAST) for i in range(3)]
+            futures.append(dispatcher.submit(10, call("reply"), PRIORITY_INTERACTIVE))
+            await asyncio.gather(*futures)
+            await dispatcher.stop()
+
+        self._run(scenario())
+        self.assertEqual(order[0], "reply")
+
+    def test_retry_after_is_retried(self):
+        """RetryAfter ставит сообщение на повтор после паузы."""
+        attempts = []
+
+        async def scenario():
+            dispatcher = MessageDispatcher(global_rate=1000, chat_rate=1000)
+
+            async def send():
+                attempts.append(time.monotonic())
+                if len(attempts) == 1:
+                    raise RetryAfter(0)
+                return "ok"
+
+            result = await dispatcher.submit(1, send)
+            await dispatcher.stop()
+            return result, dispatcher.stats
+
+        result, stats = self._run(scenario())
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(stats["retry_after"], 1)
+
+    def test_retry_after_exhausted_counts_failure(self):
+        """После MAX_RETRY_AFTER_ATTEMPTS попыток RetryAfter уходит вызывающему и считается ошибкой."""
+        async def scenario():
+            dispatcher = MessageDispatcher(global_rate=1000, chat_rate=1000)
+
+            async def send():
+                raise RetryAfter(0)
+
+            with self.assertRaises(RetryAfter):
+                await dispatcher.submit(1, send)
+            await dispatcher.stop()
+            return dispatcher.stats
+
+        stats = self._run(scenario())
+        self.assertEqual(stats["retry_after"], MAX_RETRY_AFTER_ATTEMPTS)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["sent"], 0)
+
+    def test_errors_reach_caller(self):
+        """Прочие ошибки API возвращаются вызывающему."""
+        async def scenario():
+            dispatcher = MessageDispatcher(global_rate=1000, chat_rate=1000)
+
+            async def send():
+                raise ValueError("blocked")
+
+            try:
+                await dispatcher.submit(1, send)
+            finally:
+                await dispatcher.stop()
+
+        with self.assertRaises(ValueError):
+            self._run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# tests/test_notification_index.py
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from services.notification_index import NotificationIndex
+
+
+def _user(chat_id, timezone):
+    return (chat_id, "A1", 5, 3, "09:00", timezone)
+
+
+class TestNotificationIndex(unittest.TestCase):
+    def setUp(self):
+        self.plans = {
+            1: ["20:00", "20:30"],   # Москва, UTC+3
+            2: ["20:00"],            # Владивосток, UTC+10
+            3: None,                 # план недоступен (несоответствие набора)
+        }
+        self.index = NotificationIndex(
+            plan_provider=lambda user: self.plans[user[0]],
+            first_time="20:00",
+            duration_hours=1,
+        )
+        self.users = {
+            1: _user(1, "Europe/Moscow"),
+            2: _user(2, "Asia/Vladivostok"),
+            3: _user(3, "Europe/Moscow"),
+        }
+        self.now = datetime(2025, 1, 15, 12, 0, tzinfo=ZoneInfo("UTC"))
+        self.index.rebuild(self.users.values(), self.now)
+
+    def _at(self, hour, minute):
+        return datetime(2025, 1, 15, hour, minute, tzinfo=ZoneInfo("UTC"))
+
+    def test_notification_minutes_are_converted_to_utc(self):
+        """Локальное 20:00 попадает в корзину своей UTC-минуты для каждого пояса."""
+        self.assertEqual(self.index.due(self._at(17, 0)), [1])
+        self.assertEqual(self.index.due(self._at(17, 30)), [1])
+        self.assertEqual(self.index.due(self._at(10, 0)), [2])
+        self.assertEqual(self.index.due(self._at(17, 15)), [])
+
+    def test_midnight_is_not_indexed(self):
+        """Полночь по Москве (21:00 UTC) не поднимает всех: сброс — отдельная пакетная задача."""
+        self.assertEqual(self.index.due(self._at(21, 0)), [])
+        self.assertEqual(self.index.due(self._at(21, 3)), [])
+
+    def test_test_reminder_window(self):
+        """Конец периода (21:00 по Москве) ± 5 минут — для пользователя с планом."""
+        self.assertIn(1, self.index.due(self._at(17, 55)))
+        self.assertIn(1, self.index.due(self._at(18, 5)))
+        self.assertNotIn(3, self.index.due(self._at(18, 0)))
+
+    def test_refresh_dirty_moves_user(self):
+        """После смены плана пользователь переезжает в новые корзины."""
+        self.plans[1] = ["21:00"]
+        self.index.mark_dirty(1)
+        self.assertEqual(self.index.refresh_dirty(self.users, self.now), 1)
+        self.assertEqual(self.index.due(self._at(17, 30)), [])
+        self.assertIn(1, self.index.due(self._at(18, 0)))
+
+    def test_removed_user_is_unindexed(self):
+        """Пользователь, пропавший из кэша, удаляется из индекса."""
+        del self.users[2]
+        self.index.mark_dirty(2)
+        self.index.refresh_dirty(self.users, self.now)
+        self.assertEqual(self.index.due(self._at(10, 0)), [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_overlay_compaction_keeps_schedule(self):
+        """После вливания оверлея в массивы выборка не меняется."""
+        self.plans[4] = ["20:00"]
+        self.users[4] = _user(4, "Europe/Moscow")
+        self.index.mark_dirty(4)
+        self.index.refresh_dirty(self.users, self.now)
+        before = sorted(self.index.due(self._at(17, 0)))
+        self.index._compact()
+        self.assertEqual(self.index._overlay, {})
+        self.assertEqual(sorted(self.index.due(self._at(17, 0))), before)
+        self.assertEqual(before, [1, 4])
+        self.assertEqual(len(self.index), 4)
+
+    def test_user_is_returned_once(self):
+        """Уведомление в окне напоминания о тесте — пользователь в выборке один раз."""
+        self.plans[1] = ["21:00"]
+        self.index.rebuild(self.users.values(), self.now)
+        self.assertEqual(self.index.due(self._at(18, 0)), [1])
+
+    def test_offset_follows_dst(self):
+        """Смещение пояса берется на момент тика: 20:00 по Берлину зимой и летом."""
+        self.plans[5] = ["20:00"]
+        self.index.rebuild([_user(5, "Europe/Berlin")], self.now)
+        self.assertEqual(self.index.due(datetime(2025, 1, 15, 19, 0, tzinfo=ZoneInfo("UTC"))), [5])
+        self.assertEqual(self.index.due(datetime(2025, 7, 15, 18, 0, tzinfo=ZoneInfo("UTC"))), [5])
+
+
+class TestNotificationMinutes(unittest.TestCase):
+    def test_minutes_match_times(self):
+        """Минуты суток совпадают со строками 'HH:MM', переход через полночь."""
+        from utils.helpers import compute_notification_minutes, compute_notification_times
+
+        self.assertEqual(list(compute_notification_minutes(3, "23:00", 2)), [1380, 0, 60])
+        self.assertEqual(compute_notification_times(3, "23:00", 2), ["23:00", "00:00", "01:00"])
+        self.assertEqual(compute_notification_times(4, "10:00", 1), ["10:00", "10:20", "10:40", "11:00"])
+        self.assertEqual(compute_notification_times(1, "09:30", 5), ["09:30"])
+
+
+if __name__ == '__main__':
+    unittest.main()
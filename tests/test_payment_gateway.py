@@ -0,0 +1,143 @@
+# tests/test_payment_gateway.py
+import asyncio
+import base64
+import unittest
+
+from aiohttp import web
+
+from services.payment_gateway import YooKassaGateway
+
+
+class _StubYooKassa:
+    """Локальная заглушка API ЮKassa: GET /v3/payments/{id}."""
+
+    def __init__(self, statuses, delay=0.0):
+        self.statuses = statuses
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.auth = set()
+
+    async def handle(self, request):
+        payment_id = request.match_info["payment_id"]
+        self.requests.append(payment_id)
+        self.auth.add(request.headers.get("Authorization"))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        status = self.statuses.get(payment_id)
+        if status is None:
+            return web.json_response({"type": "error", "code": "not_found"}, status=404)
+        if status == "malformed":
+            return web.Response(text='{"id": ', content_type="application/json")
+        return web.json_response({
+            "id": payment_id,
+            "status": status,
+            "paid": status == "succeeded",
+            "amount": {"value": "299.00", "currency": "RUB"},
+            "created_at": "2025-01-15T12:00:00.000Z",
+            "metadata": {"chat_id": "1", "subscription_months": "1"},
+        })
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/v3/payments/{payment_id}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v3"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+class TestYooKassaGateway(unittest.TestCase):
+    def _run(self, scenario, statuses, delay=0.0, concurrency=4):
+        async def main():
+            async with _StubYooKassa(statuses, delay) as stub:
+                gateway = YooKassaGateway("shop", "secret", stub.url, concurrency=concurrency, timeout=5)
+                try:
+                    return stub, await scenario(gateway)
+                finally:
+                    await gateway.close()
+        return asyncio.run(main())
+
+    def test_concurrent_polling_is_bounded(self):
+        """Статусы запрашиваются параллельно, но не больше concurrency одновременно."""
+        statuses = {f"p{i}": "pending" for i in range(12)}
+
+        async def scenario(gateway):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            result = await gateway.get_payments(statuses)
+            return result, loop.time() - start
+
+        stub, (result, elapsed) = self._run(scenario, statuses, delay=0.1, concurrency=4)
+        self.assertEqual({k: v["status"] for k, v in result.items()}, statuses)
+        self.assertEqual(stub.max_active, 4)
+        # 12 запросов по 0.1 с в 4 потока ≈ 0.3 с вместо 1.2 с последовательно
+        self.assertLess(elapsed, 0.8)
+        expected = "Basic " + base64.b64encode(b"shop:secret").decode()
+        self.assertEqual(stub.auth, {expected})
+
+    def test_terminal_statuses_are_cached(self):
+        """succeeded/canceled больше не запрашиваются, pending — запрашивается снова."""
+        statuses = {"ok": "succeeded", "wait": "pending"}
+
+        async def scenario(gateway):
+            await gateway.get_payments(["ok", "wait"])
+            return await gateway.get_payments(["ok", "wait"])
+
+        stub, result = self._run(scenario, statuses)
+        self.assertTrue(result["ok"]["paid"])
+        self.assertEqual(sorted(stub.requests), ["ok", "wait", "wait"])
+
+    def test_simultaneous_requests_are_merged(self):
+        """Одновременные запросы одного платежа — один HTTP-запрос."""
+        async def scenario(gateway):
+            return await asyncio.gather(*(gateway.get_payment("p") for _ in range(5)))
+
+        stub, results = self._run(scenario, {"p": "pending"}, delay=0.05)
+        self.assertEqual(stub.requests, ["p"])
+        self.assertTrue(all(r["status"] == "pending" for r in results))
+
+    def test_errors_return_none(self):
+        """Неизвестный платеж (404) — None, как в check_payment_status."""
+        async def scenario(gateway):
+            return await gateway.get_payment("missing")
+
+        _, result = self._run(scenario, {})
+        self.assertIsNone(result)
+
+    def test_malformed_json_fails_only_that_payment(self):
+        """Некорректный JSON в ответе — None для этого платежа, остальные статусы получены."""
+        async def scenario(gateway):
+            return await gateway.get_payments(["bad", "ok"])
+
+        _, result = self._run(scenario, {"bad": "malformed", "ok": "succeeded"})
+        self.assertIsNone(result["bad"])
+        self.assertEqual(result["ok"]["status"], "succeeded")
+
+    def test_session_of_previous_loop_is_closed(self):
+        """При смене цикла событий прежняя сессия закрывается, а не бросается открытой."""
+        gateway = YooKassaGateway("shop", "secret", "http://127.0.0.1:1/v3", timeout=5)
+
+        async def open_session():
+            return await gateway._ensure_session()
+
+        first = asyncio.run(open_session())
+        second = asyncio.run(open_session())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        asyncio.run(gateway.close())
+
+
+if __name__ == "__main__":
+    unittest.main()
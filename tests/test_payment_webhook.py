@@ -0,0 +1,125 @@
+# tests/test_payment_webhook.py
+import asyncio
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from fake_db import FakeManager
+from services.payment import PaymentService
+from services.payment_webhook import PaymentWebhook
+
+
+_SCHEMA = """
+    CREATE TABLE active_payments (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL,
+                                  payment_id TEXT NOT NULL UNIQUE, amount REAL NOT NULL,
+                                  months INTEGER NOT NULL, description TEXT, created_at TEXT NOT NULL,
+                                  status TEXT DEFAULT 'pending', processed BOOLEAN DEFAULT FALSE);
+    INSERT INTO active_payments (chat_id, payment_id, amount, months, created_at)
+    VALUES (42, 'pay-1', 299.0, 3, '2025-01-15T12:00:00');
+"""
+
+
+def _notification(event="payment.succeeded", payment_id="pay-1", status="succeeded", amount="299.00"):
+    return {
+        "type": "notification",
+        "event": event,
+        "object": {
+            "id": payment_id,
+            "status": status,
+            "paid": status == "succeeded",
+            "amount": {"value": amount, "currency": "RUB"},
+            "metadata": {"chat_id": "999", "subscription_months": "12"},
+        },
+    }
+
+
+class TestPaymentWebhook(unittest.TestCase):
+    def setUp(self):
+        self.manager = FakeManager(_SCHEMA)
+        self.activations = []
+        patches = [
+            patch("services.payment.db_manager", self.manager),
+            patch("database.crud.get_user_subscription_status", return_value=("free", None, None)),
+            patch("database.crud.is_user_premium", return_value=False),
+            patch("database.crud.write_user_subscription",
+                  side_effect=lambda tx, *args: self.activations.append(args)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.manager.close()
+
+    def _post(self, bodies, trusted_ips="127.0.0.1/32"):
+        webhook = PaymentWebhook(path="/hook", trusted_ips=trusted_ips)
+
+        async def scenario():
+            async with TestClient(TestServer(webhook.make_app())) as client:
+                statuses = []
+                for body in bodies:
+                    response = await client.post("/hook", json=body)
+                    statuses.append(response.status)
+                return statuses
+
+        return webhook, asyncio.run(scenario())
+
+    def _row(self):
+        return self.manager.conn.execute(
+            "SELECT status, processed FROM active_payments WHERE payment_id = 'pay-1'"
+        ).fetchone()
+
+    def test_succeeded_activates_once(self):
+        """Повтор уведомления не продлевает подписку второй раз."""
+        webhook, statuses = self._post([_notification(), _notification()])
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(len(self.activations), 1)
+        chat_id, status, _, payment_id = self.activations[0]
+        # Пользователь и срок — из active_payments, а не из metadata уведомления
+        self.assertEqual((chat_id, status, payment_id), (42, "premium", "pay-1"))
+        self.assertEqual(self._row(), ("completed", 1))
+        self.assertEqual(webhook.stats["activated"], 1)
+        self.assertEqual(webhook.stats["duplicates"], 1)
+
+    def test_already_polled_payment_is_not_activated_again(self):
+        """Платеж, обработанный фоновой проверкой, webhook не трогает."""
+        self.assertTrue(PaymentService.claim_payment("pay-1"))
+        self.assertFalse(PaymentService.claim_payment("pay-1"))
+        _, statuses = self._post([_notification()])
+        self.assertEqual(statuses, [200])
+        self.assertEqual(self.activations, [])
+
+    def test_failed_activation_rolls_back_claim(self):
+        """Ошибка записи подписки откатывает и отметку платежа: следующая проверка его подхватит."""
+        with patch("database.crud.write_user_subscription", side_effect=sqlite3.OperationalError("locked")):
+            with self.assertRaises(sqlite3.OperationalError):
+                PaymentService.activate_subscription(42, "pay-1", 3)
+        self.assertEqual(self._row(), ("pending", 0))
+        self.assertFalse(PaymentService.activate_subscription(42, "pay-1", 3))
+        self.assertEqual(self._row(), ("completed", 1))
+        self.assertEqual(len(self.activations), 1)
+
+    def test_untrusted_sender_rejected(self):
+        """Запросы не с адресов ЮKassa отклоняются."""
+        _, statuses = self._post([_notification()], trusted_ips="185.71.76.0/27")
+        self.assertEqual(statuses, [403])
+        self.assertEqual(self.activations, [])
+        self.assertEqual(self._row(), ("pending", 0))
+
+    def test_unknown_payment_and_wrong_amount_ignored(self):
+        """Чужой платеж и несовпадение суммы не активируют подписку."""
+        _, statuses = self._post([_notification(payment_id="other"), _notification(amount="1.00")])
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(self.activations, [])
+
+    def test_canceled_marks_row(self):
+        """Отмена платежа отмечает запись обработанной."""
+        _, statuses = self._post([_notification(event="payment.canceled", status="canceled")])
+        self.assertEqual(statuses, [200])
+        self.assertEqual(self._row(), ("canceled", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+# tests/test_plan_store.py
+import json
+import unittest
+
+from database.plan_store import PersistentDict, PlanStore
+from fake_db import FakeManager
+
+_SCHEMA = "CREATE TABLE daily_plans (chat_id INTEGER PRIMARY KEY, plan_date TEXT, payload TEXT NOT NULL)"
+
+
+class _MemoryStore:
+    """PlanStore в памяти: хранит JSON, как таблица, и считает обращения."""
+
+    table = "memory"
+
+    def __init__(self):
+        self.rows = {}
+        self.loads = 0
+
+    def load(self, chat_id):
+        self.loads += 1
+        payload = self.rows.get(chat_id)
+        return json.loads(payload) if payload else None
+
+    def load_all(self):
+        return {chat_id: json.loads(payload) for chat_id, payload in self.rows.items()}
+
+    def save(self, chat_id, value, plan_date=None):
+        self.rows[chat_id] = json.dumps(value)
+
+    def delete(self, chat_id):
+        self.rows.pop(chat_id, None)
+
+    def delete_many(self, chat_ids):
+        for chat_id in chat_ids:
+            self.rows.pop(chat_id, None)
+
+    def clear(self):
+        self.rows.clear()
+
+
+def _entry(date="2025-01-15"):
+    return (date, ["🔹 cat - кошка"], ["20:00"], "20:00", 1.0, 1, 1,
+            "Europe/Moscow", ["cat - кошка"], False, "")
+
+
+class TestPersistentDict(unittest.TestCase):
+    def setUp(self):
+        self.store = _MemoryStore()
+        self.cache = PersistentDict(self.store, decode=tuple)
+
+    def test_survives_restart(self):
+        """Новый словарь на том же хранилище видит сохраненный план без пересчета."""
+        self.cache[1] = _entry()
+        restarted = PersistentDict(self.store, decode=tuple)
+        self.assertIn(1, restarted)
+        self.assertEqual(restarted[1], _entry())
+        self.assertEqual(restarted.get(1), _entry())
+
+    def test_read_through_caches_misses(self):
+        """Отсутствующий ключ читается из хранилища один раз."""
+        self.assertNotIn(2, self.cache)
+        self.assertNotIn(2, self.cache)
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.store.loads, 1)
+        self.cache[2] = _entry()
+        self.assertIn(2, self.cache)
+
+    def test_delete_and_warm(self):
+        """Удаление доходит до хранилища; после warm() промахи не читают БД."""
+        self.cache[1] = _entry()
+        self.cache[2] = _entry("2025-01-14")
+        del self.cache[1]
+        self.assertNotIn(1, self.store.rows)
+
+        restarted = PersistentDict(self.store, decode=tuple)
+        self.assertEqual(restarted.warm(), 1)
+        self.assertNotIn(1, restarted)
+        self.assertEqual(self.store.loads, 0)
+
+        restarted.discard_many([2])
+        self.assertEqual(self.store.rows, {})
+
+    def test_sqlite_round_trip(self):
+        """Таблица daily_plans хранит кортеж плана без потерь."""
+        db = FakeManager(_SCHEMA)
+        self.addCleanup(db.close)
+        store = PlanStore("daily_plans", db)
+        store.save(1, _entry(), "2025-01-15")
+        self.assertEqual(tuple(store.load(1)), _entry())
+        self.assertEqual(db.conn.execute("SELECT plan_date FROM daily_plans").fetchone(), ("2025-01-15",))
+        store.delete(1)
+        self.assertIsNone(store.load(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
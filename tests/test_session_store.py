@@ -0,0 +1,149 @@
+# tests/test_session_store.py
+import unittest
+from dataclasses import dataclass, field
+from typing import List
+
+from database.session_store import MemorySessionStore, SqliteSessionStore, register_session_type
+from fake_db import FakeManager
+
+
+@register_session_type
+@dataclass
+class _State:
+    questions: List[str]
+    current: int = 0
+    answered: set = field(default_factory=set)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+_SCHEMA = """
+    CREATE TABLE sessions (namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+                           expires_at REAL NOT NULL, PRIMARY KEY (namespace, key)) WITHOUT ROWID;
+"""
+
+
+class TestMemorySessionStore(unittest.TestCase):
+    def test_ttl_expiry(self):
+        """Сессия, не обновлявшаяся дольше TTL, исчезает; запись продлевает срок."""
+        clock = _Clock()
+        store = MemorySessionStore("test", ttl=60, clock=clock)
+        store[1] = {"current": 0}
+        store[2] = {"current": 0}
+        clock.now += 50
+        store[1] = {"current": 1}
+        clock.now += 20
+        self.assertIn(1, store)
+        self.assertNotIn(2, store)
+        self.assertIsNone(store.get(2))
+        clock.now += 100
+        self.assertEqual(store.expire(), 1)
+        self.assertEqual(len(store), 0)
+
+    def test_lru_bound(self):
+        """В памяти не больше max_entries сессий, вытесняется давно не использованная."""
+        store = MemorySessionStore("test", ttl=60, max_entries=3, clock=_Clock())
+        for key in range(3):
+            store[key] = key
+        store.get(0)
+        store[3] = 3
+        self.assertEqual(len(store), 3)
+        self.assertNotIn(1, store)
+        self.assertEqual([store.get(key) for key in (0, 2, 3)], [0, 2, 3])
+
+    def test_dict_interface(self):
+        """pop/del/clear работают как у dict."""
+        store = MemorySessionStore("test", clock=_Clock())
+        store["p"] = 5
+        self.assertEqual(store.pop("p"), 5)
+        self.assertIsNone(store.pop("p", None))
+        with self.assertRaises(KeyError):
+            del store["p"]
+        store["q"] = 1
+        store.clear()
+        self.assertNotIn("q", store)
+
+
+class TestSqliteSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.manager = FakeManager(_SCHEMA)
+        self.clock = _Clock()
+
+    def tearDown(self):
+        self.manager.close()
+
+    def _store(self, namespace="quiz_states", max_entries=100):
+        return SqliteSessionStore(namespace, ttl=60, max_entries=max_entries,
+                                  clock=self.clock, manager=self.manager)
+
+    def test_survives_restart(self):
+        """Новое хранилище на той же БД видит сохраненную сессию."""
+        store = self._store()
+        state = {"questions": [{"word": "cat"}], "current": 0, "answered": set()}
+        store[42] = state
+        state["answered"].add(0)
+        state["current"] = 1
+        store[42] = state
+        store.flush()
+
+        restarted = self._store()
+        self.assertIn(42, restarted)
+        self.assertEqual(restarted[42]["current"], 1)
+        self.assertEqual(restarted[42]["answered"], {0})
+        # Другое пространство имен не пересекается
+        self.assertNotIn(42, self._store("learning_states"))
+
+    def test_evicted_session_read_back(self):
+        """Вытесненная из памяти сессия читается из несброшенных записей, затем из БД."""
+        store = self._store(max_entries=1)
+        store["poll-1"] = 10
+        store["poll-2"] = 20
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get("poll-1"), 10)
+        store["poll-3"] = 30
+        store.flush()
+        self.assertEqual(store.get("poll-1"), 10)
+
+    def test_writes_are_deferred(self):
+        """Запись и удаление не обращаются к БД до сброса; повторы схлопываются."""
+        store = self._store()
+        for current in range(5):
+            store[1] = {"current": current}
+        store[2] = "b"
+        del store[2]
+        self.assertEqual(self.manager.count("sessions"), 0)
+        self.assertEqual(store.flush(), 2)
+        self.assertEqual(self.manager.count("sessions"), 1)
+        self.assertEqual(self._store()[1], {"current": 4})
+        self.assertEqual(store.flush(), 0)
+
+    def test_values_stored_as_json(self):
+        """В таблице JSON; set и зарегистрированные dataclass восстанавливаются."""
+        store = self._store()
+        store[7] = _State(["cat", "dog"], current=1, answered={0})
+        store.flush()
+        raw = self.manager.conn.execute("SELECT value FROM sessions").fetchone()[0]
+        self.assertEqual(raw[0], "{")
+        self.assertEqual(self._store()[7], _State(["cat", "dog"], current=1, answered={0}))
+
+    def test_expire_and_pop_delete_rows(self):
+        """Истекшие и удаленные сессии удаляются из таблицы."""
+        store = self._store()
+        store[1] = "a"
+        store[2] = "b"
+        self.assertEqual(store.pop(1), "a")
+        store.flush()
+        self.clock.now += 120
+        self.assertNotIn(2, self._store())
+        self.assertEqual(store.expire(), 1)
+        self.assertEqual(self.manager.count("sessions"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
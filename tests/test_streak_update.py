@@ -0,0 +1,73 @@
+# tests/test_streak_update.py
+import unittest
+from unittest.mock import patch
+
+from database import crud
+from database.db import local_day
+from fake_db import FakeManager
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, timezone TEXT,
+                        days_streak INTEGER DEFAULT 0, last_test_date TEXT);
+"""
+
+
+class TestStreakUpdate(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeManager(_SCHEMA, sql_functions=True)
+        self.addCleanup(self.db.close)
+        self.statements = 0
+        self.db.conn.set_trace_callback(lambda sql: setattr(self, "statements", self.statements + 1))
+        patcher = patch("database.crud.db_manager", self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _add(self, chat_id, streak, last_test_date, timezone="Asia/Tokyo"):
+        self.db.conn.execute("INSERT INTO users VALUES (?, ?, ?, ?)", (chat_id, timezone, streak, last_test_date))
+
+    def _row(self, chat_id):
+        return self.db.conn.execute(
+            "SELECT days_streak, last_test_date FROM users WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+
+    def test_single_statement_rules(self):
+        """Первый тест — 1, вчера — +1, сегодня — без изменений, пропуск — 1; дата — местная."""
+        today, yesterday = local_day("Asia/Tokyo", 0), local_day("Asia/Tokyo", -1)
+        self._add(1, 0, None)
+        self._add(2, 4, yesterday)
+        self._add(3, 4, today)
+        self._add(4, 4, local_day("Asia/Tokyo", -2))
+        self.statements = 0
+        self.assertEqual(crud.increment_user_streak(2), 5)
+        self.assertEqual(self.statements, 3)  # BEGIN, UPDATE ... RETURNING, COMMIT
+        self.assertEqual(crud.increment_user_streak(1), 1)
+        self.assertEqual(crud.increment_user_streak(3), 4)
+        self.assertEqual(crud.increment_user_streak(4), 1)
+        self.assertEqual(self._row(2), (5, today))
+        self.assertEqual(crud.increment_user_streak(2), 5)  # повторный тест в тот же день
+
+    def test_default_timezone_and_missing_user(self):
+        """Без пояса и с некорректным поясом — московская дата; неизвестный пользователь — 0."""
+        moscow_yesterday = local_day("Europe/Moscow", -1)
+        self._add(1, 2, moscow_yesterday, timezone=None)
+        self._add(2, -3, moscow_yesterday, timezone="Mars/Base")
+        self.assertEqual(crud.increment_user_streak(1), 3)
+        self.assertEqual(crud.increment_user_streak(2), 1)
+        self.assertEqual(self._row(1)[1], local_day("Europe/Moscow", 0))
+        self.assertEqual(crud.increment_user_streak(999), 0)
+
+    def test_bulk_variant(self):
+        """increment_user_streaks обновляет всех одним UPDATE и возвращает новые значения."""
+        yesterday = local_day("Asia/Tokyo", -1)
+        for chat_id in range(1, 601):
+            self._add(chat_id, chat_id, yesterday if chat_id % 2 else None)
+        result = crud.increment_user_streaks(range(1, 601))
+        self.assertEqual(len(result), 600)
+        self.assertEqual(result[1], 2)
+        self.assertEqual(result[2], 1)
+        self.assertEqual(result[599], 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# tests/test_subscription_sweeper.py
+import unittest
+from unittest.mock import MagicMock, patch
+
+from database import crud
+from database.db import DatabaseManager
+from database.entitlement_cache import EntitlementCache
+from fake_db import FakeManager
+from services import subscription_sweeper
+
+NOW = 1_700_000_000
+DAY = 86400
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, subscription_status TEXT DEFAULT 'free',
+                        subscription_expires_at TEXT, subscription_expires_epoch INTEGER DEFAULT 0,
+                        subscription_payment_id TEXT);
+    CREATE TABLE job_state (name TEXT PRIMARY KEY, watermark REAL NOT NULL,
+                            updated_at TEXT NOT NULL) WITHOUT ROWID;
+    CREATE INDEX idx_users_subscription_expiry ON users(subscription_expires_epoch)
+        WHERE subscription_status = 'premium';
+"""
+
+
+class TestSubscriptionSweeper(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeManager(_SCHEMA)
+        self.addCleanup(self.db.close)
+        self.dispatcher = MagicMock()
+        for target, value in (("database.crud.db_manager", self.db),
+                              ("database.crud.entitlement_cache", EntitlementCache(max_users=100)),
+                              ("services.subscription_sweeper.message_dispatcher", self.dispatcher)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _add(self, chat_id, expires_epoch, status="premium"):
+        self.db.conn.execute(
+            "INSERT INTO users (chat_id, subscription_status, subscription_expires_epoch) VALUES (?, ?, ?)",
+            (chat_id, status, expires_epoch))
+
+    def _seed(self, now=NOW - 60):
+        """Водяные знаки, как после init_db в момент развертывания."""
+        DatabaseManager._seed_job_watermarks(self.db, now=now)
+
+    def _statuses(self):
+        return dict(self.db.conn.execute("SELECT chat_id, subscription_status FROM users"))
+
+    def _sent(self):
+        return [chat_id for call in self.dispatcher.submit_many_threadsafe.call_args_list
+                for chat_id, _ in call.args[0]]
+
+    def test_uses_expiry_index(self):
+        """Выборка истекших — диапазон по частичному индексу, без полного обхода users."""
+        plan = " ".join(row[3] for row in self.db.conn.execute(
+            "EXPLAIN QUERY PLAN UPDATE users SET subscription_status = 'expired' "
+            "WHERE subscription_status = 'premium' "
+            "AND subscription_expires_epoch > 1 AND subscription_expires_epoch <= 2"))
+        self.assertIn("idx_users_subscription_expiry", plan)
+
+    def test_expires_only_new_range(self):
+        """Понижаются подписки, истекшие после водяного знака; повторный проход пуст."""
+        self._add(1, NOW - 10)
+        self._add(2, NOW + 10)
+        self._add(3, NOW - 10, status="free")
+        self._add(4, 0)  # премиум без даты не трогаем
+        self._seed()
+        expired, _ = subscription_sweeper.sweep_subscriptions(now=NOW)
+        self.assertEqual(expired, [1])
+        self.assertEqual(self._statuses(), {1: "expired", 2: "premium", 3: "free", 4: "premium"})
+        self.assertEqual(subscription_sweeper.sweep_subscriptions(now=NOW)[0], [])
+        self.assertEqual(subscription_sweeper.sweep_subscriptions(now=NOW + 20)[0], [2])
+        self.assertEqual(crud.get_job_watermark("subscription_expiry"), NOW + 20)
+
+    def test_expiring_notice_once_in_one_batch(self):
+        """Предупреждение за SUBSCRIPTION_EXPIRY_NOTICE_DAYS дней — один раз, одним пакетом."""
+        self._add(1, NOW + DAY)
+        self._add(2, NOW + 2 * DAY)
+        self._add(3, NOW + 30 * DAY)
+        with patch("services.subscription_sweeper.SUBSCRIPTION_EXPIRY_NOTICE_DAYS", 3):
+            _, expiring = subscription_sweeper.sweep_subscriptions(now=NOW)
+            self.assertEqual([chat_id for chat_id, _ in expiring], [1, 2])
+            self.assertEqual(self.dispatcher.submit_many_threadsafe.call_count, 1)
+            subscription_sweeper.sweep_subscriptions(now=NOW + 60)
+            self.assertEqual(self._sent(), [1, 2])
+
+            # Продление: новая дата окончания — новое предупреждение позже
+            self.db.conn.execute("UPDATE users SET subscription_expires_epoch = ? WHERE chat_id = 1",
+                                 (NOW + 10 * DAY,))
+            _, expiring = subscription_sweeper.sweep_subscriptions(now=NOW + 8 * DAY)
+            self.assertEqual([chat_id for chat_id, _ in expiring], [1])
+
+    def test_expired_premium_is_not_premium(self):
+        """После понижения is_user_premium сразу ложен (кэш сброшен)."""
+        self._add(1, NOW + 5)
+        self._seed()
+        with patch("database.crud.time.time", return_value=NOW):
+            self.assertTrue(crud.is_user_premium(1))
+        subscription_sweeper.sweep_subscriptions(now=NOW + 10)
+        self.assertFalse(crud.is_user_premium(1))
+        self.assertEqual(self._sent(), [1])
+
+    def test_first_deploy_does_not_notify_old_expiries(self):
+        """При развертывании давно истекшие подписки понижаются молча, новые — как обычно."""
+        self._add(1, NOW - 365 * DAY)
+        self._add(2, NOW - 10)
+        self._add(3, NOW + 10)
+        self._seed(now=NOW)
+        self.assertEqual(self._statuses(), {1: "expired", 2: "expired", 3: "premium"})
+        self.assertEqual(subscription_sweeper.sweep_subscriptions(now=NOW + 20)[0], [3])
+        self.assertEqual(self._sent(), [3])
+
+        # Повторный init_db не сдвигает водяные знаки и никого не трогает
+        self._add(4, NOW + 30)
+        self._seed(now=NOW + 60)
+        self.assertEqual(crud.get_job_watermark("subscription_expiry"), NOW + 20)
+        self.assertEqual(self._statuses()[4], "premium")
+
+    def test_missing_watermark_starts_from_now(self):
+        """Без записи в job_state первый проход начинает отсчет с now, а не с нуля."""
+        self._add(1, NOW - 365 * DAY)
+        self.assertEqual(subscription_sweeper.sweep_subscriptions(now=NOW), ([], []))
+        self.dispatcher.submit_many_threadsafe.assert_not_called()
+        self.assertEqual(crud.get_job_watermark("subscription_expiry"), NOW)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# tests/test_text_to_speech.py
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fake_db import FakeManager
+from services.text_to_speech import PronunciationCache, cache_key, send_pronunciation
+
+
+_SCHEMA = """
+    CREATE TABLE media_file_ids (cache_key TEXT PRIMARY KEY, kind TEXT NOT NULL,
+                                 file_id TEXT NOT NULL, created_at TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+class _FakeBackend:
+    """Локальная замена gTTS: mp3 — байты текста, считает вызовы."""
+
+    def __init__(self, size=100):
+        self.size = size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def synthesize(self, text, lang):
+        with self._lock:
+            self.calls.append((text, lang))
+        return (f"{lang}:{text}".encode() * self.size)[:self.size]
+
+
+class _FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_audio(self, chat_id, audio, **kwargs):
+        self.sent.append(audio)
+        file_id = audio if isinstance(audio, str) else f"file-{len(self.sent)}"
+        return SimpleNamespace(audio=SimpleNamespace(file_id=file_id))
+
+
+class TestPronunciationCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.backend = _FakeBackend()
+        self.cache = PronunciationCache(self.dir.name, max_bytes=350, backend=self.backend)
+
+    def test_content_addressed_hit(self):
+        """Повтор того же текста и языка не вызывает синтез; другой язык — другой файл."""
+        path = self.cache.get_path("apple")
+        self.assertEqual(self.cache.get_path(" apple "), path)
+        self.assertNotEqual(self.cache.get_path("apple", "de"), path)
+        self.assertEqual(self.backend.calls, [("apple", "en"), ("apple", "de")])
+        self.assertEqual(path.name, f"{cache_key('apple')}.mp3")
+        self.assertEqual(path.read_bytes()[:9], b"en:applee")
+
+    def test_size_bounded_lru(self):
+        """При превышении размера вытесняется давно не использованный файл."""
+        first = self.cache.get_path("one")
+        second = self.cache.get_path("two")
+        self.cache.get_path("three")
+        self.cache.get_path("one")  # теперь самый давний — two
+        self.cache.get_path("four")
+        self.assertTrue(first.exists())
+        self.assertFalse(second.exists())
+        self.assertLessEqual(self.cache.disk.total_bytes, 350)
+        self.assertEqual(len(list(self.cache.disk.cache_dir.glob("*/*.tmp"))), 0)
+
+    def test_index_survives_restart(self):
+        """Новый экземпляр находит файлы на диске и не синтезирует их заново."""
+        self.cache.get_path("one")
+        restarted = PronunciationCache(self.dir.name, max_bytes=350, backend=self.backend)
+        self.assertTrue(restarted.contains("one"))
+        restarted.get_path("one")
+        self.assertEqual(len(self.backend.calls), 1)
+
+    def test_prewarm_batch(self):
+        """Пакетная озвучка: каждый текст синтезируется один раз, уже готовые пропускаются."""
+        cache = PronunciationCache(self.dir.name, max_bytes=10_000, backend=self.backend)
+        cache.get_path("cat")
+        self.assertEqual(cache.prewarm(["cat", "dog", "dog", "fox", ""], workers=3), 2)
+        self.assertEqual(sorted(text for text, _ in self.backend.calls), ["cat", "dog", "fox"])
+
+    def test_file_id_reused(self):
+        """После первой отправки повторная идет по file_id — без синтеза и загрузки."""
+        bot = _FakeBot()
+        with patch("database.crud.db_manager", FakeManager(_SCHEMA)), \
+                patch("services.text_to_speech.pronunciation_cache", self.cache):
+            asyncio.run(send_pronunciation(bot, 1, "apple"))
+            self.cache.file_ids._ids.clear()  # file_id читается из БД
+            os.remove(self.cache.disk.path(cache_key("apple")))  # файл уже вытеснен с диска
+            asyncio.run(send_pronunciation(bot, 2, "apple"))
+        self.assertEqual(len(self.backend.calls), 1)
+        self.assertEqual(bot.sent[1], "file-1")
+
+
+if __name__ == '__main__':
+    unittest.main()
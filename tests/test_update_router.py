@@ -0,0 +1,126 @@
+# tests/test_update_router.py
+import asyncio
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from services import update_router
+from services.update_router import ChatSerializer, UpdateFrontend, routing_key, worker_for
+
+
+class _ListQueue:
+    """Вместо multiprocessing.Queue: запоминает положенные элементы."""
+
+    def __init__(self):
+        self.items = []
+
+    def put_nowait(self, item):
+        self.items.append(item)
+
+
+class TestRoutingKey(unittest.TestCase):
+    def test_message_and_callback_use_chat(self):
+        """Сообщения и нажатия кнопок идут к владельцу чата."""
+        self.assertEqual(routing_key({"update_id": 1, "message": {"chat": {"id": 42}}}), 42)
+        callback = {"update_id": 2, "callback_query": {"from": {"id": 7}, "message": {"chat": {"id": 42}}}}
+        self.assertEqual(routing_key(callback), 42)
+        inline_callback = {"update_id": 3, "callback_query": {"from": {"id": 7}}}
+        self.assertEqual(routing_key(inline_callback), 7)
+
+    def test_poll_answer_goes_to_quiz_owner(self):
+        """Ответ на опрос попадает в процесс, где хранится poll_to_user."""
+        answer = {"update_id": 4, "poll_answer": {"poll_id": "p", "user": {"id": 42}, "option_ids": [0]}}
+        self.assertEqual(worker_for(routing_key(answer), 4), worker_for(42, 4))
+
+    def test_owns_chat_partition(self):
+        """Каждый чат принадлежит ровно одному процессу."""
+        owners = []
+        try:
+            for index in range(3):
+                update_router.set_partition(index, 3)
+                owners.append([chat for chat in range(30) if update_router.owns_chat(chat)])
+        finally:
+            update_router.set_partition(0, 1)
+        self.assertEqual(sorted(sum(owners, [])), list(range(30)))
+        self.assertTrue(update_router.owns_chat(5))
+
+
+class TestChatSerializer(unittest.TestCase):
+    def test_order_within_chat_and_parallel_chats(self):
+        """Один чат — строго по порядку, разные чаты — одновременно."""
+        handled = []
+        active = {"now": 0, "max": 0}
+
+        async def handler(update):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(0.01)
+            handled.append((update["chat"], update["n"]))
+            active["now"] -= 1
+
+        async def main():
+            serializer = ChatSerializer(handler, max_concurrency=8)
+            for n in range(5):
+                for chat in range(4):
+                    serializer.submit(chat, {"chat": chat, "n": n})
+            await serializer.join()
+
+        asyncio.run(main())
+        for chat in range(4):
+            self.assertEqual([n for c, n in handled if c == chat], list(range(5)))
+        self.assertEqual(active["max"], 4)
+
+    def test_handler_error_does_not_stop_chat(self):
+        """Ошибка в обработчике не останавливает очередь чата."""
+        handled = []
+
+        async def handler(update):
+            if update["n"] == 0:
+                raise RuntimeError("boom")
+            handled.append(update["n"])
+
+        async def main():
+            serializer = ChatSerializer(handler)
+            for n in range(3):
+                serializer.submit(1, {"n": n})
+            await serializer.join()
+
+        asyncio.run(main())
+        self.assertEqual(handled, [1, 2])
+
+
+class TestUpdateFrontend(unittest.TestCase):
+    def _post(self, frontend, bodies, headers=None):
+        async def scenario():
+            async with TestClient(TestServer(frontend.make_app())) as client:
+                statuses = []
+                for body in bodies:
+                    response = await client.post("/hook", json=body, headers=headers or {})
+                    statuses.append(response.status)
+                return statuses
+
+        return asyncio.run(scenario())
+
+    def test_updates_routed_by_chat(self):
+        """Обновления раскладываются по очередям воркеров в порядке поступления."""
+        queues = [_ListQueue(), _ListQueue()]
+        frontend = UpdateFrontend(queues, path="/hook", secret="s3cret")
+        bodies = [{"update_id": n, "message": {"chat": {"id": 10 + n % 4}}} for n in range(8)]
+        statuses = self._post(frontend, bodies, {"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+        self.assertEqual(statuses, [200] * 8)
+        self.assertEqual([key for key, _ in queues[0].items], [10, 12, 10, 12])
+        self.assertEqual([key for key, _ in queues[1].items], [11, 13, 11, 13])
+
+    def test_wrong_secret_rejected(self):
+        """Без секретного заголовка обновление не принимается."""
+        queues = [_ListQueue()]
+        frontend = UpdateFrontend(queues, path="/hook", secret="s3cret")
+        statuses = self._post(frontend, [{"update_id": 1, "message": {"chat": {"id": 1}}}],
+                              {"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        self.assertEqual(statuses, [403])
+        self.assertEqual(queues[0].items, [])
+        self.assertEqual(frontend.stats["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
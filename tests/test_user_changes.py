@@ -0,0 +1,71 @@
+# tests/test_user_changes.py
+import unittest
+from unittest.mock import patch
+
+from database import crud
+from database.db import DatabaseManager
+from fake_db import FakeManager
+from services import scheduler
+
+
+_SCHEMA = """
+    CREATE TABLE users (chat_id INTEGER PRIMARY KEY, level TEXT, words_per_day INTEGER,
+                        notifications INTEGER, reminder_time TEXT, timezone TEXT, chosen_set TEXT,
+                        streak INTEGER DEFAULT 0);
+    CREATE TABLE user_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL,
+                               changed_at REAL NOT NULL);
+"""
+
+
+class TestUserChanges(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeManager(_SCHEMA)
+        self.addCleanup(self.db.close)
+        DatabaseManager._create_user_change_triggers(self.db)
+        for chat_id in (1, 2, 3):
+            self._add(chat_id)
+        for target, value in (("database.crud.db_manager", self.db),
+                              ("services.scheduler.user_cache", {}),
+                              ("services.scheduler.user_changes_seq", 0)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _add(self, chat_id, words=5):
+        self.db.conn.execute("INSERT INTO users VALUES (?, 'A1', ?, 3, '10:00', 'UTC', 'Set', 0)", (chat_id, words))
+
+    def test_triggers_log_relevant_changes(self):
+        """Вставка, удаление и смена настроек попадают в журнал, прочие столбцы — нет."""
+        seq = crud.get_user_changes_watermark()
+        self.db.conn.execute("UPDATE users SET streak = 5 WHERE chat_id = 1")
+        self.assertEqual(crud.get_user_changes(seq), (seq, []))
+        self.db.conn.execute("UPDATE users SET words_per_day = 10 WHERE chat_id = 2")
+        self.db.conn.execute("DELETE FROM users WHERE chat_id = 3")
+        self._add(4)
+        self.db.conn.execute("UPDATE users SET timezone = 'Asia/Tokyo' WHERE chat_id = 2")
+        self.assertEqual(crud.get_user_changes(seq, limit=2), (seq + 4, [2, 3, 4]))
+
+    def test_scheduler_applies_only_changes(self):
+        """Тик дочитывает журнал: измененные строки обновляются, удаленные исчезают из кэша."""
+        scheduler._reload_user_cache()
+        self.assertEqual(sorted(scheduler.user_cache), [1, 2, 3])
+        self.db.conn.execute("UPDATE users SET words_per_day = 20 WHERE chat_id = 2")
+        self.db.conn.execute("DELETE FROM users WHERE chat_id = 3")
+        self._add(5)
+        with patch("database.crud.iter_users", side_effect=AssertionError("полная загрузка")):
+            self.assertTrue(scheduler._apply_user_changes())
+        self.assertEqual(sorted(scheduler.user_cache), [1, 2, 5])
+        self.assertEqual(scheduler.user_cache[2][2], 20)
+        self.assertTrue(scheduler._apply_user_changes())
+
+    def test_pruned_log_requires_reload(self):
+        """Если журнал очищен дальше водяного знака — нужна полная загрузка."""
+        seq = crud.get_user_changes_watermark()
+        self.db.conn.execute("UPDATE users SET level = 'B1' WHERE chat_id = 1")
+        self.assertEqual(crud.prune_user_changes(-60), seq + 1)
+        self.assertIsNone(crud.get_user_changes(seq))
+        self.assertEqual(crud.get_user_changes(seq + 1), (seq + 1, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
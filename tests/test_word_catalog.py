@@ -0,0 +1,96 @@
+# tests/test_word_catalog.py
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.word_catalog import WordCatalog, build_bundle
+
+
+class TestWordCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.level_dir = Path(self.tmp_dir) / "A1"
+        self.level_dir.mkdir()
+        self._write("Basics", "Hello [həˈloʊ] – привет\r\nCat - кошка\r\n\r\n# Раздел\r\n")
+        self.catalog = WordCatalog(levels_dir=self.tmp_dir, check_interval=0, bundle_path=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, text, encoding="utf-8"):
+        path = self.level_dir / f"{name}.txt"
+        path.write_bytes(text.encode(encoding))
+        return path
+
+    def test_parsing(self):
+        """Строки разбираются на слово, транскрипцию и перевод; пустые пропускаются."""
+        word_set = self.catalog.get_set("A1", "Basics")
+        self.assertEqual(word_set.lines, ("Hello [həˈloʊ] – привет", "Cat - кошка", "# Раздел"))
+        hello = word_set.records[0]
+        self.assertEqual(hello.english, "Hello")
+        self.assertEqual(hello.transcription, "həˈloʊ")
+        self.assertEqual(hello.translation, "привет")
+        self.assertIs(self.catalog.find("A1", "Basics", "hello [həˈloʊ] – привет"), hello)
+        # Комментарий без разделителя в тест не попадает
+        self.assertEqual([item["word"] for item in word_set.quiz_items],
+                         ["Hello [həˈloʊ]", "Cat"])
+
+    def test_cp1251_fallback(self):
+        """Файл не в UTF-8 читается через cp1251."""
+        self._write("Legacy", "Dog - собака\n", encoding="cp1251")
+        self.assertEqual(self.catalog.get_lines("A1", "Legacy"), ("Dog - собака",))
+
+    def test_reload_on_change(self):
+        """Изменение файла подхватывается без перезапуска, без изменений — тот же объект."""
+        first = self.catalog.get_set("A1", "Basics")
+        self.assertIs(self.catalog.get_set("A1", "Basics"), first)
+
+        path = self._write("Basics", "Bird - птица\n")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, first.mtime_ns + 1_000_000_000))
+        self.assertEqual(self.catalog.get_lines("A1", "Basics"), ("Bird - птица",))
+
+    def test_missing_and_deleted_sets(self):
+        """Отсутствующий набор — None; удаленный с диска исчезает из каталога."""
+        self.assertIsNone(self.catalog.get_set("A1", "Nope"))
+        self.assertEqual(self.catalog.list_sets("A1"), ["Basics"])
+        (self.level_dir / "Basics.txt").unlink()
+        self.assertFalse(self.catalog.has_set("A1", "Basics"))
+        self.assertEqual(self.catalog.get_lines("A1", "Basics"), ())
+
+    def test_bundle_matches_text(self):
+        """Наборы из пакета совпадают с текстом; изменения видны после пересборки пакета."""
+        self._write("Animals", "Dog - собака\nCat - кошка\n")
+        bundle_path = os.path.join(self.tmp_dir, "words.bundle")
+        self.assertEqual(build_bundle(self.tmp_dir, bundle_path), 2)
+
+        bundled = WordCatalog(levels_dir=self.tmp_dir, check_interval=0, bundle_path=bundle_path)
+        self.assertEqual(bundled.load_all(), 2)
+        self.assertEqual(bundled.sets, {})  # наборы разбираются лениво
+        self.assertEqual(bundled.list_sets("A1"), ["Animals", "Basics"])
+        for name in ("Animals", "Basics"):
+            self.assertEqual(bundled.get_lines("A1", name), self.catalog.get_lines("A1", name))
+
+        self._write("Animals", "Fox - лиса\n")
+        self.assertEqual(bundled.get_lines("A1", "Animals"), ("Dog - собака", "Cat - кошка"))
+        build_bundle(self.tmp_dir, bundle_path)
+        self.assertEqual(bundled.get_lines("A1", "Animals"), ("Fox - лиса",))
+        bundled.clear()
+
+    def test_bundle_skips_set_files(self):
+        """С пакетом список и строки наборов не требуют файлов .txt."""
+        bundle_path = os.path.join(self.tmp_dir, "words.bundle")
+        build_bundle(self.tmp_dir, bundle_path)
+        lines = self.catalog.get_lines("A1", "Basics")
+        os.remove(os.path.join(self.tmp_dir, "A1", "Basics.txt"))
+
+        bundled = WordCatalog(levels_dir=self.tmp_dir, check_interval=0, bundle_path=bundle_path)
+        self.assertEqual(bundled.list_sets("A1"), ["Basics"])
+        self.assertEqual(bundled.get_lines("A1", "Basics"), lines)
+        bundled.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
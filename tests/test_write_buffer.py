@@ -0,0 +1,73 @@
+# tests/test_write_buffer.py
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from database.write_buffer import WriteBehindBuffer
+from fake_db import FakeManager
+
+
+_SCHEMA = """
+    CREATE TABLE learned_words (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER,
+                                word TEXT, translation TEXT, learned_date TEXT);
+    CREATE UNIQUE INDEX idx_learned_words_chat_word ON learned_words(chat_id, word);
+"""
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    def setUp(self):
+        self.manager = FakeManager(_SCHEMA)
+        patcher = patch("database.write_buffer.db_manager", self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = WriteBehindBuffer(flush_interval_ms=60_000, max_rows=1000)
+        self.buffer._thread = object()  # без фонового потока: сбрасываем вручную
+
+    def tearDown(self):
+        self.manager.close()
+
+    def _rows(self, sql):
+        return self.manager.conn.execute(sql).fetchall()
+
+    def test_coalesced_single_transaction(self):
+        """Повторы схлопываются, все изменения уходят одной транзакцией."""
+        for _ in range(3):
+            self.buffer.add_learned_word(1, "cat", "кошка", "2025-01-15")
+        self.buffer.add_learned_word(1, "dog", "собака", "2025-01-15")
+        self.buffer.add_learned_word(2, "cat", "кошка", "2025-01-15")
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.manager.transactions, 1)
+        self.assertEqual(self._rows("SELECT chat_id, word FROM learned_words ORDER BY chat_id, word"),
+                         [(1, "cat"), (1, "dog"), (2, "cat")])
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_existing_word_ignored(self):
+        """Слово, уже лежащее в БД, не дублируется."""
+        self.buffer.add_learned_word(1, "cat", "кошка", "2025-01-15")
+        self.buffer.flush()
+        self.buffer.add_learned_word(1, "cat", "кошка", "2025-01-16")
+        self.buffer.flush()
+        self.assertEqual(self._rows("SELECT COUNT(*) FROM learned_words"), [(1,)])
+
+    def test_pending_visible_and_discard(self):
+        """Несброшенное видно читателям; discard отбрасывает изменения пользователя."""
+        self.buffer.add_learned_word(1, "cat", "кошка", "2025-01-15")
+        self.assertEqual(self.buffer.pending_learned_words(1), [("cat", "кошка")])
+        self.assertEqual(self.buffer.pending_learned_words(2), [])
+
+        self.buffer.discard(1)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.pending_learned_words(1), [])
+
+    def test_failed_flush_keeps_rows(self):
+        """При ошибке записи изменения остаются в буфере для повтора."""
+        self.buffer.add_learned_word(1, "cat", "кошка", "2025-01-15")
+        with patch.object(self.manager, "transaction", side_effect=sqlite3.OperationalError("locked")):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(self.buffer.flush(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
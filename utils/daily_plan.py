@@ -0,0 +1,155 @@
+# utils/daily_plan.py
+"""
+Компактный план «слов дня» пользователя.
+
+Раньше план хранился кортежем из 11 элементов: каждое сообщение
+«🔹 слово» повторялось repetitions раз отдельной строкой, рядом — список
+строк 'HH:MM' той же длины и еще раз список уникальных слов. При 100k
+пользователей это сотни тысяч одинаковых по смыслу строк.
+
+DailyPlan хранит:
+* слова — кортеж ссылок на строки каталога (sys.intern: те же объекты, что
+  в WordSet.lines, без копий);
+* число повторений одним int;
+* минуты уведомлений — array('H'), общий для всех планов с одинаковыми
+  (числом уведомлений, началом, длительностью).
+
+Тексты уведомлений собираются при отправке (message_at/message). Старые
+обращения entry[0]..entry[10] и len(entry) работают как с кортежем.
+"""
+
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+WORD_PREFIX = "🔹 "
+
+# Общие массивы минут: (уведомлений, начало, длительность) → array('H')
+_minutes_cache: Dict[Tuple[int, str, float], array] = {}
+
+
+def shared_minutes(total_count: int, first_time: str, duration_hours: float) -> array:
+    """Минуты уведомлений; один объект на все планы с одинаковыми параметрами."""
+    key = (total_count, first_time, duration_hours)
+    minutes = _minutes_cache.get(key)
+    if minutes is None:
+        from utils.helpers import compute_notification_minutes
+        minutes = _minutes_cache.setdefault(key, compute_notification_minutes(total_count, first_time, duration_hours))
+    return minutes
+
+
+class DailyPlan:
+    """План слов дня; индексы 0..10 совпадают с прежним кортежем."""
+
+    __slots__ = ("date", "words", "repetitions", "minutes", "first_time", "duration_hours",
+                 "words_count", "tz", "is_revision", "prefix")
+
+    def __init__(self, date: str, words: Sequence[str], repetitions: int, first_time: str,
+                 duration_hours: float, words_count: int, tz: str, is_revision: bool = False,
+                 prefix: str = "", minutes: Optional[array] = None):
+        self.date = sys.intern(date)
+        self.words = tuple(sys.intern(word) for word in words)
+        self.repetitions = repetitions
+        self.first_time = sys.intern(first_time)
+        self.duration_hours = duration_hours
+        self.words_count = words_count
+        self.tz = sys.intern(tz)
+        self.is_revision = bool(is_revision)
+        self.prefix = sys.intern(prefix or "")
+        if minutes is None:
+            minutes = shared_minutes(self.notification_count, first_time, duration_hours)
+        self.minutes = minutes
+
+    # ───────────────────────── уведомления ─────────────────────────
+    @property
+    def per_round(self) -> int:
+        """Сообщений в одном круге повторения (префикс + слова)."""
+        return len(self.words) + (1 if self.prefix else 0)
+
+    @property
+    def notification_count(self) -> int:
+        """Число уведомлений за день."""
+        return self.per_round * self.repetitions
+
+    def message(self, index: int) -> str:
+        """Текст уведомления номер index."""
+        position = index % self.per_round
+        if self.prefix:
+            if position == 0:
+                return self.prefix
+            position -= 1
+        return WORD_PREFIX + self.words[position]
+
+    def message_at(self, minute: int) -> Optional[str]:
+        """Текст первого уведомления, назначенного на минуту суток, или None."""
+        try:
+            index = self.minutes.index(minute)
+        except ValueError:
+            return None
+        return self.message(index) if index < self.notification_count else None
+
+    def messages(self) -> List[str]:
+        """Все уведомления дня (прежний entry[1])."""
+        one_round = ([self.prefix] if self.prefix else []) + [WORD_PREFIX + word for word in self.words]
+        return one_round * self.repetitions
+
+    def times(self) -> List[str]:
+        """Времена уведомлений 'HH:MM' (прежний entry[2])."""
+        from utils.helpers import minute_to_hhmm
+        return [minute_to_hhmm(minute) for minute in self.minutes]
+
+    # ───────────────────────── совместимость с кортежем ─────────────────────────
+    # Позиции прежнего кортежа плана: entry[0] … entry[10]
+    _TUPLE_FIELDS = ("date", "messages", "times", "first_time", "duration_hours", "words_count",
+                     "repetitions", "tz", "words", "is_revision", "prefix")
+
+    def __len__(self) -> int:
+        # Старые проверки вида len(entry) > 8 and entry[8]
+        return len(self._TUPLE_FIELDS)
+
+    def as_tuple(self) -> tuple:
+        return tuple(self[index] for index in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.as_tuple()[index]
+        name = self._TUPLE_FIELDS[index]  # отрицательные индексы и IndexError — как у кортежа
+        if name in ("messages", "times"):
+            return getattr(self, name)()
+        if name == "words":
+            return list(self.words)
+        return getattr(self, name)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, DailyPlan):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+        return NotImplemented
+
+    # Сравнение по значению, а поля изменяемые: план не может быть ключом словаря
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"DailyPlan({self.date}, {len(self.words)} слов × {self.repetitions}, tz={self.tz})"
+
+    # ───────────────────────── хранение (PlanStore, JSON) ─────────────────────────
+    def to_json(self) -> dict:
+        return {
+            "date": self.date, "words": list(self.words), "repetitions": self.repetitions,
+            "first_time": self.first_time, "duration_hours": self.duration_hours,
+            "words_count": self.words_count, "tz": self.tz, "is_revision": self.is_revision,
+            "prefix": self.prefix,
+        }
+
+    @classmethod
+    def from_json(cls, payload) -> "DailyPlan":
+        """Из JSON; принимает и прежний формат — список из 11 элементов."""
+        if isinstance(payload, dict):
+            return cls(**payload)
+        (date, messages, times, first_time, duration_hours, words_count, repetitions,
+         tz, words, is_revision, prefix) = payload
+        plan = cls(date, words or [], repetitions, first_time, duration_hours, words_count,
+                   tz, is_revision, prefix)
+        # Старый план мог быть рассчитан иначе — сохраняем его времена как были
+        if plan.times() != list(times):
+            plan.minutes = array("H", [int(t[:2]) * 60 + int(t[3:5]) for t in times])
+        return plan
@@ -0,0 +1,208 @@
+# utils/media_cache.py
+"""
+Общие части кэшей медиа, отправляемых в Telegram.
+
+* DiskCache — файлы по ключу содержимого в <каталог>/<2 символа>/<ключ><суффикс>,
+  суммарный размер ограничен, вытесняются давно не использованные (порядок
+  берется из mtime и переживает перезапуск). Запись — через временный файл
+  и os.replace, один производитель на ключ.
+* FileIdStore — file_id Telegram уже загруженных файлов (таблица
+  media_file_ids), чтобы повторная отправка не загружала файл заново.
+* send_cached — отправка по file_id с загрузкой файла (или байтов из памяти)
+  при первом обращении.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from aiogram.types import InputFile
+from aiogram.utils.exceptions import BadRequest
+
+from database import crud
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(*parts) -> str:
+    """sha256 от частей ключа (сериализуются в JSON — порядок и типы важны)."""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Запись во временный файл рядом и os.replace: читатели не видят недописанный файл."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """Файлы по ключу содержимого с вытеснением по суммарному размеру."""
+
+    def __init__(self, cache_dir, max_bytes: int, suffix: str):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        # ключ → размер файла, от давно использованных к недавним
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._scanned = False
+        self._lock = threading.Lock()
+        # Один производитель на ключ: потоки с тем же ключом ждут готовый файл
+        self._key_locks = [threading.Lock() for _ in range(64)]
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{self.suffix}"
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _scan(self) -> None:
+        """Индекс уже лежащих на диске файлов (под self._lock)."""
+        if self._scanned:
+            return
+        entries = []
+        for path in self.cache_dir.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, path.name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._files[key] = size
+            self._total += size
+        self._scanned = True
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            self._scan()
+            return key in self._files
+
+    def register(self, key: str, size: int) -> None:
+        """Учитывает файл, записанный в path(key) снаружи (например, дочерним процессом)."""
+        with self._lock:
+            self._scan()
+            self._total += size - self._files.pop(key, 0)
+            self._files[key] = size
+            evicted: List[str] = []
+            while self._total > self.max_bytes and len(self._files) > 1:
+                old_key, old_size = self._files.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                self.path(old_key).unlink()
+            except OSError:
+                pass
+        if evicted:
+            logger.debug("Кэш %s: вытеснено файлов %d", self.cache_dir, len(evicted))
+
+    def get_or_create(self, key: str, produce: Callable[[], bytes]) -> Path:
+        """Путь к файлу ключа; при промахе содержимое создает produce()."""
+        path = self.path(key)
+        with self._lock:
+            self._scan()
+            cached = key in self._files
+            if cached:
+                self._files.move_to_end(key)
+        if cached:
+            try:
+                os.utime(path)
+                return path
+            except OSError:
+                pass  # файл удален снаружи — создаем заново
+
+        with self._key_locks[int(key[:2], 16) % len(self._key_locks)]:
+            try:
+                # Мог появиться от другого потока или процесса
+                size = path.stat().st_size
+            except OSError:
+                data = produce()
+                write_atomic(path, data)
+                size = len(data)
+            self.register(key, size)
+        return path
+
+
+class FileIdStore:
+    """file_id загруженных в Telegram файлов одного вида (память + media_file_ids)."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._ids: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        file_id = self._ids.get(key)
+        if file_id is None:
+            file_id = crud.get_media_file_ids([key]).get(key)
+            if file_id is not None:
+                self._ids[key] = file_id
+        return file_id
+
+    def remember(self, key: str, file_id: str) -> None:
+        self._ids[key] = file_id
+        crud.save_media_file_id(key, self.kind, file_id)
+
+    def forget(self, key: str) -> None:
+        self._ids.pop(key, None)
+        crud.delete_media_file_id(key)
+
+
+def _sent_file_id(message, attr: str) -> Optional[str]:
+    media = getattr(message, attr, None)
+    if isinstance(media, list):
+        # Фото приходит набором размеров — берем самый большой
+        media = media[-1] if media else None
+    return getattr(media, "file_id", None)
+
+
+def input_file(content: Union[Path, bytes], filename: Optional[str] = None) -> InputFile:
+    """InputFile из пути или из байтов в памяти (BytesIO — без временного файла)."""
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return InputFile(BytesIO(content), filename=filename)
+    return InputFile(str(content), filename=filename)
+
+
+async def send_cached(send: Callable, chat_id: int, key: str, file_ids: FileIdStore,
+                      load: Callable[[], Union[Path, bytes]], attr: str, filename: Optional[str] = None,
+                      **kwargs):
+    """
+    Отправляет медиа методом бота send (send_audio, send_photo, ...): по
+    сохраненному file_id, иначе загружает load() — путь к файлу или байты
+    в памяти — и запоминает file_id ответа (message.<attr>).
+    """
+    from database.async_crud import run_db
+
+    file_id = await run_db(file_ids.get, key)
+    if file_id is not None:
+        try:
+            return await send(chat_id, file_id, **kwargs)
+        except BadRequest as e:
+            logger.warning("file_id %s %s больше не действует: %s", file_ids.kind, key[:12], e)
+            await run_db(file_ids.forget, key)
+
+    content = await asyncio.get_running_loop().run_in_executor(None, load)
+    message = await send(chat_id, input_file(content, filename), **kwargs)
+    sent_id = _sent_file_id(message, attr)
+    if sent_id is not None:
+        await run_db(file_ids.remember, key, sent_id)
+    return message
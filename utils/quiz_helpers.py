@@ -4,16 +4,39 @@
 Описание: Функция для загрузки данных для квиза.
 """
 
-import os
 import logging
-from config import LEVELS_DIR, DEFAULT_SETS
+from config import DEFAULT_SETS
+from utils.quiz_utils import DistractorIndex
+from utils.word_catalog import word_catalog
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+def get_distractor_index(level: str, chosen_set: str = None):
+    """
+    Индекс дистракторов набора (utils.quiz_utils.DistractorIndex).
+
+    Строится при первом тесте по версии набора и хранится в WordSet: после
+    изменения файла каталог создает новый WordSet, и индекс строится заново.
+    Возвращает None, если набора нет или он пуст.
+    """
+    if chosen_set is None:
+        chosen_set = DEFAULT_SETS.get(level)
+        if not chosen_set:
+            logger.warning(f"No default set defined for level {level}")
+            return None
+    word_set = word_catalog.get_set(level, chosen_set)
+    if word_set is None:
+        logger.warning(f"Quiz set not found: {level}/{chosen_set}")
+        return None
+    index = word_set.distractors
+    if index is None:
+        index = word_set.distractors = DistractorIndex(word_set.quiz_items)
+    return index if len(index) else None
+
 def load_quiz_data(level: str, chosen_set: str = None):
     """
-    Загружает данные для квиза для указанного уровня.
+    Загружает данные для квиза для указанного уровня (из каталога слов в памяти).
     """
     try:
         # Если выбранный сет не указан, берем основной по умолчанию для уровня
@@ -23,77 +46,13 @@ def load_quiz_data(level: str, chosen_set: str = None):
                 logger.warning(f"No default set defined for level {level}")
                 return []
         
-        # Формируем имя файла с учетом выбранного сета
-        filename = os.path.join(LEVELS_DIR, level, f"{chosen_set}.txt")
-        
-        if not os.path.exists(filename):
-            logger.warning(f"Quiz file not found: {filename}")
+        word_set = word_catalog.get_set(level, chosen_set)
+        if word_set is None:
+            logger.warning(f"Quiz set not found: {level}/{chosen_set}")
             return []
-            
-        quiz_items = []
-        try:
-            with open(filename, encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Проверяем различные форматы разделителей
-                    word = None
-                    translation = None
-                    
-                    for separator in [" - ", " – ", ": "]:
-                        if separator in line:
-                            parts = line.split(separator, 1)
-                            if len(parts) == 2:
-                                word = parts[0].strip()
-                                translation = parts[1].strip()
-                                quiz_items.append({"word": word, "translation": translation})
-                                break
-                    
-                    # Если не нашли разделитель, но строка выглядит как слово,
-                    # добавляем ее как есть (это поможет с совместимостью)
-                    if word is None and line and not line.startswith(("#", "//")):
-                        quiz_items.append({"word": line, "translation": line})
-            
-            logger.debug(f"Loaded {len(quiz_items)} quiz items from {filename}")
-            return quiz_items
-        except UnicodeDecodeError:
-            logger.warning(f"Unicode decode error in file {filename}, trying with cp1251 encoding")
-            try:
-                with open(filename, encoding="cp1251") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        # Повторяем ту же логику для другой кодировки
-                        word = None
-                        translation = None
-                        
-                        for separator in [" - ", " – ", ": "]:
-                            if separator in line:
-                                parts = line.split(separator, 1)
-                                if len(parts) == 2:
-                                    word = parts[0].strip()
-                                    translation = parts[1].strip()
-                                    quiz_items.append({"word": word, "translation": translation})
-                                    break
-                        
-                        if word is None and line and not line.startswith(("#", "//")):
-                            quiz_items.append({"word": line, "translation": line})
-                
-                logger.debug(f"Loaded {len(quiz_items)} quiz items from {filename} with cp1251 encoding")
-                return quiz_items
-            except Exception as e:
-                logger.error(f"Failed to load file with alternative encoding: {e}")
-                return []
-    except FileNotFoundError:
-        logger.error(f"Quiz file not found: {filename}")
-        return []
-    except PermissionError:
-        logger.error(f"Permission denied when accessing quiz file: {filename}")
-        return []
+        
+        logger.debug(f"Loaded {len(word_set.quiz_items)} quiz items from {level}/{chosen_set}")
+        return list(word_set.quiz_items)
     except Exception as e:
         logger.error(f"Error loading quiz data for level {level}, set {chosen_set}: {e}")
-        return []
\ No newline at end of file
+        return []
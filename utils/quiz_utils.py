@@ -13,6 +13,91 @@ from utils.helpers import extract_english
 
 logger = logging.getLogger(__name__)
 
+class DistractorIndex:
+    """
+    Precomputed distractor pool for one word set version.
+
+    Built once per WordSet (see utils.quiz_helpers.get_distractor_index) and
+    shared by every quiz on that set: the word -> translation mapping and the
+    deduplicated translation tuple are not rebuilt per quiz start, and k
+    distractors are drawn by rejection sampling over indices in O(k) without
+    copying the pool.
+    """
+    __slots__ = ("translations", "mapping", "_position", "_by_length", "_length_rank")
+
+    def __init__(self, quiz_items):
+        self.mapping: Dict[str, str] = {item["word"].lower(): item["translation"] for item in quiz_items}
+        self.translations: Tuple[str, ...] = tuple(dict.fromkeys(item["translation"] for item in quiz_items))
+        self._position: Dict[str, int] = {t: i for i, t in enumerate(self.translations)}
+        # Translation indices ordered by length, for similar_length sampling
+        self._by_length = tuple(sorted(range(len(self.translations)), key=lambda i: len(self.translations[i])))
+        self._length_rank = [0] * len(self._by_length)
+        for rank, i in enumerate(self._by_length):
+            self._length_rank[i] = rank
+
+    def __len__(self) -> int:
+        return len(self.translations)
+
+    def sample(self, correct_translation: str, k: int, similar_length: bool = False,
+               rng=random) -> Optional[List[str]]:
+        """
+        Returns k distinct distractors (never the correct translation), or
+        None if the set has fewer than k of them.
+
+        similar_length draws from the 4*k translations closest in length to
+        the correct one, so the right answer does not stand out visually.
+        """
+        n = len(self.translations)
+        exclude = self._position.get(correct_translation, -1)
+        available = n - (exclude >= 0)
+        if available < k:
+            return None
+
+        if similar_length and available > 4 * k:
+            # Window of the by-length order around the correct answer (or its length)
+            if exclude >= 0:
+                center = self._length_rank[exclude]
+            else:
+                length = len(correct_translation)
+                center = sum(1 for i in self._by_length if len(self.translations[i]) < length)
+            width = 4 * k + 1
+            start = min(max(0, center - width // 2), n - width)
+            pool = self._by_length
+        else:
+            start, width, pool = 0, n, None
+
+        if 3 * k > available:
+            # Small set: rejection sampling would mostly hit taken indices
+            indices = [i for i in range(n) if i != exclude]
+            return [self.translations[i] for i in rng.sample(indices, k)]
+
+        chosen = set()
+        result = []
+        while len(result) < k:
+            i = start + rng.randrange(width)
+            if pool is not None:
+                i = pool[i]
+            if i == exclude or i in chosen:
+                continue
+            chosen.add(i)
+            result.append(self.translations[i])
+        return result
+
+    def options(self, correct_translation: str, num_options: int = 4, similar_length: bool = False,
+                rng=random) -> Tuple[List[str], int]:
+        """Same contract as generate_quiz_options, using the precomputed pool."""
+        options = [correct_translation]
+        distractors = self.sample(correct_translation, num_options - 1, similar_length, rng)
+        if distractors is not None:
+            options.extend(distractors)
+        else:
+            # Not enough distinct distractors: repeat what we have, as before
+            pool = [t for t in self.translations if t != correct_translation]
+            options.extend(rng.choices(pool, k=num_options - 1) if pool else ["???"] * (num_options - 1))
+        rng.shuffle(options)
+        return options, options.index(correct_translation)
+
+
 def generate_quiz_options(correct_translation: str, 
                           all_translations: List[str], 
                           num_options: int = 4) -> Tuple[List[str], int]:
@@ -1,14 +1,63 @@
 # utils/subscription_helpers.py
 import logging
-from datetime import datetime
-from pathlib import Path
-from typing import List
+import time
+from typing import Dict, List, Optional
 
-from config import LEVELS_DIR, FREE_SETS
+from config import FREE_SETS
 from database import crud
+from utils.word_catalog import word_catalog
 
 logger = logging.getLogger(__name__)
 
+class _LevelSets:
+    """
+    Наборы уровня с номерами битов: доступность — битовая маска.
+
+    on_disk — наборы каталога (доступны премиум-пользователям),
+    free — бесплатные наборы уровня (FREE_SETS).
+    """
+
+    __slots__ = ("version", "names", "bits", "on_disk", "free")
+
+    def __init__(self, version: int, on_disk: List[str], free: List[str]):
+        self.version = version
+        self.names = tuple(sorted(set(on_disk) | set(free)))
+        self.bits = {name: bit for bit, name in enumerate(self.names)}
+        self.on_disk = self.mask(on_disk)
+        self.free = self.mask(free)
+
+    def mask(self, names) -> int:
+        result = 0
+        for name in names:
+            result |= 1 << self.bits[name]
+        return result
+
+    def names_in(self, mask: int) -> List[str]:
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+
+# Индексы уровней; перестраиваются при изменении списка наборов каталога
+_level_sets_cache: Dict[str, _LevelSets] = {}
+
+
+def _level_sets(level: str) -> _LevelSets:
+    cached = _level_sets_cache.get(level)
+    if cached is not None and cached.version == word_catalog.names_version:
+        return cached
+    on_disk = word_catalog.list_sets(level)
+    level_sets = _LevelSets(word_catalog.names_version, on_disk, FREE_SETS.get(level, []))
+    _level_sets_cache[level] = level_sets
+    return level_sets
+
+
+def allowed_sets_mask(chat_id: int, level: str) -> int:
+    """Маска наборов уровня, доступных пользователю сейчас (биты _level_sets(level))."""
+    level_sets = _level_sets(level)
+    if crud.is_user_premium(chat_id):
+        return level_sets.on_disk
+    return level_sets.on_disk & level_sets.free
+
+
 def get_available_sets_for_user(chat_id: int, level: str) -> List[str]:
     """
     Возвращает список доступных наборов для пользователя в зависимости от подписки.
@@ -21,68 +70,38 @@ def get_available_sets_for_user(chat_id: int, level: str) -> List[str]:
         Список доступных наборов
     """
     try:
-        level_dir = Path(LEVELS_DIR) / level
-        if not level_dir.exists():
-            logger.warning(f"Level directory {level_dir} does not exist")
-            return []
-        
-        # Получаем все наборы для уровня
-        all_sets = [f.stem for f in level_dir.glob("*.txt")]
-        
-        # Проверяем статус подписки
-        is_premium = crud.is_user_premium(chat_id)
-        
-        if is_premium:
-            # Премиум пользователи имеют доступ ко всем наборам
-            logger.debug(f"Premium user {chat_id} has access to all {len(all_sets)} sets for level {level}")
-            return sorted(all_sets)
-        else:
-            # Бесплатные пользователи имеют доступ только к базовым наборам
-            free_sets = FREE_SETS.get(level, [])
-            available_sets = [s for s in all_sets if s in free_sets]
-            logger.debug(f"Free user {chat_id} has access to {len(available_sets)} free sets for level {level}")
-            return sorted(available_sets)
-            
+        return _level_sets(level).names_in(allowed_sets_mask(chat_id, level))
     except Exception as e:
         logger.error(f"Error getting available sets for user {chat_id}, level {level}: {e}")
         return []
 
-def is_set_available_for_user(chat_id: int, set_name: str) -> bool:
+def is_set_available_for_user(chat_id: int, set_name: str, level: Optional[str] = None) -> bool:
     """
     Проверяет, доступен ли конкретный набор для пользователя.
-    Исправленная версия - проверяет по факту наличия набора в доступных наборах пользователя.
+    Премиум — любой набор уровня из каталога, бесплатный — наборы из FREE_SETS.
     
     Args:
         chat_id: ID пользователя
         set_name: Название набора
+        level: Уровень пользователя; если не передан — читается из БД
         
     Returns:
         True если набор доступен, False если нет
     """
     try:
-        # Получаем текущий уровень пользователя
-        user = crud.get_user(chat_id)
-        if not user:
-            logger.warning(f"User {chat_id} not found")
+        if level is None:
+            user = crud.get_user(chat_id)
+            if not user:
+                logger.warning(f"User {chat_id} not found")
+                return False
+            level = user[1]  # Уровень пользователя
+        
+        level_sets = _level_sets(level)
+        bit = level_sets.bits.get(set_name)
+        if bit is None:
             return False
-            
-        level = user[1]  # Уровень пользователя
-        
-        # Проверяем статус подписки
-        is_premium = crud.is_user_premium(chat_id)
-        
-        if is_premium:
-            # Для премиум пользователей проверяем, существует ли файл набора в папке их уровня
-            set_file_path = Path(LEVELS_DIR) / level / f"{set_name}.txt"
-            is_available = set_file_path.exists()
-            logger.debug(f"Premium user {chat_id}: set {set_name} is {'available' if is_available else 'not available'} for level {level}")
-            return is_available
-        else:
-            # Для бесплатных пользователей проверяем, есть ли набор в списке бесплатных
-            free_sets = FREE_SETS.get(level, [])
-            is_available = set_name in free_sets
-            logger.debug(f"Free user {chat_id}: set {set_name} is {'available' if is_available else 'not available'} (free sets: {free_sets})")
-            return is_available
+        mask = level_sets.on_disk if crud.is_user_premium(chat_id) else level_sets.free
+        return bool(mask >> bit & 1)
         
     except Exception as e:
         logger.error(f"Error checking set availability for user {chat_id}, set {set_name}: {e}")
@@ -99,16 +118,8 @@ def get_premium_sets_for_level(level: str) -> List[str]:
         Список премиум наборов
     """
     try:
-        level_dir = Path(LEVELS_DIR) / level
-        if not level_dir.exists():
-            return []
-            
-        all_sets = [f.stem for f in level_dir.glob("*.txt")]
-        free_sets = FREE_SETS.get(level, [])
-        premium_sets = [s for s in all_sets if s not in free_sets]
-        
-        logger.debug(f"Found {len(premium_sets)} premium sets for level {level}")
-        return sorted(premium_sets)
+        level_sets = _level_sets(level)
+        return level_sets.names_in(level_sets.on_disk & ~level_sets.free)
         
     except Exception as e:
         logger.error(f"Error getting premium sets for level {level}: {e}")
@@ -136,22 +147,19 @@ def check_subscription_expiry(chat_id: int) -> dict:
             "expired": False
         }
         
-        if status == 'premium' and expires_at:
-            try:
-                expiry_date = datetime.fromisoformat(expires_at)
-                now = datetime.now()
-                
-                if now < expiry_date:
-                    result["is_premium"] = True
-                    result["days_left"] = (expiry_date - now).days
-                else:
-                    result["expired"] = True
-                    # Обновляем статус в БД если подписка истекла
-                    crud.update_user_subscription(chat_id, 'expired')
-                    
-            except ValueError as e:
-                logger.error(f"Invalid expiry date format for user {chat_id}: {e}")
-                
+        # Окончание — из кэша прав доступа (секунды эпохи), без разбора даты
+        until = crud.get_premium_until(chat_id)
+        now = time.time()
+        if until > now:
+            result["is_premium"] = True
+            result["days_left"] = int((until - now) // 86400)
+        elif status == 'expired':
+            result["expired"] = True
+        elif status == 'premium' and expires_at:
+            result["expired"] = True
+            # Фоновая проверка еще не дошла — обновляем статус сразу
+            crud.update_user_subscription(chat_id, 'expired')
+        
         return result
         
     except Exception as e:
@@ -200,13 +208,9 @@ def get_all_sets_for_level(level: str) -> List[str]:
         Список всех наборов для уровня
     """
     try:
-        level_dir = Path(LEVELS_DIR) / level
-        if not level_dir.exists():
-            return []
-            
-        all_sets = [f.stem for f in level_dir.glob("*.txt")]
-        return sorted(all_sets)
+        level_sets = _level_sets(level)
+        return level_sets.names_in(level_sets.on_disk)
         
     except Exception as e:
         logger.error(f"Error getting all sets for level {level}: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,148 @@
+# utils/word_bundle.py
+"""
+Бинарный пакет наборов слов (levels/words.bundle).
+
+Все наборы компилируются в один файл, который бот открывает через mmap:
+вместо обхода и декодирования сотен .txt при старте читается только
+небольшой индекс, а строки набора достаются из отображенной памяти при
+первом обращении. Несколько процессов бота делят одну копию файла в
+страничном кэше ОС.
+
+Формат (little-endian):
+    заголовок:  magic b"WSBN", version u32, count u32
+    индекс:     count записей
+                mtime_ns i64, size i64, offset u64, length u32, lines u32,
+                level_len u16, name_len u16, level utf-8, name utf-8
+    данные:     на каждый набор — (lines + 1) смещений u32 от начала
+                блока строк и сам блок строк utf-8 без разделителей
+"""
+
+import logging
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WSBN"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sII")
+_ENTRY = struct.Struct("<qqQIIHH")
+
+
+class BundleEntry(NamedTuple):
+    level: str
+    name: str
+    mtime_ns: int
+    size: int
+    offset: int
+    length: int
+    line_count: int
+
+
+def _encode_set(lines: List[str]) -> bytes:
+    encoded = [line.encode("utf-8") for line in lines]
+    offsets = [0]
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(encoded)
+
+
+def write_bundle(path, sets: Iterable[Tuple[str, str, int, int, List[str]]]) -> int:
+    """
+    Записывает пакет. sets — кортежи (level, name, mtime_ns, size, lines)
+    исходных файлов. Файл заменяется атомарно. Возвращает число наборов.
+    """
+    sets = list(sets)
+    index_size = sum(
+        _ENTRY.size + len(level.encode("utf-8")) + len(name.encode("utf-8"))
+        for level, name, *_ in sets
+    )
+    offset = _HEADER.size + index_size
+
+    index_parts, data_parts = [], []
+    for level, name, mtime_ns, size, lines in sets:
+        data = _encode_set(lines)
+        level_raw, name_raw = level.encode("utf-8"), name.encode("utf-8")
+        index_parts.append(_ENTRY.pack(mtime_ns, size, offset, len(data), len(lines),
+                                       len(level_raw), len(name_raw)))
+        index_parts.append(level_raw + name_raw)
+        data_parts.append(data)
+        offset += len(data)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sets)))
+        f.writelines(index_parts)
+        f.writelines(data_parts)
+    os.replace(tmp_path, path)
+    return len(sets)
+
+
+class WordBundle:
+    """Пакет, отображенный в память (только чтение)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.entries = self._read_index()
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _read_index(self) -> Dict[Tuple[str, str], BundleEntry]:
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Неподдерживаемый формат пакета слов: {magic!r} v{version}")
+
+        entries = {}
+        pos = _HEADER.size
+        for _ in range(count):
+            mtime_ns, size, offset, length, line_count, level_len, name_len = _ENTRY.unpack_from(self._mm, pos)
+            pos += _ENTRY.size
+            level = self._mm[pos:pos + level_len].decode("utf-8")
+            pos += level_len
+            name = self._mm[pos:pos + name_len].decode("utf-8")
+            pos += name_len
+            if offset + length > len(self._mm):
+                raise ValueError(f"Пакет слов поврежден: набор {level}/{name} за пределами файла")
+            entries[(level, name)] = BundleEntry(level, name, mtime_ns, size, offset, length, line_count)
+        return entries
+
+    def get(self, level: str, name: str) -> Optional[BundleEntry]:
+        return self.entries.get((level, name))
+
+    def lines(self, entry: BundleEntry) -> List[str]:
+        """Строки набора, прочитанные из отображенной памяти."""
+        count = entry.line_count
+        offsets = struct.unpack_from(f"<{count + 1}I", self._mm, entry.offset)
+        base = entry.offset + 4 * (count + 1)
+        mm = self._mm
+        return [
+            mm[base + offsets[i]:base + offsets[i + 1]].decode("utf-8")
+            for i in range(count)
+        ]
+
+    def close(self) -> None:
+        if not self._mm.closed:
+            self._mm.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def open_bundle(path) -> Optional[WordBundle]:
+    """Открывает пакет; при отсутствии или повреждении файла возвращает None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return WordBundle(path)
+    except Exception as e:
+        logger.warning("Пакет слов %s не загружен, используем текстовые файлы: %s", path, e)
+        return None
@@ -0,0 +1,319 @@
+# utils/word_catalog.py
+"""
+Каталог наборов слов в памяти.
+
+Все файлы levels/<LEVEL>/<set>.txt разбираются один раз (при старте или при
+первом обращении) в компактные записи WordRecord со строками, прошедшими
+sys.intern. Повторный разбор происходит только если у файла изменились
+mtime/размер — так что создание теста и генерация слов дня не читают диск.
+
+Если рядом лежит скомпилированный пакет (levels/build_bundle.py), список
+наборов берется из его индекса, а строки набора — из mmap при первом
+обращении; файлы .txt при этом не обходятся и не проверяются. Раз в
+check_interval проверяется только сам пакет: пересобранный пакет
+перечитывается. Наборы, которых нет в пакете, читаются из текста, как раньше.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import LEVELS_DIR, WORDS_RELOAD_CHECK_INTERVAL, WORDS_BUNDLE_PATH
+from utils.visual_helpers import extract_english
+from utils.word_bundle import open_bundle, write_bundle
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("utf-8-sig", "cp1251", "latin-1")
+SEPARATORS = (" - ", " – ", ": ")
+COMMENT_PREFIXES = ("#", "//")
+
+
+class WordRecord:
+    """Одна строка набора: «word [transcription] – перевод»."""
+    __slots__ = ("line", "word", "english", "transcription", "translation", "key")
+
+    def __init__(self, line: str):
+        word, translation = line, line
+        for separator in SEPARATORS:
+            if separator in line:
+                word, translation = (part.strip() for part in line.split(separator, 1))
+                break
+
+        english, transcription = word, ""
+        if "[" in word and "]" in word:
+            start = word.index("[")
+            english = word[:start].strip()
+            transcription = word[start + 1:word.index("]", start)].strip()
+
+        self.line = sys.intern(line)
+        self.word = sys.intern(word)
+        self.english = sys.intern(english)
+        self.transcription = sys.intern(transcription)
+        self.translation = sys.intern(translation)
+        # Тот же ключ, что используется для выученных слов: extract_english(...).lower()
+        self.key = sys.intern(extract_english(line).lower())
+
+    def __repr__(self):
+        return f"WordRecord({self.line!r})"
+
+
+class WordSet:
+    """Разобранный набор слов с индексом по ключу."""
+    __slots__ = ("level", "name", "path", "records", "lines", "by_key",
+                 "quiz_items", "distractors", "mtime_ns", "size", "checked_at")
+
+    def __init__(self, level: str, name: str, path: Path, records: Tuple[WordRecord, ...],
+                 mtime_ns: int, size: int):
+        self.level = level
+        self.name = name
+        self.path = path
+        self.records = records
+        self.lines = tuple(record.line for record in records)
+        self.by_key: Dict[str, WordRecord] = {}
+        for record in records:
+            self.by_key.setdefault(record.key, record)
+        # Формат load_quiz_data: строки-комментарии без разделителя в тест не попадают
+        self.quiz_items = tuple(
+            {"word": record.word, "translation": record.translation}
+            for record in records
+            if any(separator in record.line for separator in SEPARATORS)
+            or not record.line.startswith(COMMENT_PREFIXES)
+        )
+        # Индекс дистракторов для тестов строится при первом обращении (utils/quiz_helpers.py)
+        self.distractors = None
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.records)
+
+
+def _decode(raw: bytes, path: Path) -> str:
+    for encoding in ENCODINGS:
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise UnicodeDecodeError("utf-8", raw, 0, len(raw), f"Can't decode {path}")
+
+
+def parse_set_text(text: str) -> Tuple[WordRecord, ...]:
+    """Разбирает текст набора в записи (пустые строки пропускаются)."""
+    return tuple(WordRecord(line.strip()) for line in text.splitlines() if line.strip())
+
+
+def _iter_set_files(levels_dir: Path):
+    """(level, name, path) для всех наборов всех уровней."""
+    if not levels_dir.exists():
+        return
+    for level_dir in sorted(p for p in levels_dir.iterdir() if p.is_dir()):
+        for path in sorted(level_dir.glob("*.txt")):
+            yield level_dir.name, path.stem, path
+
+
+def build_bundle(levels_dir=LEVELS_DIR, output_path=WORDS_BUNDLE_PATH) -> int:
+    """Компилирует все наборы в бинарный пакет. Возвращает число наборов."""
+    sets = []
+    for level, name, path in _iter_set_files(Path(levels_dir)):
+        stat = path.stat()
+        lines = [record.line for record in parse_set_text(_decode(path.read_bytes(), path))]
+        sets.append((level, name, stat.st_mtime_ns, stat.st_size, lines))
+    return write_bundle(output_path, sets)
+
+
+class WordCatalog:
+    """
+    Потокобезопасный каталог наборов слов.
+
+    check_interval — как часто (сек) проверять mtime файла набора при обращении;
+    0 — при каждом обращении (режим разработки).
+    bundle_path — путь к скомпилированному пакету; None/"" — только текстовые файлы.
+    """
+
+    def __init__(self, levels_dir: str = LEVELS_DIR, check_interval: float = WORDS_RELOAD_CHECK_INTERVAL,
+                 bundle_path: Optional[str] = WORDS_BUNDLE_PATH):
+        self.levels_dir = Path(levels_dir)
+        self.check_interval = check_interval
+        self.bundle_path = bundle_path
+        self.sets: Dict[Tuple[str, str], WordSet] = {}
+        self._names: Set[Tuple[str, str]] = set()
+        # Растет при каждом изменении списка наборов (для производных индексов)
+        self.names_version = 0
+        self._bundle = None
+        # (mtime_ns, size, inode) открытого пакета и время последней проверки
+        self._bundle_stat: Optional[Tuple[int, int, int]] = None
+        self._bundle_checked_at = 0.0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # ───────────────────────── загрузка ─────────────────────────
+    def _path(self, level: str, name: str) -> Path:
+        return self.levels_dir / level / f"{name}.txt"
+
+    def _store(self, level: str, name: str, records: Tuple[WordRecord, ...], mtime_ns: int, size: int) -> WordSet:
+        word_set = WordSet(level, name, self._path(level, name), records, mtime_ns, size)
+        self.sets[(level, name)] = word_set
+        if (level, name) not in self._names:
+            self._names.add((level, name))
+            self.names_version += 1
+        logger.debug("Загружен набор %s/%s: %d слов", level, name, len(records))
+        return word_set
+
+    def _load(self, level: str, name: str, stat: os.stat_result) -> WordSet:
+        path = self._path(level, name)
+        records = parse_set_text(_decode(path.read_bytes(), path))
+        return self._store(level, name, records, stat.st_mtime_ns, stat.st_size)
+
+    def _load_bundled(self, entry) -> WordSet:
+        records = tuple(WordRecord(line) for line in self._bundle.lines(entry))
+        return self._store(entry.level, entry.name, records, entry.mtime_ns, entry.size)
+
+    @staticmethod
+    def _stat_key(stat: os.stat_result) -> Tuple[int, int, int]:
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _open_bundle(self) -> bool:
+        if self._bundle is not None:
+            self._bundle.close()
+            self._bundle = None
+        self._bundle_checked_at = time.monotonic()
+        try:
+            self._bundle_stat = self._stat_key(os.stat(self.bundle_path)) if self.bundle_path else None
+        except OSError:
+            self._bundle_stat = None
+        if self._bundle_stat is not None:
+            self._bundle = open_bundle(self.bundle_path)
+        return self._bundle is not None
+
+    def _check_bundle(self, now: float) -> None:
+        """Перечитывает каталог, если пакет пересобран или удален (под self._lock)."""
+        self._bundle_checked_at = now
+        try:
+            current = self._stat_key(os.stat(self.bundle_path))
+        except OSError:
+            current = None
+        if current != self._bundle_stat:
+            logger.info("Пакет слов %s изменился, перечитываем каталог", self.bundle_path)
+            self.load_all()
+
+    def load_all(self) -> int:
+        """
+        Загружает каталог. С пакетом — читает только его индекс (наборы
+        разбираются лениво, каталоги уровней не обходятся), без пакета —
+        разбирает все текстовые файлы. Возвращает количество наборов.
+        """
+        with self._lock:
+            self.sets.clear()
+            self.names_version += 1
+            if self._open_bundle():
+                self._names = set(self._bundle.entries)
+                self._loaded = True
+                logger.info("Каталог слов: пакет %s (%d наборов)", self.bundle_path, len(self._names))
+                return len(self._names)
+
+            self._names = {(level, name) for level, name, _ in _iter_set_files(self.levels_dir)}
+
+            for level, name in sorted(self._names):
+                path = self._path(level, name)
+                try:
+                    self._load(level, name, path.stat())
+                except Exception as e:
+                    logger.error("Ошибка загрузки набора %s: %s", path, e)
+            self._loaded = True
+            total_words = sum(len(word_set) for word_set in self.sets.values())
+        logger.info("Каталог слов загружен: %d наборов, %d слов", len(self.sets), total_words)
+        return len(self.sets)
+
+    def get_set(self, level: str, name: str) -> Optional[WordSet]:
+        """Набор из памяти; перечитывается только если файл (или пакет) изменился."""
+        if not level or not name:
+            return None
+        key = (level, name)
+        word_set = self.sets.get(key)
+        now = time.monotonic()
+        if word_set is not None and now - word_set.checked_at < self.check_interval:
+            return word_set
+
+        with self._lock:
+            if self._bundle is not None and now - self._bundle_checked_at >= self.check_interval:
+                self._check_bundle(now)
+            entry = self._bundle.get(level, name) if self._bundle is not None else None
+            word_set = self.sets.get(key)
+            if entry is not None and word_set is None:
+                try:
+                    word_set = self._load_bundled(entry)
+                except Exception as e:
+                    logger.error("Ошибка чтения набора %s/%s из пакета: %s", level, name, e)
+                    entry = None
+            if entry is not None:
+                # Набор из пакета: его .txt не проверяется, актуальность — по самому пакету
+                word_set.checked_at = now
+                return word_set
+
+            try:
+                stat = self._path(level, name).stat()
+            except OSError:
+                if word_set is not None:
+                    logger.info("Набор %s/%s удален с диска", level, name)
+                    del self.sets[key]
+                if key in self._names:
+                    self._names.discard(key)
+                    self.names_version += 1
+                return None
+
+            if word_set is not None and (word_set.mtime_ns, word_set.size) == (stat.st_mtime_ns, stat.st_size):
+                word_set.checked_at = now
+                return word_set
+
+            try:
+                return self._load(level, name, stat)
+            except Exception as e:
+                logger.error("Ошибка загрузки набора %s/%s: %s", level, name, e)
+                return word_set
+
+    # ───────────────────────── выборки ─────────────────────────
+    def has_set(self, level: str, name: str) -> bool:
+        return self.get_set(level, name) is not None
+
+    def get_lines(self, level: str, name: str) -> Tuple[str, ...]:
+        word_set = self.get_set(level, name)
+        return word_set.lines if word_set is not None else ()
+
+    def get_quiz_items(self, level: str, name: str) -> Tuple[dict, ...]:
+        word_set = self.get_set(level, name)
+        return word_set.quiz_items if word_set is not None else ()
+
+    def find(self, level: str, name: str, word: str) -> Optional[WordRecord]:
+        """Запись набора по слову (в любом виде: строка набора или английская часть)."""
+        word_set = self.get_set(level, name)
+        if word_set is None:
+            return None
+        return word_set.by_key.get(extract_english(word).lower())
+
+    def list_sets(self, level: str) -> List[str]:
+        """Имена наборов уровня (по состоянию каталога)."""
+        if not self._loaded:
+            self.load_all()
+        return sorted(name for set_level, name in list(self._names) if set_level == level)
+
+    def clear(self) -> None:
+        """Сбрасывает каталог: следующее обращение перечитает наборы с диска."""
+        with self._lock:
+            self.sets.clear()
+            self._names = set()
+            self.names_version += 1
+            if self._bundle is not None:
+                self._bundle.close()
+                self._bundle = None
+            self._bundle_stat = None
+            self._loaded = False
+
+
+# Глобальный каталог
+word_catalog = WordCatalog()